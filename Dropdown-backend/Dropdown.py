@@ -2,10 +2,89 @@
 UI Elements that maybe used in the future
  i tried really hard to make the dropdown work from backend qwq
  but really its a frontend thing
+
+Options live in an OptionTable, validated and interned once, so dropdowns
+sharing a table (e.g. every allergy picker) skip the per-option type checks.
+Typeahead uses sorted lists of case-folded keys built on first use, so a
+prefix query is a binary search plus one step per match returned.
 """
 
+import re
+import sys
+from bisect import bisect_left
+from operator import index as as_index
+
 # written for phase 5
 
+
+# the rest of an index key from each word but the first, for matching "nut" in "Tree nuts"
+LATER_WORDS = re.compile(r"(?<=[^\w\n\0])(?=(\w.*))")
+
+
+def _check_options(options):
+    # one pass over the types instead of a check per option
+    if not set(map(type, options)) <= {str}:
+        raise KeyError("Dropdown menu options can only be strings")
+
+
+class OptionTable:
+    """
+    Validated, interned dropdown options with a case-insensitive prefix index
+
+    Attributes:
+        options(string array): the options, in display order
+    """
+
+    # Constuctor
+    def __init__(self, options=()):
+        if not isinstance(options, list):
+            options = list(options)
+        _check_options(options)
+        self.options = list(map(sys.intern, options))
+
+        # sorted index keys for whole options and for later words, built by the first search
+        self._prefixes = None
+        self._words = None
+
+    def __len__(self):
+        return len(self.options)
+
+    def _build(self):
+        # keys are case-folded text followed by "\0" and the option index, so a plain
+        # string sort also orders the indexes, and "\0" sorts before any other text
+        folded = [o.casefold().replace("\0", " ").replace("\n", " ") for o in self.options]
+        text = "\n".join(f"{key}\0{i}" for i, key in enumerate(folded))
+
+        self._prefixes = text.split("\n") if folded else []
+        self._prefixes.sort()
+
+        # one key per later word, e.g. "nuts\01" for "tree nuts", in a single regex pass
+        self._words = LATER_WORDS.findall(text)
+        self._words.sort()
+
+    def search(self, prefix, k=10):
+        """
+        Up to k option indexes matching prefix, ignoring case
+
+        Options starting with prefix come first, then options with a later
+        word starting with it, each group in alphabetical order. An empty
+        prefix gives the first k options in display order.
+        """
+        if not prefix:
+            return list(range(min(k, len(self.options))))
+        if self._prefixes is None:
+            self._build()
+
+        prefix = prefix.casefold()
+        found = {}
+        for keys in (self._prefixes, self._words):
+            i = bisect_left(keys, prefix)
+            while len(found) < k and i < len(keys) and keys[i].startswith(prefix):
+                found.setdefault(int(keys[i].rpartition("\0")[2]))
+                i += 1
+        return list(found)
+
+
 class Dropdown:
     """
     Represents dropdown menu
@@ -20,37 +99,42 @@ class Dropdown:
         self._selection = None
 
     # Getters & Setters
-    
+
     def get_option(self, index):
         return self._options[index]
-    
+
     def get_options(self):
         return self._options
-    
+
     def set_options(self, options):
-        for o in options:
-            if type(o) is not str:
-                raise KeyError("Dropdown menu options can only be strings")
-        self._options = options
+        # an OptionTable is already checked, and can be shared between dropdowns
+        if not isinstance(options, OptionTable):
+            options = OptionTable(options)
+        self._table = options
+        self._options = options.options
 
     def get_selection(self):
         if self._selection is not None:
             return self.get_option(self._selection)
         else:
             return None
-    
+
     def select_option(self, selecton_index):
-        if self._selection is not None:
-            _ = self.get_option(selecton_index)
-            self._selection = selecton_index
-        else:
-            return None
+        self._selection = _position(self._options, selecton_index)
+
+    def typeahead(self, prefix, k=10):
+        """[(index, option)] for up to k options matching prefix, see OptionTable.search"""
+        return [(i, self._options[i]) for i in self._table.search(prefix, k)]
 
 
 class MultiSelectDropdown:
     """
     Represents multi-select dropdown menu
 
+    Selections are kept in a dict used as an ordered set, so selecting,
+    checking and removing an option are O(1) and selections keep the
+    order they were made in.
+
     Attributes:
         options(string array): multi-select dropdown menu options
     """
@@ -58,35 +142,56 @@ class MultiSelectDropdown:
     # Constuctor
     def __init__(self, options=[]):
         self.set_options(options)
-        self._selections = []
+        self._selections = {}
 
     # Getters & Setters
-    
+
     def get_option(self, index):
         return self._options[index]
-    
+
     def get_options(self):
         return self._options
-    
+
     def set_options(self, options):
-        for o in options:
-            if type(o) is not str:
-                raise KeyError("Dropdown menu options can only be strings")
-        self._options = options
+        if not isinstance(options, OptionTable):
+            options = OptionTable(options)
+        self._table = options
+        self._options = options.options
 
     def get_selections(self):
-        if self._selection is not []:
-            results = []
-            for i in self._selections:
-                results.append(self.get_option(i))
-            return results
-        else:
-            return None
-    
+        options = self._options
+        return [options[i] for i in self._selections]
+
+    def get_selected_indexes(self):
+        return list(self._selections)
+
+    def is_selected(self, index):
+        return _position(self._options, index) in self._selections
+
     def select_option(self, selecton_index):
-        if self._selection is not []:
-            _ = self.get_option(selecton_index)
-            if selecton_index not in self._selections:
-                self._selections.append(selecton_index)
-        else:
-            return None
+        self._selections.setdefault(_position(self._options, selecton_index))
+
+    def select_options(self, indexes):
+        """Selects many options at once, none of them if any index is out of range"""
+        positions = [_position(self._options, i) for i in indexes]
+        self._selections.update(dict.fromkeys(positions))
+
+    def deselect_option(self, index):
+        self._selections.pop(_position(self._options, index), None)
+
+    def clear_selections(self):
+        self._selections.clear()
+
+    def typeahead(self, prefix, k=10):
+        """[(index, option)] for up to k options matching prefix, see OptionTable.search"""
+        return [(i, self._options[i]) for i in self._table.search(prefix, k)]
+
+
+def _position(options, index):
+    # a valid, non-negative option index, raising IndexError like get_option
+    if type(index) is int and 0 <= index < len(options):
+        return index
+    index = as_index(index)
+    if not -len(options) <= index < len(options):
+        raise IndexError("Dropdown option index out of range")
+    return index % len(options)
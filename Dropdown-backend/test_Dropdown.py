@@ -3,7 +3,7 @@ import unittest
 import json
 from contextlib import contextmanager
 
-from Dropdown import Dropdown, MultiSelectDropdown
+from Dropdown import Dropdown, MultiSelectDropdown, OptionTable
 
 # written for phase 5
 
@@ -34,5 +34,69 @@ class TestDropdown(unittest.TestCase):
         yield
 
 
+# testcases for typeahead over dropdown options
+class TestTypeahead(unittest.TestCase):
+    options = ["Peanuts", "Tree nuts", "Pecan", "peach", "Dairy", "Nutmeg", "Coconut milk", "Pea protein"]
+
+    # test case for whole-option matches first, then later words, ignoring case
+    def test_search(self):
+        table = OptionTable(self.options)
+        self.assertEqual(table.search("pe"), [7, 3, 0, 2])
+        self.assertEqual(table.search("PEA", k=2), [7, 3])
+        self.assertEqual(table.search("nut"), [5, 1])
+        self.assertEqual(table.search("mil"), [6])
+        self.assertEqual(table.search("xyz"), [])
+        self.assertEqual(table.search("", k=3), [0, 1, 2])
+
+    # test case for dropdowns sharing one table and returning (index, option) pairs
+    def test_dropdowns(self):
+        table = OptionTable(self.options)
+        single, multi = Dropdown(table), MultiSelectDropdown(table)
+        self.assertIs(single.get_options(), multi.get_options())
+        self.assertEqual(single.typeahead("dai"), [(4, "Dairy")])
+        self.assertEqual(multi.typeahead("co", k=1), [(6, "Coconut milk")])
+
+    # test case for non-string options still being rejected
+    def test_invalid_options(self):
+        with self.assertRaises(KeyError):
+            OptionTable(["Dairy", 5])
+        with self.assertRaises(KeyError):
+            MultiSelectDropdown(["Dairy", None])
+
+
+# testcases for dropdown selections
+class TestSelections(unittest.TestCase):
+
+    # test case for selecting an option in a single-select dropdown
+    def test_single(self):
+        dropdown = Dropdown(["Vegan", "Keto", "Paleo"])
+        self.assertIsNone(dropdown.get_selection())
+        dropdown.select_option(1)
+        self.assertEqual(dropdown.get_selection(), "Keto")
+        dropdown.select_option(-1)
+        self.assertEqual(dropdown.get_selection(), "Paleo")
+        with self.assertRaises(IndexError):
+            dropdown.select_option(3)
+
+    # test case for selections kept once each, in the order they were made
+    def test_multi(self):
+        dropdown = MultiSelectDropdown(["Vegan", "Keto", "Paleo", "Halal"])
+        self.assertEqual(dropdown.get_selections(), [])
+        for index in (2, 0, 2, -4):
+            dropdown.select_option(index)
+        self.assertEqual(dropdown.get_selections(), ["Paleo", "Vegan"])
+        self.assertTrue(dropdown.is_selected(-2))
+
+        dropdown.deselect_option(2)
+        dropdown.select_options([3, 1])
+        self.assertEqual(dropdown.get_selected_indexes(), [0, 3, 1])
+        with self.assertRaises(IndexError):
+            dropdown.select_options([2, 4])
+        self.assertFalse(dropdown.is_selected(2))
+
+        dropdown.clear_selections()
+        self.assertEqual(dropdown.get_selections(), [])
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,9 +1,38 @@
-import json
 import re
+from bisect import bisect_right
+from itertools import accumulate, chain
+
+from profile_storage import FileProfileStorage
+
+# numpy is optional, validate_batch falls back to plain python without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # written for phase 5
 
 
+# Precompiled checks shared by the single and batch validators
+USERNAME_PATTERN = re.compile(r'^[A-Za-z0-9_]+$')
+NON_BASIC_LATIN = re.compile(r'[^\x20-\x7e]')
+
+# Validation messages shared by the single and batch validators
+USERNAME_TYPE_ERROR = "Username can only be string, got type {}"
+USERNAME_LENGTH_ERROR = "Username length has to be greater than 3 and smaller than 20"
+USERNAME_CHARACTERS_ERROR = "Username should contain only alphanumeric and underscore characters"
+DESCRIPTION_TYPE_ERROR = "Description can only be string, got type {}"
+DESCRIPTION_LENGTH_ERROR = "Description exeeding 200 character limit"
+DESCRIPTION_CHARACTERS_ERROR = "Description can only contain Unicode Basic Latin characters (i.e. alphanumeric, space, !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~ )"
+WEIGHT_TYPE_ERROR = "Weight can only be float, got type {}"
+WEIGHT_RANGE_ERROR = "Weight must be between 3 and 300 kg"
+HEIGHT_TYPE_ERROR = "Height can only be float, got type {}"
+HEIGHT_RANGE_ERROR = "Height must be between 50 and 250 cm"
+ALLERGIES_ERROR = "Allergies should a string array"
+CALORIES_TYPE_ERROR = "Calories can only be float, got type {}"
+CALORIES_RANGE_ERROR = "Calories must be between 800 and 5000"
+
+
 # python classes
 
 class UserProfile:
@@ -45,13 +74,7 @@ class UserProfile:
             
         return True
 
-    def from_json(username):
-        # TODO replace this and instead load from DB in the __init__ constructor
-        filepath = f".\\stored_user_data\\{username}.json"
-
-        with open(filepath, "+rt") as mf:
-            data = json.load(mf)
-
+    def from_dict(data):
         return UserProfile(
             username=data["username"], 
             description=data["description"], 
@@ -62,75 +85,254 @@ class UserProfile:
             calories=data["calories"]
         )
 
-    def store_to_json(self):
-        # TODO update this to store to DB
-        filepath = f".\\stored_user_data\\{self.data['username']}.json"
+    def from_json(username, storage=None):
+        # loading from stored_user_data/{username}.json unless another backend is given
+        if storage is None:
+            storage = FileProfileStorage()
 
-        with open(filepath, "+xt") as mf:
-            json.dump(self.data, mf, indent=4)
+        return UserProfile.from_dict(storage.load(username))
+
+    def store_to_json(self, storage=None):
+        # storing to stored_user_data/{username}.json unless another backend is given
+        if storage is None:
+            storage = FileProfileStorage()
+
+        storage.store(self.data)
+
+    def load_many(usernames, storage):
+        # loading a batch of profiles in one backend call, skipping unknown usernames
+        found = storage.load_many(usernames)
+        return [UserProfile.from_dict(found[u]) for u in usernames if u in found]
+
+    def store_many(profiles, storage):
+        storage.store_many([p.data for p in profiles])
 
 
     def validate_username(username):
         if type(username) is not str:
-            raise ValueError(f"Username can only be string, got type {type(username)}")
+            raise ValueError(USERNAME_TYPE_ERROR.format(type(username)))
         
         if len(username) < 3 or len(username) > 20:
-            raise ValueError(f"Username length has to be greater than 3 and smaller than 20")
+            raise ValueError(USERNAME_LENGTH_ERROR)
         
-        if not re.match(r'^[A-Za-z0-9_]+$', username):
-            raise ValueError(f"Username should contain only alphanumeric and underscore characters")
+        if not USERNAME_PATTERN.match(username):
+            raise ValueError(USERNAME_CHARACTERS_ERROR)
         
         return True
     
     def validate_description(description):
         if type(description) is not str:
-            raise ValueError(f"Description can only be string, got type {type(description)}")
+            raise ValueError(DESCRIPTION_TYPE_ERROR.format(type(description)))
         
         if len(description) > 200:
-            raise ValueError(f"Description exeeding 200 character limit")
+            raise ValueError(DESCRIPTION_LENGTH_ERROR)
 
-        for c in description:
-            if ord(c)<32 or ord(c) > 126:
-                raise ValueError(f"Description can only contain Unicode Basic Latin characters (i.e. alphanumeric, space, !\"#$%&'()*+,-./:;<=>?@[\\]^_`{{|}}~ )")
+        if NON_BASIC_LATIN.search(description):
+            raise ValueError(DESCRIPTION_CHARACTERS_ERROR)
         
         return True
     
     def validate_weight(weight):
         if type(weight) is not float:
-            raise ValueError(f"Weight can only be float, got type {type(weight)}")
+            raise ValueError(WEIGHT_TYPE_ERROR.format(type(weight)))
         
         if weight < 3.0 or weight > 300.0:
-            raise ValueError(f"Weight must be between 3 and 300 kg")
+            raise ValueError(WEIGHT_RANGE_ERROR)
         
         return True
     
     def validate_height(height):
         if type(height) is not float:
-            raise ValueError(f"Height can only be float, got type {type(height)}")
+            raise ValueError(HEIGHT_TYPE_ERROR.format(type(height)))
         
         if height < 50.0 or height > 250.0:
-            raise ValueError(f"Height must be between 50 and 250 cm")
+            raise ValueError(HEIGHT_RANGE_ERROR)
         
         return True
     
     def validate_allergies(allergies):
-        if (type(allergies) is not list or not all(
-            map(lambda e : type(e) == str, allergies)
-        )):
-            raise ValueError(f"Allergies should a string array")
+        if type(allergies) is not list or not set(map(type, allergies)) <= _STR_TYPE:
+            raise ValueError(ALLERGIES_ERROR)
 
         return True
 
     def validate_calories(calories):
         if type(calories) is not float:
-            raise ValueError(f"Calories can only be float, got type {type(calories)}")
+            raise ValueError(CALORIES_TYPE_ERROR.format(type(calories)))
         
         if calories < 800.0 or calories > 5000.0:
-            raise ValueError(f"Calories must be between 800 and 5000")
+            raise ValueError(CALORIES_RANGE_ERROR)
         
         return True
 
+    def validate_batch(records):
+        """
+        Validates a columnar batch of profiles at once
 
+        records is a dict of equal-length lists keyed by the constructor arguments.
+        Returns one entry per row: None when the row is valid, otherwise the message
+        of the ValueError that UserProfile(...) would raise for that row.
+        """
+        count = len(records["username"])
+        reports = [None] * count
 
+        # running column checks last-to-first so each row keeps its first error
+        column_checks = [
+            (_username_errors, records["username"]),
+            (_description_errors, records["description"]),
+            (_weight_errors, records["weight"]),
+            (_height_errors, records["height"]),
+            (_allergies_errors, records["allergies"]),
+            (_calories_errors, records["calories"])
+        ]
+        for check, column in reversed(column_checks):
+            if len(column) != count:
+                raise ValueError("Batch columns must all have the same length")
+            for row, message in check(column).items():
+                reports[row] = message
 
-    
+        return reports
+
+    def from_batch(records):
+        """Returns (profiles for the valid rows, validate_batch reports for every row)"""
+        reports = UserProfile.validate_batch(records)
+        activities = records.get("activity") or [None] * len(reports)
+
+        columns = zip(reports, records["username"], records["description"], records["weight"],
+                      records["height"], records["allergies"], records["calories"], activities)
+
+        profiles = []
+        for report, username, description, weight, height, allergies, calories, activity in columns:
+            if report is not None:
+                continue
+
+            # rows were already validated, so skip re-running the validators
+            profile = UserProfile.__new__(UserProfile)
+            profile.data = {
+                "username": username,
+                "description": description,
+                "weight": weight,
+                "height": height,
+                "allergies": allergies,
+                "calories": calories,
+                "activity": activity
+            }
+            profiles.append(profile)
+
+        return profiles, reports
+
+
+_STR_TYPE = {str}
+_LIST_TYPE = {list}
+_FLOAT_TYPE = {float}
+
+# anything validate_username could reject, checked over a whole column at once
+_NON_USERNAME = re.compile(r'[^A-Za-z0-9_]')
+
+
+# Column checks for validate_batch, each returns {row: message} for failing rows
+
+def _type_errors(values, expected, type_error):
+    # set of types first, so the per-row loop only runs on mixed columns
+    if set(map(type, values)) <= expected:
+        return {}
+    return {row: type_error.format(type(value)) for row, value in enumerate(values)
+            if type(value) not in expected}
+
+
+def _replace_rows(values, rows, placeholder):
+    # swapping rows that already failed for a placeholder that passes every check
+    if not rows:
+        return values
+    values = list(values)
+    for row in rows:
+        values[row] = placeholder
+    return values
+
+
+def _out_of_range(values, low, high):
+    if np is not None:
+        column = np.array(values, dtype=np.float64)
+        return np.flatnonzero((column < low) | (column > high)).tolist()
+    if not values or (min(values) >= low and max(values) <= high):
+        return []
+    return [row for row, value in enumerate(values) if value < low or value > high]
+
+
+def _rows_with_match(pattern, joined, lengths):
+    # searching the joined column once and mapping match offsets back to rows
+    ends = list(accumulate(lengths))
+    return {bisect_right(ends, match.start()) for match in pattern.finditer(joined)}
+
+
+def _username_errors(usernames):
+    errors = _type_errors(usernames, _STR_TYPE, USERNAME_TYPE_ERROR)
+    strings = _replace_rows(usernames, errors, "___")
+    lengths = list(map(len, strings))
+
+    for row in _out_of_range(lengths, 3, 20):
+        errors[row] = USERNAME_LENGTH_ERROR
+
+    # for ascii text isalnum is exactly [A-Za-z0-9], so clean columns skip the regex
+    joined = "".join(strings)
+    if joined.isascii() and joined.replace("_", "").isalnum():
+        return errors
+
+    # rows flagged by the column search still go through the exact pattern
+    for row in _rows_with_match(_NON_USERNAME, joined, lengths):
+        if row not in errors and not USERNAME_PATTERN.match(strings[row]):
+            errors[row] = USERNAME_CHARACTERS_ERROR
+    return errors
+
+
+def _description_errors(descriptions):
+    errors = _type_errors(descriptions, _STR_TYPE, DESCRIPTION_TYPE_ERROR)
+    strings = _replace_rows(descriptions, errors, "")
+    lengths = list(map(len, strings))
+
+    for row in _out_of_range(lengths, 0, 200):
+        errors[row] = DESCRIPTION_LENGTH_ERROR
+
+    # for ascii text isprintable is exactly the \x20-\x7e range
+    joined = "".join(strings)
+    if joined.isascii() and joined.isprintable():
+        return errors
+
+    for row in _rows_with_match(NON_BASIC_LATIN, joined, lengths):
+        errors.setdefault(row, DESCRIPTION_CHARACTERS_ERROR)
+    return errors
+
+
+def _allergies_errors(allergies_column):
+    errors = _type_errors(allergies_column, _LIST_TYPE, ALLERGIES_ERROR)
+    lists = _replace_rows(allergies_column, errors, [])
+
+    # every element of every list is a string, so the remaining rows all pass
+    if set(map(type, chain.from_iterable(lists))) <= _STR_TYPE:
+        return errors
+
+    for row, allergies in enumerate(lists):
+        if not set(map(type, allergies)) <= _STR_TYPE:
+            errors[row] = ALLERGIES_ERROR
+    return errors
+
+
+def _float_range_errors(values, low, high, type_error, range_error):
+    errors = _type_errors(values, _FLOAT_TYPE, type_error)
+    values = _replace_rows(values, errors, low)
+
+    for row in _out_of_range(values, low, high):
+        errors[row] = range_error
+    return errors
+
+
+def _weight_errors(weights):
+    return _float_range_errors(weights, 3.0, 300.0, WEIGHT_TYPE_ERROR, WEIGHT_RANGE_ERROR)
+
+
+def _height_errors(heights):
+    return _float_range_errors(heights, 50.0, 250.0, HEIGHT_TYPE_ERROR, HEIGHT_RANGE_ERROR)
+
+
+def _calories_errors(calories):
+    return _float_range_errors(calories, 800.0, 5000.0, CALORIES_TYPE_ERROR, CALORIES_RANGE_ERROR)
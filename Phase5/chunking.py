@@ -0,0 +1,38 @@
+"""
+Chunked batch jobs in a process pool
+
+chunked groups a stream of items into lists, and pooled_map runs a function
+over those lists in worker processes, yielding the results in input order.
+Post imports, the nutrition catalog, duplicate detection and the ratings
+model all share them.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# written for phase 5
+
+
+def chunked(items, chunk_size):
+    """Yields lists of up to chunk_size consecutive items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def pooled_map(function, chunks, workers, initializer=None, initargs=()):
+    """Yields function(chunk) for every chunk in order, computed in workers processes"""
+    # keeping at most two chunks per worker in flight so memory stays bounded
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(function, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,191 @@
+"""
+Community feed over Post objects
+
+Feed keeps every post id in a time-ordered index per category (and one for
+all posts), so a page is a bisect to the cursor plus one step per post
+shown, however many posts came before it. Top posts per category are kept
+in TopPosts heaps that are updated as like counts change.
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left
+
+# written for phase 5
+
+
+# categories of CommunityForum.tsx, None is the feed of all posts
+CATEGORIES = ("recipe", "health", "tips", "question")
+
+
+class TopPosts:
+    """
+    Incremental top-k of post ids by like count
+
+    Keeps the best 2k posts in a min-heap keyed by (likes, post id), so a
+    newer post wins a tie. A changed count pushes a new heap entry and the
+    old one is skipped when it reaches the top. floor is the best key of any
+    post outside the heap. Posts are only rescanned when losing likes drops
+    one of the shown k below floor, and the spare k makes that rare.
+
+    Attributes:
+        k(int): number of posts shown
+    """
+
+    # Constuctor
+    def __init__(self, k, likes_of, post_ids):
+        self.k = k
+        self._capacity = 2 * k
+        self._likes_of = likes_of
+        self._post_ids = post_ids
+
+        # post id -> likes of the posts kept, and their heap with stale entries mixed in
+        self._members = {}
+        self._heap = []
+
+        # best (likes, post id) among posts outside the heap, None if there are none
+        self._floor = None
+
+    def __len__(self):
+        return len(self._members)
+
+    def update(self, post_id, likes):
+        """Records a new post or a new like count for post_id"""
+        members = self._members
+        key = (likes, post_id)
+        if post_id in members or len(members) < self._capacity:
+            members[post_id] = likes
+            heapq.heappush(self._heap, key)
+
+            # keeping stale entries from piling up when a few posts get all the likes
+            if len(self._heap) > 4 * self._capacity + 64:
+                self._heap = [(n, i) for i, n in members.items()]
+                heapq.heapify(self._heap)
+            return
+
+        # dropping stale entries off the top of the heap, then competing with the weakest
+        heap = self._heap
+        while members.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        if key > heap[0]:
+            outside = heapq.heapreplace(heap, key)
+            del members[outside[1]]
+            members[post_id] = likes
+        else:
+            outside = key
+        if self._floor is None or outside > self._floor:
+            self._floor = outside
+
+    def rebuild(self):
+        likes_of = self._likes_of
+        best = heapq.nlargest(self._capacity + 1, ((likes_of(i), i) for i in self._post_ids))
+        self._floor = best.pop() if len(best) > self._capacity else None
+        self._members = {i: n for n, i in best}
+        self._heap = best[::-1]
+        heapq.heapify(self._heap)
+
+    def top(self):
+        """[(post id, likes)], most liked first"""
+        ranked = sorted(self._members.items(), key=lambda item: (item[1], item[0]), reverse=True)[:self.k]
+        if self._floor is not None and (len(ranked) < self.k or (ranked[-1][1], ranked[-1][0]) < self._floor):
+            self.rebuild()
+            ranked = sorted(self._members.items(), key=lambda item: (item[1], item[0]), reverse=True)[:self.k]
+        return ranked
+
+
+class Feed:
+    """
+    Cursor-paginated, newest-first feed with per-category top posts
+
+    Post ids are handed out in insertion order. Each index lists ids sorted
+    by (created, post id), so posts created with an earlier time are slotted
+    in rather than appended. A cursor is the id of the last post on a page,
+    so pages stay stable while new posts arrive.
+
+    Attributes:
+        top_k(int): posts kept in each top posts view
+    """
+
+    # Constuctor
+    def __init__(self, top_k=10, categories=CATEGORIES):
+        self.top_k = top_k
+        self._posts = []
+        self._created = array("d")
+        self._category_of = []
+
+        # category (None for all posts) -> post ids in (created, post id) order
+        self._timelines = {category: array("q") for category in (None,) + tuple(categories)}
+        self._top = {category: TopPosts(top_k, self._likes_of, timeline)
+                     for category, timeline in self._timelines.items()}
+
+    def __len__(self):
+        return len(self._posts)
+
+    def _likes_of(self, post_id):
+        return self._posts[post_id].like_count
+
+    def _key(self, post_id):
+        return (self._created[post_id], post_id)
+
+    def get(self, post_id):
+        return self._posts[post_id]
+
+    def add(self, post, category, created):
+        """Adds a Post under category with its created time (e.g. time.time()), returns its id"""
+        if category not in self._timelines or category is None:
+            raise ValueError(f"Unknown post category {category}")
+
+        post_id = len(self._posts)
+        self._posts.append(post)
+        self._created.append(created)
+        self._category_of.append(category)
+
+        for timeline_category in (None, category):
+            timeline = self._timelines[timeline_category]
+
+            # posts nearly always arrive newest last, so this is an append
+            if not timeline or self._key(timeline[-1]) <= (created, post_id):
+                timeline.append(post_id)
+            else:
+                timeline.insert(bisect_left(timeline, (created, post_id), key=self._key), post_id)
+            self._top[timeline_category].update(post_id, post.like_count)
+        return post_id
+
+    def set_likes(self, post_id, likes):
+        """Updates a post's like count and the top posts views it is in"""
+        self._posts[post_id].like_count = likes
+        for category in (None, self._category_of[post_id]):
+            self._top[category].update(post_id, likes)
+
+    def page(self, category=None, cursor=None, limit=20):
+        """
+        One page of posts, newest first
+
+        Returns {"posts": [(post id, Post)], "next": cursor for the next page
+        or None}. Pass category=None for all categories.
+        """
+        timeline = self._timelines.get(category)
+        if timeline is None:
+            raise ValueError(f"Unknown post category {category}")
+
+        if cursor is None:
+            end = len(timeline)
+        else:
+            last = int(cursor) if isinstance(cursor, str) and cursor.isdigit() else -1
+            if not 0 <= last < len(self._posts):
+                raise ValueError(f"Invalid feed cursor {cursor}")
+            end = bisect_left(timeline, self._key(last), key=self._key)
+
+        start = max(end - limit, 0)
+        ids = timeline[start:end][::-1]
+        return {
+            "posts": [(post_id, self._posts[post_id]) for post_id in ids],
+            "next": str(ids[-1]) if start > 0 and ids else None
+        }
+
+    def top(self, category=None):
+        """[(post id, Post)] with the most likes, most liked first"""
+        view = self._top.get(category)
+        if view is None:
+            raise ValueError(f"Unknown post category {category}")
+        return [(post_id, self._posts[post_id]) for post_id, _ in view.top()]
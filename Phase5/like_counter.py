@@ -0,0 +1,377 @@
+"""
+Like counters for popular posts
+
+validate_like_count caps the like count a new post may carry at 50. Likes
+given after that are counted here instead. LikeCounter records each like in
+one of several locked shards, picked by username, so many users liking the
+same hot post don't queue on one lock. A user can only like a post once.
+Likes are buffered per shard and written in batches: flush folds them into
+the committed counts, the store and the Post objects.
+
+For several processes, give each one a LikeCounter on the same
+SQLiteLikeStore file. Before its first like or unlike of a post, a counter
+reads the post's stored likers, so it can take back likes saved by another
+process or before a restart, and refresh reads them again. The store
+dedupes likes across processes, and every flush reads back the true totals
+of the posts it touched.
+"""
+
+import sqlite3
+import threading
+
+# written for phase 5
+
+
+class _Shard:
+    # likes of the usernames hashing to one shard, guarded by its own lock
+    __slots__ = ("lock", "likers", "pending", "deltas")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # post id -> usernames that like it
+        self.likers = {}
+
+        # (post id, username) -> +1 or -1 not yet flushed, and their sum per post id
+        self.pending = {}
+        self.deltas = {}
+
+
+class LikeCounter:
+    """
+    Sharded, deduplicated like counts per post
+
+    count reads the committed count plus one pending delta per shard, so it
+    costs the same for a post with ten likes or ten million. Pending likes
+    are flushed once batch_size of them pile up, every interval seconds
+    after start, or when flush is called.
+
+    Attributes:
+        posts(dict or list): Post objects by post id, their like_count is set on flush
+        store(LikeStore): where flushed likes are written, None keeps them in memory
+        shards(int): number of locked shards
+        batch_size(int): pending likes that trigger a flush
+    """
+
+    # Constuctor
+    def __init__(self, posts=None, store=None, shards=16, batch_size=1024):
+        self.posts = posts
+        self.store = store
+        self.batch_size = batch_size
+        self._shards = [_Shard() for _ in range(shards)]
+
+        # post id -> count as of the last flush
+        self._committed = {}
+
+        # deltas taken out of the shards by a flush still writing them, or by one whose write failed
+        self._flushing = {}
+
+        # changes of a flush whose store.apply raised, written by the next flush
+        self._unwritten = {}
+        self._flush_lock = threading.Lock()
+
+        # odd while a flush moves deltas between the shards, _flushing and _committed
+        self._version = 0
+
+        # rough tally of likes since the last flush, only used to decide when to flush
+        self._pending = 0
+
+        # post ids whose stored likers were read into the shards
+        self._loaded = set()
+
+        # callbacks notified with (post id, like count) after every flush
+        self._listeners = []
+
+        self._stop = None
+        self._thread = None
+
+    @property
+    def shards(self):
+        return len(self._shards)
+
+    def _shard(self, username):
+        return self._shards[hash(username) % len(self._shards)]
+
+    def _load(self, post_id):
+        # reading a post's stored likers into the shards before its first change here
+        if self.store is None or post_id in self._loaded:
+            return
+        with self._flush_lock:
+            if post_id not in self._loaded:
+                self._read_likers([post_id])
+
+    def _read_likers(self, post_ids):
+        # replacing the likers of post_ids with the stored ones plus our unwritten changes, under _flush_lock
+        stored = {post_id: self.store.likers(post_id) for post_id in post_ids}
+        by_shard = [{} for _ in self._shards]
+        for post_id, usernames in stored.items():
+            for username in usernames:
+                by_shard[hash(username) % len(self._shards)].setdefault(post_id, set()).add(username)
+        for shard, likers in zip(self._shards, by_shard):
+            with shard.lock:
+                for post_id in stored:
+                    shard.likers[post_id] = likers.get(post_id, set())
+                for changes in (self._unwritten, shard.pending):
+                    for (post_id, username), step in changes.items():
+                        if post_id in stored and self._shard(username) is shard:
+                            (shard.likers[post_id].add if step > 0 else shard.likers[post_id].discard)(username)
+        self._version += 1
+        self._committed.update((post_id, len(usernames)) for post_id, usernames in stored.items())
+        self._version += 1
+        self._loaded.update(stored)
+
+    def _change(self, post_id, username, liked):
+        # records a like (liked=True) or an unlike, returns False when it changes nothing
+        self._load(post_id)
+        shard = self._shard(username)
+        step = 1 if liked else -1
+        with shard.lock:
+            likers = shard.likers.get(post_id)
+            if (likers is not None and username in likers) == liked:
+                return False
+
+            if liked:
+                if likers is None:
+                    likers = shard.likers[post_id] = set()
+                likers.add(username)
+            else:
+                likers.discard(username)
+
+            # a like and unlike in the same batch cancel out
+            key = (post_id, username)
+            if shard.pending.pop(key, 0) != -step:
+                shard.pending[key] = step
+            shard.deltas[post_id] = shard.deltas.get(post_id, 0) + step
+            self._pending += 1
+
+        if self._pending >= self.batch_size:
+            self.flush(wait=False)
+        return True
+
+    def like(self, post_id, username):
+        """Counts username's like of post_id, returns False if they already like it"""
+        return self._change(post_id, username, True)
+
+    def unlike(self, post_id, username):
+        """Takes username's like of post_id back, returns False if they didn't like it"""
+        return self._change(post_id, username, False)
+
+    def likes(self, post_id, username):
+        return username in self._shard(username).likers.get(post_id, ())
+
+    def count(self, post_id):
+        """Current like count of post_id, including likes not flushed yet"""
+        while True:
+            version = self._version
+            total = self._committed.get(post_id, 0) + self._flushing.get(post_id, 0)
+            for shard in self._shards:
+                total += shard.deltas.get(post_id, 0)
+
+            # retrying if a flush moved deltas while they were being added up
+            if version == self._version and not version & 1:
+                return total
+
+    def flush(self, wait=True):
+        """
+        Writes pending likes to the store and the posts
+
+        With wait=False the call returns straight away when another thread
+        is already flushing. Returns the number of likes written. When the
+        store raises, the error is raised again and the likes are written
+        by the next flush.
+        """
+        if not self._flush_lock.acquire(blocking=wait):
+            return 0
+        try:
+            # taking each shard's batch under its lock, likers keep going on the fresh dicts
+            changes, self._unwritten = self._unwritten, {}
+            for shard in self._shards:
+                with shard.lock:
+                    if not shard.pending:
+                        continue
+                    batch, deltas = shard.pending, shard.deltas
+                    self._version += 1
+                    shard.pending, shard.deltas = {}, {}
+                    for post_id, delta in deltas.items():
+                        self._flushing[post_id] = self._flushing.get(post_id, 0) + delta
+                    self._version += 1
+                for key, step in batch.items():
+                    # a like and unlike across a failed flush and this one cancel out
+                    if changes.pop(key, 0) != -step:
+                        changes[key] = step
+            self._pending = 0
+            if not changes:
+                return 0
+
+            if self.store is not None:
+                try:
+                    totals = self.store.apply(changes)
+                except Exception:
+                    # keeping the batch for the next flush, its deltas stay counted in _flushing
+                    self._unwritten = changes
+                    raise
+            else:
+                totals = {post_id: self._committed.get(post_id, 0) + delta
+                          for post_id, delta in self._flushing.items()}
+
+            self._version += 1
+            self._committed.update(totals)
+            self._flushing = {}
+            self._version += 1
+
+            self._fold(totals)
+            return len(changes)
+        finally:
+            self._flush_lock.release()
+
+    def refresh(self, post_ids):
+        """Re-reads committed counts from the store, e.g. to see other processes' likes"""
+        if self.store is None:
+            return
+        with self._flush_lock:
+            post_ids = list(post_ids)
+            # posts we track likers of get them re-read too, so we can take back likes made elsewhere
+            self._read_likers([post_id for post_id in post_ids if post_id in self._loaded])
+            totals = self.store.counts(post_ids)
+            self._version += 1
+            self._committed.update(totals)
+            self._version += 1
+        self._fold(totals)
+
+    def subscribe(self, listener):
+        # registering a callback called with (post id, like count) for every flushed post
+        self._listeners.append(listener)
+
+    def _fold(self, totals):
+        # setting like_count on the Post objects we were given, skipping unknown ids
+        if self.posts is not None:
+            for post_id, total in totals.items():
+                try:
+                    self.posts[post_id].like_count = total
+                except (KeyError, IndexError):
+                    continue
+
+        for listener in self._listeners:
+            for post_id, total in totals.items():
+                listener(post_id, total)
+
+    def start(self, interval=1.0):
+        """Flushes every interval seconds in a background thread until stop"""
+        if self._thread is not None:
+            return
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(interval, self._stop), daemon=True)
+        self._thread.start()
+
+    def _run(self, interval, stop):
+        while not stop.wait(interval):
+            self.flush()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+class LikeStore:
+    """
+    Base class for where LikeCounter writes flushed likes
+
+    Subclasses implement apply, counts and likers.
+    """
+
+    def apply(self, changes):
+        """
+        Applies {(post id, username): +1 or -1} in one go
+
+        Likes already stored and unlikes of missing likes are ignored.
+        Returns {post id: like count} for every post id in changes.
+        """
+        raise NotImplementedError
+
+    def counts(self, post_ids):
+        raise NotImplementedError
+
+    def likers(self, post_id):
+        """Set of usernames with a stored like of post_id"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteLikeStore(LikeStore):
+    """
+    Likes in a SQLite database that several processes can share
+
+    Each flush is one IMMEDIATE transaction, so batches from different
+    processes are applied one at a time. Likes are deduplicated by the
+    (post_id, username) primary key. Counts are kept per post, so reading
+    them does not scan the likes.
+
+    Attributes:
+        path(string): database file, or ":memory:"
+    """
+
+    _CREATE = (
+        "CREATE TABLE IF NOT EXISTS likes (post_id, username TEXT, PRIMARY KEY (post_id, username)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS like_counts (post_id PRIMARY KEY, likes INTEGER NOT NULL)"
+    )
+    _INSERT = "INSERT OR IGNORE INTO likes VALUES (?, ?)"
+    _DELETE = "DELETE FROM likes WHERE post_id = ? AND username = ?"
+    _ADD = ("INSERT INTO like_counts VALUES (?, ?) "
+            "ON CONFLICT (post_id) DO UPDATE SET likes = likes + excluded.likes")
+    _SELECT = "SELECT likes FROM like_counts WHERE post_id = ?"
+    _LIKERS = "SELECT username FROM likes WHERE post_id = ?"
+
+    # Constuctor
+    def __init__(self, path=":memory:", timeout=30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self._CREATE:
+            self._conn.execute(statement)
+
+    def apply(self, changes):
+        by_post = {}
+        for (post_id, username), step in changes.items():
+            likes, unlikes = by_post.setdefault(post_id, ([], []))
+            (likes if step > 0 else unlikes).append((post_id, username))
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                totals = {}
+                for post_id, (likes, unlikes) in by_post.items():
+                    # rowcount only counts rows that were really inserted or deleted
+                    added = self._conn.executemany(self._INSERT, likes).rowcount if likes else 0
+                    removed = self._conn.executemany(self._DELETE, unlikes).rowcount if unlikes else 0
+                    self._conn.execute(self._ADD, (post_id, added - removed))
+                    totals[post_id] = self._conn.execute(self._SELECT, (post_id,)).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return totals
+
+    def counts(self, post_ids):
+        totals = {}
+        with self._lock:
+            for post_id in post_ids:
+                row = self._conn.execute(self._SELECT, (post_id,)).fetchone()
+                if row is not None:
+                    totals[post_id] = row[0]
+        return totals
+
+    def likers(self, post_id):
+        with self._lock:
+            return {row[0] for row in self._conn.execute(self._LIKERS, (post_id,))}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,438 @@
+"""
+Metrics registry and hot-path instrumentation
+
+Nothing is measured until enable() is called. It swaps timed wrappers in
+for the functions listed in HOT_PATHS (the validators, create_post, profile
+storage calls and RecipeStorage), and disable() puts the originals back, so
+instrumentation costs nothing while it is off. Wrappers record a latency
+histogram per function, plus a counter per rejection reason for functions
+that return status strings and per exception type for ones that raise.
+
+Wrappers replace the module or class attribute, so calls that look the
+function up there (post_status calling validate_image, UserProfile calling
+its validators) are measured, while a name imported before enable() with
+"from post import create_post" still refers to the original.
+
+Registry.exposition renders a Prometheus-style text snapshot.
+SamplingProfiler is an opt-in profiler that collects folded stacks for
+flame graphs.
+"""
+
+import functools
+import importlib
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+# written for phase 5
+
+
+# latency bucket upper bounds in seconds, 1 us to about 1 s
+LATENCY_BUCKETS = tuple(round(base * 10.0 ** exponent, 9) for exponent in range(-6, 0) for base in (1, 2.5, 5)) + (1.0,)
+
+HELP = {
+    "plateplanner_call_seconds": "Latency of instrumented functions",
+    "plateplanner_rejections_total": "Status strings returned for rejected input, by reason",
+    "plateplanner_errors_total": "Exceptions raised by instrumented functions, by exception type"
+}
+
+
+# observations buffered before they are folded into a metric
+FOLD_EVERY = 1024
+
+
+class Counter:
+    """
+    Monotonic counter for one set of labels
+
+    inc() only appends to a pending list (atomic under the GIL), the
+    increments are added up when the value is read or enough are pending.
+    """
+
+    # Constuctor
+    def __init__(self):
+        self._value = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        self.fold()
+        return self._value
+
+    def inc(self, amount=1):
+        self._pending.append(amount)
+        if len(self._pending) >= FOLD_EVERY:
+            self.fold()
+
+    def fold(self):
+        with self._lock:
+            # appends landing meanwhile go past n and wait for the next fold
+            pending = self._pending
+            n = len(pending)
+            self._value += sum(pending[:n])
+            del pending[:n]
+
+
+class Histogram:
+    """
+    Cumulative bucketed histogram for one set of labels
+
+    Like Counter, observe() appends to a pending list that is sorted into
+    buckets when the histogram is read or enough values are pending.
+
+    Attributes:
+        buckets(tuple): upper bounds, +Inf is implied
+    """
+
+    # Constuctor
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @property
+    def counts(self):
+        """Observations per bucket (not cumulative), the last one is +Inf"""
+        self.fold()
+        return list(self._counts)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    @property
+    def sum(self):
+        self.fold()
+        return self._sum
+
+    def observe(self, value):
+        self._pending.append(value)
+        if len(self._pending) >= FOLD_EVERY:
+            self.fold()
+
+    def fold(self):
+        with self._lock:
+            pending = self._pending
+            n = len(pending)
+            values = pending[:n]
+            del pending[:n]
+            buckets, counts = self.buckets, self._counts
+            for value in values:
+                counts[bisect_left(buckets, value)] += 1
+            self._sum += sum(values)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, inf past the last bucket"""
+        counts = self.counts
+        total = sum(counts)
+        if total == 0:
+            return None
+        seen = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            seen += count
+            if seen >= q * total:
+                return bound
+        return math.inf
+
+
+class Registry:
+    """
+    Named metric families, each holding one counter or histogram per label set
+    """
+
+    # Constuctor
+    def __init__(self):
+        # name -> (type, {sorted label pairs: Counter or Histogram})
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _child(self, kind, name, labels, make):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, (kind, {}))
+            if family[0] != kind:
+                raise ValueError(f"Metric {name} is a {family[0]}, not a {kind}")
+            child = family[1].get(key)
+            if child is None:
+                child = family[1][key] = make()
+        return child
+
+    def counter(self, name, **labels):
+        return self._child("counter", name, labels, Counter)
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS, **labels):
+        return self._child("histogram", name, labels, lambda: Histogram(buckets))
+
+    def get(self, name, **labels):
+        """The counter or histogram for name and labels, None if nothing was recorded"""
+        family = self._families.get(name)
+        return family[1].get(tuple(sorted(labels.items()))) if family else None
+
+    def clear(self):
+        with self._lock:
+            self._families.clear()
+
+    def exposition(self):
+        """Prometheus text format snapshot of every metric"""
+        lines = []
+        with self._lock:
+            families = sorted((name, kind, list(children.items())) for name, (kind, children) in self._families.items())
+
+        for name, kind, children in families:
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, child in sorted(children, key=lambda item: item[0]):
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(key)} {_number(child.value)}")
+                    continue
+
+                cumulative = 0
+                total = child.sum
+                for bound, count in zip(child.buckets + (math.inf,), child.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(key + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(key)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes exposition() to path atomically, e.g. for node_exporter's textfile collector"""
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "wt") as mf:
+            mf.write(self.exposition())
+        os.replace(partial, path)
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+# the registry enable() records into unless given another
+REGISTRY = Registry()
+
+
+# Instrumentation
+
+def _status(result):
+    # validators and add_recipe: a status string (other than success) is the rejection reason
+    return result if isinstance(result, str) and result != "Recipe saved successfully" else None
+
+
+def _post_status(result):
+    # create_post: {"status", "post"} with post None when rejected
+    return result["status"] if result["post"] is None else None
+
+
+# module -> [(attribute path, rejection reason from the result or None)]
+HOT_PATHS = {
+    "post": [
+        ("validate_image", _status),
+        ("validate_description", _status),
+        ("validate_image_count", _status),
+        ("validate_like_count", _status),
+        ("validate_like_button", _status),
+        ("validate_like_consistency", _status),
+        ("post_status", _status),
+        ("create_post", _post_status)
+    ],
+    "UserProfile": [
+        ("UserProfile.__init__", None),
+        ("UserProfile.validate_username", None),
+        ("UserProfile.validate_description", None),
+        ("UserProfile.validate_weight", None),
+        ("UserProfile.validate_height", None),
+        ("UserProfile.validate_allergies", None),
+        ("UserProfile.validate_calories", None),
+        ("UserProfile.validate_batch", None)
+    ],
+    "profile_storage": [
+        ("FileProfileStorage.load_many", None),
+        ("FileProfileStorage.store_many", None),
+        ("SQLiteProfileStorage.load", None),
+        ("SQLiteProfileStorage.load_many", None),
+        ("SQLiteProfileStorage.store_many", None)
+    ],
+    "main": [
+        ("RecipeStorage.add_recipe", _status),
+        ("RecipeStorage.find_recipes", None)
+    ]
+}
+
+# (owner, attribute, original) for every wrapper currently installed
+_installed = []
+
+
+def timed(func, label, registry=REGISTRY, reason=None):
+    """
+    Wraps func to record its latency under function=label
+
+    reason(result) returning a string counts a rejection with that reason.
+    Exceptions are counted by their type and raised again. Not by message,
+    which can hold user input (a username in a KeyError) and would add a
+    series per distinct value.
+    """
+    observe = registry.histogram("plateplanner_call_seconds", function=label).observe
+    clock = time.perf_counter
+
+    # counters per reason or exception type, so the registry is only looked up for a new one
+    rejections, errors = {}, {}
+
+    def count(counters, name, key, value):
+        counter = counters.get(value)
+        if counter is None:
+            counter = counters[value] = registry.counter(name, function=label, **{key: value})
+        counter.inc()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            observe(clock() - start)
+            count(errors, "plateplanner_errors_total", "error", type(e).__name__)
+            raise
+        observe(clock() - start)
+
+        if reason is not None:
+            rejected = reason(result)
+            if rejected:
+                count(rejections, "plateplanner_rejections_total", "reason", rejected)
+        return result
+
+    return wrapper
+
+
+def enabled():
+    return bool(_installed)
+
+
+def enable(registry=REGISTRY, hot_paths=None):
+    """
+    Installs timed wrappers on every hot path, importing modules as needed
+
+    Modules that cannot be imported (e.g. main when only Phase5 is on the
+    path) are skipped. Calling it again while enabled does nothing.
+    """
+    if _installed:
+        return
+    for module_name, targets in (HOT_PATHS if hot_paths is None else hot_paths).items():
+        try:
+            module = sys.modules.get(module_name) or importlib.import_module(module_name)
+        except ImportError:
+            continue
+
+        for path, reason in targets:
+            owner_path, _, attribute = path.rpartition(".")
+            owner = module
+            for part in filter(None, owner_path.split(".")):
+                owner = getattr(owner, part)
+
+            # reading the class __dict__ keeps staticmethod and plain function attributes as they are
+            original = vars(owner)[attribute]
+            label = f"{module_name}.{path}"
+            if isinstance(original, (staticmethod, classmethod)):
+                wrapper = type(original)(timed(original.__func__, label, registry, reason))
+            else:
+                wrapper = timed(original, label, registry, reason)
+            setattr(owner, attribute, wrapper)
+            _installed.append((owner, attribute, original))
+
+
+def disable():
+    """Puts every original function back"""
+    while _installed:
+        owner, attribute, original = _installed.pop()
+        setattr(owner, attribute, original)
+
+
+# Sampling profiler
+
+class SamplingProfiler:
+    """
+    Samples the stacks of running threads into folded stack counts
+
+    Every interval seconds a background thread reads sys._current_frames()
+    and counts each stack as "outer;...;inner", the input format of
+    flamegraph.pl and speedscope. Sampling is off unless started, and the
+    sampled threads are never paused.
+
+    Attributes:
+        interval(float): seconds between samples
+        thread_ids(set): threads to sample, None samples all but the profiler's own
+        stacks(dict): folded stack -> samples
+    """
+
+    # Constuctor
+    def __init__(self, interval=0.005, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own)
+
+    def sample(self, exclude=None):
+        """Takes one sample of every selected thread"""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == exclude or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack = ";".join(reversed(names))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def folded(self):
+        """Folded stacks, one "stack count" line each, most sampled first"""
+        ranked = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)
+        return "".join(f"{stack} {count}\n" for stack, count in ranked)
+
+    def write(self, path):
+        with open(path, "wt") as mf:
+            mf.write(self.folded())
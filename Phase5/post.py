@@ -1,3 +1,16 @@
+import json
+import time
+
+from chunking import chunked, pooled_map
+
+
+# status for jsonl lines that are not a post object with every field
+INVALID_POST_DATA = "Invalid post data"
+
+# status for posts repeating the description or image of an earlier post
+DUPLICATE_POST = "This has already been posted"
+
+
 class Post:
     def __init__(self, image, description, like_button, like_count, image_count):
         self.image = image
@@ -55,27 +68,42 @@ def validate_like_consistency(like_button, like_count, clicked):
     return None
 
 
-def create_post(data):
-    clicked = data.get("clicked", True)
-
+def post_status(data, clicked=True):
+    # running the validators in order and returning the first failure, if any
     msg = validate_image(data["image"])
-    if msg: return {"status": msg, "post": None}
+    if msg: return msg
 
     msg = validate_description(data["description"])
-    if msg: return {"status": msg, "post": None}
+    if msg: return msg
 
     msg = validate_image_count(data["imageCount"])
-    if msg: return {"status": msg, "post": None}
+    if msg: return msg
 
     msg = validate_like_button(data["likeButton"], clicked)
-    if msg: return {"status": msg, "post": None}
+    if msg: return msg
 
     msg = validate_like_count(data["likeCount"])
-    if msg: return {"status": msg, "post": None}
+    if msg: return msg
 
     msg = validate_like_consistency(data["likeButton"], data["likeCount"], clicked)
+    if msg: return msg
+
+    return None
+
+
+def create_post(data, duplicates=None):
+    clicked = data.get("clicked", True)
+
+    msg = post_status(data, clicked)
     if msg: return {"status": msg, "post": None}
 
+    # rejecting reposts when an index of earlier posts (a duplicates.DuplicateIndex) is given
+    if duplicates is not None:
+        value, digest = duplicates.fingerprint(data["description"], data["image"])
+        if duplicates.find_fingerprint(value, digest) is not None:
+            return {"status": DUPLICATE_POST, "post": None}
+        duplicates.add_fingerprint(len(duplicates), value, digest)
+
     post = Post(
         data["image"],
         data["description"],
@@ -85,3 +113,83 @@ def create_post(data):
     )
 
     return {"status": "Posted!", "post": post}
+
+
+class IngestStats:
+    """
+    Counters filled in by create_posts
+
+    Attributes:
+        accepted(int): posts created
+        rejected(dict): rejection count per status string
+        elapsed(float): seconds spent in create_posts so far
+    """
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = {}
+        self.elapsed = 0.0
+
+    @property
+    def total(self):
+        return self.accepted + sum(self.rejected.values())
+
+    @property
+    def posts_per_sec(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+
+def _create_chunk(lines):
+    # validating a chunk of jsonl lines, one (status, post) pair per line
+    results = []
+    for line in lines:
+        try:
+            data = json.loads(line)
+            msg = post_status(data, data.get("clicked", True))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            results.append((INVALID_POST_DATA, None))
+            continue
+
+        if msg:
+            results.append((msg, None))
+        else:
+            post = Post(data["image"], data["description"], data["likeButton"],
+                        data["likeCount"], data["imageCount"])
+            results.append(("Posted!", post))
+    return results
+
+
+def create_posts(stream, chunk_size=1000, workers=None, stats=None):
+    """
+    Creates posts from a stream of jsonl lines, e.g. an open file
+
+    Yields (status, post) pairs in input order, where post is None for rejected
+    lines. Lines are read and validated one chunk at a time, so memory stays
+    bounded by chunk_size (times a few chunks in flight when workers is set).
+
+    Args:
+        workers(int): fan chunks out to this many processes, None keeps it in-process
+        stats(IngestStats): filled with accepted/rejected counts and throughput
+    """
+    start = time.perf_counter()
+
+    # skipping blank lines between records
+    chunks = chunked((line for line in stream if line.strip()), chunk_size)
+    if workers:
+        results = pooled_map(_create_chunk, chunks, workers)
+    else:
+        results = map(_create_chunk, chunks)
+
+    try:
+        for chunk in results:
+            if stats is not None:
+                for status, post in chunk:
+                    if post is not None:
+                        stats.accepted += 1
+                    else:
+                        stats.rejected[status] = stats.rejected.get(status, 0) + 1
+                stats.elapsed = time.perf_counter() - start
+            yield from chunk
+    finally:
+        if stats is not None:
+            stats.elapsed = time.perf_counter() - start
@@ -0,0 +1,218 @@
+"""
+In-process cache of validated UserProfile objects
+
+ProfileCache wraps a storage backend with a bounded LRU, an optional TTL
+and hit/miss/eviction counters. It is itself a ProfileStorage, so
+UserProfile.store_to_json(cache) writes through to the backend and drops
+the cached entry.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from UserProfile import UserProfile
+from profile_storage import ProfileStorage
+
+# written for phase 5
+
+
+class _PendingLoad:
+    # one in-flight backend load that concurrent misses wait on
+    def __init__(self):
+        self.done = threading.Event()
+        self.profile = None
+        self.error = None
+        self.stale = False
+
+
+class ProfileCache(ProfileStorage):
+    """
+    Bounded LRU cache of UserProfile objects in front of a ProfileStorage
+
+    Concurrent misses on the same username share a single backend load.
+    Cached profiles are shared between callers, so treat them as read-only
+    and save changes through store_to_json(cache).
+
+    Attributes:
+        storage(ProfileStorage): backend the cache reads from and writes through to
+        max_size(int): most profiles kept before evicting the least recently used
+        ttl(float): seconds a cached profile stays valid, None for no expiry
+    """
+
+    # Constuctor
+    def __init__(self, storage, max_size=1024, ttl=None, clock=time.monotonic):
+        self.storage = storage
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pending = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self.coalesced
+            }
+
+    def _lookup(self, username):
+        # cached profile or None, counting hits and expiries; caller holds the lock
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+
+        profile, expires_at = entry
+        if expires_at is not None and self._clock() >= expires_at:
+            del self._entries[username]
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return profile
+
+    def _insert(self, username, profile):
+        # caller holds the lock
+        expires_at = None if self.ttl is None else self._clock() + self.ttl
+        self._entries[username] = (profile, expires_at)
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _finish(self, username, pending):
+        # caller holds the lock
+        if not pending.stale and pending.error is None:
+            self._insert(username, pending.profile)
+        if self._pending.get(username) is pending:
+            del self._pending[username]
+        pending.done.set()
+
+    def get(self, username):
+        """Cached UserProfile for username, loading it from storage on a miss"""
+        with self._lock:
+            profile = self._lookup(username)
+            if profile is not None:
+                return profile
+
+            self.misses += 1
+            pending = self._pending.get(username)
+            leader = pending is None
+            if leader:
+                pending = _PendingLoad()
+                self._pending[username] = pending
+            else:
+                self.coalesced += 1
+
+        # followers wait for the leader's load instead of hitting storage
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.profile
+
+        try:
+            pending.profile = UserProfile.from_dict(self.storage.load(username))
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._finish(username, pending)
+        return pending.profile
+
+    def get_many(self, usernames):
+        """Cached UserProfiles for usernames, with every miss loaded in one backend call"""
+        usernames = list(usernames)
+        found = {}
+        waiting = {}
+        owned = {}
+        with self._lock:
+            for username in usernames:
+                if username in found or username in waiting or username in owned:
+                    continue
+                profile = self._lookup(username)
+                if profile is not None:
+                    found[username] = profile
+                    continue
+
+                self.misses += 1
+                if username in self._pending:
+                    self.coalesced += 1
+                    waiting[username] = self._pending[username]
+                else:
+                    owned[username] = self._pending[username] = _PendingLoad()
+
+        if owned:
+            try:
+                datas = self.storage.load_many(list(owned))
+                for username, pending in owned.items():
+                    if username in datas:
+                        pending.profile = UserProfile.from_dict(datas[username])
+                        found[username] = pending.profile
+                    else:
+                        pending.error = KeyError(f"No stored profile for username {username}")
+            except Exception as e:
+                for pending in owned.values():
+                    if pending.profile is None:
+                        pending.error = e
+                raise
+            finally:
+                with self._lock:
+                    for username, pending in owned.items():
+                        self._finish(username, pending)
+
+        for username, pending in waiting.items():
+            pending.done.wait()
+            if pending.error is None:
+                found[username] = pending.profile
+
+        return [found[u] for u in usernames if u in found]
+
+    def invalidate(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+            # a load already in flight may have read the old profile
+            if username in self._pending:
+                self._pending[username].stale = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for pending in self._pending.values():
+                pending.stale = True
+
+    # ProfileStorage interface, so the cache can stand in for its backend
+
+    def load(self, username):
+        return self.get(username).data
+
+    def load_many(self, usernames):
+        return {p.data["username"]: p.data for p in self.get_many(usernames)}
+
+    def store_many(self, datas):
+        # writing through first, then dropping the cached copies
+        datas = list(datas)
+        self.storage.store_many(datas)
+        for data in datas:
+            self.invalidate(data["username"])
+
+    def close(self):
+        self.storage.close()
@@ -0,0 +1,318 @@
+"""
+Profile storage sharded over worker processes
+
+Usernames are placed on a consistent hash ring, and every shard is a
+separate process owning its own SQLite file, so loads and stores for
+different shards run on different cores. ShardedProfileStorage is the
+router: it splits each batch by shard, sends every part before waiting on
+any reply, then gathers the replies.
+
+Adding a shard moves only the profiles the new shard takes over, about 1/N
+of them, while the router keeps serving reads and writes.
+"""
+
+import bisect
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from contextlib import ExitStack
+
+from profile_storage import ProfileStorage, SQLiteProfileStorage
+
+# written for phase 5
+
+
+DEFAULT_SHARDS = 4
+
+# points each shard gets on the ring, more points spread users more evenly
+VIRTUAL_NODES = 128
+
+# profiles moved per locked step while re-sharding
+MOVE_BATCH = 1024
+
+_SHARD_FILE = re.compile(r"^shard(\d+)\.db$")
+
+# present while profiles may still sit on a shard that no longer owns them
+_RESHARDING_MARKER = "resharding"
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping keys to node names
+
+    Every node owns the keys hashing between its points and the previous
+    point on the ring, so adding a node only takes keys away from the
+    others and never moves keys between them.
+
+    Attributes:
+        nodes(list): node names in the order they were added
+        replicas(int): points per node
+    """
+
+    # Constuctor
+    def __init__(self, nodes=(), replicas=VIRTUAL_NODES):
+        self.nodes = []
+        self.replicas = replicas
+        self._points = []
+        self._owners = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self.nodes:
+            raise ValueError(f"Node {node} is already on the ring")
+        self.nodes.append(node)
+        points = list(zip(self._points, self._owners))
+        points.extend((_hash(f"{node}#{i}"), node) for i in range(self.replicas))
+        points.sort()
+        self._points = [point for point, _ in points]
+        self._owners = [owner for _, owner in points]
+
+    def copy(self):
+        ring = HashRing(replicas=self.replicas)
+        ring.nodes = list(self.nodes)
+        ring._points = list(self._points)
+        ring._owners = list(self._owners)
+        return ring
+
+    def node_for(self, key):
+        if not self._points:
+            raise ValueError("Hash ring has no nodes")
+        i = bisect.bisect_left(self._points, _hash(key))
+        # keys past the last point wrap around to the first
+        return self._owners[i % len(self._owners)]
+
+    def partition(self, keys):
+        """Returns a dict of node -> list of the keys it owns"""
+        parts = {}
+        for key in keys:
+            parts.setdefault(self.node_for(key), []).append(key)
+        return parts
+
+
+def _store_missing(storage, datas):
+    # stores only profiles the shard does not have yet, so a profile moved in
+    # while re-sharding never overwrites a newer one written meanwhile
+    present = storage.load_many(data["username"] for data in datas)
+    storage.store_many(data for data in datas if data["username"] not in present)
+
+
+_OPERATIONS = {
+    "load_many": lambda storage, usernames: storage.load_many(usernames),
+    "store_many": lambda storage, datas: storage.store_many(datas),
+    "store_missing": _store_missing,
+    "delete_many": lambda storage, usernames: storage.delete_many(usernames),
+    "usernames": lambda storage, _: storage.usernames(),
+}
+
+
+def _serve(connection, path):
+    # main loop of a shard process, answering one (operation, argument) request at a time
+    storage = SQLiteProfileStorage(path)
+    try:
+        while True:
+            operation, argument = connection.recv()
+            if operation == "close":
+                break
+            try:
+                connection.send((True, _OPERATIONS[operation](storage, argument)))
+            except Exception as error:
+                connection.send((False, error))
+    finally:
+        storage.close()
+        connection.close()
+
+
+class _Shard:
+    # router side of one shard process; lock is held from sending a request until its reply is read
+    def __init__(self, name, path):
+        self.name = name
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child, path), name=f"profile-{name}",
+                                               daemon=True)
+        self.process.start()
+        child.close()
+        self.lock = threading.Lock()
+
+    def request(self, operation, argument=None):
+        self.connection.send((operation, argument))
+        return self.reply()
+
+    def reply(self):
+        ok, value = self.connection.recv()
+        if not ok:
+            raise value
+        return value
+
+
+class ShardedProfileStorage(ProfileStorage):
+    """
+    Router over profile shards, each a worker process with its own SQLite file
+
+    Shard files are {directory}/shard{n}.db. Reopening a directory starts
+    every shard found there, adding new ones if fewer than `shards` exist.
+
+    Attributes:
+        directory(string): folder holding the shard files
+        shards(list): names of the running shards
+    """
+
+    # Constuctor
+    def __init__(self, directory="stored_user_shards", shards=DEFAULT_SHARDS, replicas=VIRTUAL_NODES):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self._shards = {}
+        self._ring = HashRing(replicas=replicas)
+        # ring from before a re-shard that is still moving profiles, else None
+        self._previous = None
+        self._resharding = threading.Lock()
+
+        found = sorted(int(match.group(1)) for match in map(_SHARD_FILE.match, os.listdir(directory)) if match)
+        marker = os.path.join(directory, _RESHARDING_MARKER)
+        unsettled = os.path.exists(marker) or 0 < len(found) < shards
+        for n in found:
+            self._ring.add(self._start(f"shard{n}"))
+        while len(self._shards) < shards:
+            self._ring.add(self._start(self._next_name()))
+
+        # nobody else can reach the router yet, so misplaced profiles are moved before returning
+        if unsettled:
+            self._rebalance()
+            if os.path.exists(marker):
+                os.remove(marker)
+
+    @property
+    def shards(self):
+        return list(self._ring.nodes)
+
+    def _next_name(self):
+        return f"shard{max((int(name[5:]) + 1 for name in self._shards), default=0)}"
+
+    def _start(self, name):
+        self._shards[name] = _Shard(name, os.path.join(self.directory, f"{name}.db"))
+        return name
+
+    def _locked(self, names):
+        # holding several shard locks, always taken in name order so routers never deadlock
+        stack = ExitStack()
+        for name in sorted(names):
+            stack.enter_context(self._shards[name].lock)
+        return stack
+
+    def _route(self, plan):
+        """
+        Sends the requests plan(ring, previous) returns, {shard: (operation, argument)},
+        to their shards at once and returns ring, previous and {shard: result}
+        """
+        while True:
+            ring, previous = self._ring, self._previous
+            requests = plan(ring, previous)
+            if not requests:
+                return ring, previous, {}
+            with self._locked(requests):
+                # a re-shard switched rings after the plan was made, plan again
+                if self._ring is not ring:
+                    continue
+
+                # scatter, then gather, so the shards work in parallel
+                for name, request in requests.items():
+                    self._shards[name].connection.send(request)
+                results, error = {}, None
+                for name in requests:
+                    try:
+                        results[name] = self._shards[name].reply()
+                    except Exception as e:
+                        # reading every reply anyway, so the pipes stay in step
+                        error = error or e
+            if error is not None:
+                raise error
+            return ring, previous, results
+
+    def load_many(self, usernames):
+        usernames = list(usernames)
+
+        def plan(ring, previous):
+            requests = {name: ("load_many", names) for name, names in ring.partition(usernames).items()}
+            if previous is not None:
+                # profiles not moved yet are still on their old shard
+                for username in usernames:
+                    old = previous.node_for(username)
+                    if old != ring.node_for(username):
+                        requests.setdefault(old, ("load_many", []))[1].append(username)
+            return requests
+
+        ring, previous, results = self._route(plan)
+        found = {}
+        for name, loaded in results.items():
+            for username, data in loaded.items():
+                # the new owner has the newest copy while a profile is being moved
+                if username not in found or ring.node_for(username) == name:
+                    found[username] = data
+        return found
+
+    def store_many(self, datas):
+        datas = list(datas)
+
+        def plan(ring, previous):
+            requests = {}
+            for data in datas:
+                requests.setdefault(ring.node_for(data["username"]), ("store_many", []))[1].append(data)
+            return requests
+
+        self._route(plan)
+
+    def add_shard(self):
+        """
+        Starts one more shard and moves over the profiles it takes from the others.
+        Reads and writes keep being served meanwhile; returns the new shard's name
+        """
+        with self._resharding:
+            name = self._start(self._next_name())
+            ring = self._ring.copy()
+            ring.add(name)
+
+            open(os.path.join(self.directory, _RESHARDING_MARKER), "w").close()
+            with self._locked(self._shards):
+                self._previous, self._ring = self._ring, ring
+            self._rebalance()
+            with self._locked(self._shards):
+                self._previous = None
+            os.remove(os.path.join(self.directory, _RESHARDING_MARKER))
+        return name
+
+    def _rebalance(self):
+        # moves every profile to the shard owning it on the current ring
+        ring = self._ring
+        for name in sorted(self._shards):
+            with self._locked([name]):
+                usernames = self._shards[name].request("usernames")
+            moving = {}
+            for username in usernames:
+                owner = ring.node_for(username)
+                if owner != name:
+                    moving.setdefault(owner, []).append(username)
+
+            for owner, names in moving.items():
+                for i in range(0, len(names), MOVE_BATCH):
+                    # copy and delete under both locks, so readers see the profile on exactly one side
+                    with self._locked([name, owner]):
+                        datas = self._shards[name].request("load_many", names[i:i + MOVE_BATCH])
+                        self._shards[owner].request("store_missing", list(datas.values()))
+                        self._shards[name].request("delete_many", list(datas))
+
+    def close(self):
+        with self._locked(self._shards):
+            for shard in self._shards.values():
+                if shard.process.is_alive():
+                    shard.connection.send(("close", None))
+            for shard in self._shards.values():
+                shard.process.join()
+                shard.connection.close()
+        self._shards = {}
@@ -0,0 +1,196 @@
+"""
+Storage backends for UserProfile data
+
+Backends read and write the plain profile dict (UserProfile.data), so they can
+be used without constructing and validating profiles. Every backend upserts,
+i.e. storing a username that already exists replaces the old profile.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+
+# written for phase 5
+
+
+PROFILE_FIELDS = ("username", "description", "weight", "height", "allergies", "calories", "activity")
+
+# usernames are used as file names, so only allow what validate_username allows
+_SAFE_USERNAME = re.compile(r'^[A-Za-z0-9_]+$')
+
+
+class ProfileStorage:
+    """
+    Base class for profile storage backends
+
+    Subclasses implement load_many and store_many; the single-profile
+    methods are thin wrappers around them.
+    """
+
+    def load(self, username):
+        found = self.load_many([username])
+        if username not in found:
+            raise KeyError(f"No stored profile for username {username}")
+        return found[username]
+
+    def store(self, data):
+        self.store_many([data])
+
+    def load_many(self, usernames):
+        """Returns a dict of username -> profile data for every stored username"""
+        raise NotImplementedError
+
+    def store_many(self, datas):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FileProfileStorage(ProfileStorage):
+    """
+    Stores each profile as {directory}/{username}.json
+
+    Attributes:
+        directory(string): folder holding the json files
+    """
+
+    def __init__(self, directory="stored_user_data"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, username):
+        return os.path.join(self.directory, f"{username}.json")
+
+    def load_many(self, usernames):
+        found = {}
+        for username in usernames:
+            if type(username) is not str or not _SAFE_USERNAME.match(username):
+                continue
+            try:
+                with open(self._path(username), "rt") as mf:
+                    found[username] = json.load(mf)
+            except FileNotFoundError:
+                pass
+        return found
+
+    def store_many(self, datas):
+        datas = list(datas)
+        # checking the whole batch first, so a bad username writes nothing
+        for data in datas:
+            username = data["username"]
+            if type(username) is not str or not _SAFE_USERNAME.match(username):
+                raise ValueError(f"Username {username!r} cannot be stored as a file name")
+
+        for data in datas:
+            path = self._path(data["username"])
+
+            # writing to a temp file first so a crash never leaves half a profile
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wt") as mf:
+                json.dump(data, mf, indent=4)
+            os.replace(tmp_path, path)
+
+
+class SQLiteProfileStorage(ProfileStorage):
+    """
+    Stores profiles in a single embedded SQLite database
+
+    SQL strings are fixed so sqlite3's statement cache reuses the prepared
+    statements, and batches go through executemany and chunked IN (...)
+    queries of a fixed width.
+
+    Attributes:
+        path(string): database file, or ":memory:"
+    """
+
+    # number of usernames bound per SELECT in load_many
+    CHUNK_SIZE = 256
+
+    _CREATE = (
+        "CREATE TABLE IF NOT EXISTS profiles ("
+        "username TEXT PRIMARY KEY, description TEXT, weight REAL, height REAL, "
+        "allergies TEXT, calories REAL, activity TEXT)"
+    )
+    _UPSERT = "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?)"
+    _SELECT = (
+        "SELECT username, description, weight, height, allergies, calories, activity "
+        "FROM profiles WHERE username IN ({})"
+    )
+    _DELETE = "DELETE FROM profiles WHERE username = ?"
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(self._CREATE)
+        self._select_one = self._SELECT.format("?")
+        self._select_chunk = self._SELECT.format(", ".join("?" * self.CHUNK_SIZE))
+
+    def load(self, username):
+        with self._lock:
+            row = self._conn.execute(self._select_one, (username,)).fetchone()
+        if row is None:
+            raise KeyError(f"No stored profile for username {username}")
+        return _row_to_data(row)
+
+    def load_many(self, usernames):
+        usernames = list(usernames)
+        found = {}
+        with self._lock:
+            for i in range(0, len(usernames), self.CHUNK_SIZE):
+                chunk = usernames[i:i + self.CHUNK_SIZE]
+
+                # padding the last chunk so every query reuses the same statement
+                chunk += [None] * (self.CHUNK_SIZE - len(chunk))
+                for row in self._conn.execute(self._select_chunk, chunk):
+                    found[row[0]] = _row_to_data(row)
+        return found
+
+    def store_many(self, datas):
+        rows = [_data_to_row(data) for data in datas]
+        with self._lock, self._conn:
+            self._conn.executemany(self._UPSERT, rows)
+
+    def delete_many(self, usernames):
+        with self._lock, self._conn:
+            self._conn.executemany(self._DELETE, ((username,) for username in usernames))
+
+    def usernames(self):
+        """Returns a list of every stored username"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT username FROM profiles")]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _data_to_row(data):
+    return (
+        data["username"],
+        data["description"],
+        data["weight"],
+        data["height"],
+        json.dumps(data["allergies"]),
+        data["calories"],
+        json.dumps(data["activity"])
+    )
+
+
+def _row_to_data(row):
+    data = dict(zip(PROFILE_FIELDS, row))
+    data["allergies"] = json.loads(data["allergies"])
+    data["activity"] = json.loads(data["activity"])
+    return data
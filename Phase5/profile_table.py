@@ -0,0 +1,198 @@
+"""
+Memory-compact forms of UserProfile
+
+ProfileRecord is a slotted single profile, and ProfileTable stores many
+profiles column by column, with the numeric fields in typed arrays and each
+distinct allergy list stored once.
+"""
+
+import sys
+from array import array
+
+from UserProfile import UserProfile
+
+# written for phase 5
+
+
+FIELDS = ("username", "description", "weight", "height", "allergies", "calories", "activity")
+
+
+class ProfileRecord:
+    """
+    Slotted, validated profile without a per-instance dict
+
+    Attributes:
+        username(string), description(string), weight(float), height(float),
+        allergies(string tuple), calories(float), activity(any)
+    """
+
+    __slots__ = FIELDS
+
+    # Constuctor
+    def __init__(self, username, description, weight, height, allergies, calories, activity=None):
+
+        # Validate inputs with the same rules as UserProfile
+        UserProfile.validate_username(username)
+        UserProfile.validate_description(description)
+        UserProfile.validate_weight(weight)
+        UserProfile.validate_height(height)
+        UserProfile.validate_allergies(allergies)
+        UserProfile.validate_calories(calories)
+
+        self.username = username
+        self.description = description
+        self.weight = weight
+        self.height = height
+        self.allergies = tuple(sys.intern(a) for a in allergies)
+        self.calories = calories
+        self.activity = activity
+
+    @property
+    def data(self):
+        """Profile in the same dict form as UserProfile.data"""
+        return {
+            "username": self.username,
+            "description": self.description,
+            "weight": self.weight,
+            "height": self.height,
+            "allergies": list(self.allergies),
+            "calories": self.calories,
+            "activity": self.activity
+        }
+
+    def __eq__(self, other):
+        """Implements equality operator i.e. =="""
+        if isinstance(other, ProfileRecord):
+            return all(getattr(self, f) == getattr(other, f) for f in FIELDS)
+        if isinstance(other, UserProfile):
+            return self.data == other.data
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ProfileRecord({self.username!r})"
+
+    def from_dict(data):
+        return ProfileRecord(**{f: data[f] for f in FIELDS})
+
+    def from_profile(profile):
+        return ProfileRecord.from_dict(profile.data)
+
+    def to_profile(self):
+        return UserProfile.from_dict(self.data)
+
+
+class ProfileTable:
+    """
+    Column store of profiles keyed by username
+
+    weight, height and calories live in array('d') columns, and each row
+    points at a shared tuple of interned allergy strings, so users with the
+    same allergies share one tuple.
+    """
+
+    # Constuctor
+    def __init__(self, profiles=()):
+        self._rows = {}
+        self._usernames = []
+        self._descriptions = []
+        self._weights = array("d")
+        self._heights = array("d")
+        self._calories = array("d")
+        self._activities = []
+
+        # each distinct allergy list is stored once and referenced by id
+        self._allergy_ids = {}
+        self._allergy_sets = []
+        self._allergy_refs = array("I")
+
+        for profile in profiles:
+            self.add(profile)
+
+    def __len__(self):
+        return len(self._usernames)
+
+    def __contains__(self, username):
+        return username in self._rows
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.record(row)
+
+    def _allergy_ref(self, allergies):
+        key = tuple(sys.intern(a) for a in allergies)
+        ref = self._allergy_ids.get(key)
+        if ref is None:
+            ref = len(self._allergy_sets)
+            self._allergy_ids[key] = ref
+            self._allergy_sets.append(key)
+        return ref
+
+    def add(self, profile):
+        """Adds or replaces a profile given as UserProfile, ProfileRecord or dict"""
+        if isinstance(profile, dict):
+            profile = ProfileRecord.from_dict(profile)
+        data = profile.data
+
+        values = (
+            data["description"],
+            data["weight"],
+            data["height"],
+            data["calories"],
+            data["activity"],
+            self._allergy_ref(data["allergies"])
+        )
+        columns = (
+            self._descriptions,
+            self._weights,
+            self._heights,
+            self._calories,
+            self._activities,
+            self._allergy_refs
+        )
+
+        # replacing in place when the username is already stored
+        row = self._rows.get(data["username"])
+        if row is None:
+            self._rows[data["username"]] = len(self._usernames)
+            self._usernames.append(data["username"])
+            for column, value in zip(columns, values):
+                column.append(value)
+        else:
+            for column, value in zip(columns, values):
+                column[row] = value
+
+    def row_of(self, username):
+        return self._rows[username]
+
+    def to_dict(self, row):
+        """Row in the same dict form as UserProfile.data"""
+        return {
+            "username": self._usernames[row],
+            "description": self._descriptions[row],
+            "weight": self._weights[row],
+            "height": self._heights[row],
+            "allergies": list(self._allergy_sets[self._allergy_refs[row]]),
+            "calories": self._calories[row],
+            "activity": self._activities[row]
+        }
+
+    def record(self, row):
+        # rows were validated when added, so skip re-running the validators
+        record = ProfileRecord.__new__(ProfileRecord)
+        record.username = self._usernames[row]
+        record.description = self._descriptions[row]
+        record.weight = self._weights[row]
+        record.height = self._heights[row]
+        record.allergies = self._allergy_sets[self._allergy_refs[row]]
+        record.calories = self._calories[row]
+        record.activity = self._activities[row]
+        return record
+
+    def get(self, username):
+        return self.record(self._rows[username])
+
+    def to_dicts(self):
+        return [self.to_dict(row) for row in range(len(self))]
+
+    def from_dicts(datas):
+        return ProfileTable(datas)
@@ -120,6 +120,48 @@ class TestUserProfile(unittest.TestCase):
     def test_invalid_calories(self):
         self.assertRaises(ValueError, UserProfile.validate_calories, 700)
 
+    # batch validation
+    def test_validate_batch_matches_constructor(self):
+        rows = [
+            ("John_D4", "Student", 55.0, 165.0, ["milk"], 2000.0),
+            ("J0hn!4", "Student", 55.0, 165.0, [], 2000.0),
+            ("Jo", "Student", 55.0, 165.0, [], 2000.0),
+            (42, "Student", 55.0, 165.0, [], 2000.0),
+            ("John_D4", "Caf\u00e9 lover", 55.0, 165.0, [], 2000.0),
+            ("John_D4", "Student", 55, 165.0, [], 2000.0),
+            ("John_D4", "Student", 55.0, 255.0, [], 2000.0),
+            ("John_D4", "Student", 55.0, 165.0, ["milk", 3], 2000.0),
+            ("John_D4", "Student", 55.0, 165.0, [], 700.0),
+            ("J!", "x" * 201, -1.0, 10.0, "", 1),
+        ]
+        columns = ["username", "description", "weight", "height", "allergies", "calories"]
+        records = {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+
+        expected = []
+        for row in rows:
+            try:
+                UserProfile(*row)
+                expected.append(None)
+            except ValueError as e:
+                expected.append(str(e))
+
+        self.assertEqual(UserProfile.validate_batch(records), expected)
+
+    def test_from_batch(self):
+        records = {
+            "username": ["John_D4", "J0hn!4"],
+            "description": ["Student", "Student"],
+            "weight": [55.0, 55.0],
+            "height": [165.0, 165.0],
+            "allergies": [["milk"], []],
+            "calories": [2000.0, 2000.0],
+            "activity": ["high", None]
+        }
+        profiles, reports = UserProfile.from_batch(records)
+        self.assertEqual(profiles, [UserProfile("John_D4", "Student", 55.0, 165.0, ["milk"], 2000.0, "high")])
+        self.assertEqual(reports[0], None)
+        self.assertIsNotNone(reports[1])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from chunking import chunked, pooled_map
+
+# written for phase 5
+
+
+# Helpers
+def total(chunk):
+    return sum(chunk) + _offset
+
+
+_offset = 0
+
+
+def set_offset(offset):
+    global _offset
+    _offset = offset
+
+
+# testcases for the chunked batch helpers
+class TestChunking(unittest.TestCase):
+
+    # test case for grouping items into chunks with a shorter last one
+    def test_chunked(self):
+        self.assertEqual(list(chunked(iter(range(7)), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(chunked([], 3)), [])
+
+    # test case for pooled results coming back in input order, with an initializer run per worker
+    def test_pooled_map(self):
+        chunks = list(chunked(range(100), 7))
+        self.assertEqual(list(pooled_map(total, chunks, 2)), [sum(chunk) for chunk in chunks])
+        self.assertEqual(list(pooled_map(total, chunks, 2, set_offset, (1000,))),
+                         [sum(chunk) + 1000 for chunk in chunks])
+
+
+if __name__ == "__main__":
+    unittest.main()
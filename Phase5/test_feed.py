@@ -0,0 +1,99 @@
+import random
+import unittest
+
+from feed import Feed, TopPosts
+from like_counter import LikeCounter
+from post import Post
+
+# written for phase 5
+
+
+# Helpers
+def make_post(likes=0):
+    return Post("pasta.jpg", "Trying out this new recipe!", False, likes, 1)
+
+
+# testcases for Feed pagination
+class TestFeed(unittest.TestCase):
+
+    # initialising a feed with 25 posts alternating between two categories
+    def setUp(self):
+        self.feed = Feed(top_k=3)
+        for i in range(25):
+            self.feed.add(make_post(), "recipe" if i % 2 else "tips", created=1000.0 + i)
+
+    def walk(self, category=None, limit=4):
+        ids, cursor = [], None
+        while True:
+            page = self.feed.page(category, cursor, limit)
+            ids += [post_id for post_id, _ in page["posts"]]
+            cursor = page["next"]
+            if cursor is None:
+                return ids
+
+    # test case for pages covering every post once, newest first
+    def test_pages(self):
+        self.assertEqual(self.walk(), list(range(24, -1, -1)))
+        self.assertEqual(self.walk("recipe"), list(range(23, 0, -2)))
+        self.assertEqual(self.feed.page("tips", limit=2)["next"], "22")
+        self.assertEqual(self.feed.page("question"), {"posts": [], "next": None})
+
+    # test case for cursors staying valid while new and backdated posts arrive
+    def test_stable_cursor(self):
+        first = self.feed.page(limit=5)
+        self.feed.add(make_post(), "tips", created=2000.0)
+        self.feed.add(make_post(), "tips", created=1017.5)
+        second = self.feed.page(cursor=first["next"], limit=5)
+        self.assertEqual([post_id for post_id, _ in second["posts"]], [19, 18, 26, 17, 16])
+
+    # test case for unknown categories and bad cursors
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.feed.add(make_post(), "gossip", created=0.0)
+        for cursor in ("abc", "-1", "999"):
+            with self.assertRaises(ValueError):
+                self.feed.page(cursor=cursor)
+
+    # test case for top posts following likes, including likes taken back
+    def test_top(self):
+        for post_id, likes in [(3, 10), (4, 7), (5, 12), (8, 7)]:
+            self.feed.set_likes(post_id, likes)
+        self.assertEqual([post_id for post_id, _ in self.feed.top()], [5, 3, 8])
+        self.assertEqual([post_id for post_id, _ in self.feed.top("recipe")], [5, 3, 23])
+
+        self.feed.set_likes(5, 0)
+        self.feed.set_likes(3, 1)
+        self.assertEqual([post_id for post_id, _ in self.feed.top()], [8, 4, 3])
+
+    # test case for flushed likes reaching the top posts view
+    def test_like_counter(self):
+        counter = LikeCounter()
+        counter.subscribe(self.feed.set_likes)
+        for user in ("alice", "bob"):
+            counter.like(11, user)
+        counter.flush()
+        self.assertEqual(self.feed.top("recipe")[0], (11, self.feed.get(11)))
+        self.assertEqual(self.feed.get(11).like_count, 2)
+
+
+# testcases for TopPosts against sorting everything
+class TestTopPosts(unittest.TestCase):
+
+    # test case for random like changes matching a full sort
+    def test_matches_sort(self):
+        rng = random.Random(0)
+        likes = [0] * 500
+        top = TopPosts(5, likes.__getitem__, range(500))
+        for post_id in range(500):
+            top.update(post_id, 0)
+        for _ in range(5000):
+            post_id = rng.randrange(500)
+            likes[post_id] = max(0, likes[post_id] + rng.choice((-3, 1, 1, 2)))
+            top.update(post_id, likes[post_id])
+            if rng.random() < 0.1:
+                expected = sorted(((n, i) for i, n in enumerate(likes)), reverse=True)[:5]
+                self.assertEqual(top.top(), [(i, n) for n, i in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from like_counter import LikeCounter, LikeStore, SQLiteLikeStore
+from post import Post
+
+# written for phase 5
+
+
+# Helpers
+class FlakyStore(LikeStore):
+    # in-memory store whose first few apply calls fail
+    def __init__(self, failures):
+        self.failures = failures
+        self.likes = set()
+
+    def apply(self, changes):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("store unavailable")
+        for key, step in changes.items():
+            (self.likes.add if step > 0 else self.likes.discard)(key)
+        return self.counts({post_id for post_id, _ in changes})
+
+    def counts(self, post_ids):
+        return {post_id: sum(1 for liked, _ in self.likes if liked == post_id) for post_id in post_ids}
+
+    def likers(self, post_id):
+        return {username for liked, username in self.likes if liked == post_id}
+
+
+# testcases for LikeCounter
+class TestLikeCounter(unittest.TestCase):
+
+    # initialising a counter over two posts for testing
+    def setUp(self):
+        self.posts = {"a": Post("a.jpg", "First", False, 0, 1), "b": Post("b.jpg", "Second", False, 3, 1)}
+        self.counter = LikeCounter(posts=self.posts, shards=4, batch_size=100)
+
+    # test case for likes counted once per user
+    def test_dedupe(self):
+        self.assertTrue(self.counter.like("a", "alice"))
+        self.assertFalse(self.counter.like("a", "alice"))
+        self.assertTrue(self.counter.like("a", "bob"))
+        self.assertTrue(self.counter.like("b", "alice"))
+        self.assertEqual(self.counter.count("a"), 2)
+        self.assertTrue(self.counter.likes("a", "bob"))
+        self.assertFalse(self.counter.likes("b", "bob"))
+
+    # test case for unliking, including within the same batch
+    def test_unlike(self):
+        self.counter.like("a", "alice")
+        self.assertTrue(self.counter.unlike("a", "alice"))
+        self.assertFalse(self.counter.unlike("a", "alice"))
+        self.assertEqual(self.counter.count("a"), 0)
+        self.assertEqual(self.counter.flush(), 0)
+
+    # test case for folding flushed counts into the posts past the 50 like cap
+    def test_flush_folds_into_posts(self):
+        for i in range(250):
+            self.counter.like("a", f"user_{i}")
+        self.assertEqual(self.posts["a"].like_count, 200)
+        self.counter.flush()
+        self.assertEqual(self.posts["a"].like_count, 250)
+        self.assertEqual(self.posts["b"].like_count, 3)
+        self.assertEqual(self.counter.count("a"), 250)
+
+    # test case for many threads liking one hot post
+    def test_concurrent_likes(self):
+        def like_all(offset):
+            for i in range(2000):
+                self.counter.like("a", f"user_{(offset + i) % 5000}")
+                self.counter.count("a")
+
+        threads = [threading.Thread(target=like_all, args=(t * 1000,)) for t in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.counter.count("a"), 5000)
+        self.counter.flush()
+        self.assertEqual(self.posts["a"].like_count, 5000)
+
+    # test case for a background flusher
+    def test_start_stop(self):
+        self.counter.start(interval=0.01)
+        self.counter.like("b", "alice")
+        self.counter.stop()
+        self.assertEqual(self.posts["b"].like_count, 1)
+
+    # test case for a failed store write keeping its likes for the next flush
+    def test_failing_store(self):
+        store = FlakyStore(failures=1)
+        counter = LikeCounter(posts=self.posts, store=store, shards=4)
+        counter.like("a", "alice")
+        counter.like("a", "bob")
+        with self.assertRaises(OSError):
+            counter.flush()
+        self.assertEqual(counter.count("a"), 2)
+
+        counter.unlike("a", "bob")
+        counter.like("a", "carol")
+        self.assertEqual(counter.count("a"), 2)
+        self.assertEqual(counter.flush(), 2)
+        self.assertEqual(store.likes, {("a", "alice"), ("a", "carol")})
+        self.assertEqual(counter.count("a"), 2)
+        self.assertEqual(self.posts["a"].like_count, 2)
+
+
+# testcases for counters sharing a SQLiteLikeStore
+class TestSQLiteLikeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "likes.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # test case for two counters, as in two processes, deduping through the store
+    def test_shared_store(self):
+        stores = [SQLiteLikeStore(self.path), SQLiteLikeStore(self.path)]
+        first, second = (LikeCounter(store=store) for store in stores)
+
+        first.like(7, "alice")
+        first.like(7, "bob")
+        second.like(7, "bob")
+        second.like(7, "carol")
+        first.flush()
+        second.flush()
+        self.assertEqual(second.count(7), 3)
+
+        first.refresh([7, 8])
+        self.assertEqual(first.count(7), 3)
+        self.assertEqual(stores[0].counts([7, 8]), {7: 3})
+
+        # the refresh showed first carol's like, made through second
+        self.assertTrue(first.unlike(7, "alice"))
+        self.assertTrue(first.unlike(7, "carol"))
+        first.flush()
+        self.assertEqual(first.count(7), 1)
+        self.assertEqual(stores[1].likers(7), {"bob"})
+        for store in stores:
+            store.close()
+
+    # test case for a counter opened later taking back and deduping likes stored by another
+    def test_stored_likers(self):
+        stores = [SQLiteLikeStore(self.path), SQLiteLikeStore(self.path)]
+        first = LikeCounter(store=stores[0])
+        first.like(7, "alice")
+        first.like(7, "bob")
+        first.flush()
+
+        second = LikeCounter(store=stores[1])
+        self.assertFalse(second.like(7, "alice"))
+        self.assertEqual(second.count(7), 2)
+        self.assertTrue(second.unlike(7, "alice"))
+        self.assertEqual(second.count(7), 1)
+        self.assertFalse(second.unlike(7, "carol"))
+        second.flush()
+        self.assertEqual(stores[0].counts([7]), {7: 1})
+        self.assertEqual(stores[0].likers(7), {"bob"})
+        for store in stores:
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
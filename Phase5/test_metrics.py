@@ -0,0 +1,147 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import metrics
+import post
+from metrics import Histogram, Registry, SamplingProfiler
+from profile_storage import SQLiteProfileStorage
+from UserProfile import UserProfile
+
+# written for phase 5
+
+
+# Helpers
+def post_data(**changes):
+    data = {"image": "pasta.jpg", "description": "Trying out this new recipe!",
+            "likeButton": True, "likeCount": 5, "imageCount": 1}
+    data.update(changes)
+    return data
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+# testcases for hot-path instrumentation
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+        self.original = post.create_post
+        metrics.enable(self.registry, {key: metrics.HOT_PATHS[key] for key in ("post", "UserProfile")})
+
+    def tearDown(self):
+        metrics.disable()
+
+    # test case for originals coming back when disabled
+    def test_disable(self):
+        self.assertTrue(metrics.enabled())
+        self.assertIsNot(post.create_post, self.original)
+        metrics.disable()
+        self.assertFalse(metrics.enabled())
+        self.assertIs(post.create_post, self.original)
+
+    # test case for latency and rejection reasons of create_post and the validators it calls
+    def test_create_post(self):
+        for data in (post_data(), post_data(imageCount=7), post_data(imageCount=9), post_data(image="a.txt")):
+            post.create_post(data)
+
+        calls = self.registry.get("plateplanner_call_seconds", function="post.create_post")
+        self.assertEqual(calls.count, 4)
+        self.assertEqual(self.registry.get("plateplanner_call_seconds", function="post.validate_image").count, 4)
+        self.assertEqual(self.registry.get("plateplanner_rejections_total", function="post.create_post",
+                                           reason="Too many photos selected").value, 2)
+        self.assertEqual(self.registry.get("plateplanner_rejections_total", function="post.validate_image",
+                                           reason="Must be an image").value, 1)
+
+    # test case for validators that raise being counted by exception type
+    def test_user_profile(self):
+        UserProfile("good_user", "Hi", 70.0, 175.0, [], 2000.0)
+        with self.assertRaises(ValueError):
+            UserProfile("good_user", "Hi", 900.0, 175.0, [], 2000.0)
+
+        self.assertEqual(self.registry.get("plateplanner_call_seconds",
+                                           function="UserProfile.UserProfile.validate_weight").count, 2)
+        self.assertEqual(self.registry.get("plateplanner_errors_total", function="UserProfile.UserProfile.__init__",
+                                           error="ValueError").value, 1)
+
+    # test case for errors holding user input sharing one series per exception type
+    def test_error_labels(self):
+        metrics.disable()
+        metrics.enable(self.registry, {"profile_storage": metrics.HOT_PATHS["profile_storage"]})
+        with SQLiteProfileStorage() as storage:
+            for username in ("alice", "bob", "carol"):
+                with self.assertRaises(KeyError):
+                    storage.load(username)
+
+        self.assertEqual(self.registry.get("plateplanner_errors_total",
+                                           function="profile_storage.SQLiteProfileStorage.load",
+                                           error="KeyError").value, 3)
+        exposition = self.registry.exposition()
+        self.assertEqual(exposition.count("plateplanner_errors_total{"), 1)
+        self.assertNotIn("alice", exposition)
+
+
+# testcases for the metrics registry and its exporter
+class TestRegistry(unittest.TestCase):
+
+    # test case for histogram buckets and quantiles
+    def test_histogram(self):
+        histogram = Histogram(buckets=(1, 5, 10))
+        for value in (0.5, 1, 3, 7, 20):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual((histogram.quantile(0.4), histogram.quantile(0.6), histogram.quantile(1.0)), (1, 5, float("inf")))
+
+    # test case for the Prometheus text format, including escaped labels
+    def test_exposition(self):
+        registry = Registry()
+        registry.counter("plateplanner_rejections_total", function="f", reason='say "hi"\n').inc(2)
+        registry.histogram("plateplanner_call_seconds", buckets=(0.5,), function="f").observe(0.25)
+        self.assertEqual(registry.exposition(), "\n".join([
+            "# HELP plateplanner_call_seconds Latency of instrumented functions",
+            "# TYPE plateplanner_call_seconds histogram",
+            'plateplanner_call_seconds_bucket{function="f",le="0.5"} 1',
+            'plateplanner_call_seconds_bucket{function="f",le="+Inf"} 1',
+            'plateplanner_call_seconds_sum{function="f"} 0.25',
+            'plateplanner_call_seconds_count{function="f"} 1',
+            "# HELP plateplanner_rejections_total Status strings returned for rejected input, by reason",
+            "# TYPE plateplanner_rejections_total counter",
+            'plateplanner_rejections_total{function="f",reason="say \\"hi\\"\\n"} 2'
+        ]) + "\n")
+
+        with self.assertRaises(ValueError):
+            registry.histogram("plateplanner_rejections_total")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "plateplanner.prom")
+            registry.write(path)
+            with open(path) as mf:
+                self.assertEqual(mf.read(), registry.exposition())
+
+
+# testcases for the sampling profiler
+class TestSamplingProfiler(unittest.TestCase):
+
+    # test case for a busy thread showing up in the folded stacks
+    def test_samples(self):
+        worker = threading.Thread(target=busy_loop, args=(0.2,))
+        with SamplingProfiler(interval=0.002) as profiler:
+            worker.start()
+            worker.join()
+        self.assertGreater(profiler.samples, 0)
+
+        folded = profiler.folded()
+        self.assertIn("busy_loop (test_metrics.py:", folded)
+        stack, count = folded.splitlines()[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertNotIn("_run (metrics.py", folded)
+
+
+if __name__ == "__main__":
+    unittest.main()
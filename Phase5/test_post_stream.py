@@ -0,0 +1,81 @@
+import io
+import json
+import unittest
+
+from post import create_post, create_posts, IngestStats, INVALID_POST_DATA
+
+# written for phase 5
+
+
+# Helpers
+def make_line(**changes):
+    data = {
+        "image": "pasta.jpg",
+        "description": "Trying out this new recipe!",
+        "likeButton": True,
+        "likeCount": 5,
+        "imageCount": 4
+    }
+    data.update(changes)
+    return json.dumps(data) + "\n"
+
+
+# testcases for streaming post creation
+class TestCreatePosts(unittest.TestCase):
+    lines = [
+        make_line(),
+        make_line(imageCount=7),
+        "not json\n",
+        "\n",
+        make_line(description=""),
+        json.dumps({"image": "pasta.jpg"}) + "\n",
+        make_line(likeCount=12)
+    ]
+
+    # statuses match create_post line by line, in order
+    def test_statuses_match_create_post(self):
+        results = list(create_posts(io.StringIO("".join(self.lines)), chunk_size=2))
+        self.assertEqual([status for status, _ in results], [
+            "Posted!",
+            "Too many photos selected",
+            INVALID_POST_DATA,
+            "No post description written",
+            INVALID_POST_DATA,
+            "Posted!"
+        ])
+        self.assertEqual(results[0][0], create_post(json.loads(self.lines[0]))["status"])
+        self.assertEqual(results[-1][1].like_count, 12)
+        self.assertIsNone(results[1][1])
+
+    # stats count accepted and rejected lines per status
+    def test_stats(self):
+        stats = IngestStats()
+        for _ in create_posts(self.lines, stats=stats):
+            pass
+        self.assertEqual(stats.accepted, 2)
+        self.assertEqual(stats.rejected[INVALID_POST_DATA], 2)
+        self.assertEqual(stats.total, 6)
+        self.assertGreater(stats.posts_per_sec, 0)
+
+    # process pool keeps input order
+    def test_workers(self):
+        lines = [make_line(likeCount=1 + i % 40) for i in range(500)]
+        results = list(create_posts(lines, chunk_size=64, workers=2))
+        self.assertEqual([post.like_count for _, post in results], [1 + i % 40 for i in range(500)])
+
+    # the stream is consumed lazily
+    def test_lazy(self):
+        consumed = []
+
+        def stream():
+            for i in range(10_000):
+                consumed.append(i)
+                yield make_line()
+
+        first = next(create_posts(stream(), chunk_size=10))
+        self.assertEqual(first[0], "Posted!")
+        self.assertEqual(len(consumed), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
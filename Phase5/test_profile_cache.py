@@ -0,0 +1,112 @@
+import threading
+import unittest
+
+from UserProfile import UserProfile
+from profile_cache import ProfileCache
+from profile_storage import SQLiteProfileStorage
+
+# written for phase 5
+
+
+# Helpers
+def make_profile(username, calories=2000.0):
+    return UserProfile(username, "Student", 70.0, 175.0, ["milk"], calories, "moderate")
+
+
+class CountingStorage(SQLiteProfileStorage):
+    # in-memory backend that counts loads and can hold them until released
+    def __init__(self):
+        super().__init__()
+        self.loads = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def load(self, username):
+        self.loads += 1
+        self.release.wait()
+        return super().load(username)
+
+    def load_many(self, usernames):
+        self.loads += 1
+        return super().load_many(usernames)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# testcases for ProfileCache
+class TestProfileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = CountingStorage()
+        UserProfile.store_many([make_profile(f"user_{i}") for i in range(5)], self.storage)
+        self.clock = FakeClock()
+        self.cache = ProfileCache(self.storage, max_size=3, ttl=60, clock=self.clock)
+
+    # repeated gets only load once
+    def test_hit_after_miss(self):
+        first = self.cache.get("user_0")
+        self.assertIs(self.cache.get("user_0"), first)
+        self.assertEqual(self.storage.loads, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    # least recently used profile is evicted first
+    def test_lru_eviction(self):
+        for username in ["user_0", "user_1", "user_2", "user_0", "user_3"]:
+            self.cache.get(username)
+        self.assertEqual(self.cache.evictions, 1)
+        self.cache.get("user_0")
+        self.cache.get("user_1")
+        self.assertEqual(self.storage.loads, 5)
+
+    # entries expire after the ttl
+    def test_ttl(self):
+        self.cache.get("user_0")
+        self.clock.now = 61
+        self.cache.get("user_0")
+        self.assertEqual(self.cache.expirations, 1)
+        self.assertEqual(self.storage.loads, 2)
+
+    # storing through the cache writes through and invalidates
+    def test_write_through(self):
+        self.cache.get("user_0")
+        make_profile("user_0", calories=1500.0).store_to_json(self.cache)
+        self.assertEqual(self.storage.load("user_0")["calories"], 1500.0)
+        self.assertEqual(self.cache.get("user_0").data["calories"], 1500.0)
+
+    # unknown usernames raise KeyError like the backends
+    def test_missing(self):
+        self.assertRaises(KeyError, self.cache.get, "nobody")
+        self.assertRaises(KeyError, UserProfile.from_json, "nobody", self.cache)
+
+    # batch gets load every miss in one call
+    def test_get_many(self):
+        self.cache.get("user_0")
+        profiles = self.cache.get_many(["user_0", "user_1", "nobody", "user_2"])
+        self.assertEqual([p.data["username"] for p in profiles], ["user_0", "user_1", "user_2"])
+        self.assertEqual(self.storage.loads, 2)
+
+    # concurrent misses on one username share a single load
+    def test_coalesced_misses(self):
+        self.storage.release.clear()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get("user_4")))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        while self.cache.coalesced < 7:
+            threading.Event().wait(0.001)
+        self.storage.release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.storage.loads, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from UserProfile import UserProfile
+from profile_shards import HashRing, ShardedProfileStorage
+
+# written for phase 5
+
+
+# Helpers
+def make_data(username, calories=2000.0):
+    return {
+        "username": username,
+        "description": "Student who enjoys fitness and cooking",
+        "weight": 70.0,
+        "height": 175.0,
+        "allergies": ["peanut", "milk"],
+        "calories": calories,
+        "activity": "moderate"
+    }
+
+
+def stored_usernames(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT username FROM profiles")}
+    finally:
+        conn.close()
+
+
+# testcases for the consistent hash ring
+class TestHashRing(unittest.TestCase):
+
+    # test case for adding a node moving only the keys the new node takes
+    def test_add_node(self):
+        keys = [f"user_{i}" for i in range(4000)]
+        ring = HashRing(["shard0", "shard1", "shard2"])
+        before = {key: ring.node_for(key) for key in keys}
+        self.assertEqual(before, {key: HashRing(["shard2", "shard0", "shard1"]).node_for(key) for key in keys})
+
+        grown = ring.copy()
+        grown.add("shard3")
+        moved = [key for key in keys if grown.node_for(key) != before[key]]
+        self.assertTrue(all(grown.node_for(key) == "shard3" for key in moved))
+        self.assertLess(abs(len(moved) / len(keys) - 0.25), 0.08)
+        self.assertEqual(ring.nodes, ["shard0", "shard1", "shard2"])
+        self.assertRaises(ValueError, grown.add, "shard3")
+        self.assertRaises(ValueError, HashRing().node_for, "user_0")
+
+
+# testcases for the sharded profile storage
+class TestShardedProfileStorage(unittest.TestCase):
+
+    # initialising a router over 3 shards in a temporary directory
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = ShardedProfileStorage(self.tmpdir.name, shards=3)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmpdir.cleanup()
+
+    # Helpers
+    def reopen(self, shards=3):
+        self.storage.close()
+        self.storage = ShardedProfileStorage(self.tmpdir.name, shards=shards)
+
+    def assert_placed(self):
+        # every profile sits on exactly the shard the ring gives it
+        ring = HashRing(self.storage.shards)
+        for name in self.storage.shards:
+            usernames = stored_usernames(os.path.join(self.tmpdir.name, f"{name}.db"))
+            self.assertTrue(all(ring.node_for(username) == name for username in usernames))
+
+    # test case for single and batched loads and stores through UserProfile
+    def test_round_trip(self):
+        profile = UserProfile.from_dict(make_data("tasty"))
+        profile.store_to_json(self.storage)
+        self.assertEqual(UserProfile.from_json("tasty", self.storage), profile)
+        self.assertRaises(KeyError, UserProfile.from_json, "nobody", self.storage)
+
+        self.storage.store_many(make_data(f"user_{i}") for i in range(300))
+        self.storage.store(make_data("user_7", calories=1500.0))
+        loaded = self.storage.load_many(["user_0", "nobody", "user_7", "user_299"])
+        self.assertEqual(sorted(loaded), ["user_0", "user_299", "user_7"])
+        self.assertEqual(loaded["user_7"]["calories"], 1500.0)
+        self.assertEqual(self.storage.load_many([]), {})
+
+        # every shard got a share of the users
+        sizes = [len(stored_usernames(os.path.join(self.tmpdir.name, f"{name}.db"))) for name in self.storage.shards]
+        self.assertEqual(sum(sizes), 301)
+        self.assertGreater(min(sizes), 50)
+        self.assert_placed()
+
+    # test case for an error raised in a shard reaching the caller and the shards staying usable
+    def test_shard_error(self):
+        broken = make_data("broken")
+        del broken["height"]
+        self.assertRaises(KeyError, self.storage.store_many, [make_data(f"user_{i}") for i in range(20)] + [broken])
+        self.storage.store(make_data("tasty"))
+        self.assertEqual(self.storage.load("tasty")["username"], "tasty")
+
+    # test case for reopening with the same and with more shards
+    def test_reopen(self):
+        self.storage.store_many(make_data(f"user_{i}") for i in range(200))
+        self.reopen()
+        self.assertEqual(len(self.storage.load_many(f"user_{i}" for i in range(200))), 200)
+
+        self.reopen(shards=5)
+        self.assertEqual(self.storage.shards, ["shard0", "shard1", "shard2", "shard3", "shard4"])
+        self.assertEqual(len(self.storage.load_many(f"user_{i}" for i in range(200))), 200)
+        self.assert_placed()
+
+    # test case for adding a shard while other threads keep reading and writing
+    def test_add_shard_online(self):
+        usernames = [f"user_{i}" for i in range(3000)]
+        self.storage.store_many(make_data(username) for username in usernames)
+        stop = threading.Event()
+        misses = []
+        written = []
+
+        def reader():
+            while not stop.is_set():
+                found = self.storage.load_many(usernames[::7])
+                misses.extend(username for username in usernames[::7] if username not in found)
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                username = usernames[(i * 13) % len(usernames)]
+                self.storage.store(make_data(username, calories=1000.0))
+                written.append(username)
+                i += 1
+
+        threads = [threading.Thread(target=reader), threading.Thread(target=writer)]
+        for thread in threads:
+            thread.start()
+        self.assertEqual(self.storage.add_shard(), "shard3")
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(misses, [])
+        self.assertGreater(len(written), 0)
+        loaded = self.storage.load_many(usernames)
+        self.assertEqual(len(loaded), len(usernames))
+        self.assertTrue(all(loaded[username]["calories"] == 1000.0 for username in written))
+        self.assertGreater(len(stored_usernames(os.path.join(self.tmpdir.name, "shard3.db"))), 300)
+        self.assert_placed()
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, "resharding")))
+
+
+if __name__ == "__main__":
+    unittest.main()
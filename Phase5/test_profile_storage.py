@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from UserProfile import UserProfile
+from profile_storage import FileProfileStorage, SQLiteProfileStorage
+
+# written for phase 5
+
+
+# Helpers
+def make_profile(username, calories=2000.0):
+    return UserProfile(
+        username=username,
+        description="Student who enjoys fitness and cooking",
+        weight=70.0,
+        height=175.0,
+        allergies=["peanut", "milk"],
+        calories=calories,
+        activity="moderate"
+    )
+
+
+# shared testcases run against every storage backend
+class StorageBackendTests:
+
+    def make_storage(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = self.make_storage()
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmpdir.cleanup()
+
+    # store then load a single profile
+    def test_round_trip(self):
+        profile = make_profile("tasty")
+        profile.store_to_json(self.storage)
+        self.assertEqual(UserProfile.from_json("tasty", self.storage), profile)
+
+    # storing the same username twice replaces the first profile
+    def test_upsert(self):
+        make_profile("tasty").store_to_json(self.storage)
+        make_profile("tasty", calories=1500.0).store_to_json(self.storage)
+        self.assertEqual(UserProfile.from_json("tasty", self.storage).data["calories"], 1500.0)
+
+    # loading an unknown username
+    def test_missing_profile(self):
+        self.assertRaises(KeyError, UserProfile.from_json, "nobody", self.storage)
+
+    # batched store and load, skipping unknown usernames
+    def test_batch(self):
+        profiles = [make_profile(f"user_{i}") for i in range(300)]
+        UserProfile.store_many(profiles, self.storage)
+        loaded = UserProfile.load_many(["user_0", "nobody", "user_299"], self.storage)
+        self.assertEqual(loaded, [profiles[0], profiles[299]])
+        self.assertEqual(len(self.storage.load_many(f"user_{i}" for i in range(300))), 300)
+
+
+class TestFileProfileStorage(StorageBackendTests, unittest.TestCase):
+
+    def make_storage(self):
+        return FileProfileStorage(self.tmpdir.name)
+
+    # stored profiles end up as one json file per user
+    def test_file_layout(self):
+        make_profile("tasty").store_to_json(self.storage)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["tasty.json"])
+
+    # usernames that would escape the directory are rejected before anything is written
+    def test_unsafe_username(self):
+        data = make_profile("tasty").data
+        for username in ("../escaped", "a/b", "", None):
+            with self.assertRaises(ValueError):
+                self.storage.store(dict(data, username=username))
+        with self.assertRaises(ValueError):
+            self.storage.store_many([data, dict(data, username="../escaped")])
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.tmpdir.name), "escaped.json")))
+
+
+class TestSQLiteProfileStorage(StorageBackendTests, unittest.TestCase):
+
+    def make_storage(self):
+        return SQLiteProfileStorage(os.path.join(self.tmpdir.name, "profiles.db"))
+
+    # listing and deleting stored usernames
+    def test_delete_many(self):
+        UserProfile.store_many([make_profile(f"user_{i}") for i in range(5)], self.storage)
+        self.storage.delete_many(["user_1", "user_3", "nobody"])
+        self.assertEqual(sorted(self.storage.usernames()), ["user_0", "user_2", "user_4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
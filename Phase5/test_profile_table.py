@@ -0,0 +1,67 @@
+import json
+import unittest
+
+from UserProfile import UserProfile
+from profile_table import ProfileRecord, ProfileTable
+
+# written for phase 5
+
+
+# testcases for the compact profile forms
+class TestProfileTable(unittest.TestCase):
+    test_object = {
+        "username": "tasty",
+        "description": "description",
+        "weight": 3.0,
+        "height": 50.0,
+        "activity": "activity",
+        "allergies": ["peanut", "milk"],
+        "calories": 800.0
+    }
+
+    # ProfileRecord keeps UserProfile equality and dict form
+    def test_record_round_trip(self):
+        profile = UserProfile.from_dict(self.test_object)
+        record = ProfileRecord.from_profile(profile)
+        self.assertEqual(record, profile)
+        self.assertEqual(record, ProfileRecord.from_dict(self.test_object))
+        self.assertEqual(record.data, profile.data)
+        self.assertEqual(record.to_profile(), profile)
+
+    def test_record_has_no_dict(self):
+        record = ProfileRecord.from_dict(self.test_object)
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_record_validates(self):
+        self.assertRaises(ValueError, ProfileRecord.from_dict, {**self.test_object, "weight": 2})
+
+    def test_record_inequality(self):
+        record = ProfileRecord.from_dict(self.test_object)
+        other = ProfileRecord.from_dict({**self.test_object, "allergies": ["milk"]})
+        self.assertNotEqual(record, other)
+
+    # ProfileTable round trips through dicts and json
+    def test_table_round_trip(self):
+        datas = [{**self.test_object, "username": f"user_{i}", "weight": 3.0 + i} for i in range(10)]
+        table = ProfileTable.from_dicts(datas)
+        self.assertEqual(len(table), 10)
+        self.assertEqual(table.to_dicts(), datas)
+        self.assertEqual(ProfileTable.from_dicts(json.loads(json.dumps(table.to_dicts()))).to_dicts(), datas)
+        self.assertEqual(table.get("user_3"), UserProfile.from_dict(datas[3]))
+
+    # adding an existing username replaces its row
+    def test_table_replace(self):
+        table = ProfileTable([self.test_object])
+        table.add({**self.test_object, "allergies": [], "calories": 1200.0})
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table.to_dict(0)["allergies"], [])
+        self.assertEqual(table.to_dict(0)["calories"], 1200.0)
+
+    # identical allergy lists are stored once
+    def test_table_shares_allergies(self):
+        table = ProfileTable({**self.test_object, "username": f"user_{i}"} for i in range(5))
+        self.assertIs(table.get("user_0").allergies, table.get("user_4").allergies)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+"""
+Allergen bitset index over a RecipeStorage catalog
+
+Every allergen gets a bit in an AllergenVocabulary. AllergenIndex keeps one
+mask per recipe plus one bitmap per allergen over recipe rows, so "safe
+recipes for this user" is a single AND NOT over big integers instead of a
+string scan per recipe.
+
+Ingredient text is matched longest phrase first, so "peanut butter" is a
+peanut and "coconut milk" is nothing, rather than both being milk.
+"""
+
+import re
+
+from nutrition import singular
+
+
+# canonical allergens and the ingredient words that imply them
+DEFAULT_ALLERGENS = {
+    "milk": ["milk", "dairy", "cheese", "butter", "cream", "yogurt", "whey", "ghee"],
+    "egg": ["egg", "mayonnaise", "meringue"],
+    "peanut": ["peanut", "peanut butter"],
+    "tree nut": ["tree nut", "almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut",
+                 "almond milk", "almond butter", "cashew milk", "cashew butter"],
+    "soy": ["soy", "tofu", "edamame", "tempeh", "miso", "soy milk"],
+    "wheat": ["wheat", "flour", "bread", "pasta", "couscous", "semolina"],
+    "fish": ["fish", "salmon", "tuna", "cod", "anchovy", "tilapia"],
+    "shellfish": ["shellfish", "shrimp", "prawn", "crab", "lobster", "scallop"],
+    "sesame": ["sesame", "tahini"]
+}
+
+# phrases that contain an allergen term without implying any allergen
+NOT_ALLERGENS = ["coconut milk", "coconut cream", "oat milk", "rice milk", "cocoa butter", "cream of tartar"]
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def normalize(term):
+    # lower case, single spaces and singular words, applied to allergies and ingredients alike
+    return " ".join(singular(w) for w in _WORD.findall(term.lower()))
+
+
+class AllergenVocabulary:
+    """
+    Assigns each allergen a bit
+
+    Attributes:
+        names(string array): canonical allergen per bit
+    """
+
+    # Constuctor
+    def __init__(self, allergens=DEFAULT_ALLERGENS, not_allergens=NOT_ALLERGENS):
+        self.names = []
+        # normalized term -> its allergen's bit, or None for a phrase implying no allergen
+        self._terms = {normalize(term): None for term in not_allergens}
+        self._longest = max((len(term.split()) for term in self._terms), default=1)
+        for name, terms in allergens.items():
+            self.add(name, terms)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, terms=()):
+        """Adds an allergen (and the terms that imply it), returns its bit"""
+        key = normalize(name)
+        if self._terms.get(key) is not None:
+            return self._terms[key]
+
+        bit = len(self.names)
+        self.names.append(key)
+        for term in (key, *terms):
+            term = normalize(term)
+            if self._terms.get(term) is None:
+                self._terms[term] = bit
+                self._longest = max(self._longest, len(term.split()))
+        return bit
+
+    def bit(self, term):
+        return self._terms.get(normalize(term))
+
+    def mask_of_text(self, text):
+        # bits of every allergen term in the text, taking the longest term at each word
+        words = normalize(text).split()
+        mask = 0
+        i = 0
+        while i < len(words):
+            for size in range(min(self._longest, len(words) - i), 0, -1):
+                term = " ".join(words[i:i + size])
+                if term in self._terms:
+                    if self._terms[term] is not None:
+                        mask |= 1 << self._terms[term]
+                    i += size
+                    break
+            else:
+                i += 1
+        return mask
+
+
+class AllergenIndex:
+    """
+    Per-recipe allergen masks and per-allergen recipe bitmaps
+
+    The index subscribes to the storage, so recipes saved later are indexed
+    as they arrive. Allergies the vocabulary does not know yet are added on
+    first use, which costs one pass over the stored ingredients.
+
+    Attributes:
+        storage(RecipeStorage): indexed catalog
+        vocabulary(AllergenVocabulary): allergen bits
+    """
+
+    # Constuctor
+    def __init__(self, storage, vocabulary=None):
+        self.storage = storage
+        self.vocabulary = AllergenVocabulary() if vocabulary is None else vocabulary
+
+        self._rows = {}
+        self._titles = []
+        self._masks = []
+
+        # one bytearray bitmap per allergen bit, and its int form built on demand
+        self._bitmaps = []
+        self._bitmap_ints = {}
+        self._profile_masks = {}
+
+        for title, recipe in storage.recipes.items():
+            self._add(title, recipe)
+        storage.subscribe(self._add)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def _set_bit(self, bit, row, value):
+        while len(self._bitmaps) <= bit:
+            self._bitmaps.append(bytearray())
+        bitmap = self._bitmaps[bit]
+        if len(bitmap) <= row >> 3:
+            bitmap.extend(bytes((row >> 3) + 1 - len(bitmap)))
+        if value:
+            bitmap[row >> 3] |= 1 << (row & 7)
+        else:
+            bitmap[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+        self._bitmap_ints.pop(bit, None)
+
+    def _add(self, title, recipe):
+        mask = self.vocabulary.mask_of_text(" , ".join(recipe.get("ingredients", ())))
+
+        # re-saved titles keep their row, with the old bits cleared first
+        row = self._rows.get(title)
+        if row is None:
+            row = len(self._titles)
+            self._rows[title] = row
+            self._titles.append(title)
+            self._masks.append(0)
+        old = self._masks[row]
+        self._masks[row] = mask
+
+        for bit in _bits(old & ~mask):
+            self._set_bit(bit, row, False)
+        for bit in _bits(mask & ~old):
+            self._set_bit(bit, row, True)
+
+    def _learn(self, allergy):
+        # adding an unknown allergy and marking the stored recipes that mention it
+        bit = self.vocabulary.add(allergy)
+        term = normalize(allergy)
+        for title, row in self._rows.items():
+            ingredients = normalize(" , ".join(self.storage.recipes[title].get("ingredients", ())))
+            if f" {term} " in f" {ingredients} ":
+                self._masks[row] |= 1 << bit
+                self._set_bit(bit, row, True)
+        return bit
+
+    def profile_mask(self, allergies):
+        """Exclusion mask for a list of allergies, cached per distinct list"""
+        key = tuple(allergies)
+        if key not in self._profile_masks:
+            mask = 0
+            for allergy in allergies:
+                bit = self.vocabulary.bit(allergy)
+                if bit is None:
+                    bit = self._learn(allergy)
+                mask |= 1 << bit
+            self._profile_masks[key] = mask
+        return self._profile_masks[key]
+
+    def is_safe(self, title, allergies):
+        return self._masks[self._rows[title]] & self.profile_mask(allergies) == 0
+
+    def _bitmap_int(self, bit):
+        if bit not in self._bitmap_ints:
+            bitmap = self._bitmaps[bit] if bit < len(self._bitmaps) else b""
+            self._bitmap_ints[bit] = int.from_bytes(bitmap, "little")
+        return self._bitmap_ints[bit]
+
+    def safe_bitmap(self, allergies):
+        """Bitmap of safe recipe rows: bit i is set when recipe row i is safe"""
+        unsafe = 0
+        for bit in _bits(self.profile_mask(allergies)):
+            unsafe |= self._bitmap_int(bit)
+        return ((1 << len(self._titles)) - 1) & ~unsafe
+
+    def safe_count(self, allergies):
+        return self.safe_bitmap(allergies).bit_count()
+
+    def safe_recipes(self, allergies, limit=None):
+        """Titles of safe recipes in row (insertion) order"""
+        bitmap = self.safe_bitmap(allergies)
+        titles = []
+        data = bitmap.to_bytes((len(self._titles) + 7) // 8, "little")
+        for byte_index, byte in enumerate(data):
+            # skipping whole bytes with no safe rows
+            while byte:
+                low = byte & -byte
+                titles.append(self._titles[(byte_index << 3) + low.bit_length() - 1])
+                if limit is not None and len(titles) >= limit:
+                    return titles
+                byte ^= low
+        return titles
+
+
+def _bits(mask):
+    # positions of the set bits in mask
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
@@ -0,0 +1,229 @@
+"""
+Authentication for many users
+
+UserDirectory stores salted PBKDF2 password hashes and verifies them in
+constant time, throttles login attempts per username and per IP with token
+buckets, and hands out session tokens from a SessionTable instead of the
+session_active/logout_request flags passed to User.logout.
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """
+    In-memory token bucket per key
+
+    Attributes:
+        capacity(float): most attempts allowed in a burst
+        refill_rate(float): tokens added back per second
+    """
+
+    # Constuctor
+    def __init__(self, capacity=5, refill_rate=0.1, clock=time.monotonic):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # key -> [tokens, last refill time]
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, key, cost=1):
+        """Takes cost tokens from the key's bucket, returns False when it runs dry"""
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now]
+            else:
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+                bucket[1] = now
+
+            if bucket[0] < cost:
+                return False
+            bucket[0] -= cost
+            return True
+
+    def sweep(self):
+        # dropping buckets that have refilled completely, they behave like new ones
+        now = self._clock()
+        with self._lock:
+            full = [key for key, (tokens, last) in self._buckets.items()
+                    if tokens + (now - last) * self.refill_rate >= self.capacity]
+            for key in full:
+                del self._buckets[key]
+        return len(full)
+
+
+class SessionTable:
+    """
+    Session tokens with O(1) lookup and expiry
+
+    Sessions are kept in expiry order (touching one moves it to the end), so
+    sweep only visits the sessions that actually expired.
+
+    Attributes:
+        ttl(float): seconds a session stays valid after its last use
+    """
+
+    # Constuctor
+    def __init__(self, ttl=3600, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # token -> (username, expires at), oldest expiry first
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, username):
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = (username, self._clock() + self.ttl)
+        return token
+
+    def get(self, token, touch=True):
+        """Username for a live session token, or None"""
+        now = self._clock()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+
+            username, expires_at = session
+            if now >= expires_at:
+                del self._sessions[token]
+                return None
+
+            # sliding expiry keeps the table in expiry order
+            if touch:
+                self._sessions[token] = (username, now + self.ttl)
+                self._sessions.move_to_end(token)
+            return username
+
+    def delete(self, token):
+        with self._lock:
+            return self._sessions.pop(token, None) is not None
+
+    def sweep(self):
+        # removing expired sessions from the front until a live one is reached
+        now = self._clock()
+        removed = 0
+        with self._lock:
+            while self._sessions:
+                token, (_, expires_at) = next(iter(self._sessions.items()))
+                if expires_at > now:
+                    break
+                del self._sessions[token]
+                removed += 1
+        return removed
+
+
+class UserDirectory:
+    """
+    Salted, hashed credentials for many users
+
+    Attributes:
+        iterations(int): PBKDF2-SHA256 rounds per hash, the tunable hash cost
+        sessions(SessionTable): live sessions
+        user_limiter(TokenBucketLimiter): login attempts per username
+        ip_limiter(TokenBucketLimiter): login attempts per IP address
+    """
+
+    DEFAULT_ITERATIONS = 100_000
+    SALT_BYTES = 16
+
+    # Constuctor
+    def __init__(self, iterations=DEFAULT_ITERATIONS, sessions=None, user_limiter=None, ip_limiter=None):
+        self.iterations = iterations
+        self.sessions = SessionTable() if sessions is None else sessions
+        self.user_limiter = TokenBucketLimiter(capacity=5, refill_rate=0.1) if user_limiter is None else user_limiter
+        self.ip_limiter = TokenBucketLimiter(capacity=20, refill_rate=1.0) if ip_limiter is None else ip_limiter
+
+        # username -> (salt, iterations, hash)
+        self._credentials = {}
+        self._lock = threading.Lock()
+
+        # unknown usernames are checked against this, so they cost as much as known ones
+        salt = os.urandom(self.SALT_BYTES)
+        self._dummy = (salt, iterations, self._hash(secrets.token_hex(16), salt, iterations))
+
+    def __len__(self):
+        return len(self._credentials)
+
+    def __contains__(self, username):
+        return username in self._credentials
+
+    def _hash(self, password, salt, iterations):
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+    def register(self, username, password):
+        # check if any of the inputs are not string
+        if not isinstance(username, str) or not isinstance(password, str):
+            return "Username and password must be text"
+
+        if username.strip() == "" or password == "":
+            return "Username and password must be text"
+
+        salt = os.urandom(self.SALT_BYTES)
+        record = (salt, self.iterations, self._hash(password, salt, self.iterations))
+        with self._lock:
+            if username in self._credentials:
+                return "Username already taken"
+            self._credentials[username] = record
+        return "Account created"
+
+    def verify(self, username, password):
+        """Checks a password in constant time, also for unknown usernames"""
+        salt, iterations, expected = self._credentials.get(username, self._dummy)
+        matches = hmac.compare_digest(self._hash(password, salt, iterations), expected)
+        return matches and username in self._credentials
+
+    def login(self, username, password, ip=None):
+        # check if any of the inputs are not string
+        if not isinstance(username, str) or not isinstance(password, str):
+            return {"status": "Incorrect Username or Password", "session": None}
+
+        # throttling bursts per IP and per username before doing any hashing
+        if ip is not None and not self.ip_limiter.allow(ip):
+            return {"status": "Too many login attempts, please try again later", "session": None}
+        if not self.user_limiter.allow(username):
+            return {"status": "Too many login attempts, please try again later", "session": None}
+
+        if not self.verify(username, password):
+            return {"status": "Incorrect Username or Password", "session": None}
+
+        return {"status": "Welcome Back", "session": self.sessions.create(username)}
+
+    def current_user(self, token):
+        return self.sessions.get(token)
+
+    def logout(self, token):
+        # logging out the session if it is still live
+        if not isinstance(token, str):
+            return "Unexpected error"
+
+        if self.sessions.get(token, touch=False) is not None and self.sessions.delete(token):
+            return "Logout successful"
+
+        return "Invalid session please login"
+
+    def sweep(self):
+        # periodic cleanup of expired sessions and idle rate limit buckets
+        return {
+            "sessions": self.sessions.sweep(),
+            "user_buckets": self.user_limiter.sweep(),
+            "ip_buckets": self.ip_limiter.sweep()
+        }
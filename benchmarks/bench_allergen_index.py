@@ -0,0 +1,77 @@
+"""
+Benchmark for AllergenIndex
+
+Indexes a synthetic catalog, then answers "safe recipes for user" for many
+users with random allergy lists, compared with a nested string scan on a
+sample of users.
+
+usage: python benchmarks/bench_allergen_index.py [--recipes 1000000] [--users 10000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import RecipeStorage
+from allergen_index import AllergenIndex
+
+INGREDIENTS = ["chicken breast", "rice", "peanut butter", "milk", "eggs", "soy sauce", "wheat flour",
+               "tomatoes", "lettuce", "salmon", "butter", "oats", "black beans", "sesame seeds",
+               "shrimp", "lentils", "almonds", "olive oil", "garlic", "onion", "spinach", "tofu"]
+ALLERGIES = ["peanut", "milk", "egg", "soy", "wheat", "sesame", "shellfish", "tree nut", "fish"]
+
+
+def build_catalog(size, seed=0):
+    rng = random.Random(seed)
+    store = RecipeStorage()
+    for i in range(size):
+        store.add_recipe(f"Recipe {i}", "Cook it", f"recipe{i}.jpg",
+                         rng.choice(RecipeStorage.VALID_CATEGORIES),
+                         ingredients=rng.sample(INGREDIENTS, rng.randint(3, 8)))
+    return store
+
+
+def scan_safe_count(store, allergies):
+    # the nested string scan the index replaces
+    return sum(
+        1 for recipe in store.recipes.values()
+        if not any(a in ingredient.lower() for a in allergies for ingredient in recipe["ingredients"])
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--scan-users", type=int, default=5)
+    args = parser.parse_args()
+
+    store = build_catalog(args.recipes)
+
+    start = time.perf_counter()
+    index = AllergenIndex(store)
+    elapsed = time.perf_counter() - start
+    print(f"indexed {args.recipes:,} recipes in {elapsed:.1f}s ({args.recipes / elapsed:,.0f} recipes/s)")
+
+    rng = random.Random(1)
+    users = [rng.sample(ALLERGIES, rng.randint(1, 3)) for _ in range(args.users)]
+
+    start = time.perf_counter()
+    for allergies in users:
+        index.safe_bitmap(allergies).bit_count()
+    elapsed = time.perf_counter() - start
+    print(f"safe set for {args.users:,} users in {elapsed:.2f}s ({elapsed / args.users * 1e3:.3f} ms/user)")
+
+    start = time.perf_counter()
+    for allergies in users[:args.scan_users]:
+        scan_safe_count(store, allergies)
+    elapsed = time.perf_counter() - start
+    print(f"string scan baseline: {elapsed / args.scan_users * 1e3:.1f} ms/user")
+
+
+if __name__ == "__main__":
+    main()
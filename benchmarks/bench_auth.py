@@ -0,0 +1,68 @@
+"""
+Benchmark for UserDirectory
+
+Measures login latency percentiles at several PBKDF2 hash costs, plus the
+per-call cost of the rate limiter and session lookups.
+
+usage: python benchmarks/bench_auth.py [--costs 10000 50000 100000 200000] [--logins 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from auth import SessionTable, TokenBucketLimiter, UserDirectory
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return [timings[min(int(len(timings) * p), len(timings) - 1)] * 1000 for p in (0.5, 0.99)]
+
+
+def bench_hash_cost(iterations, logins):
+    directory = UserDirectory(iterations=iterations,
+                              user_limiter=TokenBucketLimiter(capacity=logins, refill_rate=0))
+    directory.register("goodexample123", "gpass12!")
+
+    timings = []
+    for i in range(logins):
+        password = "gpass12!" if i % 2 else "wrongpas"
+        start = time.perf_counter()
+        directory.login("goodexample123", password)
+        timings.append(time.perf_counter() - start)
+    p50, p99 = percentiles(timings)
+    print(f"iterations {iterations:>8,}: login p50 {p50:7.2f} ms, p99 {p99:7.2f} ms")
+
+
+def bench_per_call(label, func, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed / calls * 1e6:6.2f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--costs", type=int, nargs="*", default=[10_000, 50_000, 100_000, 200_000])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    for iterations in args.costs:
+        bench_hash_cost(iterations, args.logins)
+
+    limiter = TokenBucketLimiter(capacity=5, refill_rate=0.1)
+    bench_per_call("limiter allow", lambda i: limiter.allow(f"10.0.{i % 256}.{i % 200}"), args.calls)
+
+    sessions = SessionTable()
+    tokens = [sessions.create(f"user_{i}") for i in range(args.calls)]
+    bench_per_call("session lookup", lambda i: sessions.get(tokens[i]), args.calls)
+    bench_per_call("session sweep (no-op)", lambda i: sessions.sweep(), args.calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark for CalorieTracker aggregates
+
+Logs a year of meals for many users, one tracker each, then times daily,
+weekly and rolling-window queries picked at random.
+
+usage: python benchmarks/bench_calorie_tracker.py [--users 100000] [--days 365]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import CalorieTracker
+
+MEALS = ["Oats", "Tacos", "Salad", "Pasta", "Smoothie", "Curry", "Toast", "Soup"]
+
+
+def log_year(users, days, meals_per_day, seed=0):
+    rng = random.Random(seed)
+    first_day = date(2024, 1, 1).toordinal()
+    trackers = []
+    for _ in range(users):
+        tracker = CalorieTracker()
+        for day in range(first_day, first_day + days):
+            for _ in range(meals_per_day):
+                tracker.log_meal(rng.randint(100, 900), protein=rng.randint(0, 50),
+                                 carbs=rng.randint(0, 90), fat=rng.randint(0, 40),
+                                 name=rng.choice(MEALS), when=date.fromordinal(day))
+        trackers.append(tracker)
+    return trackers, first_day
+
+
+def time_queries(trackers, first_day, days, queries, seed=1):
+    rng = random.Random(seed)
+    kinds = {
+        "daily": lambda t, d: t.daily_totals(d),
+        "weekly": lambda t, d: t.weekly_totals(d),
+        "rolling 30": lambda t, d: t.rolling_totals(30, end=d),
+        "weekly average": lambda t, d: t.range_average(d, d + 6)
+    }
+    for label, query in kinds.items():
+        start = time.perf_counter()
+        for _ in range(queries):
+            query(rng.choice(trackers), first_day + rng.randrange(days))
+        elapsed = time.perf_counter() - start
+        print(f"{label:<16} {elapsed / queries * 1e6:>8.2f} us/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--meals-per-day", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    trackers, first_day = log_year(args.users, args.days, args.meals_per_day)
+    elapsed = time.perf_counter() - start
+    appends = args.users * args.days * args.meals_per_day
+    print(f"logged {appends:,} meals for {args.users:,} users in {elapsed:.1f}s "
+          f"({appends / elapsed:,.0f} log_meal/s)")
+
+    # memory per user from a small traced sample
+    tracemalloc.start()
+    sample, _ = log_year(min(args.users, 100), args.days, args.meals_per_day)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory {size / len(sample) / 1024:.1f} KiB/user")
+
+    time_queries(trackers, first_day, args.days, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark for Dropdown typeahead and selections
+
+Builds option tables of increasing size from ingredient-like names and
+reports the table and index build times, p50/p99 typeahead latency for 1-3
+letter prefixes (against a linear scan on the smallest size), and bulk
+selection of a tenth of the options in a MultiSelectDropdown.
+
+usage: python benchmarks/bench_dropdown.py [--sizes 10000 100000 1000000] [--queries 5000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Dropdown-backend"))
+
+from Dropdown import MultiSelectDropdown, OptionTable
+
+WORDS = ["peanut", "almond", "tree", "nut", "milk", "oat", "soy", "wheat", "rye", "barley", "sesame", "mustard",
+         "celery", "lupin", "egg", "shrimp", "crab", "cod", "tuna", "pecan", "cashew", "coconut", "butter", "flour"]
+
+
+def make_options(size, rng):
+    return [f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(string.ascii_lowercase)}{i}"
+            for i in range(size)]
+
+
+def percentiles(timings):
+    timings.sort()
+    return timings[len(timings) // 2] * 1e6, timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1e6
+
+
+def linear_search(options, prefix, k):
+    prefix = prefix.casefold()
+    return [i for i, o in enumerate(options) if o.casefold().startswith(prefix)][:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rng = random.Random(size)
+        options = make_options(size, rng)
+
+        start = time.perf_counter()
+        table = OptionTable(options)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        table.search("a")
+        indexed = time.perf_counter() - start
+        print(f"{size:>9,} options: table {built * 1e3:7.1f} ms, prefix index {indexed * 1e3:7.1f} ms")
+
+        prefixes = [rng.choice(WORDS)[:rng.randint(1, 3)] for _ in range(args.queries)]
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            table.search(prefix, args.k)
+            timings.append(time.perf_counter() - start)
+        print(f"  typeahead      p50 {percentiles(timings)[0]:8.1f} us  p99 {percentiles(timings)[1]:8.1f} us")
+
+        if size == args.sizes[0]:
+            timings = []
+            for prefix in prefixes[:200]:
+                start = time.perf_counter()
+                linear_search(options, prefix, args.k)
+                timings.append(time.perf_counter() - start)
+            print(f"  linear scan    p50 {percentiles(timings)[0]:8.1f} us  p99 {percentiles(timings)[1]:8.1f} us")
+
+        dropdown = MultiSelectDropdown(table)
+        picks = rng.sample(range(size), size // 10)
+        start = time.perf_counter()
+        dropdown.select_options(picks)
+        bulk = time.perf_counter() - start
+        start = time.perf_counter()
+        for index in picks[:10_000]:
+            dropdown.select_option(index)
+            dropdown.is_selected(index)
+        single = (time.perf_counter() - start) / min(len(picks), 10_000)
+        print(f"  select {len(picks):,} at once in {bulk * 1e3:.1f} ms, select + is_selected {single * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
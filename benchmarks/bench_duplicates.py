@@ -0,0 +1,111 @@
+"""
+Benchmark for near-duplicate detection
+
+Builds a corpus of random recipe instructions where every --repost-rate'th
+item is a copy of an earlier one with a word or two changed. It then
+measures:
+
+- the latency of DuplicateIndex.find as the index grows, which should stay
+  flat;
+- how many edited reposts are caught (recall) and how many unrelated
+  texts are flagged (false positives);
+- bulk de-duplication with find_duplicates, inline and with --workers
+  processes.
+
+usage: python benchmarks/bench_duplicates.py [--items 100000] [--workers 4] [--words 60]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from duplicates import DuplicateIndex, find_duplicates, simhash
+
+
+WORDS = ("add bake beat blend boil bowl butter chop cook cream dice drain egg flour fold fry garlic "
+         "grate heat knead lemon melt milk mince mix oil onion oven pan pepper pinch pour rest "
+         "roast salt sauce season serve simmer slice stir sugar taste toss warm whisk until golden "
+         "minutes gently then over with into the a and of for").split()
+
+
+def make_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def edit(text, rng, changes):
+    words = text.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def make_corpus(size, words, repost_rate, rng):
+    """[(key, text, None)] and {key: original key} of the reposts among them"""
+    items, reposts = [], {}
+    for i in range(size):
+        if i and i % repost_rate == 0:
+            original = rng.randrange(i)
+            while original in reposts:
+                original = rng.randrange(i)
+            items.append((i, edit(items[original][1], rng, rng.randint(1, 2)), None))
+            reposts[i] = original
+        else:
+            items.append((i, make_text(rng, words), None))
+    return items, reposts
+
+
+def percentiles(timings):
+    timings.sort()
+    return timings[len(timings) // 2] * 1e6, timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--repost-rate", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    items, reposts = make_corpus(args.items, args.words, args.repost_rate, rng)
+    fingerprints = [(key, simhash(text)) for key, text, _ in items]
+
+    # find latency, measured on fresh texts at a few index sizes
+    index = DuplicateIndex()
+    checkpoints = sorted({args.items // 100, args.items // 10, args.items})
+    added = 0
+    print("find latency as the index grows")
+    for size in checkpoints:
+        for key, value in fingerprints[added:size]:
+            index.add_fingerprint(key, value)
+        added = size
+        probes = [simhash(make_text(rng, args.words)) for _ in range(args.queries)]
+        timings = []
+        for value in probes:
+            start = time.perf_counter()
+            index.find_fingerprint(value)
+            timings.append(time.perf_counter() - start)
+        p50, p99 = percentiles(timings)
+        print(f"  {size:>9,} indexed  p50 {p50:8.2f} us  p99 {p99:8.2f} us")
+
+    for workers in (0, args.workers):
+        start = time.perf_counter()
+        found = dict(find_duplicates(items, workers=workers))
+        elapsed = time.perf_counter() - start
+        label = f"{workers} workers" if workers else "inline"
+        print(f"bulk de-duplication, {label:>10}: {elapsed:.2f} s ({elapsed / args.items * 1e6:.1f} us/item)")
+
+    caught = sum(1 for key, original in reposts.items() if found.get(key) == original)
+    false_positives = sum(1 for key in found if key not in reposts)
+    print(f"  reposts caught {caught / len(reposts):.1%} ({caught}/{len(reposts)}), "
+          f"false positives {false_positives / (args.items - len(reposts)):.3%} ({false_positives})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark for the append-only event log
+
+Measures:
+
+- durable append throughput with 1 to --threads writer threads, where
+  concurrent writers share fsyncs (group commit);
+- buffered (durable=False) append throughput;
+- latest(user, 20) latency over a log of --events events in many
+  segments, before and after removing a share of them and compacting.
+
+usage: python benchmarks/bench_event_log.py [--events 200000] [--users 5000] [--threads 16]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from event_log import KINDS, EventLog
+
+
+def durable_appends(directory, threads, per_thread):
+    log = EventLog(directory)
+
+    def writer(t):
+        for i in range(per_thread):
+            log.append("like", f"user{t}", {"post": i})
+
+    workers = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    log.close()
+    return threads * per_thread / elapsed
+
+
+def fill(log, events, users, rng):
+    start = time.perf_counter()
+    for i in range(events):
+        kind = rng.choice(KINDS)
+        user = f"user{rng.randrange(users)}"
+        if kind == "meal_log":
+            log.append(kind, user, {"calories": rng.randint(1200, 3000)}, key=f"day{rng.randrange(30)}",
+                       durable=False)
+        else:
+            log.append(kind, user, {"n": i, "text": "x" * rng.randint(10, 120)}, durable=False)
+    log.flush()
+    return events / (time.perf_counter() - start)
+
+
+def tail_latency(log, users, queries, rng):
+    timings = []
+    for _ in range(queries):
+        user = f"user{rng.randrange(users)}"
+        start = time.perf_counter()
+        log.latest(user, 20)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e3, timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--durable-appends", type=int, default=2000)
+    parser.add_argument("--segment-size", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--remove", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as root:
+        print("durable appends (one fsync per group of waiting writers)")
+        threads = 1
+        while threads <= args.threads:
+            rate = durable_appends(os.path.join(root, f"durable{threads}"), threads, args.durable_appends // threads)
+            print(f"  {threads:>3} threads: {rate:10,.0f} events/s")
+            threads *= 2
+
+        log = EventLog(os.path.join(root, "log"), segment_size=args.segment_size)
+        rate = fill(log, args.events, args.users, rng)
+        segments = sum(name.endswith(".log") for name in os.listdir(log.directory))
+        print(f"buffered appends: {rate:,.0f} events/s, {args.events:,} events in {segments} segments")
+
+        p50, p99 = tail_latency(log, args.users, args.queries, rng)
+        print(f"latest(user, 20): p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+
+        removed = rng.sample(range(1, args.events + 1), int(args.events * args.remove))
+        for event_id in removed:
+            log.remove("", event_id, durable=False)
+        log.flush()
+        start = time.perf_counter()
+        dropped = log.compact()
+        elapsed = time.perf_counter() - start
+        segments = sum(name.endswith(".log") for name in os.listdir(log.directory))
+        print(f"compaction: dropped {dropped:,} records in {elapsed:.2f} s, {segments} segments left")
+
+        p50, p99 = tail_latency(log, args.users, args.queries, rng)
+        print(f"latest(user, 20) after compaction: p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
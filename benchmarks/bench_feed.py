@@ -0,0 +1,78 @@
+"""
+Benchmark for Feed
+
+Builds feeds of increasing size (1% of posts backdated) and reports p50/p99
+latency for first pages, pages deep in the feed reached by cursor, like
+count updates with their top posts maintenance, and reading the top posts.
+Page latency should not grow with the number of posts.
+
+usage: python benchmarks/bench_feed.py [--sizes 10000 100000 1000000] [--samples 5000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase5"))
+
+from feed import CATEGORIES, Feed
+from post import Post
+
+
+def build_feed(size, rng):
+    feed = Feed(top_k=10)
+    now = 1_700_000_000.0
+    for i in range(size):
+        created = now + i - (rng.random() * 86400 if rng.random() < 0.01 else 0)
+        feed.add(Post(f"post{i}.jpg", "Trying out this new recipe!", False, 0, 1), rng.choice(CATEGORIES), created)
+    return feed
+
+
+def timed(func, samples):
+    timings = []
+    for i in range(samples):
+        start = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e6, timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rng = random.Random(size)
+        start = time.perf_counter()
+        feed = build_feed(size, rng)
+        print(f"{size:>9,} posts, built in {time.perf_counter() - start:.1f}s")
+
+        categories = [rng.choice((None,) + CATEGORIES) for _ in range(args.samples)]
+        cursors = [str(rng.randrange(size)) for _ in range(args.samples)]
+
+        # likes are skewed, a few posts get most of them and some get taken back
+        targets = [min(int(rng.paretovariate(1.2)) - 1, size - 1) * 7919 % size for _ in range(args.samples)]
+
+        def like(i):
+            post_id = targets[i]
+            likes = feed.get(post_id).like_count
+            feed.set_likes(post_id, max(0, likes + (1 if i % 10 else -1)))
+
+        results = [
+            ("first page", timed(lambda i: feed.page(categories[i], limit=args.limit), args.samples)),
+            ("page by cursor", timed(lambda i: feed.page(categories[i], cursors[i], args.limit), args.samples)),
+            ("set likes", timed(like, args.samples)),
+            ("top posts", timed(lambda i: feed.top(categories[i]), args.samples))
+        ]
+        for name, (p50, p99) in results:
+            print(f"  {name:<15} p50 {p50:7.1f} us  p99 {p99:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark for ImagePipeline
+
+Writes a set of synthetic PNG and JPEG photos (a share of them byte-for-byte
+repeats of earlier ones), then ingests them in uploads of 5 for several
+worker counts. Reports images per second, the duplicates skipped, and the
+time to ingest the same files again once every thumbnail exists. Without
+Pillow installed no thumbnails are made, so only the checks and hashing are
+timed.
+
+usage: python benchmarks/bench_image_ingest.py [--images 60] [--width 1600] [--height 1200] [--workers 0 1 2 4]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import struct
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import image_ingest
+from image_ingest import PNG_SIGNATURE, ImagePipeline
+
+# DC Huffman table from the JPEG spec (Annex K.3), AC coefficients are all end of block
+DC_COUNTS = [0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0]
+QUANTIZER = 16
+
+
+def huffman_codes(counts):
+    codes, code = [], 0
+    for length in range(1, 17):
+        for _ in range(counts[length - 1]):
+            codes.append(format(code, f"0{length}b"))
+            code += 1
+        code <<= 1
+    return codes
+
+
+def make_jpeg(width, height, rng):
+    # baseline 4:4:4 JPEG with one flat color per 8x8 block
+    dc_codes = huffman_codes(DC_COUNTS)
+    blocks_x, blocks_y = -(-width // 8), -(-height // 8)
+    bits = []
+    predictors = [0, 0, 0]
+    base = [rng.randrange(256) for _ in range(3)]
+    for by in range(blocks_y):
+        for bx in range(blocks_x):
+            for c in range(3):
+                value = (base[c] + 3 * bx + 2 * by + rng.randrange(16)) % 256
+                coefficient = round((value - 128) * 8 / QUANTIZER)
+                diff = coefficient - predictors[c]
+                predictors[c] = coefficient
+                size = abs(diff).bit_length()
+                bits.append(dc_codes[size])
+                if size:
+                    bits.append(format(diff if diff > 0 else diff + (1 << size) - 1, f"0{size}b"))
+                bits.append("0")
+    stream = "".join(bits)
+    stream += "1" * (-len(stream) % 8)
+    entropy = int(stream, 2).to_bytes(len(stream) // 8, "big").replace(b"\xff", b"\xff\x00")
+
+    def segment(marker, body):
+        return bytes([0xFF, marker]) + (len(body) + 2).to_bytes(2, "big") + body
+
+    frame = bytes([8]) + height.to_bytes(2, "big") + width.to_bytes(2, "big") + bytes([3, 1, 0x11, 0, 2, 0x11, 0, 3, 0x11, 0])
+    return (b"\xff\xd8" + segment(0xDB, bytes([0]) + bytes([QUANTIZER] * 64)) + segment(0xC0, frame)
+            + segment(0xC4, bytes([0x00] + DC_COUNTS) + bytes(range(12)))
+            + segment(0xC4, bytes([0x10, 1] + [0] * 15) + b"\x00")
+            + segment(0xDA, bytes([3, 1, 0x00, 2, 0x00, 3, 0x00, 0, 63, 0])) + entropy + b"\xff\xd9")
+
+
+def encode_png(width, height, rgb):
+    """Encodes 8-bit RGB rows as a PNG file's bytes"""
+    stride = width * 3
+    raw = b"".join(b"\x00" + bytes(rgb[y * stride:(y + 1) * stride]) for y in range(height))
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    return (PNG_SIGNATURE + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+def make_png(width, height, rng):
+    shift = rng.randrange(256)
+    row = bytes(value for x in range(width) for value in ((x + shift) % 256, (x * 3) % 256, shift))
+    return encode_png(width, height, b"".join(bytes((v + y) % 256 for v in row) if y % 16 == 0 else row
+                                             for y in range(height)))
+
+
+def write_images(directory, count, width, height, repeats, rng):
+    paths, contents = [], []
+    for i in range(count):
+        if contents and rng.random() < repeats:
+            data = rng.choice(contents)
+        else:
+            data = (make_jpeg if i % 2 else make_png)(width, height, rng)
+            contents.append(data)
+        extension = "jpg" if data.startswith(b"\xff\xd8") else "png"
+        path = os.path.join(directory, f"upload{i}.{extension}")
+        with open(path, "wb") as mf:
+            mf.write(data)
+        paths.append(path)
+    return paths
+
+
+def ingest_all(pipeline, paths, upload):
+    duplicates = 0
+    start = time.perf_counter()
+    for i in range(0, len(paths), upload):
+        result = pipeline.ingest(paths[i:i + upload])
+        assert result["status"] == "Uploaded!", result["status"]
+        duplicates += sum(image["duplicate"] for image in result["images"])
+    return time.perf_counter() - start, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1200)
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--upload", type=int, default=5)
+    parser.add_argument("--repeats", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, nargs="*", default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_images(directory, args.images, args.width, args.height, args.repeats, rng)
+        print(f"{args.images} images of {args.width}x{args.height}, "
+              f"{f'thumbnails of {args.size}px' if image_ingest.Image is not None else 'no thumbnails (Pillow missing)'}")
+
+        for workers in args.workers:
+            with ImagePipeline(os.path.join(directory, f"thumbnails{workers}"), args.size, workers) as pipeline:
+                elapsed, duplicates = ingest_all(pipeline, paths, args.upload)
+                again, skipped = ingest_all(pipeline, paths, args.upload)
+            print(f"  workers {workers}: {args.images / elapsed:7.1f} images/s, {duplicates} duplicates skipped, "
+                  f"re-upload of all {skipped} in {again * 1e3:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Stress benchmark for LikeCounter
+
+Many threads like one hot post at once, with a reader polling its count,
+for several shard counts. Then several processes like the same post
+through a shared SQLiteLikeStore. Likers overlap, so deduplication is
+exercised too, and every run checks the final count against the number of
+distinct users.
+
+usage: python benchmarks/bench_like_counter.py [--threads 16] [--likes 200000] [--processes 4] [--shards 1 4 16 64]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase5"))
+
+from like_counter import LikeCounter, SQLiteLikeStore
+from post import Post
+
+
+def liker(counter, start, likes, users):
+    # each liker walks a window of users that overlaps the next liker's
+    for i in range(start, start + likes):
+        counter.like("hot", f"user_{i % users}")
+
+
+def bench_threads(shards, threads, likes, users):
+    posts = {"hot": Post("hot.jpg", "Popular", False, 0, 1)}
+    counter = LikeCounter(posts=posts, shards=shards)
+    per_thread = likes // threads
+
+    # one reader polling the count the whole time, as a page view would
+    reads = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            start = time.perf_counter()
+            counter.count("hot")
+            reads.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=liker, args=(counter, t * per_thread // 2, per_thread, users))
+               for t in range(threads)]
+    polling = threading.Thread(target=reader)
+    start = time.perf_counter()
+    polling.start()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    counter.flush()
+    elapsed = time.perf_counter() - start
+    done.set()
+    polling.join()
+
+    expected = len({(t * per_thread // 2 + i) % users for t in range(threads) for i in range(per_thread)})
+    assert posts["hot"].like_count == counter.count("hot") == expected, (posts["hot"].like_count, expected)
+    reads.sort()
+    print(f"threads {threads:>3}, shards {shards:>3}: {per_thread * threads / elapsed:10,.0f} likes/s, "
+          f"count p99 {reads[int(len(reads) * 0.99)] * 1e6:6.1f} us, {expected:,} likes")
+
+
+def process_liker(path, start, likes, users, ready):
+    store = SQLiteLikeStore(path)
+    counter = LikeCounter(store=store, batch_size=4096)
+    ready.wait()
+    liker(counter, start, likes, users)
+    counter.flush()
+    store.close()
+
+
+def bench_processes(processes, likes, users):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "likes.db")
+        SQLiteLikeStore(path).close()
+        per_process = likes // processes
+
+        ready = multiprocessing.Event()
+        workers = [multiprocessing.Process(target=process_liker,
+                                           args=(path, p * per_process // 2, per_process, users, ready))
+                   for p in range(processes)]
+        for worker in workers:
+            worker.start()
+        start = time.perf_counter()
+        ready.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        store = SQLiteLikeStore(path)
+        total = store.counts(["hot"])["hot"]
+        store.close()
+
+    expected = len({(p * per_process // 2 + i) % users for p in range(processes) for i in range(per_process)})
+    assert total == expected, (total, expected)
+    print(f"processes {processes:>2}, sqlite store: {per_process * processes / elapsed:10,.0f} likes/s, "
+          f"{total:,} likes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--likes", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=150_000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--shards", type=int, nargs="*", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    for shards in args.shards:
+        bench_threads(shards, args.threads, args.likes, args.users)
+    bench_processes(args.processes, args.likes, args.users)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark for MealPlanner
+
+Builds a synthetic catalog, then times day and week plans for profiles
+with random calorie targets and allergies.
+
+usage: python benchmarks/bench_meal_planner.py [--recipes 50000] [--profiles 50]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import RecipeStorage
+from meal_planner import MealPlanner
+
+INGREDIENTS = ["chicken", "rice", "peanut", "milk", "egg", "soy", "wheat flour", "tomato",
+               "lettuce", "salmon", "butter", "oats", "beans", "sesame", "shrimp", "lentils"]
+ALLERGIES = ["peanut", "milk", "egg", "soy", "wheat", "sesame", "shrimp"]
+CALORIE_RANGES = {"Appetizer": (80, 400), "Main Course": (300, 1100), "Dessert": (120, 600)}
+
+
+def build_catalog(size, seed=0):
+    rng = random.Random(seed)
+    store = RecipeStorage()
+    for i in range(size):
+        category = rng.choice(RecipeStorage.VALID_CATEGORIES)
+        store.add_recipe(
+            f"Recipe {i}", "Cook it", f"recipe{i}.jpg", category,
+            calories=rng.randint(*CALORIE_RANGES[category]),
+            protein=rng.randint(0, 60), carbs=rng.randint(0, 120), fat=rng.randint(0, 50),
+            ingredients=rng.sample(INGREDIENTS, 4)
+        )
+    return store
+
+
+def percentile(timings, share):
+    return sorted(timings)[int(len(timings) * share)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=50_000)
+    parser.add_argument("--profiles", type=int, default=50)
+    args = parser.parse_args()
+
+    store = build_catalog(args.recipes)
+    planner = MealPlanner(store)
+
+    start = time.perf_counter()
+    planner._refresh()
+    print(f"precomputed arrays for {args.recipes:,} recipes in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    rng = random.Random(1)
+    for label, plan in (("day plan (top 3)", lambda p: planner.plan_day(p, count=3)),
+                        ("week plan", lambda p: planner.plan_week(p))):
+        timings = []
+        for _ in range(args.profiles):
+            profile = SimpleNamespace(data={
+                "calories": float(rng.randint(1400, 3200)),
+                "allergies": rng.sample(ALLERGIES, rng.randint(0, 2))
+            })
+            start = time.perf_counter()
+            plan(profile)
+            timings.append(time.perf_counter() - start)
+        print(f"{label:<18} p50 {percentile(timings, 0.5):.1f} ms, p99 {percentile(timings, 0.99):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark for metrics instrumentation overhead
+
+Times create_post and UserProfile construction with instrumentation never
+enabled, enabled, and disabled again, then with the sampling profiler
+running on top. Disabled should match never enabled, as the original
+functions are back in place.
+
+usage: python benchmarks/bench_metrics.py [--calls 200000] [--interval 0.005]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase5"))
+
+import metrics
+import post
+from UserProfile import UserProfile
+
+POSTS = [
+    {"image": "pasta.jpg", "description": "Trying out this new recipe!", "likeButton": True, "likeCount": 5, "imageCount": 1},
+    {"image": "pasta.jpg", "description": "Too many", "likeButton": True, "likeCount": 5, "imageCount": 9},
+    {"image": "notes.txt", "description": "Not a photo", "likeButton": False, "likeCount": 0, "imageCount": 1}
+]
+
+
+def run(calls):
+    # best of three, in ns per call, for each workload
+    def best(func):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) / calls * 1e9
+
+    return {
+        "create_post": best(lambda: [post.create_post(POSTS[i % 3]) for i in range(calls)]),
+        "UserProfile": best(lambda: [UserProfile("user_name", "Hi", 70.0, 175.0, ["nuts"], 2000.0)
+                                     for _ in range(calls // 4)]) / 4
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--interval", type=float, default=0.005)
+    args = parser.parse_args()
+
+    rows = [("never enabled", run(args.calls))]
+    metrics.enable()
+    rows.append(("enabled", run(args.calls)))
+    with metrics.SamplingProfiler(interval=args.interval) as profiler:
+        rows.append((f"+ profiler {args.interval * 1e3:g}ms", run(args.calls)))
+    metrics.disable()
+    rows.append(("disabled again", run(args.calls)))
+
+    for label, timings in rows:
+        print(f"{label:<20} " + "  ".join(f"{name} {ns:8.0f} ns/call" for name, ns in timings.items()))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "plateplanner.prom")
+        start = time.perf_counter()
+        metrics.REGISTRY.write(path)
+        elapsed = time.perf_counter() - start
+        print(f"snapshot of {len(open(path).readlines())} lines in {elapsed * 1e3:.2f} ms, "
+              f"{profiler.samples} profiler samples, {len(profiler.stacks)} distinct stacks")
+
+
+if __name__ == "__main__":
+    main()
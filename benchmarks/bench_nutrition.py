@@ -0,0 +1,88 @@
+"""
+Benchmark for the nutrition engine
+
+Builds a catalog whose ingredient lines are drawn from a few thousand
+distinct lines, as in real recipes, then times catalog recomputation with
+the parse cache cold, warm and bypassed, and in process pools of several
+sizes.
+
+usage: python benchmarks/bench_nutrition.py [--recipes 100000] [--distinct 3000] [--workers 0 2 4]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import nutrition
+from main import RecipeStorage
+from nutrition import compute_catalog, parse_ingredient
+
+QUANTITIES = ["1", "2", "3", "1/2", "1/4", "1 1/2", "2-3", "100", "250"]
+UNITS = ["", "cup ", "cups ", "tbsp ", "tsp ", "g ", "oz ", "slices ", "scoops ", "cloves "]
+FOODS = list(nutrition.FOODS) + ["fresh basil", "vanilla extract", "cinnamon"]
+ADJECTIVES = ["", "chopped ", "sliced ", "fresh ", "cooked ", "diced "]
+
+
+def make_lines(count, rng):
+    lines = set()
+    while len(lines) < count:
+        quantity = rng.choice(QUANTITIES + [""])
+        unit = rng.choice(UNITS) if quantity else ""
+        lines.add(f"{quantity} {unit}{rng.choice(ADJECTIVES)}{rng.choice(FOODS)}".strip())
+    return sorted(lines)
+
+
+def build_catalog(size, lines, rng):
+    store = RecipeStorage()
+    for i in range(size):
+        store.add_recipe(f"Recipe {i}", "Mix and cook", f"recipe{i}.jpg", rng.choice(RecipeStorage.VALID_CATEGORIES),
+                         ingredients=rng.sample(lines, rng.randint(4, 12)))
+    return store
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=3000)
+    parser.add_argument("--workers", type=int, nargs="*", default=[0, 2, 4])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lines = make_lines(args.distinct, rng)
+    store = build_catalog(args.recipes, lines, rng)
+    total = sum(len(recipe["ingredients"]) for recipe in store.recipes.values())
+    print(f"{args.recipes:,} recipes, {total:,} ingredient lines, {len(lines):,} distinct")
+
+    start = time.perf_counter()
+    for recipe in store.recipes.values():
+        for line in recipe["ingredients"]:
+            parse_ingredient.__wrapped__(line)
+    uncached = time.perf_counter() - start
+    print(f"  parse every line, no cache  {uncached:7.2f} s  ({uncached / total * 1e6:.1f} us/line)")
+
+    parse_ingredient.cache_clear()
+    cold = timed(compute_catalog, store)
+    info = parse_ingredient.cache_info()
+    print(f"  compute_catalog, cold cache {cold:7.2f} s  (hit rate {info.hits / (info.hits + info.misses):.1%})")
+    warm = timed(compute_catalog, store)
+    print(f"  compute_catalog, warm cache {warm:7.2f} s  ({args.recipes / warm:,.0f} recipes/s)")
+
+    for workers in args.workers:
+        if workers:
+            elapsed = timed(compute_catalog, store, workers=workers)
+            print(f"  compute_catalog, {workers} workers {elapsed:7.2f} s  ({args.recipes / elapsed:,.0f} recipes/s)")
+    print(f"  cpus available: {os.cpu_count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark for streaming post ingestion
+
+Writes a synthetic jsonl dump of forum posts, then streams it through
+post.create_posts in-process and with process pools of a few sizes.
+
+usage: python benchmarks/bench_post_ingest.py [--posts 500000] [--workers 2 4]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase5"))
+
+from post import create_posts, IngestStats
+
+
+def write_dump(path, count, seed=0):
+    rng = random.Random(seed)
+    with open(path, "wt") as mf:
+        for i in range(count):
+            post = {
+                "image": rng.choice(["pasta.jpg", "salad.png", "cake.gif", "clip.MOV"]),
+                "description": f"Trying out recipe {i}!" * rng.randint(1, 8),
+                "likeButton": True,
+                "likeCount": rng.randint(0, 60),
+                "imageCount": rng.randint(0, 6)
+            }
+            mf.write(json.dumps(post) + "\n")
+
+
+def run(path, workers, chunk_size):
+    stats = IngestStats()
+    with open(path, "rt") as mf:
+        for _ in create_posts(mf, chunk_size=chunk_size, workers=workers, stats=stats):
+            pass
+    label = f"{workers} workers" if workers else "in-process"
+    print(f"{label:<12} {stats.posts_per_sec:>12,.0f} posts/s  "
+          f"({stats.accepted:,} accepted, {stats.total - stats.accepted:,} rejected)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=500_000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="*", default=[2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "posts.jsonl")
+        write_dump(path, args.posts)
+        run(path, None, args.chunk_size)
+        for workers in args.workers:
+            run(path, workers, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Memory benchmark for the compact profile forms
+
+Measures traced allocations for the same synthetic profiles held as
+UserProfile objects, ProfileRecord objects and one ProfileTable.
+
+usage: python benchmarks/bench_profile_memory.py [--profiles 200000]
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase5"))
+
+from UserProfile import UserProfile
+from profile_table import ProfileRecord, ProfileTable
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_profile_storage import make_profiles
+
+
+def measure(label, count, build):
+    tracemalloc.start()
+    held = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {size / 2**20:>8.1f} MiB  {size / count:>6.0f} bytes/profile")
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=200_000)
+    args = parser.parse_args()
+
+    # the input dicts are built outside the traced sections, so only the
+    # containers and anything they copy are counted
+    datas = make_profiles(args.profiles)
+
+    measure("UserProfile", args.profiles, lambda: [UserProfile.from_dict(d) for d in datas])
+    measure("ProfileRecord", args.profiles, lambda: [ProfileRecord.from_dict(d) for d in datas])
+    measure("ProfileTable", args.profiles, lambda: ProfileTable(datas))
+
+
+if __name__ == "__main__":
+    main()
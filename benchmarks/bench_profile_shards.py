@@ -0,0 +1,123 @@
+"""
+Benchmark for the sharded profile storage
+
+For 1, 2, 4 and 8 shards (up to --max-shards), stores --profiles synthetic
+profiles and measures:
+
+- store_many throughput in batches of --batch;
+- load_many throughput from --clients threads, each asking for random
+  batches of --batch usernames;
+- single load throughput from the same client threads;
+- adding one more shard while a client keeps reading, with the share of
+  profiles moved and the reads that missed (should be 0).
+
+Shards are separate processes, so throughput can only grow with the number
+of shards up to the number of cores, which is printed first.
+
+usage: python benchmarks/bench_profile_shards.py [--profiles 200000] [--clients 8] [--batch 256] [--max-shards 8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase5"))
+
+from profile_shards import HashRing, ShardedProfileStorage
+
+from bench_profile_storage import make_profiles
+
+
+def run_clients(clients, duration, work):
+    """Runs work(rng) in a loop on every client thread for duration seconds, returns the summed results / s"""
+    counts = [0] * clients
+    stop = threading.Event()
+
+    def client(c):
+        rng = random.Random(c)
+        while not stop.is_set():
+            counts[c] += work(rng)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def bench_shards(directory, shards, profiles, args):
+    usernames = [p["username"] for p in profiles]
+    storage = ShardedProfileStorage(directory, shards=shards)
+
+    start = time.perf_counter()
+    for i in range(0, len(profiles), args.batch):
+        storage.store_many(profiles[i:i + args.batch])
+    stored = len(profiles) / (time.perf_counter() - start)
+
+    def multi_get(rng):
+        return len(storage.load_many(rng.sample(usernames, args.batch)))
+
+    def single_get(rng):
+        storage.load(rng.choice(usernames))
+        return 1
+
+    batched = run_clients(args.clients, args.duration, multi_get)
+    single = run_clients(args.clients, args.duration, single_get)
+
+    # re-shard with a reader running, counting reads that came back short
+    stop = threading.Event()
+    misses = [0]
+
+    def reader():
+        rng = random.Random(0)
+        while not stop.is_set():
+            batch = rng.sample(usernames, args.batch)
+            misses[0] += len(batch) - len(storage.load_many(batch))
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    start = time.perf_counter()
+    added = storage.add_shard()
+    resharded = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    ring = HashRing(storage.shards)
+    moved = sum(ring.node_for(username) == added for username in usernames) / len(usernames)
+    storage.close()
+
+    print(f"{shards:>2} shards: store_many {stored:>9,.0f}/s | load_many {batched:>9,.0f}/s | "
+          f"load {single:>7,.0f}/s | add shard {resharded:5.2f} s, moved {moved:.1%}, {misses[0]} missed")
+    return batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--max-shards", type=int, default=8)
+    args = parser.parse_args()
+
+    profiles = make_profiles(args.profiles)
+    print(f"{args.profiles:,} profiles, {args.clients} client threads, {os.cpu_count()} cores")
+    baseline = None
+    shards = 1
+    with tempfile.TemporaryDirectory() as root:
+        while shards <= args.max_shards:
+            rate = bench_shards(os.path.join(root, f"shards{shards}"), shards, profiles, args)
+            baseline = baseline or rate
+            print(f"           load_many speedup over 1 shard: {rate / baseline:.2f}x")
+            shards *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for the UserProfile storage backends
+
+Stores synthetic profiles in each backend, then times single loads and
+batched load_many calls over all of them.
+
+usage: python benchmarks/bench_profile_storage.py [--profiles 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase5"))
+
+from profile_storage import FileProfileStorage, SQLiteProfileStorage
+
+ALLERGIES = ["peanut", "milk", "egg", "soy", "wheat", "shellfish", "fish", "sesame"]
+
+
+def make_profiles(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "username": f"user_{i}",
+            "description": "Student who enjoys fitness and cooking",
+            "weight": round(rng.uniform(40.0, 150.0), 1),
+            "height": round(rng.uniform(140.0, 210.0), 1),
+            "allergies": rng.sample(ALLERGIES, rng.randint(0, 2)),
+            "calories": float(rng.randint(1200, 3500)),
+            "activity": rng.choice(["low", "moderate", "high"])
+        }
+        for i in range(count)
+    ]
+
+
+def bench_backend(name, storage, profiles):
+    usernames = [p["username"] for p in profiles]
+
+    start = time.perf_counter()
+    storage.store_many(profiles)
+    stored = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for username in usernames:
+        storage.load(username)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = storage.load_many(usernames)
+    batched = time.perf_counter() - start
+    assert len(loaded) == len(profiles)
+
+    count = len(profiles)
+    print(f"{name:<8} store_many {count / stored:>10,.0f}/s | "
+          f"load {count / single:>10,.0f}/s | load_many {count / batched:>10,.0f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=100_000)
+    args = parser.parse_args()
+
+    profiles = make_profiles(args.profiles)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with FileProfileStorage(os.path.join(tmpdir, "files")) as storage:
+            bench_backend("file", storage, profiles)
+        with SQLiteProfileStorage(os.path.join(tmpdir, "profiles.db")) as storage:
+            bench_backend("sqlite", storage, profiles)
+        with SQLiteProfileStorage() as storage:
+            bench_backend("memory", storage, profiles)
+
+
+if __name__ == "__main__":
+    main()
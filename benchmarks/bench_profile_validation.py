@@ -0,0 +1,88 @@
+"""
+Benchmark for UserProfile batch validation
+
+Compares constructing profiles one at a time (six validate_* calls per row)
+against UserProfile.validate_batch and UserProfile.from_batch on the same
+columnar batch, with a share of invalid rows mixed in.
+
+usage: python benchmarks/bench_profile_validation.py [--records 200000]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Phase5"))
+
+import UserProfile as user_profile_module
+from UserProfile import UserProfile
+
+COLUMNS = ["username", "description", "weight", "height", "allergies", "calories"]
+
+
+def make_records(count, invalid_share=0.05, seed=0):
+    rng = random.Random(seed)
+    records = {name: [] for name in COLUMNS}
+    for i in range(count):
+        row = {
+            "username": f"user_{i}",
+            "description": "Student who enjoys fitness and cooking, mostly high protein meals",
+            "weight": rng.uniform(40.0, 150.0),
+            "height": rng.uniform(140.0, 210.0),
+            "allergies": rng.sample(["peanut", "milk", "egg", "soy"], rng.randint(0, 2)),
+            "calories": float(rng.randint(1200, 3500))
+        }
+        if rng.random() < invalid_share:
+            row[rng.choice(COLUMNS)] = rng.choice([None, 7, "", 9000.0])
+        for name in COLUMNS:
+            records[name].append(row[name])
+    return records
+
+
+def construct_each(records):
+    reports = []
+    for row in zip(*(records[name] for name in COLUMNS)):
+        try:
+            UserProfile(*row)
+            reports.append(None)
+        except ValueError as e:
+            reports.append(str(e))
+    return reports
+
+
+def timed(label, count, func, *args, repeat=3):
+    # best of a few runs with gc paused, like timeit
+    best = None
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        gc.enable()
+    print(f"{label:<28} {count / best:>12,.0f} rows/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--invalid-share", type=float, default=0.05)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.invalid_share)
+    print(f"numpy: {'yes' if user_profile_module.np is not None else 'no'}")
+
+    expected = timed("UserProfile(...) per row", args.records, construct_each, records)
+    reports = timed("UserProfile.validate_batch", args.records, UserProfile.validate_batch, records)
+    timed("UserProfile.from_batch", args.records, UserProfile.from_batch, records)
+    assert reports == expected
+
+
+if __name__ == "__main__":
+    main()
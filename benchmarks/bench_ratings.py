@@ -0,0 +1,113 @@
+"""
+Benchmark for the ratings store and the recommendation job
+
+Generates users and recipes in taste clusters. A user rates a recipe higher
+when they share a cluster, and popular recipes are rated more often. Holds
+out one rating per user and measures:
+
+- the cost of each rating write;
+- the matrix factorization fit, with its holdout RMSE against the
+  bias-only baseline;
+- the nightly recommend_all job, with a few allergy profiles mixed in.
+
+usage: python benchmarks/bench_ratings.py [--users 20000] [--recipes 10000] [--per-user 40] [--workers 4]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from allergen_index import AllergenIndex
+from main import RecipeStorage
+from ratings import MatrixFactorization, RatingStore
+
+
+ALLERGIES = ([], [], [], ["peanut"], ["milk"], ["wheat", "egg"])
+INGREDIENTS = ("rice", "chicken", "peanuts", "milk", "flour", "eggs", "tomatoes", "beans")
+
+
+def make_ratings(users, recipes, per_user, clusters, rng):
+    """[(username, title, rating)] to train on and one held out (username, title, rating) per user"""
+    recipe_clusters = [rng.randrange(clusters) for _ in range(recipes)]
+    # popularity falls off as 1 / rank
+    weights = [1.0 / (rank + 1) for rank in range(recipes)]
+    train, held_out = [], []
+    for user in range(users):
+        cluster = rng.randrange(clusters)
+        picked = set(rng.choices(range(recipes), weights=weights, k=per_user + 1))
+        rows = []
+        for recipe in sorted(picked):
+            rating = 4.5 if recipe_clusters[recipe] == cluster else 2.0
+            rating = min(5, max(1, round(rating + rng.gauss(0.0, 0.7))))
+            rows.append((f"user{user}", f"Recipe {recipe}", rating))
+        held_out.append(rows.pop(rng.randrange(len(rows))))
+        train.extend(rows)
+    return train, held_out
+
+
+def make_catalog(recipes, rng):
+    store = RecipeStorage()
+    for recipe in range(recipes):
+        store.add_recipe(f"Recipe {recipe}", "Cook", f"recipe{recipe}.jpg", "Main Course",
+                         ingredients=rng.sample(INGREDIENTS, 3))
+    return store
+
+
+def rmse(model, held_out):
+    errors = [(model.predict(username, title) - rating) ** 2 for username, title, rating in held_out]
+    return math.sqrt(sum(errors) / len(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--per-user", type=int, default=40)
+    parser.add_argument("--clusters", type=int, default=4)
+    parser.add_argument("--factors", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    train, held_out = make_ratings(args.users, args.recipes, args.per_user, args.clusters, rng)
+
+    ratings = RatingStore()
+    start = time.perf_counter()
+    for username, title, rating in train:
+        ratings.rate(username, title, rating)
+    ratings.compact()
+    elapsed = time.perf_counter() - start
+    print(f"{len(ratings):,} ratings by {args.users:,} users of {len(ratings.recipes):,} recipes: "
+          f"{elapsed / len(ratings) * 1e6:.1f} us/rating written")
+
+    allergens = AllergenIndex(make_catalog(args.recipes, rng))
+    profiles = [SimpleNamespace(data={"username": f"user{user}", "allergies": ALLERGIES[user % len(ALLERGIES)]})
+                for user in range(args.users)]
+
+    for workers in sorted({0, args.workers}):
+        label = f"{workers} workers" if workers else "inline"
+        model = MatrixFactorization(ratings, allergens=allergens, factors=args.factors,
+                                    iterations=args.iterations)
+        start = time.perf_counter()
+        model.fit(workers=workers)
+        fit = time.perf_counter() - start
+
+        start = time.perf_counter()
+        recommendations = model.recommend_all(profiles, n=10, workers=workers)
+        recommend = time.perf_counter() - start
+        print(f"  {label:>10}: fit {fit:.1f} s ({fit / args.iterations / len(ratings) * 1e6:.1f} us/rating/iteration), "
+              f"recommend_all {recommend:.1f} s ({recommend / len(recommendations) * 1e3:.2f} ms/user)")
+
+    baseline = MatrixFactorization(ratings, factors=args.factors, iterations=0).fit()
+    print(f"  holdout rmse: factorization {rmse(model, held_out):.3f}, biases only {rmse(baseline, held_out):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark for RecipeStorage.find_recipes
+
+Fills a catalog with synthetic recipes through add_recipe, then times
+filtered lookups against the secondary indexes.
+
+usage: python benchmarks/bench_recipe_query.py [--recipes 1000000] [--queries 1000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import RecipeStorage
+
+TAGS = ["Vegan", "Vegetarian", "Gluten-Free", "High-Protein", "Low-Carb", "Dairy-Free", "Keto", "Paleo"]
+
+
+def build_catalog(size, seed=0):
+    rng = random.Random(seed)
+    store = RecipeStorage()
+    for i in range(size):
+        store.add_recipe(
+            f"Recipe {i}",
+            "Mix everything and cook",
+            f"recipe{i}.jpg",
+            rng.choice(RecipeStorage.VALID_CATEGORIES),
+            calories=rng.randint(50, 1200),
+            protein=rng.randint(0, 80),
+            dietary_tags=rng.sample(TAGS, rng.randint(0, 3))
+        )
+    return store
+
+
+def time_queries(store, queries, seed=1):
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(queries):
+        low = rng.randint(50, 1100)
+        kwargs = {
+            "category": rng.choice(RecipeStorage.VALID_CATEGORIES),
+            "tags": [rng.choice(TAGS)],
+            "min_calories": low,
+            "max_calories": low + rng.randint(10, 100),
+            "limit": 50
+        }
+        start = time.perf_counter()
+        store.find_recipes(**kwargs)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = build_catalog(args.recipes)
+    build = time.perf_counter() - start
+    print(f"built {args.recipes} recipes in {build:.2f}s ({args.recipes / build:,.0f} add_recipe/s)")
+
+    timings = time_queries(store, args.queries)
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    print(f"category + tag + calorie range, limit 50: p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark for RecipeSearch
+
+Indexes a synthetic catalog whose ingredients follow a Zipf distribution,
+reports p50/p99 latency for ranked one to three word queries and for
+typeahead (prefix) queries, checks the ranking against an exhaustive search
+on a sample, and times saving and restoring a snapshot.
+
+usage: python benchmarks/bench_recipe_search.py [--recipes 1000000] [--queries 2000] [--check 100]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import RecipeStorage
+from recipe_search import RecipeSearch
+
+ADJECTIVES = ["spicy", "creamy", "crispy", "smoky", "zesty", "hearty", "quick", "roasted", "grilled",
+              "baked", "fresh", "sticky", "golden", "rustic", "tangy", "sweet", "savory", "herby"]
+INGREDIENTS = ["chicken", "beef", "pork", "salmon", "shrimp", "tofu", "lentil", "chickpea", "rice",
+               "noodle", "potato", "tomato", "spinach", "mushroom", "pepper", "onion", "garlic", "ginger",
+               "lemon", "lime", "coconut", "peanut", "almond", "chocolate", "banana", "apple", "berry",
+               "cheese", "yogurt", "butter", "basil", "cilantro", "cumin", "paprika", "honey", "maple",
+               "oat", "quinoa", "bean", "corn", "zucchini", "eggplant", "carrot", "kale", "avocado"]
+DISHES = ["curry", "salad", "soup", "stew", "tacos", "bowl", "pie", "cake", "bake", "stir fry",
+          "risotto", "pasta", "burger", "wrap", "skewers", "muffins", "pancakes", "smoothie"]
+VERBS = ["chop", "simmer", "whisk", "fold", "roast", "grill", "saute", "blend", "season", "marinate",
+         "bake", "toast", "drain", "stir", "serve", "garnish", "slice", "mash", "knead", "chill"]
+
+
+def zipf_weights(words):
+    # word frequencies in real recipe text fall off roughly as 1 / rank
+    return [1 / rank for rank in range(1, len(words) + 1)]
+
+
+def build_catalog(size, seed=0):
+    rng = random.Random(seed)
+    weights = zipf_weights(INGREDIENTS)
+    store = RecipeStorage()
+    for i in range(size):
+        ingredients = list(dict.fromkeys(rng.choices(INGREDIENTS, weights, k=rng.randint(4, 10))))
+        title = f"{rng.choice(ADJECTIVES).title()} {ingredients[0].title()} {rng.choice(DISHES).title()} {i}"
+        instructions = ". ".join(
+            f"{rng.choice(VERBS)} the {rng.choice(ingredients)}" for _ in range(rng.randint(2, 12))
+        )
+        store.add_recipe(title, instructions, f"recipe{i}.jpg",
+                         rng.choice(RecipeStorage.VALID_CATEGORIES), ingredients=ingredients)
+    return store
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def time_queries(search, queries, prefix):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search.search(query, limit=10, prefix=prefix)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--check", type=int, default=100)
+    args = parser.parse_args()
+
+    store = build_catalog(args.recipes)
+
+    start = time.perf_counter()
+    search = RecipeSearch(store)
+    search.optimize()
+    elapsed = time.perf_counter() - start
+    print(f"indexed {args.recipes:,} recipes in {elapsed:.1f}s ({len(search._postings):,} terms)")
+
+    # a long-lived index should not be walked by every full garbage collection
+    gc.freeze()
+
+    # queries mix a dish or adjective with ingredients, picked as often as they are used
+    rng = random.Random(1)
+    weights = zipf_weights(INGREDIENTS)
+    queries = [" ".join(rng.choices(INGREDIENTS, weights, k=rng.randint(0, 2)) +
+                        [rng.choice(ADJECTIVES + DISHES)]) for _ in range(args.queries)]
+    prefixes = [f"{rng.choice(DISHES)} {rng.choices(INGREDIENTS, weights)[0][:rng.randint(1, 4)]}"
+                for _ in range(args.queries)]
+
+    for name, batch, prefix in (("ranked", queries, False), ("typeahead", prefixes, True)):
+        samples = time_queries(search, batch, prefix)
+        print(f"{name}: p50 {percentile(samples, 0.5) * 1e3:.2f} ms, "
+              f"p99 {percentile(samples, 0.99) * 1e3:.2f} ms over {len(samples):,} queries")
+
+    # results scoring at least the exhaustive search's 10th best
+    found = []
+    for query in queries[:args.check]:
+        fast = search.search(query)
+        search.SCORED_BUDGET = len(store.recipes)
+        exact = search.search(query)
+        del search.SCORED_BUDGET
+        found.append(sum(1 for _, score in fast if score >= exact[-1][1] - 1e-9) / len(exact) if exact else 1)
+    print(f"recall@10 against an exhaustive search: {sum(found) / len(found):.3f} over {len(found)} queries")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "search.snapshot")
+        start = time.perf_counter()
+        search.save(path)
+        saved = time.perf_counter() - start
+
+        start = time.perf_counter()
+        RecipeSearch.load(path, store)
+        loaded = time.perf_counter() - start
+        print(f"snapshot {os.path.getsize(path) / 2**20:.0f} MiB: save {saved:.1f}s, load {loaded:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark for RecipeStorage startup from a snapshot
+
+Saves a synthetic catalog as JSON and as a binary snapshot, then compares
+startup: json.load plus add_recipe per recipe against open_snapshot. It
+also reports the first query (which builds the indexes from the snapshot
+columns), lookup latency of recipes decoded on first access and the two
+file sizes.
+
+usage: python benchmarks/bench_recipe_snapshot.py [--recipes 1000000] [--lookups 10000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import RecipeStorage
+
+WORDS = ["tomato", "basil", "garlic", "lentil", "rice", "tofu", "chili", "lemon", "ginger", "spinach",
+         "oats", "honey", "yogurt", "pepper", "onion", "quinoa", "mango", "almond", "salmon", "thyme"]
+TAGS = ["Vegan", "Vegetarian", "Gluten-Free", "High-Protein", "Low-Carb", "Dairy-Free", "Keto", "Paleo"]
+
+
+def build_catalog(size, seed=0):
+    rng = random.Random(seed)
+    store = RecipeStorage()
+    for i in range(size):
+        store.add_recipe(
+            f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}",
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 40))),
+            f"recipe{i}.jpg",
+            rng.choice(RecipeStorage.VALID_CATEGORIES),
+            calories=rng.randint(50, 1200),
+            protein=rng.randint(0, 80),
+            fat=round(rng.uniform(0, 60), 1) if rng.random() < 0.5 else None,
+            dietary_tags=rng.sample(TAGS, rng.randint(0, 3)),
+            ingredients=rng.sample(WORDS, rng.randint(3, 8))
+        )
+    return store
+
+
+def load_json(path):
+    with open(path, "rt") as mf:
+        recipes = json.load(mf)
+    store = RecipeStorage()
+    for title, recipe in recipes.items():
+        store.add_recipe(title, recipe["instructions"], recipe["image"], recipe["category"],
+                         recipe["calories"], recipe["protein"], recipe["dietary_tags"],
+                         recipe["carbs"], recipe["fat"], recipe["ingredients"])
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    store = build_catalog(args.recipes)
+    titles = list(store.recipes)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "catalog.json")
+        snapshot_path = os.path.join(directory, "catalog.snap")
+
+        start = time.perf_counter()
+        with open(json_path, "wt") as mf:
+            json.dump(store.recipes, mf)
+        json_write = time.perf_counter() - start
+        start = time.perf_counter()
+        store.save_snapshot(snapshot_path)
+        snapshot_write = time.perf_counter() - start
+        del store
+        print(f"{args.recipes:,} recipes")
+        print(f"  write        json {json_write:8.2f} s   snapshot {snapshot_write:8.2f} s")
+        print(f"  size         json {os.path.getsize(json_path) / 2 ** 20:8.1f} MB  "
+              f"snapshot {os.path.getsize(snapshot_path) / 2 ** 20:8.1f} MB")
+
+        start = time.perf_counter()
+        load_json(json_path)
+        json_startup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = RecipeStorage.open_snapshot(snapshot_path)
+        snapshot_startup = time.perf_counter() - start
+        print(f"  startup      json {json_startup:8.2f} s   snapshot {snapshot_startup * 1e3:8.3f} ms")
+
+        rng = random.Random(1)
+        timings = []
+        for title in rng.sample(titles, min(args.lookups, len(titles))):
+            start = time.perf_counter()
+            loaded.recipes[title]
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"  first lookup p50 {timings[len(timings) // 2] * 1e6:8.1f} us  "
+              f"p99 {timings[int(len(timings) * 0.99)] * 1e6:8.1f} us")
+
+        start = time.perf_counter()
+        loaded.find_recipes(category="Dessert", tags=["Vegan"], max_calories=400, limit=50)
+        print(f"  first query  {time.perf_counter() - start:8.2f} s (builds the indexes)")
+        loaded.recipes.close()
+
+
+if __name__ == "__main__":
+    main()
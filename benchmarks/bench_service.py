@@ -0,0 +1,117 @@
+"""
+Load test for RecipeService
+
+Starts the service in its own process with a seeded recipe catalog, then
+drives it from many concurrent keep-alive connections and reports req/s and
+p50/p95/p99 latency per workload. Client and server share the machine, so
+numbers on few cores understate what the server alone can do.
+
+usage: python benchmarks/bench_service.py [--connections 32] [--requests 5000] [--workers 2] [--batch 64]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import RecipeStorage
+from service import RecipeService, ServiceClient
+
+
+def run_server(port, workers, recipes, ready):
+    store = RecipeStorage()
+    rng = random.Random(0)
+    for i in range(recipes):
+        store.add_recipe(f"Recipe {i}", "Mix and cook", f"recipe{i}.jpg", rng.choice(RecipeStorage.VALID_CATEGORIES),
+                         calories=rng.randint(100, 1200), protein=rng.randint(0, 60))
+
+    async def serve():
+        service = RecipeService(recipes=store, workers=workers, max_pending=1024)
+        await service.start(port=port)
+
+        # shutting the process pool down on terminate, so no workers are left behind
+        stopped = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set_result, None)
+        ready.put(service.port)
+        await stopped
+        await service.close()
+
+    asyncio.run(serve())
+
+
+def post_data(i):
+    return {"image": f"food{i}.jpg", "description": f"Lunch number {i}", "likeButton": True,
+            "likeCount": 1 + i % 50, "imageCount": 1 + i % 5}
+
+
+def workload(name, batch):
+    # returns request(i) -> (method, path, body) for one workload
+    if name == "health":
+        return lambda i: ("GET", "/health", None)
+    if name == "recipes":
+        return lambda i: ("GET", f"/recipes?category=Dessert&min_calories={i % 1000}&limit=10", None)
+    if name == "posts":
+        return lambda i: ("POST", "/posts", post_data(i))
+    return lambda i: ("POST", "/posts:batch", [post_data(i * batch + j) for j in range(batch)])
+
+
+async def drive(port, request, total, connections):
+    timings = []
+    counter = iter(range(total))
+
+    async def connection():
+        client = ServiceClient("127.0.0.1", port)
+        for i in counter:
+            method, path, body = request(i)
+            start = time.perf_counter()
+            status, _ = await client.request(method, path, body)
+            timings.append(time.perf_counter() - start)
+            if status >= 500:
+                raise RuntimeError(f"{method} {path} answered {status}")
+        await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(connections)))
+    return timings, time.perf_counter() - start
+
+
+def percentile(timings, p):
+    return timings[min(int(len(timings) * p), len(timings) - 1)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=run_server, args=(args.port, args.workers, args.recipes, ready))
+    server.start()
+    port = ready.get(timeout=120)
+
+    try:
+        for name in ("health", "recipes", "posts", "posts:batch"):
+            total = args.requests // args.batch if name == "posts:batch" else args.requests
+            timings, elapsed = asyncio.run(drive(port, workload(name, args.batch), total, args.connections))
+            timings.sort()
+            records = f", {total * args.batch / elapsed:,.0f} posts/s" if name == "posts:batch" else ""
+            print(f"{name:<12} {total / elapsed:8,.0f} req/s{records}  p50 {percentile(timings, 0.5):6.2f} ms  "
+                  f"p95 {percentile(timings, 0.95):6.2f} ms  p99 {percentile(timings, 0.99):6.2f} ms")
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
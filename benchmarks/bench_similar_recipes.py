@@ -0,0 +1,102 @@
+"""
+Benchmark for the similar recipes index
+
+Builds a catalog of recipe families (variations of a base ingredient list
+with a few ingredients swapped), indexes it with SimilarRecipes and
+compares top-k queries against a brute-force Jaccard scan over every
+recipe: query latency, and recall of the true top k among recipes at or
+above --min-similarity.
+
+usage: python benchmarks/bench_similar_recipes.py [--recipes 200000] [--queries 200] [--k 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import RecipeStorage
+from similar_recipes import SimilarRecipes, ingredient_set, jaccard
+
+
+def make_vocabulary(size, rng):
+    syllables = ["ba", "ko", "ri", "sa", "mu", "te", "lo", "ni", "pe", "da", "vo", "ga"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def build_catalog(size, vocabulary, rng, family_size=20):
+    store = RecipeStorage()
+    base = None
+    for i in range(size):
+        if i % family_size == 0:
+            base = rng.sample(vocabulary, rng.randint(6, 12))
+        ingredients = list(base)
+        for _ in range(rng.randint(0, 3)):
+            ingredients[rng.randrange(len(ingredients))] = rng.choice(vocabulary)
+        store.add_recipe(f"Recipe {i}", "Mix and cook", f"recipe{i}.jpg",
+                         rng.choice(RecipeStorage.VALID_CATEGORIES),
+                         ingredients=[f"{rng.randint(1, 3)} cups {name}" for name in ingredients])
+    return store
+
+
+def brute_force(sets, title, k):
+    target = sets[title]
+    scored = [(jaccard(target, other), t) for t, other in sets.items() if t != title]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return scored[:k]
+
+
+def percentiles(timings):
+    timings.sort()
+    return timings[len(timings) // 2] * 1e3, timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=200_000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-similarity", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    store = build_catalog(args.recipes, make_vocabulary(args.vocabulary, rng), rng)
+
+    start = time.perf_counter()
+    index = SimilarRecipes(store)
+    build = time.perf_counter() - start
+    print(f"{args.recipes:,} recipes: index built in {build:.2f} s ({build / args.recipes * 1e6:.1f} us/recipe)")
+
+    sets = {title: ingredient_set(recipe["ingredients"]) for title, recipe in store.recipes.items()}
+    titles = rng.sample(list(store.recipes), args.queries)
+
+    lsh_timings, brute_timings = [], []
+    found = relevant = 0
+    for title in titles:
+        start = time.perf_counter()
+        result = index.similar(title, args.k)
+        lsh_timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        truth = brute_force(sets, title, args.k)
+        brute_timings.append(time.perf_counter() - start)
+
+        expected = {t for score, t in truth if score >= args.min_similarity}
+        relevant += len(expected)
+        found += len(expected & {t for t, _ in result})
+
+    print(f"  lsh          p50 {percentiles(lsh_timings)[0]:9.3f} ms  p99 {percentiles(lsh_timings)[1]:9.3f} ms")
+    print(f"  brute force  p50 {percentiles(brute_timings)[0]:9.3f} ms  p99 {percentiles(brute_timings)[1]:9.3f} ms")
+    print(f"  recall@{args.k} of neighbours with jaccard >= {args.min_similarity}: "
+          f"{found / relevant if relevant else 1:.1%} ({found}/{relevant})")
+
+
+if __name__ == "__main__":
+    main()
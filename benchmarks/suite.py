@@ -0,0 +1,325 @@
+"""
+Benchmark suite with regression gating
+
+Times the core operations (RecipeStorage.add_recipe, UserProfile
+construction and JSON round trips, create_post, CalorieTracker.add_calories
+and the Dropdown classes) on seeded synthetic data at several sizes. Every
+case reports the best time per operation over a few repeats, and its time
+relative to a fixed calibration loop timed alongside it, so results from
+different machines (or a machine under varying load) can be compared.
+
+With --baseline the results are compared against a stored run and the
+script exits with status 1 when any case got slower than the threshold.
+
+usage: python benchmarks/suite.py [--sizes 100 1000 10000] [--cases recipe post] [--output results.json]
+                                  [--baseline benchmarks/baseline.json] [--threshold 0.25] [--update-baseline]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Phase5"))
+sys.path.insert(0, os.path.join(ROOT, "Dropdown-backend"))
+
+from Dropdown import Dropdown, MultiSelectDropdown
+from main import CalorieTracker, RecipeStorage
+from post import create_post
+from UserProfile import UserProfile
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# case name -> function(size, rng) returning (run, operations per run)
+CASES = {}
+
+WORDS = ["tomato", "basil", "garlic", "lentil", "rice", "tofu", "chili", "lemon", "ginger", "spinach",
+         "oats", "honey", "yogurt", "pepper", "onion", "quinoa", "mango", "almond", "salmon", "thyme"]
+CATEGORIES = ["Main Course", "Dessert", "Appetizer"]
+TAGS = ["vegan", "vegetarian", "gluten-free", "dairy-free", "high-protein", "low-carb"]
+ALLERGIES = ["nuts", "dairy", "gluten", "eggs", "soy", "shellfish"]
+
+
+def case(name):
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+
+# Seeded generators
+
+def make_recipes(size, rng):
+    recipes = []
+    for i in range(size):
+        recipes.append({
+            "title": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}",
+            "instructions": " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 40))),
+            "image": f"recipe{i}{rng.choice(('.jpg', '.png', '.jpeg'))}",
+            "category": rng.choice(CATEGORIES),
+            "calories": rng.randint(80, 1200),
+            "protein": rng.randint(0, 60),
+            "dietary_tags": rng.sample(TAGS, rng.randint(0, 3)),
+            "ingredients": rng.sample(WORDS, rng.randint(3, 8))
+        })
+    return recipes
+
+
+def make_profiles(size, rng):
+    return [{
+        "username": f"user_{i}_{rng.randrange(10_000)}",
+        "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 20))),
+        "weight": round(rng.uniform(40.0, 150.0), 1),
+        "height": round(rng.uniform(140.0, 210.0), 1),
+        "allergies": rng.sample(ALLERGIES, rng.randint(0, 3)),
+        "calories": float(rng.randint(1200, 3500)),
+        "activity": rng.choice([None, "low", "moderate", "high"])
+    } for i in range(size)]
+
+
+def make_posts(size, rng):
+    # about one post in ten fails a validator, as user input would
+    posts = []
+    for i in range(size):
+        data = {"image": f"post{i}.jpg", "description": " ".join(rng.choice(WORDS) for _ in range(8)),
+                "likeButton": rng.random() < 0.5, "likeCount": rng.randint(0, 50), "imageCount": rng.randint(1, 5)}
+        if rng.random() < 0.1:
+            field, value = rng.choice([("image", "post.txt"), ("imageCount", 9), ("likeCount", 80)])
+            data[field] = value
+        posts.append(data)
+    return posts
+
+
+def make_options(size, rng):
+    return [f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}" for i in range(size)]
+
+
+# Cases
+
+@case("recipe.add_recipe")
+def bench_add_recipe(size, rng):
+    recipes = make_recipes(size, rng)
+
+    def run():
+        storage = RecipeStorage()
+        for recipe in recipes:
+            storage.add_recipe(**recipe)
+    return run, size
+
+
+@case("profile.construct")
+def bench_profile_construct(size, rng):
+    profiles = make_profiles(size, rng)
+
+    def run():
+        for data in profiles:
+            UserProfile(**data)
+    return run, size
+
+
+@case("profile.json_round_trip")
+def bench_profile_json(size, rng):
+    profiles = [UserProfile(**data) for data in make_profiles(size, rng)]
+
+    def run():
+        for profile in profiles:
+            UserProfile.from_dict(json.loads(json.dumps(profile.data)))
+    return run, size
+
+
+@case("post.create_post")
+def bench_create_post(size, rng):
+    posts = make_posts(size, rng)
+
+    def run():
+        for data in posts:
+            create_post(data)
+    return run, size
+
+
+@case("calorie.add_calories")
+def bench_add_calories(size, rng):
+    # mostly whole numbers, with the float and text inputs add_calories rejects
+    amounts = [rng.choice([rng.randint(50, 900)] * 8 + [12.5, "abc"]) for _ in range(size)]
+
+    def run():
+        tracker = CalorieTracker()
+        for amount in amounts:
+            tracker.add_calories(amount)
+    return run, size
+
+
+@case("dropdown.construct")
+def bench_dropdown_construct(size, rng):
+    options = make_options(size, rng)
+
+    def run():
+        Dropdown(options)
+    return run, size
+
+
+@case("dropdown.select")
+def bench_dropdown_select(size, rng):
+    dropdown = Dropdown(make_options(size, rng))
+    picks = [rng.randrange(size) for _ in range(size)]
+
+    def run():
+        for index in picks:
+            dropdown.get_option(index)
+            dropdown.select_option(index)
+            dropdown.get_selection()
+    return run, size
+
+
+@case("multiselect.construct")
+def bench_multiselect_construct(size, rng):
+    options = make_options(size, rng)
+
+    def run():
+        dropdown = MultiSelectDropdown(options)
+        for index in range(0, size, 7):
+            dropdown.get_option(index)
+    return run, size
+
+
+# Timing
+
+CALIBRATION_LOOPS = 20_000
+
+
+def calibration_loop():
+    # a fixed mix of dict, string and arithmetic work
+    table = {}
+    for i in range(CALIBRATION_LOOPS):
+        table[str(i & 1023)] = table.get(str(i & 511), 0) + i * 3
+
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def measure(run, repeats):
+    """
+    Best time of run() and the median of its times relative to the calibration loop
+
+    Each repeat times the calibration loop right before run(), so a machine
+    that speeds up or slows down during the suite affects both alike. The
+    garbage collector is off while timing, as in timeit.
+    """
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        timings, ratios = [], []
+        for _ in range(repeats):
+            calibration = timed(calibration_loop)
+            timings.append(timed(run))
+            ratios.append(timings[-1] / calibration)
+    finally:
+        if enabled:
+            gc.enable()
+    ratios.sort()
+    return min(timings), ratios[len(ratios) // 2]
+
+
+def run_case(name, size, repeats, seed=0):
+    run, ops = CASES[name](size, random.Random(f"{seed}:{name}:{size}"))
+
+    # repeating small cases so each timed run lasts long enough to measure
+    loops = max(1, 10_000 // size)
+    elapsed, ratio = measure(lambda: [run() for _ in range(loops)], repeats)
+    return {
+        "ns_per_op": elapsed / loops / ops * 1e9,
+        "normalized": ratio / loops / ops * CALIBRATION_LOOPS,
+        "ops": ops,
+        "repeats": repeats
+    }
+
+
+def run_suite(sizes, names, repeats, seed=0):
+    return {f"{name}[{size}]": run_case(name, size, repeats, seed) for name in names for size in sizes}
+
+
+def report(sizes, names, repeats):
+    calibration, _ = measure(calibration_loop, repeats)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "calibration_ns": calibration / CALIBRATION_LOOPS * 1e9,
+        "results": run_suite(sizes, names, repeats)
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    [(case, ratio, regressed)] for cases in both runs, ratio > 1 is slower
+
+    Normalized times are compared, so a baseline taken on another machine
+    still applies.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["normalized"] / before["normalized"]
+        rows.append((name, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 1000, 10_000])
+    parser.add_argument("--cases", nargs="*", default=None, help="only cases starting with these prefixes")
+    parser.add_argument("--repeats", type=int, default=9)
+    parser.add_argument("--output", default=None, help="write the results as json here")
+    parser.add_argument("--baseline", default=None, help="compare against this stored run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--update-baseline", action="store_true", help=f"store the results as {BASELINE}")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if args.cases is None or name.startswith(tuple(args.cases))]
+    current = report(args.sizes, names, args.repeats)
+
+    rows = []
+    if args.baseline:
+        with open(args.baseline, "rt") as mf:
+            baseline = json.load(mf)
+        rows = compare(current, baseline, args.threshold)
+
+        # measuring suspected regressions once more, so one noisy run does not fail the suite
+        for name, _, regressed in rows:
+            if regressed:
+                case_name, _, size = name[:-1].rpartition("[")
+                again = run_case(case_name, int(size), args.repeats)
+                if again["normalized"] < current["results"][name]["normalized"]:
+                    current["results"][name] = again
+        rows = compare(current, baseline, args.threshold)
+
+    print(f"calibration {current['calibration_ns']:.1f} ns")
+    for name, result in current["results"].items():
+        print(f"  {name:<32} {result['ns_per_op'] / 1e3:10.2f} us/op")
+    if args.baseline:
+        print(f"against {args.baseline} (threshold +{args.threshold:.0%}):")
+        for name, ratio, regressed in rows:
+            print(f"  {name:<32} {ratio:6.2f}x{'  REGRESSION' if regressed else ''}")
+
+    for path in [args.output] + ([BASELINE] if args.update_baseline else []):
+        if path:
+            with open(path, "wt") as mf:
+                json.dump(current, mf, indent=2)
+
+    if any(regressed for _, _, regressed in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Near-duplicate detection for posts and recipes
+
+Every item gets a fingerprint: a 64 bit SimHash of its word shingles, so
+small edits change only a few bits, plus the sha256 of its image file when
+that file exists. DuplicateIndex finds an earlier item whose SimHash is
+within MAX_DISTANCE bits, or within IMAGE_MAX_DISTANCE bits when it has the
+same image. A shared image alone is not enough, since many items can use
+the same placeholder picture. SimHashes are split into
+BLOCKS blocks, and two fingerprints within MAX_DISTANCE bits differ in at
+most MAX_DISTANCE // BLOCKS bits of some block, so a lookup probes every
+block and its neighbours within that radius: the same number of dict probes
+however many items are indexed.
+
+create_post and RecipeStorage take a DuplicateIndex as their duplicates
+argument to reject reposts at ingest time, fingerprinting each item once.
+find_duplicates checks a whole
+existing corpus, computing fingerprints in parallel chunks.
+"""
+
+import hashlib
+import os
+import re
+import sys
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Phase5"))
+
+from chunking import chunked, pooled_map
+from image_ingest import content_hash
+
+
+# bits two SimHashes may differ in and still count as the same text, one or
+# two changed words in 60 move about 6, unrelated texts differ in about 32
+MAX_DISTANCE = 7
+
+# bits the SimHashes of two items with the same image may differ in, a
+# rewritten caption still matches but unrelated texts almost never do
+IMAGE_MAX_DISTANCE = 15
+
+# SimHash blocks indexed, of FINGERPRINT_BITS / BLOCKS bits each
+BLOCKS = 4
+
+# words per shingle
+SHINGLE_SIZE = 2
+
+FINGERPRINT_BITS = 64
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# each bit of a byte spread into its own 16 bit counter field, so adding the
+# spread hashes counts, per bit position, how many shingles have it set
+_FIELD_BITS = 16
+_SPREAD = [sum(((byte >> bit) & 1) << (bit * _FIELD_BITS) for bit in range(8)) for byte in range(256)]
+_FIELD_MASK = (1 << _FIELD_BITS) - 1
+
+# most shingles counted at once before the counters could overflow
+_BATCH = _FIELD_MASK
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Overlapping runs of size lower case words, or the whole text when shorter"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text):
+    """64 bit SimHash of the text's shingles, 0 for text without words"""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+              for s in set(shingles(text))]
+    if not hashes:
+        return 0
+
+    counts = [0] * FINGERPRINT_BITS
+    for start in range(0, len(hashes), _BATCH):
+        batch = hashes[start:start + _BATCH]
+        spread = [0] * 8
+        for h in batch:
+            for byte in range(8):
+                spread[byte] += _SPREAD[(h >> (8 * byte)) & 0xFF]
+        for byte, packed in enumerate(spread):
+            for bit in range(8):
+                counts[8 * byte + bit] += (packed >> (bit * _FIELD_BITS)) & _FIELD_MASK
+
+    # a bit is set when most shingles have it set
+    fingerprint = 0
+    for bit, count in enumerate(counts):
+        if 2 * count > len(hashes):
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def image_digest(image):
+    """sha256 of an image file, None when there is no such file"""
+    if not image or not isinstance(image, str) or not os.path.isfile(image):
+        return None
+    try:
+        return content_hash(image)
+    except OSError:
+        return None
+
+
+def fingerprint(text, image=None):
+    """(simhash, image sha256 or None) of an item"""
+    return simhash(text), image_digest(image)
+
+
+class DuplicateIndex:
+    """
+    Fingerprints of items seen so far, keyed by their title or id
+
+    Adding a key again replaces its earlier fingerprint. SimHashes live in
+    one typed array, and each block table maps a block's bits to the
+    positions holding them. When max_distance is BLOCKS or more, lookups
+    also probe the one-bit neighbours of every block, which covers distances
+    up to 2 * BLOCKS - 1.
+
+    Attributes:
+        max_distance(int): most SimHash bits a duplicate may differ in
+        image_distance(int): most SimHash bits a duplicate with the same image may differ in
+    """
+
+    # so callers holding an index can fingerprint once, then find and add
+    fingerprint = staticmethod(fingerprint)
+
+    # Constuctor
+    def __init__(self, max_distance=MAX_DISTANCE, image_distance=IMAGE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.image_distance = image_distance
+        self._block_bits = FINGERPRINT_BITS // BLOCKS
+        self._block_mask = (1 << self._block_bits) - 1
+
+        if max_distance >= 2 * BLOCKS:
+            raise ValueError(f"max_distance must be below {2 * BLOCKS}")
+
+        # masks xor-ed onto a query block: itself, then its one-bit neighbours if needed
+        self._probes = [0]
+        if max_distance >= BLOCKS:
+            self._probes += [1 << bit for bit in range(self._block_bits)]
+
+        self._keys = []
+        self._positions = {}
+        self._simhashes = array("Q")
+        self._deleted = set()
+        self._blocks = [{} for _ in range(BLOCKS)]
+        # image sha256 -> positions of the items with it
+        self._images = {}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _block_keys(self, value):
+        bits, mask = self._block_bits, self._block_mask
+        return [(value >> (block * bits)) & mask for block in range(len(self._blocks))]
+
+    def find(self, text, image=None):
+        """Key of an earlier near-duplicate of the text or image, else None"""
+        return self.find_fingerprint(*fingerprint(text, image))
+
+    def add(self, key, text, image=None):
+        self.add_fingerprint(key, *fingerprint(text, image))
+
+    def find_fingerprint(self, value, digest=None):
+        simhashes, deleted, probes = self._simhashes, self._deleted, self._probes
+        if digest is not None:
+            for position in self._images.get(digest, ()):
+                if position not in deleted and (simhashes[position] ^ value).bit_count() <= self.image_distance:
+                    return self._keys[position]
+        # texts without words only match items with the same image and no words either
+        if value == 0:
+            return None
+
+        for table, block in zip(self._blocks, self._block_keys(value)):
+            for probe in probes:
+                for position in table.get(block ^ probe, ()):
+                    if position not in deleted and (simhashes[position] ^ value).bit_count() <= self.max_distance:
+                        return self._keys[position]
+        return None
+
+    def add_fingerprint(self, key, value, digest=None):
+        old = self._positions.get(key)
+        if old is not None:
+            self._deleted.add(old)
+
+        position = len(self._keys)
+        self._keys.append(key)
+        self._positions[key] = position
+        self._simhashes.append(value)
+        if value:
+            for table, block in zip(self._blocks, self._block_keys(value)):
+                positions = table.get(block)
+                if positions is None:
+                    positions = table[block] = array("I")
+                positions.append(position)
+        if digest is not None:
+            positions = self._images.get(digest)
+            if positions is None:
+                positions = self._images[digest] = array("I")
+            positions.append(position)
+
+
+def _fingerprint_chunk(chunk):
+    # [(key, simhash, digest)] for [(key, text, image)], run in pool workers
+    return [(key, *fingerprint(text, image)) for key, text, image in chunk]
+
+
+def find_duplicates(items, workers=0, chunk_size=1000, index=None):
+    """
+    Yields (key, original key) for every item that duplicates an earlier one
+
+    items are (key, text, image path or None) triples. Fingerprints are
+    computed a chunk at a time, in workers processes when set, and checked
+    in input order against index (a new DuplicateIndex by default), which
+    ends up holding every item that was not a duplicate.
+    """
+    index = DuplicateIndex() if index is None else index
+    chunks = chunked(items, chunk_size)
+    results = pooled_map(_fingerprint_chunk, chunks, workers) if workers else map(_fingerprint_chunk, chunks)
+    for chunk in results:
+        for key, value, digest in chunk:
+            original = index.find_fingerprint(value, digest)
+            if original is not None and original != key:
+                yield key, original
+            else:
+                index.add_fingerprint(key, value, digest)
+
+
+def recipe_text(instructions, ingredients=()):
+    # the text fingerprinted for a recipe
+    return "\n".join([instructions, *ingredients])
+
+
+def duplicate_recipes(storage, workers=0, chunk_size=1000):
+    """{title: original title} for recipes in a RecipeStorage that repeat an earlier one"""
+    items = ((title, recipe_text(recipe["instructions"], recipe["ingredients"]), recipe["image"])
+             for title, recipe in storage.recipes.items())
+    return dict(find_duplicates(items, workers, chunk_size))
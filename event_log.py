@@ -0,0 +1,633 @@
+"""
+Append-only event log for activity, meal log saves, posts and likes
+
+EventLog appends events to segment files in one directory and gives each a
+monotonic id that is never reused, whatever is removed later. Appends are
+buffered and made durable in groups: concurrent writers waiting on fsync
+share one, so durable throughput grows with the number of writers. A full
+segment is sealed and gets an index file, read through mmap, of its events
+sorted by user, so "latest N for a user" bisects each segment newest first
+instead of scanning the log.
+
+Events with a key (a meal log's date, say) supersede earlier events of the
+same kind, user and key, and remove() hides an event. Compaction rewrites
+sealed segments without the hidden events, merging small segments as it
+goes, and can run in a background thread.
+
+Segment files, little-endian:
+
+    {first id}.log  header (magic, version, first id, last id once sealed),
+                    then records: crc32, body length, id, time, kind, user
+                    and key lengths, then the user, key and JSON data bytes
+    {first id}.idx  written when the segment is sealed: header (magic,
+                    version, first and last id, log size, entry and special
+                    counts), (user hash, id, offset) uint64 triples sorted by
+                    user hash and id, then the offsets of keyed and removal
+                    records, which are re-read on open
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import namedtuple
+
+
+# event kinds appended by the app, stored as their index
+KINDS = ("activity", "meal_log", "post", "like")
+
+# kind code and name of the records remove() appends
+_REMOVAL = 255
+REMOVED = "removed"
+
+LOG_MAGIC = b"PPEL"
+INDEX_MAGIC = b"PPEI"
+LOG_VERSION = 1
+
+# bytes after which the active segment is sealed and a new one started
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+# bytes of non-durable appends buffered before they are written out
+BUFFER_SIZE = 1 << 20
+
+# magic, version, flags, first id, last id (0 until sealed)
+_LOG_HEADER = struct.Struct("<4sHHQQ")
+
+# crc32, body length, id, time, kind, flags, user length, key length
+_RECORD = struct.Struct("<IIQdBBHH")
+
+# magic, version, flags, first id, last id, log size, entries, specials
+_INDEX_HEADER = struct.Struct("<4sHHQQQQQ")
+
+Event = namedtuple("Event", "id time kind user key data")
+
+
+def _user_hash(user):
+    # stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(user.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _encode(event_id, when, code, user, key, data):
+    user_bytes = user.encode("utf-8")
+    key_bytes = key.encode("utf-8") if key is not None else b""
+    data_bytes = json.dumps(data, separators=(",", ":")).encode("utf-8") if data is not None else b""
+    body = user_bytes + key_bytes + data_bytes
+    head = _RECORD.pack(0, len(body), event_id, when, code, 0, len(user_bytes), len(key_bytes))[4:]
+    return struct.pack("<I", zlib.crc32(body, zlib.crc32(head))) + head + body
+
+
+def _decode(buffer, offset):
+    _, length, event_id, when, code, _, user_length, key_length = _RECORD.unpack_from(buffer, offset)
+    start = offset + _RECORD.size
+    body = bytes(buffer[start:start + length])
+    key = body[user_length:user_length + key_length].decode("utf-8") if key_length else None
+    data = body[user_length + key_length:]
+    return Event(event_id, when, REMOVED if code == _REMOVAL else KINDS[code], body[:user_length].decode("utf-8"),
+                 key, json.loads(data) if data else None)
+
+
+def _scan(buffer, start, end):
+    # [(offset, id, code)] of the intact records in buffer[start:end], and where they stop
+    records = []
+    offset = start
+    while offset + _RECORD.size <= end:
+        crc, length, event_id, _, code, _, _, _ = _RECORD.unpack_from(buffer, offset)
+        stop = offset + _RECORD.size + length
+        if stop > end or zlib.crc32(buffer[offset + 4:stop]) != crc:
+            break
+        records.append((offset, event_id, code))
+        offset = stop
+    return records, offset
+
+
+def _log_name(first_id):
+    return f"{first_id:020d}.log"
+
+
+def _write_file(path, parts):
+    # written next to path, synced and moved in place
+    partial = f"{path}.tmp"
+    with open(partial, "wb") as mf:
+        for part in parts:
+            mf.write(part)
+        mf.flush()
+        os.fsync(mf.fileno())
+    os.replace(partial, path)
+
+
+def _write_index(path, first_id, last_id, log_size, entries, specials):
+    entries = sorted(entries)
+    flat = array("Q", (value for entry in entries for value in entry))
+    header = _INDEX_HEADER.pack(INDEX_MAGIC, LOG_VERSION, 0, first_id, last_id, log_size, len(entries), len(specials))
+    _write_file(path, [header, flat, array("Q", specials)])
+
+
+def _index_log(path):
+    """Writes the index of a log file from its records, dropping a torn tail, and seals it"""
+    with open(path, "r+b") as mf:
+        data = mf.read()
+        magic, version, _, first_id, last_id = _LOG_HEADER.unpack_from(data)
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            raise ValueError(f"{path} is not an event log segment")
+        records, end = _scan(data, _LOG_HEADER.size, len(data))
+        entries, specials = [], []
+        for offset, event_id, code in records:
+            event = _decode(data, offset)
+            entries.append((_user_hash(event.user), event_id, offset))
+            if event.key is not None or code == _REMOVAL:
+                specials.append(offset)
+        if not last_id:
+            last_id = records[-1][1] if records else first_id - 1
+        mf.truncate(end)
+        mf.seek(0)
+        mf.write(_LOG_HEADER.pack(magic, version, 0, first_id, last_id))
+        mf.flush()
+        os.fsync(mf.fileno())
+    _write_index(path[:-4] + ".idx", first_id, last_id, end, entries, specials)
+
+
+class _Segment:
+    # a sealed segment: its log and index files, both mapped read-only
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as mf:
+            self._log = mmap.mmap(mf.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with open(path[:-4] + ".idx", "rb") as mf:
+                self._index = mmap.mmap(mf.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._log.close()
+            raise ValueError(f"{path} has no index")
+
+        if len(self._index) < _INDEX_HEADER.size:
+            self.close()
+            raise ValueError(f"{path} has a truncated index")
+        magic, version, _, self.first_id, self.last_id, log_size, self.count, specials = \
+            _INDEX_HEADER.unpack_from(self._index)
+        if magic != INDEX_MAGIC or version != LOG_VERSION or log_size != len(self._log) or \
+                len(self._index) != _INDEX_HEADER.size + 8 * (3 * self.count + specials):
+            self.close()
+            raise ValueError(f"{path} has a stale index")
+
+        view = memoryview(self._index)
+        self._entries = view[_INDEX_HEADER.size:_INDEX_HEADER.size + 24 * self.count].cast("Q")
+        self.specials = view[_INDEX_HEADER.size + 24 * self.count:].cast("Q")
+        self._views = [view, self._entries, self.specials]
+
+    @property
+    def size(self):
+        return len(self._log)
+
+    def close(self):
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        self._log.close()
+        self._index.close()
+
+    def read(self, offset):
+        return _decode(self._log, offset)
+
+    def raw(self, offset):
+        length = struct.unpack_from("<I", self._log, offset + 4)[0]
+        return self._log[offset:offset + _RECORD.size + length]
+
+    def find(self, hashed):
+        """(id, offset) of the entries with a user hash, newest first"""
+        entries, count = self._entries, self.count
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if entries[3 * mid] < hashed:
+                lo = mid + 1
+            else:
+                hi = mid
+        end = lo
+        while end < count and entries[3 * end] == hashed:
+            end += 1
+        for i in range(end - 1, lo - 1, -1):
+            yield entries[3 * i + 1], entries[3 * i + 2]
+
+    def offsets(self):
+        """Offsets of every record, in id order"""
+        return sorted(self._entries[2::3])
+
+    def ids(self):
+        """Ids of every record"""
+        return set(self._entries[1::3])
+
+
+class EventLog:
+    """
+    Segmented append-only event log in one directory
+
+    Appends are durable on return unless durable=False, in which case they
+    are written out with the next durable append, flush() or close(). All
+    methods are thread safe.
+
+    Attributes:
+        directory(string): folder holding the segment files
+        segment_size(int): bytes after which a segment is sealed
+        buffer_size(int): bytes of non-durable appends buffered before writing
+    """
+
+    # Constuctor
+    def __init__(self, directory, segment_size=SEGMENT_SIZE, buffer_size=BUFFER_SIZE):
+        if sys.byteorder != "little":
+            raise ValueError("Event logs can only be used on little-endian machines")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.buffer_size = buffer_size
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._flushing = False
+        self._compacting = threading.Lock()
+        self._stop = threading.Event()
+        self._compactor = None
+        self._closed = False
+
+        self._sealed = []
+        # removed id -> id of its removal record, (kind, user, key) -> newest id, and ids hidden
+        # by either that are still stored
+        self._removed = {}
+        self._keys = {}
+        self._garbage = set()
+        self._open()
+        self._forget_compacted()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Opening and sealing
+
+    def _path(self, first_id, suffix=".log"):
+        return os.path.join(self.directory, _log_name(first_id)[:-4] + suffix)
+
+    def _open(self):
+        for name in os.listdir(self.directory):
+            if name.endswith((".tmp", ".compact")):
+                os.remove(os.path.join(self.directory, name))
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".log"))
+
+        last_id = 0
+        for i, name in enumerate(names):
+            path = os.path.join(self.directory, name)
+            first_id = int(name[:-4])
+            if first_id <= last_id:
+                # left over from a compaction interrupted before it removed its inputs
+                self._remove_files(path)
+                continue
+            if i == len(names) - 1 and not os.path.exists(path[:-4] + ".idx"):
+                self._recover_active(path, first_id)
+                return
+            try:
+                segment = _Segment(path)
+            except ValueError:
+                _index_log(path)
+                segment = _Segment(path)
+            self._sealed.append(segment)
+            for offset in segment.specials:
+                self._note(segment.read(offset))
+            last_id = segment.last_id
+        self._new_active(last_id + 1)
+
+    def _forget_compacted(self):
+        # re-read removals and keys also name ids an earlier compaction already dropped
+        for segment in self._sealed:
+            hidden = {i for i in self._garbage if segment.first_id <= i <= segment.last_id}
+            if hidden:
+                self._garbage -= hidden - segment.ids()
+
+    def _remove_files(self, path):
+        for name in (path, path[:-4] + ".idx"):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def _new_active(self, first_id):
+        self._active_path = self._path(first_id)
+        self._fd = os.open(self._active_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.write(self._fd, _LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, 0, first_id, 0))
+        self._active_first = first_id
+        self._next_id = first_id
+        self._durable = first_id - 1
+        self._written = _LOG_HEADER.size
+        self._buffer = bytearray()
+        self._entries = []
+        self._by_user = {}
+        self._specials = []
+
+    def _recover_active(self, path, first_id):
+        # the unsealed segment of the last run: keep its intact records and append after them
+        with open(path, "rb") as mf:
+            data = mf.read()
+        magic, version, _, _, _ = _LOG_HEADER.unpack_from(data)
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            raise ValueError(f"{path} is not an event log segment")
+        records, end = _scan(data, _LOG_HEADER.size, len(data))
+
+        self._active_path = path
+        self._fd = os.open(path, os.O_RDWR)
+        os.ftruncate(self._fd, end)
+        os.lseek(self._fd, end, os.SEEK_SET)
+        self._active_first = first_id
+        self._written = end
+        self._buffer = bytearray()
+        self._entries, self._by_user, self._specials = [], {}, []
+        for offset, event_id, code in records:
+            event = _decode(data, offset)
+            self._track(event, offset, code)
+            self._note(event)
+        self._next_id = records[-1][1] + 1 if records else first_id
+        self._durable = self._next_id - 1
+
+    def _track(self, event, offset, code):
+        self._entries.append((_user_hash(event.user), event.id, offset))
+        self._by_user.setdefault(event.user, []).append((event.id, offset))
+        if event.key is not None or code == _REMOVAL:
+            self._specials.append(offset)
+
+    def _note(self, event):
+        # updating removals and the newest id per key with an appended or re-read event
+        if event.kind == REMOVED:
+            target = event.data["id"]
+            self._removed[target] = event.id
+            self._garbage.add(target)
+        elif event.key is not None:
+            key = (event.kind, event.user, event.key)
+            newest = self._keys.get(key)
+            if newest is None or newest < event.id:
+                self._keys[key] = event.id
+                if newest is not None:
+                    self._garbage.add(newest)
+            else:
+                self._garbage.add(event.id)
+
+    def _seal(self):
+        # lock held: makes the active segment durable, indexes it and starts the next
+        self._write()
+        last_id = self._next_id - 1
+        os.pwrite(self._fd, _LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, 0, self._active_first, last_id), 0)
+        os.fsync(self._fd)
+        os.close(self._fd)
+        _write_index(self._path(self._active_first, ".idx"), self._active_first, last_id, self._written,
+                     self._entries, self._specials)
+        self._sealed.append(_Segment(self._active_path))
+        self._new_active(last_id + 1)
+        self._synced.notify_all()
+
+    # Writing
+
+    def append(self, kind, user, data=None, key=None, durable=True):
+        """
+        Appends an event and returns its id
+
+        data is any JSON value. An event with a key hides earlier events of
+        the same kind, user and key.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown event kind {kind}")
+        return self._append(KINDS.index(kind), user, data, key, durable)
+
+    def remove(self, user, event_id, durable=True):
+        """Hides an event from reads, compaction then drops it"""
+        return self._append(_REMOVAL, user, {"id": event_id}, None, durable)
+
+    def _append(self, code, user, data, key, durable):
+        with self._lock:
+            if self._closed:
+                raise ValueError("Event log is closed")
+            event_id = self._next_id
+            self._next_id += 1
+            when = time.time()
+            offset = self._written + len(self._buffer)
+            self._buffer += _encode(event_id, when, code, user, key, data)
+            event = Event(event_id, when, REMOVED if code == _REMOVAL else KINDS[code], user, key, data)
+            self._track(event, offset, code)
+            self._note(event)
+
+            if durable:
+                self._sync(event_id)
+            elif len(self._buffer) >= self.buffer_size:
+                self._write()
+            if self._written + len(self._buffer) >= self.segment_size and not self._flushing:
+                self._seal()
+            return event_id
+
+    def _write(self):
+        # lock held: hands the buffered records to the OS
+        data = memoryview(self._buffer)
+        while data:
+            data = data[os.write(self._fd, data):]
+        self._written += len(self._buffer)
+        self._buffer = bytearray()
+
+    def _sync(self, event_id):
+        # lock held: group commit, one waiting writer fsyncs every record written so far for all
+        while self._durable < event_id:
+            if self._flushing:
+                self._synced.wait()
+                continue
+            self._flushing = True
+            upto = self._next_id - 1
+            self._write()
+            fd = self._fd
+            self._lock.release()
+            try:
+                os.fsync(fd)
+            finally:
+                self._lock.acquire()
+                self._flushing = False
+                self._synced.notify_all()
+            self._durable = max(self._durable, upto)
+
+    def flush(self):
+        """Makes every appended event durable"""
+        with self._lock:
+            self._sync(self._next_id - 1)
+
+    # Reading
+
+    def _live(self, event, kind):
+        if event.kind == REMOVED or event.id in self._removed or (kind is not None and event.kind != kind):
+            return False
+        return event.key is None or self._keys.get((event.kind, event.user, event.key)) == event.id
+
+    def _read_active(self, offset):
+        # lock held: from the buffer, or the segment file for records already written
+        if offset >= self._written:
+            return _decode(self._buffer, offset - self._written)
+        head = os.pread(self._fd, _RECORD.size, offset)
+        return _decode(head + os.pread(self._fd, _RECORD.unpack(head)[1], offset + _RECORD.size), 0)
+
+    def latest(self, user, n=20, kind=None):
+        """The user's n newest events, newest first, optionally only of one kind"""
+        events = []
+        if n <= 0:
+            return events
+        with self._lock:
+            for event_id, offset in reversed(self._by_user.get(user, ())):
+                if event_id in self._removed:
+                    continue
+                event = self._read_active(offset)
+                if self._live(event, kind):
+                    events.append(event)
+                    if len(events) == n:
+                        return events
+
+            hashed = _user_hash(user)
+            for segment in reversed(self._sealed):
+                for event_id, offset in segment.find(hashed):
+                    if event_id in self._removed:
+                        continue
+                    event = segment.read(offset)
+                    if event.user == user and self._live(event, kind):
+                        events.append(event)
+                        if len(events) == n:
+                            return events
+        return events
+
+    def events(self, kind=None):
+        """Yields every event, oldest first, reading a segment at a time"""
+        after = 0
+        while True:
+            with self._lock:
+                segment = next((segment for segment in self._sealed if segment.last_id > after), None)
+                if segment is None:
+                    batch = [self._read_active(offset) for _, event_id, offset in self._entries if event_id > after]
+                    batch = [event for event in batch if self._live(event, kind)]
+                    break
+                batch = [segment.read(offset) for offset in segment.offsets()]
+                batch = [event for event in batch if event.id > after and self._live(event, kind)]
+                after = segment.last_id
+            yield from batch
+        yield from batch
+
+    # Compaction
+
+    def compact(self):
+        """
+        Rewrites sealed segments without removed or superseded events
+
+        Runs of small segments are merged up to segment_size, and segments
+        holding no hidden events are left alone when they cannot be merged.
+        Returns the number of records dropped.
+        """
+        with self._compacting:
+            with self._lock:
+                if self._closed:
+                    return 0
+                segments = list(self._sealed)
+                garbage = set(self._garbage)
+                removed = dict(self._removed)
+                keys = dict(self._keys)
+                durable = self._durable
+
+            groups, group, size = [], [], 0
+            for segment in segments:
+                if group and size + segment.size > self.segment_size:
+                    groups.append(group)
+                    group, size = [], 0
+                group.append(segment)
+                size += segment.size
+            if group:
+                groups.append(group)
+
+            dropped = 0
+            for group in groups:
+                first, last = group[0].first_id, group[-1].last_id
+                if len(group) == 1 and not any(first <= i <= last for i in garbage):
+                    continue
+                dropped += self._rewrite(group, removed, keys, durable)
+            return dropped
+
+    def _rewrite(self, group, removed, keys, durable):
+        # one new segment from a run of sealed ones, swapped in under the lock
+        first, last = group[0].first_id, group[-1].last_id
+        parts = [_LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, 0, first, last)]
+        offset = _LOG_HEADER.size
+        entries, specials, dropped, forgotten = [], [], [], []
+        for segment in group:
+            for record in segment.offsets():
+                event = segment.read(record)
+                if event.kind == REMOVED:
+                    # the removed event is older, so it is dropped from this run or already gone
+                    keep = not first <= event.data["id"] <= last
+                    if not keep:
+                        forgotten.append(event.data["id"])
+                elif event.id in removed:
+                    keep = removed[event.id] > durable
+                elif event.key is not None:
+                    newest = keys.get((event.kind, event.user, event.key), event.id)
+                    keep = newest == event.id or newest > durable
+                else:
+                    keep = True
+                if not keep:
+                    dropped.append(event.id)
+                    continue
+                raw = segment.raw(record)
+                entries.append((_user_hash(event.user), event.id, offset))
+                if event.key is not None or event.kind == REMOVED:
+                    specials.append(offset)
+                parts.append(raw)
+                offset += len(raw)
+
+        path = self._path(first)
+        log_partial, index_partial = f"{path}.compact", path[:-4] + ".idx.compact"
+        _write_file(log_partial, parts)
+        _write_index(index_partial, first, last, offset, entries, specials)
+
+        with self._lock:
+            # the log moves first: a crash before the index follows leaves a stale index, rebuilt on open
+            os.replace(log_partial, path)
+            os.replace(index_partial, path[:-4] + ".idx")
+            for segment in group[1:]:
+                self._remove_files(segment.path)
+            start = self._sealed.index(group[0])
+            self._sealed[start:start + len(group)] = [_Segment(path)]
+            for segment in group:
+                segment.close()
+            self._garbage.difference_update(dropped)
+            for target in forgotten:
+                self._removed.pop(target, None)
+        return len(dropped)
+
+    def start_compaction(self, interval=60.0):
+        """Compacts every interval seconds in a daemon thread until close"""
+        if self._compactor is not None:
+            return
+        self._stop.clear()
+        self._compactor = threading.Thread(target=self._compact_loop, args=(interval,), name="event-log-compaction",
+                                           daemon=True)
+        self._compactor.start()
+
+    def _compact_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.compact()
+
+    def close(self):
+        """Stops background compaction, makes every event durable and closes the files"""
+        if self._compactor is not None:
+            self._stop.set()
+            self._compactor.join()
+            self._compactor = None
+        with self._compacting, self._lock:
+            if self._closed:
+                return
+            self._sync(self._next_id - 1)
+            self._closed = True
+            os.close(self._fd)
+            for segment in self._sealed:
+                segment.close()
+            self._sealed = []
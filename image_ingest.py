@@ -0,0 +1,276 @@
+"""
+Image ingestion for post and recipe uploads
+
+validate_image only looks at the file name. sniff_image reads the magic
+bytes and header dimensions through mmap, so a file is checked without
+loading it. ImagePipeline checks a whole upload (at most 5 images, as
+validate_image_count allows) that way. Then it hashes each image, skips the
+ones already seen, and makes fixed-size PNG thumbnails of the rest in a
+process pool.
+
+Thumbnails need Pillow, which is optional. Without it uploads are still
+checked and hashed, but no thumbnails are made.
+"""
+
+import hashlib
+import io
+import mmap
+import os
+import struct
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Phase5"))
+
+from post import validate_image, validate_image_count
+
+# Pillow is optional, uploads get no thumbnails without it
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+# Validation messages, the first two shared with post.validate_image
+NO_IMAGE_ERROR = "No image chosen"
+NOT_AN_IMAGE_ERROR = "Must be an image"
+IMAGE_TOO_LARGE_ERROR = "Image is too large"
+UNREADABLE_IMAGE_ERROR = "Image could not be read"
+
+# largest accepted upload, in bytes and in decoded pixels
+MAX_BYTES = 20 * 1024 * 1024
+MAX_PIXELS = 40_000_000
+
+# file extensions each sniffed format may be saved under
+EXTENSIONS = {"png": (".png",), "gif": (".gif",), "jpeg": (".jpg", ".jpeg")}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Pillow's names for the sniffed formats
+_PILLOW_FORMATS = ("PNG", "GIF", "JPEG")
+
+ImageInfo = namedtuple("ImageInfo", ["format", "width", "height"])
+
+
+# Sniffing
+
+def sniff_image(path):
+    """ImageInfo from the file's magic bytes and header, raises ValueError for anything else"""
+    try:
+        with open(path, "rb") as mf:
+            size = os.fstat(mf.fileno()).st_size
+            if size == 0:
+                raise ValueError(NOT_AN_IMAGE_ERROR)
+            if size > MAX_BYTES:
+                raise ValueError(IMAGE_TOO_LARGE_ERROR)
+
+            # only the pages holding the header are ever read from disk
+            with mmap.mmap(mf.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                info = _sniff(data)
+    except OSError:
+        raise ValueError(NO_IMAGE_ERROR)
+
+    if info is None or info.width == 0 or info.height == 0:
+        raise ValueError(NOT_AN_IMAGE_ERROR)
+    if info.width * info.height > MAX_PIXELS:
+        raise ValueError(IMAGE_TOO_LARGE_ERROR)
+    return info
+
+
+def _sniff(data):
+    # every header field is bounds checked first, a truncated upload is just not an image
+    if data[:8] == PNG_SIGNATURE and data[12:16] == b"IHDR" and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return ImageInfo("png", width, height)
+
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        width, height = struct.unpack("<HH", data[6:10])
+        return ImageInfo("gif", width, height)
+
+    if data[:3] == b"\xff\xd8\xff":
+        for marker, start, end in _jpeg_segments(data):
+            if marker in _JPEG_FRAMES and min(end, len(data)) - start >= 5:
+                height, width = struct.unpack(">HH", data[start + 1:start + 5])
+                return ImageInfo("jpeg", width, height)
+            if marker == 0xDA:
+                break
+    return None
+
+
+def validate_image_file(path):
+    """Like post.validate_image, but checks the file's content matches its name"""
+    msg = validate_image(path)
+    if msg:
+        return msg
+
+    try:
+        info = sniff_image(path)
+    except ValueError as e:
+        return str(e)
+
+    if not path.lower().endswith(EXTENSIONS[info.format]):
+        return NOT_AN_IMAGE_ERROR
+    return None
+
+
+# JPEG
+
+# start of frame markers for Huffman coded frames (baseline, extended, progressive, lossless)
+_JPEG_FRAMES = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_segments(data):
+    # yields (marker, payload start, payload end) up to and including the first SOS
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        yield marker, i + 4, i + 2 + length
+        if marker == 0xDA:
+            return
+        i += 2 + length
+
+
+# Thumbnails
+
+def make_thumbnail(path, size=256):
+    """size x size PNG thumbnail of the image at path, as bytes. Needs Pillow"""
+    if Image is None:
+        raise RuntimeError("Thumbnails need Pillow installed")
+
+    try:
+        # only the formats sniff_image accepts, never any other Pillow plugin
+        with Image.open(path, formats=_PILLOW_FORMATS) as image:
+            if image.width * image.height <= MAX_PIXELS:
+                # lets JPEG decode at a reduced scale when it is much larger than the thumbnail
+                image.draft("RGB", (size, size))
+                thumbnail = ImageOps.fit(image.convert("RGB"), (size, size))
+                out = io.BytesIO()
+                thumbnail.save(out, "PNG")
+                return out.getvalue()
+    except Exception:
+        # any decoder failure on a crafted or truncated upload is reported, never raised past here
+        raise ValueError(UNREADABLE_IMAGE_ERROR)
+    raise ValueError(IMAGE_TOO_LARGE_ERROR)
+
+
+def _thumbnail_job(path, size, destination):
+    # runs in a worker: writes the thumbnail next to its final name, then moves it in place
+    try:
+        thumbnail = make_thumbnail(path, size)
+    except ValueError as e:
+        return str(e)
+
+    partial = f"{destination}.{os.getpid()}.tmp"
+    with open(partial, "wb") as mf:
+        mf.write(thumbnail)
+    os.replace(partial, destination)
+    return None
+
+
+def content_hash(path):
+    """sha256 hex digest of the file, read through mmap"""
+    with open(path, "rb") as mf:
+        if os.fstat(mf.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(mf.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha256(data).hexdigest()
+
+
+class ImagePipeline:
+    """
+    Validates uploads and writes their thumbnails, skipping images seen before
+
+    Thumbnails are stored as {directory}/{sha256 of the original}.png, so an
+    image uploaded again (under any name) maps to the thumbnail already made.
+    Without Pillow no thumbnails are made, every image's thumbnail is None
+    and only repeats within one upload count as duplicates.
+
+    Attributes:
+        directory(string): where thumbnails are written
+        size(int): width and height of every thumbnail
+        workers(int): processes making thumbnails, 0 makes them in-process
+    """
+
+    # Constuctor
+    def __init__(self, directory="thumbnails", size=256, workers=None):
+        self.directory = directory
+        self.size = size
+        self.workers = os.cpu_count() if workers is None else workers
+        self._pool = None
+        os.makedirs(directory, exist_ok=True)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.directory, f"{digest}.png")
+
+    def ingest(self, paths):
+        """
+        Checks and thumbnails one upload of image files
+
+        Returns {"status", "images"}: status is "Uploaded!" or the first
+        problem found, and images has one dict per path with its format,
+        size, hash, thumbnail path and whether it was a duplicate. Nothing
+        is written unless every image passes the checks.
+        """
+        paths = list(paths)
+        msg = validate_image_count(len(paths))
+        if msg:
+            return {"status": msg, "images": []}
+
+        # cheap header checks for the whole upload before any decoding
+        images = []
+        for path in paths:
+            msg = validate_image_file(path)
+            if msg:
+                return {"status": msg, "images": []}
+            info = sniff_image(path)
+            images.append({"image": path, "format": info.format, "width": info.width, "height": info.height})
+
+        jobs = {}
+        for image in images:
+            digest = content_hash(image["image"])
+            destination = self.thumbnail_path(digest) if Image is not None else None
+            image["hash"] = digest
+            image["thumbnail"] = destination
+            image["duplicate"] = digest in jobs or destination is not None and os.path.exists(destination)
+            if not image["duplicate"]:
+                jobs[digest] = (image["image"], self.size, destination)
+
+        # skipping thumbnails altogether when Pillow is not installed
+        if Image is None:
+            return {"status": "Uploaded!", "images": images}
+
+        statuses = self._run(list(jobs.values()))
+        for msg in statuses:
+            if msg:
+                return {"status": msg, "images": images}
+        return {"status": "Uploaded!", "images": images}
+
+    def _run(self, jobs):
+        # a single new image is not worth a round trip to another process
+        if not self.workers or len(jobs) <= 1:
+            return [_thumbnail_job(*job) for job in jobs]
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return list(self._pool.map(_thumbnail_job, *zip(*jobs)))
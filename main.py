@@ -1,3 +1,11 @@
+import hmac
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from itertools import islice
+
+from recipe_snapshot import SnapshotRecipes, write_snapshot
+
 # python classes
 
 class User:
@@ -18,8 +26,10 @@ class User:
         if len(password) > 8:
             return "Incorrect Username or Password"
 
-        # validating username and password
-        if username == self.username and password == self.password:
+        # validating username and password, comparing in constant time
+        username_ok = hmac.compare_digest(username.encode(), self.username.encode())
+        password_ok = hmac.compare_digest(password.encode(), self.password.encode())
+        if username_ok and password_ok:
             
             # setting status to logged in
             self.logged_in = True
@@ -55,9 +65,27 @@ class User:
 
 
 class CalorieTracker:
+
+    # macro fields tracked per day, as in LoggedMeal
+    FIELDS = ("calories", "protein", "carbs", "fat")
+
+    # days meals can be logged on, the prefix sums hold one entry per day in between
+    EARLIEST_DAY = date(1900, 1, 1).toordinal()
+    LATEST_DAY = date(2100, 12, 31).toordinal()
+
     def __init__(self):
         self.total_calories = 0
 
+        # prefix sums per field: _prefix[field][i] is the total of the days
+        # before _first_day + i, so any day range is two lookups
+        self._first_day = None
+        self._prefix = {field: array("d", [0.0]) for field in self.FIELDS}
+        self._meals_prefix = array("I", [0])
+        self._active_prefix = array("I", [0])
+
+        # meal names logged per day, for top meal stats
+        self._meal_names = {}
+
     def add_calories(self, calorie_amount):
         # check for if input value is anything other than an integer
         if not isinstance(calorie_amount, int):
@@ -68,12 +96,234 @@ class CalorieTracker:
             
             return "Only numeric characters are allowed"
 
-        # updating calorie count
-        self.total_calories += calorie_amount
+        # recording the amount as a meal for today
+        self._record(_day_of(None), (calorie_amount, 0, 0, 0), None)
 
         # returning updated calorie count
         return f"Total Daily Calories: {self.total_calories}"
 
+    def log_meal(self, calories, protein=0, carbs=0, fat=0, name=None, when=None):
+        # check if every amount is a non-negative number
+        for amount in (calories, protein, carbs, fat):
+            if not _is_amount(amount):
+                return "Only numeric characters are allowed"
+
+        # check if the day is a date, datetime or "YYYY-MM-DD" string in the loggable range
+        if when is not None and not isinstance(when, (date, str)):
+            return "Invalid date"
+        try:
+            day = _day_of(when)
+        except (TypeError, ValueError):
+            return "Invalid date"
+        if not self.EARLIEST_DAY <= day <= self.LATEST_DAY:
+            return "Invalid date"
+
+        self._record(day, (calories, protein, carbs, fat), name)
+        return "Meal logged"
+
+    def _record(self, day, amounts, name):
+        # updating calorie count
+        self.total_calories += amounts[0]
+
+        # first entry sets day zero, back-dated entries shift everything
+        if self._first_day is None:
+            self._first_day = day
+        if day < self._first_day:
+            self._shift(self._first_day - day)
+        index = day - self._first_day
+
+        # extending every series with empty days up to this one
+        gap = index + 2 - len(self._meals_prefix)
+        if gap > 0:
+            for series in (*self._prefix.values(), self._meals_prefix, self._active_prefix):
+                series.extend([series[-1]] * gap)
+
+        # adding to every prefix from this day on, O(1) when logging the latest day
+        first_meal = self._meals_prefix[index + 1] == self._meals_prefix[index]
+        for field, amount in zip(self.FIELDS, amounts):
+            series = self._prefix[field]
+            for position in range(index + 1, len(series)):
+                series[position] += amount
+        for position in range(index + 1, len(self._meals_prefix)):
+            self._meals_prefix[position] += 1
+            if first_meal:
+                self._active_prefix[position] += 1
+
+        if name is not None:
+            self._meal_names.setdefault(day, []).append(name)
+
+    def _shift(self, days):
+        # prepending empty days before the current first day
+        for series in (*self._prefix.values(), self._meals_prefix, self._active_prefix):
+            series[0:0] = array(series.typecode, [0] * days)
+        self._first_day -= days
+
+    def _at(self, series, day):
+        # prefix value for the start of the given day, clamped to the logged span
+        index = min(max(day - self._first_day, 0), len(series) - 1)
+        return series[index]
+
+    def range_totals(self, start, end):
+        """Totals per field, plus meals and active (logged) days, for start..end inclusive"""
+        start, end = _day_of(start), _day_of(end)
+        totals = {field: 0.0 for field in self.FIELDS}
+        totals["meals"] = 0
+        totals["active_days"] = 0
+        if self._first_day is None or end < start:
+            return totals
+
+        for field in self.FIELDS:
+            totals[field] = self._at(self._prefix[field], end + 1) - self._at(self._prefix[field], start)
+        totals["meals"] = self._at(self._meals_prefix, end + 1) - self._at(self._meals_prefix, start)
+        totals["active_days"] = self._at(self._active_prefix, end + 1) - self._at(self._active_prefix, start)
+        return totals
+
+    def daily_totals(self, day):
+        return self.range_totals(day, day)
+
+    def weekly_totals(self, week_start):
+        week_start = _day_of(week_start)
+        return self.range_totals(week_start, week_start + 6)
+
+    def rolling_totals(self, days, end=None):
+        # last `days` days up to end, which defaults to the latest logged day
+        end = self.last_day() if end is None else _day_of(end)
+        return self.range_totals(end - days + 1, end)
+
+    def range_average(self, start, end, field="calories"):
+        # average per logged day, as shown in the weekly summary
+        totals = self.range_totals(start, end)
+        if totals["active_days"] == 0:
+            return 0.0
+        return totals[field] / totals["active_days"]
+
+    def top_meals(self, start, end, count=2):
+        # most logged meal names in start..end, costs one lookup per day in the range
+        start, end = _day_of(start), _day_of(end)
+        counts = {}
+        for day in range(start, end + 1):
+            for name in self._meal_names.get(day, ()):
+                counts[name] = counts.get(name, 0) + 1
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:count]
+
+    def last_day(self):
+        if self._first_day is None:
+            return _day_of(None)
+        return self._first_day + len(self._meals_prefix) - 2
+
+
+class SortedIndex:
+    # sorted (key, title) pairs kept in bounded buckets so inserts and
+    # removals stay cheap and range queries only touch the matching slice
+    BUCKET_SIZE = 1000
+
+    def __init__(self):
+        self._buckets = []
+        self._maxes = []
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def add(self, key, title):
+        item = (key, title)
+        self._length += 1
+
+        # first item starts the first bucket
+        if not self._buckets:
+            self._buckets.append([item])
+            self._maxes.append(item)
+            return
+
+        # items past the last max go into the last bucket
+        i = bisect_left(self._maxes, item)
+        if i == len(self._maxes):
+            i -= 1
+
+        bucket = self._buckets[i]
+        insort(bucket, item)
+        self._maxes[i] = bucket[-1]
+
+        # splitting buckets that grew too large
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            tail = bucket[self.BUCKET_SIZE:]
+            del bucket[self.BUCKET_SIZE:]
+            self._buckets.insert(i + 1, tail)
+            self._maxes[i] = bucket[-1]
+            self._maxes.insert(i + 1, tail[-1])
+
+    def update(self, items):
+        # bulk loading into an empty index sorts once and cuts the buckets directly
+        if self._length:
+            for key, title in items:
+                self.add(key, title)
+            return
+
+        # sorting by title, then stably by key, compares faster than (key, title) tuples
+        items = sorted(items, key=_second)
+        items.sort(key=_first)
+        self._buckets = [items[i:i + self.BUCKET_SIZE] for i in range(0, len(items), self.BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._length = len(items)
+
+    def remove(self, key, title):
+        item = (key, title)
+        i = bisect_left(self._maxes, item)
+        if i == len(self._maxes):
+            return False
+
+        bucket = self._buckets[i]
+        j = bisect_left(bucket, item)
+        if j == len(bucket) or bucket[j] != item:
+            return False
+
+        del bucket[j]
+        self._length -= 1
+
+        # dropping buckets that became empty
+        if bucket:
+            self._maxes[i] = bucket[-1]
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+        return True
+
+    def _position(self, key, right):
+        # (bucket, offset) of the first item with a key >= key (or > key)
+        find = bisect_right if right else bisect_left
+        i = find(self._maxes, key, key=_first)
+        if i == len(self._buckets):
+            return i, 0
+        return i, find(self._buckets[i], key, key=_first)
+
+    def _bounds(self, low, high):
+        start = (0, 0) if low is None else self._position(low, right=False)
+        stop = (len(self._buckets), 0) if high is None else self._position(high, right=True)
+        return start, stop
+
+    def count(self, low=None, high=None):
+        # number of items with low <= key <= high
+        (i, j), (k, m) = self._bounds(low, high)
+        if (i, j) >= (k, m):
+            return 0
+        if i == k:
+            return m - j
+
+        total = len(self._buckets[i]) - j
+        for b in range(i + 1, k):
+            total += len(self._buckets[b])
+        return total + m
+
+    def irange(self, low=None, high=None):
+        # yielding titles with low <= key <= high in key order
+        (i, j), (k, m) = self._bounds(low, high)
+        for b in range(i, min(k + 1, len(self._buckets))):
+            bucket = self._buckets[b]
+            begin = j if b == i else 0
+            end = m if b == k else len(bucket)
+            for index in range(begin, end):
+                yield bucket[index][1]
+
 
 class RecipeStorage:
 
@@ -81,11 +331,52 @@ class RecipeStorage:
     VALID_IMAGE_FORMATS = ('.jpg', '.jpeg', '.png')
     VALID_CATEGORIES = ["Main Course", "Dessert", "Appetizer"]
 
-    def __init__(self):
+    # numeric recipe fields that support range queries
+    RANGE_FIELDS = ("calories", "protein")
+
+    def __init__(self, duplicates=None):
         # initiallising an empty dictionary to store recipies
         self.recipes = {}
 
-    def add_recipe(self, title, instructions, image, category):
+        # optional duplicates.DuplicateIndex rejecting recipes reposted under a new title
+        self.duplicates = duplicates
+
+        # incremented on every saved recipe
+        self.version = 0
+
+        # callbacks notified with (title, recipe) after every saved recipe
+        self._listeners = []
+
+        # secondary indexes kept in sync by add_recipe
+        self._category_index = {}
+        self._tag_index = {}
+
+        # range indexes per numeric field, both catalog-wide (None) and per category
+        self._range_indexes = {field: {None: SortedIndex()} for field in self.RANGE_FIELDS}
+
+        # (title, recipe) pairs of an opened snapshot, indexed on first use
+        self._pending = None
+
+    @classmethod
+    def open_snapshot(cls, path):
+        """
+        Storage backed by a snapshot written with save_snapshot
+
+        Opening maps the file without reading the recipes, which are decoded
+        as they are looked up. The indexes are built by the first query or
+        saved recipe, from the category, tag and number columns only.
+        """
+        storage = cls()
+        storage.recipes = SnapshotRecipes(path)
+        storage._pending = storage.recipes.index_entries()
+        return storage
+
+    def save_snapshot(self, path):
+        """Writes every recipe to a binary snapshot that open_snapshot can map"""
+        write_snapshot(self.recipes, path)
+
+    def add_recipe(self, title, instructions, image, category, calories=None, protein=None,
+                   dietary_tags=None, carbs=None, fat=None, ingredients=None):
 
         # check if input is non-empty string
         if not isinstance(title, str) or title.strip() == "":
@@ -100,13 +391,210 @@ class RecipeStorage:
         
         if category not in self.VALID_CATEGORIES:
             return "Please select a category"
-        
+
+        # check if optional nutrition values are non-negative numbers
+        if calories is not None and not _is_amount(calories):
+            return "Invalid calorie amount"
+
+        if protein is not None and not _is_amount(protein):
+            return "Invalid protein amount"
+
+        if carbs is not None and not _is_amount(carbs):
+            return "Invalid carbs amount"
+
+        if fat is not None and not _is_amount(fat):
+            return "Invalid fat amount"
+
+        # check if dietary tags are a list of strings
+        if dietary_tags is None:
+            dietary_tags = []
+        if not isinstance(dietary_tags, (list, tuple)) or not all(isinstance(t, str) for t in dietary_tags):
+            return "Invalid dietary tags"
+
+        # check if ingredients are a list of strings
+        if ingredients is None:
+            ingredients = []
+        if not isinstance(ingredients, (list, tuple)) or not all(isinstance(i, str) for i in ingredients):
+            return "Invalid ingredients"
+
+        # checking for the same recipe under another title, text as in duplicates.recipe_text
+        if self.duplicates is not None:
+            text = "\n".join([instructions, *ingredients])
+            value, digest = self.duplicates.fingerprint(text, image)
+            original = self.duplicates.find_fingerprint(value, digest)
+            if original is not None and original != title:
+                return "Recipe already exists"
+            self.duplicates.add_fingerprint(title, value, digest)
+
+        # removing stale index entries when a title is saved again
+        if self._pending is not None:
+            self._catch_up()
+        if title in self.recipes:
+            self._unindex(title, self.recipes[title])
+
         # adding recipie to dictionary
-        self.recipes[title] = {
+        recipe = {
             "instructions": instructions,
             "image": image,
-            "category": category
+            "category": category,
+            "calories": calories,
+            "protein": protein,
+            "carbs": carbs,
+            "fat": fat,
+            "dietary_tags": list(dietary_tags),
+            "ingredients": list(ingredients)
         }
+        self.recipes[title] = recipe
+        self._index(title, recipe)
+
+        # bumping the version and notifying derived indexes
+        self.version += 1
+        for listener in self._listeners:
+            listener(title, recipe)
 
         # returning sucess message
         return "Recipe saved successfully"
+
+    def subscribe(self, listener):
+        # registering a callback called with (title, recipe) after each saved recipe
+        self._listeners.append(listener)
+
+    def _index(self, title, recipe):
+        self._category_index.setdefault(recipe["category"], set()).add(title)
+        for tag in recipe["dietary_tags"]:
+            self._tag_index.setdefault(tag, set()).add(title)
+
+        for field in self.RANGE_FIELDS:
+            if recipe[field] is not None:
+                indexes = self._range_indexes[field]
+                indexes[None].add(recipe[field], title)
+                indexes.setdefault(recipe["category"], SortedIndex()).add(recipe[field], title)
+
+    def _catch_up(self):
+        # indexing a snapshot's recipes in bulk, with one sort per range index
+        pending, self._pending = self._pending, None
+        ranges = {field: {} for field in self.RANGE_FIELDS}
+        for title, recipe in pending:
+            self._category_index.setdefault(recipe["category"], set()).add(title)
+            for tag in recipe["dietary_tags"]:
+                self._tag_index.setdefault(tag, set()).add(title)
+            for field in self.RANGE_FIELDS:
+                if recipe[field] is not None:
+                    ranges[field].setdefault(recipe["category"], []).append((recipe[field], title))
+
+        for field, categories in ranges.items():
+            indexes = self._range_indexes[field]
+            indexes[None].update([item for items in categories.values() for item in items])
+            for category, items in categories.items():
+                indexes.setdefault(category, SortedIndex()).update(items)
+
+    def _unindex(self, title, recipe):
+        self._category_index[recipe["category"]].discard(title)
+        for tag in recipe["dietary_tags"]:
+            self._tag_index[tag].discard(title)
+
+        for field in self.RANGE_FIELDS:
+            if recipe[field] is not None:
+                indexes = self._range_indexes[field]
+                indexes[None].remove(recipe[field], title)
+                indexes[recipe["category"]].remove(recipe[field], title)
+
+    def find_recipes(self, category=None, tags=(), min_calories=None, max_calories=None,
+                     min_protein=None, max_protein=None, limit=None):
+        """Returns titles matching every given filter, using the indexes instead of a full scan.
+
+        Range filters are inclusive. When a range filter is given, results come back in
+        ascending order of the narrowest range's field.
+        """
+
+        if self._pending is not None:
+            self._catch_up()
+
+        # collecting the range filters that were actually given
+        bounds = {"calories": (min_calories, max_calories), "protein": (min_protein, max_protein)}
+        ranges = [(field, low, high) for field, (low, high) in bounds.items()
+                  if low is not None or high is not None]
+
+        # collecting the inverted index sets for exact filters, smallest first
+        sets = [self._tag_index.get(tag, set()) for tag in tags]
+        if category is not None and not ranges:
+            sets.append(self._category_index.get(category, set()))
+        sets.sort(key=len)
+
+        # no filters means every recipe matches
+        if not sets and not ranges:
+            return list(islice(self.recipes, limit))
+
+        # only exact filters: walking the smallest set
+        if not ranges:
+            smallest, rest = sets[0], sets[1:]
+            return list(islice(self._filter(smallest, rest, ()), limit))
+
+        # picking the range that matches the fewest recipes, scoped to the category if given
+        empty = SortedIndex()
+        scoped = [(field, self._range_indexes[field].get(category, empty), low, high)
+                  for field, low, high in ranges]
+        counts = [index.count(low, high) for _, index, low, high in scoped]
+        narrowest = counts.index(min(counts))
+        field, index, low, high = scoped[narrowest]
+        others = ranges[:narrowest] + ranges[narrowest + 1:]
+
+        # walking the smallest set when it is smaller than the narrowest range
+        if sets and len(sets[0]) < counts[narrowest]:
+            if category is not None:
+                sets.append(self._category_index.get(category, set()))
+            smallest, rest = sets[0], sets[1:]
+            matches = list(self._filter(smallest, rest, ranges))
+            matches.sort(key=lambda t: (self.recipes[t][field], t))
+            return matches[:limit]
+
+        # otherwise walking the narrowest range in value order
+        return list(islice(self._filter(index.irange(low, high), sets, others), limit))
+
+    def _filter(self, titles, sets, ranges):
+        # yielding titles contained in every set and inside every range
+        recipes = self.recipes
+        for title in titles:
+            for s in sets:
+                if title not in s:
+                    break
+            else:
+                if not ranges or self._in_ranges(recipes[title], ranges):
+                    yield title
+
+    def _in_ranges(self, recipe, ranges):
+        for field, low, high in ranges:
+            value = recipe[field]
+            if value is None:
+                return False
+            if low is not None and value < low:
+                return False
+            if high is not None and value > high:
+                return False
+        return True
+
+
+def _first(item):
+    return item[0]
+
+
+def _second(item):
+    return item[1]
+
+
+def _day_of(when):
+    # day number (proleptic ordinal) for a date, datetime, ordinal or "YYYY-MM-DD" string,
+    # ordinals are only for range queries, log_meal takes dates
+    if when is None:
+        return date.today().toordinal()
+    if isinstance(when, int) and not isinstance(when, bool):
+        return when
+    if isinstance(when, str):
+        return date.fromisoformat(when[:10]).toordinal()
+    if isinstance(when, date):
+        return when.toordinal()
+    raise TypeError(f"Expected a date, got type {type(when)}")
+
+
+def _is_amount(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
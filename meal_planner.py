@@ -0,0 +1,199 @@
+"""
+Meal plan optimizer over a RecipeStorage catalog
+
+Fills a day (or a week of days) with recipes from the catalog so the total
+hits a profile's calorie target and macro split, skipping recipes that
+contain any of the profile's allergies.
+"""
+
+from bisect import bisect_left
+
+from allergen_index import AllergenIndex
+
+
+# default day layout: (slot name, recipe category)
+DEFAULT_SLOTS = (
+    ("starter", "Appetizer"),
+    ("lunch", "Main Course"),
+    ("dinner", "Main Course"),
+    ("dessert", "Dessert")
+)
+
+# default share of calories coming from each macro
+DEFAULT_MACRO_SPLIT = {"protein": 0.3, "carbs": 0.4, "fat": 0.3}
+
+MACROS = ("protein", "carbs", "fat")
+CALORIES_PER_GRAM = {"protein": 4, "carbs": 4, "fat": 9}
+
+
+class MealPlanner:
+    """
+    Beam search over per-category, calorie-sorted recipe arrays
+
+    Each slot only looks at the few recipes whose calories are nearest to
+    that slot's share of the remaining target, found by bisecting the sorted
+    array, and only the best partial plans are carried to the next slot.
+
+    Attributes:
+        storage(RecipeStorage): recipe catalog, re-read whenever its version changes
+        slots(tuple): (slot name, category) pairs making up a day
+        macro_split(dict): target share of calories per macro
+        tolerance(float): allowed relative distance from the calorie target
+        allergens(AllergenIndex): allergens of the catalog's recipes, built from storage if not given
+    """
+
+    # Constuctor
+    def __init__(self, storage, slots=DEFAULT_SLOTS, macro_split=None, tolerance=0.05,
+                 beam_width=24, candidates=8, allergens=None):
+        self.storage = storage
+        self.allergens = AllergenIndex(storage) if allergens is None else allergens
+        self.slots = tuple(slots)
+        self.macro_split = dict(DEFAULT_MACRO_SPLIT if macro_split is None else macro_split)
+        self.tolerance = tolerance
+        self.beam_width = beam_width
+        self.candidates = candidates
+        self._version = None
+
+    def _refresh(self):
+        # rebuilding the sorted arrays only when the catalog changed
+        if self._version == self.storage.version:
+            return
+
+        rows = {}
+        for title, recipe in self.storage.recipes.items():
+            if recipe["calories"] is None:
+                continue
+            macros = tuple(recipe.get(m) or 0 for m in MACROS)
+            rows.setdefault(recipe["category"], []).append((recipe["calories"], title, macros))
+
+        # per category: calories, titles and macros as parallel lists sorted by calories
+        self._arrays = {}
+        for category, entries in rows.items():
+            entries.sort()
+            self._arrays[category] = (
+                [e[0] for e in entries],
+                [e[1] for e in entries],
+                [e[2] for e in entries]
+            )
+
+        self._safe = {}
+        self._version = self.storage.version
+
+    def _is_safe(self, title, allergies):
+        # memoised per allergy list, since the same recipes come up for many days
+        safe = self._safe.setdefault(allergies, {})
+        if title not in safe:
+            # ingredients and title both through the allergen vocabulary ("peanuts" matches "peanut butter",
+            # "milk" matches "cheese" but not "coconut milk"), word by word, so "pea" does not match "Peanut Noodles"
+            safe[title] = (self.allergens.is_safe(title, allergies)
+                           and not self.allergens.vocabulary.mask_of_text(title)
+                           & self.allergens.profile_mask(allergies))
+        return safe[title]
+
+    def _nearest(self, category, target, allergies, used):
+        # recipes in a category closest to target calories, walking out from the bisect point
+        if category not in self._arrays:
+            return []
+        calories, titles, macros = self._arrays[category]
+
+        found = []
+        right = bisect_left(calories, target)
+        left = right - 1
+        scanned = 0
+        limit = 50 * self.candidates
+        while len(found) < self.candidates and scanned < limit and (left >= 0 or right < len(calories)):
+            if right >= len(calories) or (left >= 0 and target - calories[left] <= calories[right] - target):
+                index, left = left, left - 1
+            else:
+                index, right = right, right + 1
+            scanned += 1
+
+            title = titles[index]
+            if title not in used and self._is_safe(title, allergies):
+                found.append((title, calories[index], macros[index]))
+        return found
+
+    def _slot_shares(self):
+        # each slot's share of the day, from its category's median calories
+        medians = []
+        for _, category in self.slots:
+            calories = self._arrays.get(category, ([0],))[0]
+            medians.append(calories[len(calories) // 2] if calories else 0)
+        total = sum(medians) or 1
+        return [m / total for m in medians]
+
+    def _score(self, calories, macros, target):
+        # relative calorie error plus distance from the macro split
+        score = abs(calories - target) / target
+        energy = [grams * CALORIES_PER_GRAM[m] for m, grams in zip(MACROS, macros)]
+        total = sum(energy)
+        if total > 0:
+            score += 0.5 * sum(abs(e / total - self.macro_split.get(m, 0))
+                               for m, e in zip(MACROS, energy))
+        return score
+
+    def _plan_day(self, target, allergies, used, count):
+        shares = self._slot_shares()
+
+        # (score, calories, macros, titles) partial plans
+        beam = [(0.0, 0, (0, 0, 0), ())]
+        for i, (_, category) in enumerate(self.slots):
+            rest_share = sum(shares[i:]) or 1
+            done_share = sum(shares[:i + 1])
+            next_beam = {}
+            for _, calories, macros, titles in beam:
+                slot_target = (target - calories) * shares[i] / rest_share
+                for title, c, m in self._nearest(category, slot_target, allergies, used.union(titles)):
+                    new_calories = calories + c
+                    new_macros = tuple(a + b for a, b in zip(macros, m))
+                    score = self._score(new_calories, new_macros, target * done_share or 1)
+                    key = frozenset(titles + (title,))
+                    if key not in next_beam or score < next_beam[key][0]:
+                        next_beam[key] = (score, new_calories, new_macros, titles + (title,))
+            beam = sorted(next_beam.values())[:self.beam_width]
+
+        # only complete plans within the calorie tolerance count
+        plans = []
+        for score, calories, macros, titles in beam:
+            if abs(calories - target) <= self.tolerance * target:
+                plan = {"meals": dict(zip((s for s, _ in self.slots), titles)), "calories": calories}
+                plan.update(zip(MACROS, macros))
+                plan["score"] = score
+                plans.append(plan)
+            if len(plans) == count:
+                break
+        return plans
+
+    def plan_day(self, profile, count=3):
+        """Returns up to count day plans for the profile, best first"""
+        self._refresh()
+        target = profile.data["calories"]
+        allergies = tuple(sorted(a.lower() for a in profile.data["allergies"]))
+        return self._plan_day(target, allergies, frozenset(), count)
+
+    def plan_week(self, profile, count=1, days=7):
+        """
+        Returns up to count week plans, each a list of day plans
+
+        Recipes are not repeated within a week unless the catalog runs out,
+        and each alternative week avoids the recipes earlier weeks used on the
+        same day.
+        """
+        self._refresh()
+        target = profile.data["calories"]
+        allergies = tuple(sorted(a.lower() for a in profile.data["allergies"]))
+
+        weeks = []
+        for _ in range(count):
+            week = []
+            used = set()
+            for day in range(days):
+                avoid = used.union(*(w[day]["meals"].values() for w in weeks))
+                plans = self._plan_day(target, allergies, avoid, 1) or \
+                    self._plan_day(target, allergies, frozenset(), 1)
+                if not plans:
+                    return weeks
+                week.append(plans[0])
+                used.update(plans[0]["meals"].values())
+            weeks.append(week)
+        return weeks
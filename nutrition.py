@@ -0,0 +1,301 @@
+"""
+Nutrition engine for recipe ingredient lines
+
+parse_ingredient turns a line such as "1/4 cup oats" or "2 scoops protein
+powder" into a quantity, a unit, a food from the local FOODS table and the
+weight in grams. recipe_nutrition adds those up into per-serving calories
+and macros, and compute_catalog / fill_catalog do it for a whole
+RecipeStorage, optionally in a process pool.
+
+Ingredient lines repeat heavily across recipes, so parsing is memoized in a
+bounded LRU cache (one per process).
+"""
+
+import os
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Phase5"))
+
+from chunking import chunked, pooled_map
+
+
+# most distinct ingredient lines kept parsed per process
+PARSE_CACHE_SIZE = 8192
+
+MACROS = ("calories", "protein", "carbs", "fat")
+
+# calories, protein, carbs and fat per 100 g, grams per ml, and grams per portion unit.
+# "each" is one whole item, "serving" is assumed when a line gives no quantity.
+Food = namedtuple("Food", ["calories", "protein", "carbs", "fat", "density", "portions"])
+
+FOODS = {
+    "oats": Food(379, 13.2, 67.7, 6.5, 0.34, {"serving": 40}),
+    "greek yogurt": Food(59, 10.2, 3.6, 0.4, 1.03, {"serving": 170}),
+    "yogurt": Food(61, 3.5, 4.7, 3.3, 1.03, {"serving": 170}),
+    "granola": Food(471, 10.0, 64.0, 20.0, 0.51, {"serving": 50}),
+    "berries": Food(57, 0.7, 14.5, 0.3, 0.63, {"serving": 75}),
+    "honey": Food(304, 0.3, 82.4, 0.0, 1.42, {"serving": 21}),
+    "almonds": Food(579, 21.2, 21.6, 49.9, 0.6, {"serving": 28}),
+    "protein powder": Food(400, 80.0, 8.0, 6.0, 0.4, {"scoop": 30, "serving": 30}),
+    "eggs": Food(143, 12.6, 0.7, 9.5, 1.03, {"each": 50, "serving": 50}),
+    "banana": Food(89, 1.1, 22.8, 0.3, 0.6, {"each": 118, "serving": 118}),
+    "baking powder": Food(53, 0.0, 27.7, 0.0, 0.9, {"serving": 4}),
+    "chicken breast": Food(165, 31.0, 0.0, 3.6, 1.0, {"each": 174, "serving": 120}),
+    "chicken": Food(190, 28.9, 0.0, 7.4, 1.0, {"serving": 120}),
+    "lettuce": Food(17, 1.2, 3.3, 0.3, 0.2, {"each": 600, "serving": 50}),
+    "mixed greens": Food(17, 1.5, 3.0, 0.2, 0.2, {"serving": 50}),
+    "caesar dressing": Food(542, 2.2, 3.3, 57.9, 0.98, {"serving": 30}),
+    "parmesan": Food(420, 29.6, 13.9, 27.8, 0.42, {"serving": 10}),
+    "cheddar": Food(403, 24.9, 1.3, 33.1, 0.45, {"slice": 28, "serving": 28}),
+    "croutons": Food(407, 11.9, 73.5, 6.6, 0.13, {"serving": 10}),
+    "quinoa": Food(120, 4.4, 21.3, 1.9, 0.78, {"serving": 140}),
+    "rice": Food(130, 2.7, 28.2, 0.3, 0.79, {"serving": 150}),
+    "pasta": Food(371, 13.0, 74.7, 1.5, 0.4, {"serving": 85}),
+    "chickpeas": Food(164, 8.9, 27.4, 2.6, 0.69, {"can": 240, "serving": 80}),
+    "lentils": Food(116, 9.0, 20.1, 0.4, 0.84, {"serving": 100}),
+    "tofu": Food(76, 8.0, 1.9, 4.8, 1.0, {"block": 400, "serving": 120}),
+    "sweet potato": Food(86, 1.6, 20.1, 0.1, 0.6, {"each": 130, "serving": 130}),
+    "potato": Food(77, 2.0, 17.5, 0.1, 0.6, {"each": 170, "serving": 170}),
+    "avocado": Food(160, 2.0, 8.5, 14.7, 0.6, {"each": 150, "serving": 75}),
+    "bread": Food(252, 12.4, 42.7, 3.5, 0.25, {"slice": 32, "serving": 32}),
+    "tortilla": Food(297, 9.8, 46.0, 7.9, 0.5, {"each": 45, "serving": 45}),
+    "turkey": Food(104, 17.1, 4.2, 1.7, 1.0, {"slice": 28, "serving": 56}),
+    "beef": Food(254, 17.2, 0.0, 20.0, 1.0, {"serving": 113}),
+    "salmon": Food(208, 20.4, 0.0, 13.4, 1.0, {"each": 170, "fillet": 170, "serving": 170}),
+    "tuna": Food(116, 25.5, 0.0, 0.8, 1.0, {"can": 142, "serving": 100}),
+    "shrimp": Food(99, 24.0, 0.2, 0.3, 1.0, {"each": 6, "serving": 85}),
+    "tomato": Food(18, 0.9, 3.9, 0.2, 0.6, {"each": 123, "serving": 60}),
+    "broccoli": Food(34, 2.8, 6.6, 0.4, 0.38, {"head": 600, "serving": 90}),
+    "bell pepper": Food(31, 1.0, 6.0, 0.3, 0.5, {"each": 120, "serving": 60}),
+    "zucchini": Food(17, 1.2, 3.1, 0.3, 0.5, {"each": 196, "serving": 100}),
+    "spinach": Food(23, 2.9, 3.6, 0.4, 0.13, {"serving": 30}),
+    "onion": Food(40, 1.1, 9.3, 0.1, 0.6, {"each": 110, "serving": 55}),
+    "garlic": Food(149, 6.4, 33.0, 0.5, 0.6, {"clove": 3, "each": 40, "serving": 3}),
+    "ginger": Food(80, 1.8, 17.8, 0.8, 0.6, {"serving": 5}),
+    "lemon": Food(29, 1.1, 9.3, 0.3, 0.6, {"each": 58, "wedge": 7, "serving": 7}),
+    "lemon juice": Food(22, 0.4, 6.9, 0.2, 1.03, {"serving": 15}),
+    "olive oil": Food(884, 0.0, 0.0, 100.0, 0.91, {"serving": 14}),
+    "butter": Food(717, 0.9, 0.1, 81.1, 0.96, {"serving": 14}),
+    "milk": Food(61, 3.2, 4.8, 3.3, 1.03, {"serving": 244}),
+    "flour": Food(364, 10.3, 76.3, 1.0, 0.53, {"serving": 30}),
+    "sugar": Food(387, 0.0, 100.0, 0.0, 0.85, {"serving": 12}),
+    "cocoa": Food(228, 19.6, 57.9, 13.7, 0.36, {"serving": 5}),
+    "peanut butter": Food(588, 25.0, 20.0, 50.0, 1.08, {"serving": 32}),
+    "tahini": Food(595, 17.0, 21.2, 53.8, 1.0, {"serving": 15}),
+    "soy sauce": Food(53, 8.1, 4.9, 0.6, 1.15, {"serving": 16}),
+    "mustard": Food(60, 3.7, 5.8, 3.3, 1.05, {"serving": 5}),
+    "red pepper flakes": Food(318, 12.0, 56.6, 17.3, 0.4, {"pinch": 0.3, "serving": 0.5}),
+    "black pepper": Food(251, 10.4, 64.0, 3.3, 0.46, {"pinch": 0.1, "serving": 0.5}),
+    "salt": Food(0, 0.0, 0.0, 0.0, 1.2, {"pinch": 0.4, "serving": 1})
+}
+
+# other names for foods in the table
+FOOD_ALIASES = {
+    "oatmeal": "oats", "rolled oats": "oats", "egg": "eggs", "egg white": "eggs",
+    "blueberries": "berries", "strawberries": "berries", "raspberries": "berries", "mixed berries": "berries",
+    "chicken breasts": "chicken breast", "romaine": "lettuce", "romaine lettuce": "lettuce", "greens": "mixed greens",
+    "parmesan cheese": "parmesan", "cheese": "cheddar", "chickpea": "chickpeas", "garbanzo beans": "chickpeas",
+    "ground beef": "beef", "salmon fillet": "salmon", "bell peppers": "bell pepper", "pepper": "black pepper",
+    "extra virgin olive oil": "olive oil", "tahini dressing": "tahini", "cocoa powder": "cocoa",
+    "wheat flour": "flour", "brown sugar": "sugar", "chili flakes": "red pepper flakes"
+}
+
+# unit names to ("g" or "ml", amount), or ("portion", portion unit) for units sized per food
+UNITS = {
+    "g": ("g", 1), "gram": ("g", 1), "kg": ("g", 1000), "kilogram": ("g", 1000),
+    "oz": ("g", 28.35), "ounce": ("g", 28.35), "lb": ("g", 453.6), "pound": ("g", 453.6),
+    "ml": ("ml", 1), "milliliter": ("ml", 1), "l": ("ml", 1000), "liter": ("ml", 1000), "litre": ("ml", 1000),
+    "tsp": ("ml", 4.93), "teaspoon": ("ml", 4.93), "tbsp": ("ml", 14.79), "tablespoon": ("ml", 14.79),
+    "cup": ("ml", 236.6), "pint": ("ml", 473.2), "quart": ("ml", 946.4), "fl oz": ("ml", 29.57),
+    "slice": ("portion", "slice"), "scoop": ("portion", "scoop"), "clove": ("portion", "clove"),
+    "fillet": ("portion", "fillet"), "can": ("portion", "can"), "block": ("portion", "block"),
+    "head": ("portion", "head"), "wedge": ("portion", "wedge"), "pinch": ("portion", "pinch"),
+    "dash": ("portion", "pinch"), "piece": ("portion", "each"), "whole": ("portion", "each"),
+    "large": ("portion", "each"), "medium": ("portion", "each"), "small": ("portion", "each")
+}
+
+_FRACTIONS = {"¼": " 1/4", "½": " 1/2", "¾": " 3/4", "⅓": " 1/3", "⅔": " 2/3", "⅛": " 1/8"}
+_NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+"
+_QUANTITY = re.compile(rf"\s*({_NUMBER})(?:\s*(?:-|–|to)\s*({_NUMBER}))?\s*")
+_WORD = re.compile(r"[a-z]+")
+
+Ingredient = namedtuple("Ingredient", ["quantity", "unit", "food", "grams"])
+
+
+def singular(word):
+    """Plural to singular, close enough for matching ingredient words (shared with allergen_index)"""
+    if len(word) <= 3 or not word.endswith("s") or word.endswith("ss"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "xes", "ches", "shes")):
+        return word[:-2]
+    return word[:-1]
+
+
+def _words(text):
+    return [singular(w) for w in _WORD.findall(text.lower())]
+
+
+# stemmed food names and aliases to their FOODS key
+_FOOD_NAMES = {" ".join(_words(name)): name for name in FOODS}
+_FOOD_NAMES.update({" ".join(_words(alias)): name for alias, name in FOOD_ALIASES.items()})
+_UNIT_NAMES = {" ".join(_words(name)): unit for name, unit in UNITS.items()}
+_LONGEST_NAME = max(len(name.split()) for name in _FOOD_NAMES)
+
+
+def _number(text):
+    whole, _, fraction = text.strip().rpartition(" ")
+    if "/" in fraction:
+        numerator, denominator = fraction.split("/")
+        value = int(numerator) / int(denominator) if int(denominator) else 0.0
+    else:
+        value = float(fraction)
+    return value + (int(whole) if whole else 0)
+
+
+def _match_food(words):
+    # longest run of words naming a food, leftmost first among equally long runs
+    for size in range(min(_LONGEST_NAME, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            name = _FOOD_NAMES.get(" ".join(words[start:start + size]))
+            if name is not None:
+                return name
+    return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_ingredient(line):
+    """
+    Ingredient(quantity, unit, food, grams) for one ingredient line
+
+    quantity is None when the line has none (then one serving of the food is
+    assumed), unit is the matched unit name or None for a plain count, food
+    is a FOODS key or None when no known food is named, and grams is None
+    when the food or its weight for the unit is unknown.
+    """
+    quantity, unit, words = _split(line)
+    food = _match_food(words)
+    if food is None:
+        return Ingredient(quantity, unit, None, None)
+    return Ingredient(quantity, unit, food, _grams(FOODS[food], quantity, unit))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def food_name(line):
+    """The FOODS key an ingredient line names, else its singular words after the quantity and unit"""
+    food = parse_ingredient(line).food
+    return food if food is not None else " ".join(_split(line)[2])
+
+
+def _split(line):
+    # (quantity, unit, remaining stemmed words) of an ingredient line
+    for symbol, text in _FRACTIONS.items():
+        line = line.replace(symbol, text)
+
+    # quantity, a single number, a mixed number or the middle of a range
+    quantity = None
+    match = _QUANTITY.match(line)
+    if match:
+        quantity = _number(match.group(1))
+        if match.group(2):
+            quantity = (quantity + _number(match.group(2))) / 2
+        line = line[match.end():]
+
+    # unit, the longest known unit name right after the quantity
+    words = _words(line)
+    unit = None
+    for size in (2, 1):
+        if quantity is not None and " ".join(words[:size]) in _UNIT_NAMES:
+            unit = " ".join(words[:size])
+            words = words[size:]
+            break
+    if words[:1] == ["of"]:
+        words = words[1:]
+    return quantity, unit, words
+
+
+def _grams(food, quantity, unit):
+    if quantity is None:
+        return float(food.portions["serving"])
+
+    kind, amount = _UNIT_NAMES[unit] if unit is not None else ("portion", "each")
+    if kind == "g":
+        return quantity * amount
+    if kind == "ml":
+        return quantity * amount * food.density
+
+    # portion units the food has no size for count as whole items, then as servings
+    portions = food.portions
+    return quantity * portions.get(amount, portions.get("each", portions["serving"]))
+
+
+def recipe_nutrition(ingredients, servings=1):
+    """
+    Per-serving calories, protein, carbs and fat for a list of ingredient lines
+
+    Each value is rounded to one decimal. Lines naming no known food count
+    as zero and are listed under "unmatched".
+    """
+    totals = [0.0] * len(MACROS)
+    unmatched = []
+    for line in ingredients:
+        ingredient = parse_ingredient(line)
+        if ingredient.grams is None:
+            unmatched.append(line)
+            continue
+        food = FOODS[ingredient.food]
+        share = ingredient.grams / 100
+        totals[0] += food.calories * share
+        totals[1] += food.protein * share
+        totals[2] += food.carbs * share
+        totals[3] += food.fat * share
+
+    servings = servings or 1
+    nutrition = {macro: round(total / servings, 1) for macro, total in zip(MACROS, totals)}
+    nutrition["unmatched"] = unmatched
+    return nutrition
+
+
+def _nutrition_chunk(chunk):
+    # [(title, nutrition)] for [(title, ingredients, servings)], run in pool workers
+    return [(title, recipe_nutrition(ingredients, servings)) for title, ingredients, servings in chunk]
+
+
+def compute_catalog(storage, workers=0, chunk_size=512):
+    """
+    {title: recipe_nutrition} for every recipe in a RecipeStorage
+
+    With workers, chunks of recipes are computed in that many processes,
+    each with its own parse cache. Recipes without a "servings" field count
+    as one serving.
+    """
+    chunks = chunked(((title, recipe.get("ingredients") or [], recipe.get("servings") or 1)
+                      for title, recipe in storage.recipes.items()), chunk_size)
+    results = pooled_map(_nutrition_chunk, chunks, workers) if workers else map(_nutrition_chunk, chunks)
+    return {title: nutrition for chunk in results for title, nutrition in chunk}
+
+
+def fill_catalog(storage, workers=0, overwrite=False):
+    """
+    Saves computed calories and macros into the storage, returns how many recipes changed
+
+    Only missing values are filled unless overwrite is set. Recipes go back
+    through add_recipe, so indexes and subscribers see the new values.
+    Recipes where no ingredient line names a known food are left alone.
+    """
+    changed = 0
+    for title, nutrition in compute_catalog(storage, workers).items():
+        recipe = storage.recipes[title]
+        if nutrition["unmatched"] == recipe["ingredients"]:
+            continue
+
+        updates = {macro: nutrition[macro] for macro in MACROS
+                   if (overwrite or recipe[macro] is None) and recipe[macro] != nutrition[macro]}
+        if updates:
+            storage.add_recipe(title, **dict(recipe, **updates))
+            changed += 1
+    return changed
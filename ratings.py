@@ -0,0 +1,514 @@
+"""
+Per-user recipe ratings and recommendations
+
+RatingStore keeps every (user, recipe, rating) triple in a compressed sparse
+row matrix: one row per user, holding sorted recipe ids and 1 byte ratings.
+New ratings go to a small pending table that is merged into the rows in
+bulk. Per-recipe count, mean and Bayesian average are updated on every
+rating.
+
+MatrixFactorization fits user and recipe factors to the ratings. It
+recommends each user the unrated recipes with the highest predicted rating,
+skipping recipes unsafe for the user's allergies when it has an
+AllergenIndex.
+"""
+
+import heapq
+import math
+import os
+import random
+import sys
+from array import array
+from bisect import bisect_left
+from operator import add, mul
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Phase5"))
+
+from chunking import pooled_map
+
+
+MIN_RATING = 1
+MAX_RATING = 5
+
+# ratings of the catalog-wide mean that every recipe's Bayesian average starts with
+PRIOR_WEIGHT = 10
+
+# pending ratings are merged into the rows once there are this many, or a
+# quarter of the stored ratings if that is more, so merges stay amortized O(1)
+COMPACT_MIN = 4096
+
+# most k-means clusters of recipe factors searched by recommendations, the
+# default is the square root of the recipe count
+MAX_CLUSTERS = 256
+
+RATING_ERROR = f"Rating must be an integer from {MIN_RATING} to {MAX_RATING}"
+
+
+class RatingStore:
+    """
+    Sparse user x recipe rating matrix with per-recipe aggregates
+
+    Users are keyed by username and recipes by title, each mapped to a dense
+    id in order of first rating. Rating a recipe again replaces the earlier
+    rating.
+
+    Attributes:
+        users(string array): username per user id
+        recipes(string array): title per recipe id
+        prior_weight(int): ratings of the mean added to every Bayesian average
+    """
+
+    # Constuctor
+    def __init__(self, prior_weight=PRIOR_WEIGHT):
+        self.users = []
+        self.recipes = []
+        self.prior_weight = prior_weight
+        self._user_ids = {}
+        self._recipe_ids = {}
+
+        # compressed rows: user u's recipe ids and ratings are at indptr[u]:indptr[u + 1]
+        self._indptr = array("Q", [0])
+        self._indices = array("I")
+        self._values = array("B")
+        # ratings not merged into the rows yet: {user: {recipe: rating}}
+        self._pending = {}
+        self._pending_count = 0
+
+        self._counts = array("I")
+        self._sums = array("Q")
+        self._total = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _recipe_id(self, title):
+        recipe = self._recipe_ids.get(title)
+        if recipe is None:
+            recipe = self._recipe_ids[title] = len(self.recipes)
+            self.recipes.append(title)
+            self._counts.append(0)
+            self._sums.append(0)
+        return recipe
+
+    def _row(self, user):
+        # (start, end) of a user's compressed row, empty for users added since the last merge
+        if user + 1 < len(self._indptr):
+            return self._indptr[user], self._indptr[user + 1]
+        return 0, 0
+
+    def _get(self, user, recipe):
+        rating = self._pending.get(user, {}).get(recipe)
+        if rating is None:
+            start, end = self._row(user)
+            i = bisect_left(self._indices, recipe, start, end)
+            if i < end and self._indices[i] == recipe:
+                rating = self._values[i]
+        return rating
+
+    def rate(self, username, title, rating):
+        """Records a user's rating of a recipe, replacing any earlier one"""
+        if not isinstance(rating, int) or isinstance(rating, bool) or not MIN_RATING <= rating <= MAX_RATING:
+            raise ValueError(RATING_ERROR)
+
+        user = self._user_ids.get(username)
+        if user is None:
+            user = self._user_ids[username] = len(self.users)
+            self.users.append(username)
+        recipe = self._recipe_id(title)
+
+        old = self._get(user, recipe)
+        if old is None:
+            self._counts[recipe] += 1
+            self._count += 1
+            old = 0
+        self._sums[recipe] += rating - old
+        self._total += rating - old
+
+        row = self._pending.setdefault(user, {})
+        self._pending_count += recipe not in row
+        row[recipe] = rating
+        if self._pending_count >= max(COMPACT_MIN, len(self._indices) // 4):
+            self.compact()
+
+    def rating(self, username, title):
+        """A user's rating of a recipe, None when they have not rated it"""
+        user, recipe = self._user_ids.get(username), self._recipe_ids.get(title)
+        if user is None or recipe is None:
+            return None
+        return self._get(user, recipe)
+
+    def user_ratings(self, username):
+        """{title: rating} of every recipe a user rated"""
+        user = self._user_ids.get(username)
+        if user is None:
+            return {}
+        # the user's compressed row with their pending ratings laid over it, without merging
+        start, end = self._row(user)
+        merged = dict(zip(self._indices[start:end], self._values[start:end]))
+        merged.update(self._pending.get(user, {}))
+        return {self.recipes[recipe]: rating for recipe, rating in merged.items()}
+
+    def compact(self):
+        """Merges pending ratings into the compressed rows"""
+        if not self._pending:
+            return
+        changes = self._pending
+
+        indptr, indices, values = array("Q", [0]), array("I"), array("B")
+        for user in range(len(self.users)):
+            start, end = self._row(user)
+            row = changes.get(user)
+            if row is None:
+                indices.extend(self._indices[start:end])
+                values.extend(self._values[start:end])
+            else:
+                merged = dict(zip(self._indices[start:end], self._values[start:end]))
+                merged.update(row)
+                for recipe in sorted(merged):
+                    indices.append(recipe)
+                    values.append(merged[recipe])
+            indptr.append(len(indices))
+
+        self._indptr, self._indices, self._values = indptr, indices, values
+        self._pending = {}
+        self._pending_count = 0
+
+    def mean(self):
+        """Mean of every rating, the middle of the scale before any"""
+        return self._total / self._count if self._count else (MIN_RATING + MAX_RATING) / 2
+
+    def _bayesian(self, recipe):
+        weight = self.prior_weight
+        return (weight * self.mean() + self._sums[recipe]) / (weight + self._counts[recipe])
+
+    def stats(self, title):
+        """{"count", "mean", "bayesian"} of a recipe's ratings, mean None when unrated"""
+        recipe = self._recipe_ids.get(title)
+        if recipe is None:
+            return {"count": 0, "mean": None, "bayesian": self.mean()}
+        count = self._counts[recipe]
+        return {
+            "count": count,
+            "mean": self._sums[recipe] / count if count else None,
+            "bayesian": self._bayesian(recipe)
+        }
+
+    def top_rated(self, n=10):
+        """[(title, bayesian average)] of the n best rated recipes"""
+        best = heapq.nlargest(n, range(len(self.recipes)), key=self._bayesian)
+        return [(self.recipes[recipe], self._bayesian(recipe)) for recipe in best]
+
+
+class MatrixFactorization:
+    """
+    Biased matrix factorization of a RatingStore, fitted by alternating least squares
+
+    A predicted rating is the mean rating plus a user bias, a recipe bias and
+    the dot product of the user's and recipe's factor vectors. Biases are
+    regularized averages. The factors are then fitted to what the biases
+    leave over, one side at a time: with the recipe factors fixed, each
+    user's factors are a small independent least squares problem, and the
+    other way round. Those solves run a chunk of rows at a time, in worker
+    processes when workers is set.
+
+    Recommendations are exact top-n searches over k-means clusters of the
+    recipe factors. A recipe scores at most its bias plus the user's factors
+    dot its cluster centre plus the user's factor norm times the cluster
+    radius, so whole clusters, and the low bias end of the rest, are
+    skipped once they cannot beat the n-th best.
+
+    The model is a snapshot of the ratings at the last fit.
+
+    Attributes:
+        ratings(RatingStore): rating matrix
+        allergens(AllergenIndex): recipe allergens used to filter recommendations, or None
+        factors(int): factor vector length
+        regularization(float): weight of the factor penalty, per rating
+        bias_regularization(float): ratings of the mean each bias starts with
+        iterations(int): alternating least squares passes
+    """
+
+    # Constuctor
+    def __init__(self, ratings, allergens=None, factors=10, regularization=0.1, bias_regularization=5.0,
+                 iterations=6, seed=0):
+        self.ratings = ratings
+        self.allergens = allergens
+        self.factors = factors
+        self.regularization = regularization
+        self.bias_regularization = bias_regularization
+        self.iterations = iterations
+        self.seed = seed
+
+        self._mean = ratings.mean()
+        self._users = {}
+        self._recipes = []
+        self._user_bias = array("d")
+        self._recipe_bias = array("d")
+        self._user_factors = array("d")
+        self._recipe_factors = array("d")
+        self._rows = (array("Q", [0]), array("I"))
+        self._clusters = []
+        self._safe = {}
+
+    def fit(self, workers=0, chunk_size=2000):
+        """Fits biases and factors to the current ratings, returns self"""
+        ratings = self.ratings
+        ratings.compact()
+        indptr, indices, values = ratings._indptr, ratings._indices, ratings._values
+        users, recipes, k = len(indptr) - 1, len(ratings.recipes), self.factors
+
+        mean = ratings.mean()
+        recipe_bias = array("d", ((ratings._sums[r] - mean * ratings._counts[r]) /
+                                  (self.bias_regularization + ratings._counts[r]) for r in range(recipes)))
+        residuals = array("d", (v - mean - recipe_bias[r] for r, v in zip(indices, values)))
+        user_bias = array("d")
+        for user in range(users):
+            start, end = indptr[user], indptr[user + 1]
+            bias = math.fsum(residuals[start:end]) / (self.bias_regularization + end - start)
+            user_bias.append(bias)
+            for i in range(start, end):
+                residuals[i] -= bias
+
+        # the same residuals by recipe: column pointers, user ids and positions in the rows
+        col_indptr = array("Q", bytes(8 * (recipes + 1)))
+        for recipe in indices:
+            col_indptr[recipe + 1] += 1
+        for recipe in range(recipes):
+            col_indptr[recipe + 1] += col_indptr[recipe]
+        fill = array("Q", col_indptr[:-1])
+        col_users = array("I", bytes(4 * len(indices)))
+        col_residuals = array("d", bytes(8 * len(indices)))
+        for user in range(users):
+            for i in range(indptr[user], indptr[user + 1]):
+                position = fill[indices[i]]
+                col_users[position] = user
+                col_residuals[position] = residuals[i]
+                fill[indices[i]] += 1
+
+        rng = random.Random(self.seed)
+        recipe_factors = array("d", (rng.gauss(0.0, 0.1) for _ in range(recipes * k)))
+        user_factors = array("d", bytes(8 * users * k))
+        for _ in range(self.iterations):
+            user_factors = self._solve_side(indptr, indices, residuals, recipe_factors, workers, chunk_size)
+            recipe_factors = self._solve_side(col_indptr, col_users, col_residuals, user_factors,
+                                              workers, chunk_size)
+
+        self._mean = mean
+        self._users = {ratings.users[user]: user for user in range(users)}
+        self._recipes = ratings.recipes[:recipes]
+        self._user_bias, self._recipe_bias = user_bias, recipe_bias
+        self._user_factors, self._recipe_factors = user_factors, recipe_factors
+        self._rows = (indptr, indices)
+        self._clusters = _cluster_recipes(recipe_factors, recipe_bias, k,
+                                          min(MAX_CLUSTERS, math.isqrt(recipes)), rng)
+        self._safe = {}
+        return self
+
+    def _solve_side(self, indptr, indices, residuals, other, workers, chunk_size):
+        # factors of every row of one side, with the other side's factors fixed
+        rows = len(indptr) - 1
+        chunks = ([(indices[indptr[row]:indptr[row + 1]], residuals[indptr[row]:indptr[row + 1]])
+                   for row in range(start, min(start + chunk_size, rows))]
+                  for start in range(0, rows, chunk_size))
+        state = (other, self.factors, self.regularization)
+        factors = array("d")
+        if workers:
+            results = pooled_map(_solve_chunk, chunks, workers, _init_worker, (state,))
+        else:
+            _init_worker(state)
+            results = map(_solve_chunk, chunks)
+        for chunk in results:
+            factors.extend(chunk)
+        return factors
+
+    def _safe_flags(self, allergies):
+        # one byte per recipe id, set when the recipe is known to the allergen index and safe
+        key = tuple(sorted(a.lower() for a in allergies))
+        if self.allergens is None or not key:
+            return None
+        if key not in self._safe:
+            known = self.allergens.storage.recipes
+            self._safe[key] = bytes(title in known and self.allergens.is_safe(title, key)
+                                    for title in self._recipes)
+        return self._safe[key]
+
+    def _user_state(self, username):
+        # (user id or None, factor vector, rated recipe ids)
+        user = self._users.get(username)
+        k = self.factors
+        if user is None:
+            return None, [0.0] * k, frozenset()
+        indptr, indices = self._rows
+        return user, self._user_factors[user * k:(user + 1) * k], frozenset(indices[indptr[user]:indptr[user + 1]])
+
+    def _predicted(self, user, score):
+        rating = self._mean + (self._user_bias[user] if user is not None else 0.0) + score
+        return min(float(MAX_RATING), max(float(MIN_RATING), rating))
+
+    def predict(self, username, title):
+        """Predicted rating of a recipe by a user, from the last fit"""
+        user, vector, _ = self._user_state(username)
+        recipe = self.ratings._recipe_ids.get(title)
+        if recipe is None or recipe >= len(self._recipes):
+            return self._predicted(user, 0.0)
+        k = self.factors
+        q = self._recipe_factors[recipe * k:(recipe + 1) * k]
+        return self._predicted(user, self._recipe_bias[recipe] + sum(map(mul, vector, q)))
+
+    def recommend(self, username, n=10, allergies=()):
+        """[(title, predicted rating)] of the n best recipes the user has not rated and can eat"""
+        user, vector, rated = self._user_state(username)
+        best = _top_recipes(vector, rated, self._safe_flags(allergies), n, self._recipe_bias, self._clusters,
+                            self._recipe_factors, self.factors)
+        return [(self._recipes[recipe], self._predicted(user, score)) for score, recipe in best]
+
+    def recommend_all(self, profiles, n=10, workers=0, chunk_size=1000):
+        """
+        {username: recommend(...)} for every UserProfile in profiles
+
+        The nightly batch: users are scored a chunk at a time, in workers
+        processes when set, each holding one copy of the recipe factors.
+        """
+        jobs = []
+        for profile in profiles:
+            username, allergies = profile.data["username"], profile.data["allergies"]
+            user, vector, rated = self._user_state(username)
+            flags = self._safe_flags(allergies)
+            jobs.append((username, user, vector, rated, tuple(sorted(a.lower() for a in allergies))
+                         if flags is not None else None))
+
+        state = (self._recipe_bias, self._clusters, self._recipe_factors, self.factors, self._safe)
+        chunks = ([(vector, rated, key, n) for _, _, vector, rated, key in jobs[start:start + chunk_size]]
+                  for start in range(0, len(jobs), chunk_size))
+        if workers:
+            results = pooled_map(_recommend_chunk, chunks, workers, _init_worker, (state,))
+        else:
+            _init_worker(state)
+            results = map(_recommend_chunk, chunks)
+
+        owners = iter(jobs)
+        recommendations = {}
+        for chunk in results:
+            for best in chunk:
+                username, user = next(owners)[:2]
+                recommendations[username] = [(self._recipes[recipe], self._predicted(user, score))
+                                             for score, recipe in best]
+        return recommendations
+
+
+def _solve_row(ids, residuals, other, k, regularization):
+    # regularized least squares for one row's factors: (Q'Q + lambda n I) x = Q'e, by Cholesky
+    if not ids:
+        return [0.0] * k
+    # the row's other-side factors as k columns, so every Gram entry is one dot product
+    columns = list(zip(*(other[j * k:(j + 1) * k] for j in ids)))
+    gram = [[0.0] * k for _ in range(k)]
+    for a in range(k):
+        for b in range(a + 1):
+            gram[a][b] = sum(map(mul, columns[a], columns[b]))
+    rhs = [sum(map(mul, column, residuals)) for column in columns]
+
+    penalty = regularization * len(ids)
+    lower = [[0.0] * k for _ in range(k)]
+    for a in range(k):
+        for b in range(a + 1):
+            s = gram[a][b] - sum(map(mul, lower[a][:b], lower[b][:b]))
+            lower[a][b] = math.sqrt(s + penalty) if a == b else s / lower[b][b]
+
+    # forward then back substitution
+    y = [0.0] * k
+    for a in range(k):
+        y[a] = (rhs[a] - sum(map(mul, lower[a][:a], y[:a]))) / lower[a][a]
+    upper = list(zip(*lower))
+    x = [0.0] * k
+    for a in reversed(range(k)):
+        x[a] = (y[a] - sum(map(mul, upper[a][a + 1:], x[a + 1:]))) / lower[a][a]
+    return x
+
+
+def _cluster_recipes(factors, bias, k, count, rng, iterations=4, sample=20000):
+    # k-means of the recipe factors, fitted on a sample: [(centre, radius, recipe ids by falling bias)]
+    recipes = len(bias)
+    if not recipes:
+        return []
+    rows = [factors[r * k:(r + 1) * k] for r in range(recipes)]
+    sampled = rng.sample(range(recipes), min(sample, recipes))
+    centres = [list(rows[r]) for r in sampled[:max(1, count)]]
+
+    for _ in range(iterations):
+        sums = [[0.0] * k for _ in centres]
+        sizes = [0] * len(centres)
+        for r in sampled:
+            c = _nearest(rows[r], centres)
+            sums[c] = list(map(add, sums[c], rows[r]))
+            sizes[c] += 1
+        centres = [[x / size for x in total] if size else centre
+                   for total, size, centre in zip(sums, sizes, centres)]
+
+    members = [[] for _ in centres]
+    for r in range(recipes):
+        members[_nearest(rows[r], centres)].append(r)
+    clusters = []
+    for centre, ids in zip(centres, members):
+        if ids:
+            radius = max(math.dist(rows[r], centre) for r in ids)
+            ids.sort(key=bias.__getitem__, reverse=True)
+            clusters.append((centre, radius, array("I", ids)))
+    return clusters
+
+
+def _nearest(row, centres):
+    # index of the centre closest to row: the largest row . c - |c|^2 / 2
+    scores = [sum(map(mul, row, centre)) - sum(map(mul, centre, centre)) / 2 for centre in centres]
+    return scores.index(max(scores))
+
+
+def _top_recipes(vector, rated, safe, n, bias, clusters, factors, k):
+    # [(score, recipe id)] best first, visiting clusters by their best bound and
+    # scanning each by falling bias until its bound cannot beat the n-th best
+    if n <= 0:
+        return []
+    norm = math.sqrt(sum(map(mul, vector, vector)))
+    order = []
+    for centre, radius, ids in clusters:
+        offset = sum(map(mul, vector, centre)) + norm * radius
+        order.append((bias[ids[0]] + offset, offset, ids))
+    order.sort(key=lambda cluster: cluster[0], reverse=True)
+
+    heap = []
+    for top, offset, ids in order:
+        if len(heap) == n and top <= heap[0][0]:
+            break
+        for recipe in ids:
+            b = bias[recipe]
+            if len(heap) == n and b + offset <= heap[0][0]:
+                break
+            if recipe in rated or (safe is not None and not safe[recipe]):
+                continue
+            score = b + sum(map(mul, vector, factors[recipe * k:(recipe + 1) * k]))
+            if len(heap) < n:
+                heapq.heappush(heap, (score, -recipe))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, -recipe))
+    return [(score, -recipe) for score, recipe in sorted(heap, reverse=True)]
+
+
+# state shared by every chunk of a pool, set once per worker process
+_state = None
+
+
+def _init_worker(state):
+    global _state
+    _state = state
+
+
+def _solve_chunk(chunk):
+    other, k, regularization = _state
+    return [x for ids, residuals in chunk for x in _solve_row(ids, residuals, other, k, regularization)]
+
+
+def _recommend_chunk(chunk):
+    bias, clusters, factors, k, safe = _state
+    return [_top_recipes(vector, rated, safe[key] if key is not None else None, n_best, bias, clusters, factors, k)
+            for vector, rated, key, n_best in chunk]
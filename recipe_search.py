@@ -0,0 +1,480 @@
+"""
+Full-text recipe search over a RecipeStorage catalog
+
+RecipeSearch tokenizes each recipe's title, ingredients and instructions
+into a compact inverted index, ranks matches with BM25 and completes
+prefixes for typeahead. It follows the storage through subscribe, and can
+be saved to and restored from a snapshot file so a restart does not have
+to re-tokenize the catalog.
+
+Snapshot layout, every section 8-byte aligned and little-endian:
+
+    header          magic, version and the section sizes below
+    lengths         per doc: its length in weighted terms, uint32
+    fingerprints    per doc: hash of the recipe text it was built from, uint64
+    deleted         per doc: 1 when replaced or removed, else 0
+    sizes           per term: number of postings, uint32
+    docs            doc ids of every term's postings in turn, uint32
+    tfs             weighted tfs of the same postings, uint16
+    strings         UTF-8 JSON {"titles": [...], "terms": [...]}
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, insort
+
+
+SNAPSHOT_MAGIC = b"PPSI"
+SNAPSHOT_VERSION = 2
+
+# magic, version, flags, then the number of docs, terms and postings and the strings size
+_HEADER = struct.Struct("<4sHHQQQQ")
+_HEADER_SIZE = 64
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it",
+    "of", "on", "or", "the", "then", "to", "until", "with"
+])
+
+
+def tokenize(text):
+    # lower case words and numbers, without stopwords and single letters
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _fingerprint(recipe):
+    # hash of the indexed recipe fields, to find recipes changed since a snapshot
+    text = "\0".join((*recipe.get("ingredients", ()), "", recipe.get("instructions", "")))
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def _aligned(size):
+    return (size + 7) & ~7
+
+
+def _layout(docs, terms, postings):
+    # byte offset of every section, the strings last
+    sizes = [("lengths", 4 * docs), ("fingerprints", 8 * docs), ("deleted", docs), ("sizes", 4 * terms),
+             ("docs", 4 * postings), ("tfs", 2 * postings)]
+    layout = {}
+    offset = _HEADER_SIZE
+    for name, size in sizes:
+        layout[name] = offset
+        offset += _aligned(size)
+    layout["strings"] = offset
+    return layout
+
+
+class _Impacts:
+    # a common term's postings split into buckets of falling BM25 weight
+    __slots__ = ("avg_length", "built_df", "floors", "buckets", "tf_map")
+
+    def __init__(self, avg_length, built_df):
+        self.avg_length = avg_length
+        self.built_df = built_df
+
+        # lowest saturation in each bucket when it was built, for placing new postings
+        self.floors = []
+
+        # [{tf: shortest doc length}, doc ids] per bucket, strongest postings first
+        self.buckets = []
+
+        # tf per doc id (capped at 255) for terms in a large share of recipes, else None
+        self.tf_map = None
+
+
+class RecipeSearch:
+    """
+    BM25 ranked search with prefix completion
+
+    Each term has a postings list of doc ids and weighted term frequencies in
+    two typed arrays. Doc ids only grow, so postings stay sorted by doc id and
+    a single posting is found by bisecting.
+
+    Postings of common terms are also split into impact buckets, highest
+    weight first and growing geometrically in size. Each bucket knows the
+    shortest doc length per tf in it, which bounds its best score. Search
+    reads buckets in order of that bound and scores each recipe it meets in
+    full. It stops as soon as no unread recipe can make the top results, so
+    the ranking is exact, or after SCORED_BUDGET recipes, which keeps queries
+    on very common words fast at the cost of possibly missing a few results.
+
+    Re-saved titles get a new doc id and the old one is marked deleted.
+
+    Attributes:
+        storage(RecipeStorage): indexed catalog
+    """
+
+    # how much a word in each field counts towards term frequency
+    FIELD_WEIGHTS = {"title": 3, "ingredients": 1, "instructions": 1}
+
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+
+    # terms in at least this many recipes get impact buckets, rarer ones are scored outright
+    COMMON_DF = 256
+
+    # size of a term's first impact bucket, each later one is GROWTH times bigger
+    FIRST_BUCKET = 64
+    GROWTH = 4
+
+    # relative change in average doc length after which buckets are rebuilt
+    LENGTH_DRIFT = 0.05
+
+    # most recipes a search scores before settling for the best found so far
+    SCORED_BUDGET = 1536
+
+    # terms in at least 1 / DENSE_SHARE of the recipes keep a tf per doc id
+    DENSE_SHARE = 64
+
+    # completions searched for the last word of a typeahead query
+    PREFIX_EXPANSIONS = 3
+
+    # Constuctor
+    def __init__(self, storage):
+        self._reset(storage)
+        for title, recipe in storage.recipes.items():
+            self._add(title, recipe)
+        storage.subscribe(self._add)
+
+    def _reset(self, storage):
+        self.storage = storage
+        self._titles = []
+        self._doc_ids = {}
+        self._lengths = array("I")
+        self._fingerprints = array("Q")
+        self._deleted = set()
+        self._live_length = 0
+
+        # term -> (doc ids, weighted tfs), and the terms in sorted order for prefixes
+        self._postings = {}
+        self._vocabulary = []
+
+        # common term -> _Impacts
+        self._impacts = {}
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def _term_counts(self, title, recipe):
+        counts = {}
+        fields = (
+            ("title", title),
+            ("ingredients", " ".join(recipe.get("ingredients", ()))),
+            ("instructions", recipe.get("instructions", ""))
+        )
+        for field, text in fields:
+            weight = self.FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                counts[term] = counts.get(term, 0) + weight
+        return counts
+
+    def _add(self, title, recipe):
+        counts = self._term_counts(title, recipe)
+
+        # a re-saved title replaces its old document
+        if title in self._doc_ids:
+            self._delete(self._doc_ids[title])
+
+        doc = len(self._titles)
+        length = sum(counts.values())
+        self._titles.append(title)
+        self._doc_ids[title] = doc
+        self._lengths.append(length)
+        self._fingerprints.append(_fingerprint(recipe))
+        self._live_length += length
+
+        for term, tf in counts.items():
+            tf = min(tf, 0xFFFF)
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("H"))
+                insort(self._vocabulary, term)
+            postings[0].append(doc)
+            postings[1].append(tf)
+
+            impacts = self._impacts.get(term)
+            if impacts is not None:
+                self._place(impacts, doc, tf, length)
+
+    def _delete(self, doc):
+        self._deleted.add(doc)
+        self._live_length -= self._lengths[doc]
+        del self._doc_ids[self._titles[doc]]
+
+    # Ranking
+
+    def _saturation(self, tf, length, avg_length):
+        # BM25 term weight without the idf factor
+        return tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length / avg_length))
+
+    def _place(self, impacts, doc, tf, length):
+        # a new posting joins the first bucket whose weakest posting it matches
+        weight = self._saturation(tf, length, impacts.avg_length)
+        if not impacts.buckets:
+            impacts.floors.append(weight)
+            impacts.buckets.append([{}, array("I")])
+        bucket = len(impacts.floors) - 1
+        for i, floor in enumerate(impacts.floors):
+            if weight >= floor:
+                bucket = i
+                break
+        shortest, docs = impacts.buckets[bucket]
+        shortest[tf] = min(shortest.get(tf, length), length)
+        docs.append(doc)
+
+        if impacts.tf_map is not None:
+            impacts.tf_map.extend(bytes(doc + 1 - len(impacts.tf_map)))
+            impacts.tf_map[doc] = min(tf, 0xFF)
+
+    def _impacts_of(self, term):
+        # impact buckets of a common term, rebuilt once it doubled or the average length drifted
+        docs, tfs = self._postings[term]
+        avg_length = self._live_length / len(self._doc_ids)
+        impacts = self._impacts.get(term)
+        if impacts is not None and len(docs) < 2 * impacts.built_df and \
+                abs(avg_length / impacts.avg_length - 1) <= self.LENGTH_DRIFT:
+            return impacts
+
+        lengths = self._lengths
+        deleted = self._deleted
+        impacts = _Impacts(avg_length, len(docs))
+        weights = [self._saturation(tf, lengths[doc], impacts.avg_length) for doc, tf in zip(docs, tfs)]
+        order = [p for p in sorted(range(len(docs)), key=weights.__getitem__, reverse=True)
+                 if docs[p] not in deleted]
+
+        start, size = 0, self.FIRST_BUCKET
+        while start < len(order):
+            end = start + size
+            if len(order) - end < size:
+                end = len(order)
+            shortest = {}
+            for p in order[start:end]:
+                tf, length = tfs[p], lengths[docs[p]]
+                if length < shortest.get(tf, length + 1):
+                    shortest[tf] = length
+            impacts.floors.append(weights[order[end - 1]])
+            impacts.buckets.append([shortest, array("I", [docs[p] for p in order[start:end]])])
+            start, size = end, size * self.GROWTH
+
+        # terms in a large share of recipes look tfs up by doc id instead of bisecting
+        if len(docs) * self.DENSE_SHARE >= len(self._titles):
+            impacts.tf_map = bytearray(docs[-1] + 1)
+            for doc, tf in zip(docs, tfs):
+                impacts.tf_map[doc] = min(tf, 0xFF)
+
+        self._impacts[term] = impacts
+        return impacts
+
+    def optimize(self):
+        """Builds every common term's impact buckets ahead of time, e.g. after a bulk load"""
+        for term, (docs, _) in self._postings.items():
+            if len(docs) >= self.COMMON_DF:
+                self._impacts_of(term)
+
+    def search(self, query, limit=10, prefix=False):
+        """
+        Returns up to limit (title, score) pairs, best first
+
+        With prefix=True the last word of the query is also matched as a
+        prefix (typeahead), expanding to its most common completions.
+        """
+        words = _TOKEN.findall(query.lower())
+        if prefix and words and not query[-1:].isspace():
+            # the partial last word skips tokenize's filters, so "t" or "to" still complete to "tomatoes"
+            terms = tokenize(" ".join(words[:-1])) + [words[-1]] + self.complete(words[-1], self.PREFIX_EXPANSIONS)
+        else:
+            terms = tokenize(query)
+        terms = list(dict.fromkeys(t for t in terms if t in self._postings))
+        if not terms or not self._doc_ids or limit <= 0:
+            return []
+        return self._top(terms, limit)
+
+    def _top(self, terms, limit):
+        count = len(self._doc_ids)
+        avg_length = self._live_length / count or 1
+        saturation = self._saturation
+        lengths = self._lengths
+        deleted = self._deleted
+        k1, b = self.K1, self.B
+
+        # per term: idf and a way to find a recipe's tf, plus its segments by best score
+        dense = []
+        sparse = []
+        segments = []
+        for t, term in enumerate(terms):
+            docs, tfs = self._postings[term]
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            if len(docs) < self.COMMON_DF:
+                sparse.append((idf * (k1 + 1), docs, tfs))
+                segments.append((math.inf, t, docs))
+                continue
+
+            impacts = self._impacts_of(term)
+            if impacts.tf_map is None:
+                sparse.append((idf * (k1 + 1), docs, tfs))
+            else:
+                # padded to every doc id so lookups need no bounds check
+                impacts.tf_map.extend(bytes(len(self._titles) - len(impacts.tf_map)))
+                dense.append((idf * (k1 + 1), impacts.tf_map))
+            for shortest, bucket_docs in impacts.buckets:
+                if shortest:
+                    best = max(saturation(tf, length, avg_length) for tf, length in shortest.items())
+                    segments.append((idf * best, t, bucket_docs))
+        segments.sort(key=lambda segment: -segment[0])
+
+        # each term's best score among the recipes not read yet
+        ahead = [0.0] * len(terms)
+        for bound, t, _ in reversed(segments):
+            ahead[t] = bound
+
+        def score(doc):
+            total = 0.0
+            norm = k1 * (1 - b + b * lengths[doc] / avg_length)
+            for lift, tf_map in dense:
+                tf = tf_map[doc]
+                if tf:
+                    total += lift * tf / (tf + norm)
+            for lift, docs, tfs in sparse:
+                i = bisect_left(docs, doc)
+                if i < len(docs) and docs[i] == doc:
+                    total += lift * tfs[i] / (tfs[i] + norm)
+            return total
+
+        # reading recipes strongest segment first and scoring each one in full, until no
+        # unread recipe can make the top results or the budget runs out
+        heap = []
+        seen = set()
+        budget = max(self.SCORED_BUDGET, limit)
+        for position, (bound, t, docs) in enumerate(segments):
+            if len(seen) >= budget or (len(heap) == limit and heap[0][0] > sum(ahead)):
+                break
+            for doc in docs:
+                if doc in seen or doc in deleted:
+                    continue
+                seen.add(doc)
+                entry = (score(doc), -doc)
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+                if len(seen) >= budget:
+                    break
+            ahead[t] = next((later[0] for later in segments[position + 1:] if later[1] == t), 0.0)
+
+        return [(self._titles[-doc], s) for s, doc in sorted(heap, reverse=True)]
+
+    # Typeahead
+
+    def complete(self, prefix, limit=10):
+        """Indexed terms starting with prefix, most common first"""
+        prefix = prefix.lower()
+        low = bisect_left(self._vocabulary, prefix)
+        high = bisect_left(self._vocabulary, prefix + "{")
+        terms = self._vocabulary[low:high]
+        return heapq.nlargest(limit, terms, key=lambda t: len(self._postings[t][0]))
+
+    # Snapshots
+
+    def save(self, path):
+        """
+        Writes the index to path so load can restore it without re-tokenizing
+
+        Impact buckets are not saved, common terms rebuild them on first use
+        (or all at once with optimize). The file is written next to path and
+        moved in place.
+        """
+        if sys.byteorder != "little":
+            raise ValueError("Search snapshots can only be written on little-endian machines")
+
+        terms = list(self._postings)
+        sizes = array("I", (len(self._postings[term][0]) for term in terms))
+        deleted = bytearray(len(self._titles))
+        for doc in self._deleted:
+            deleted[doc] = 1
+        strings = json.dumps({"titles": self._titles, "terms": terms}).encode("utf-8")
+
+        layout = _layout(len(self._titles), len(terms), sum(sizes))
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "wb") as mf:
+            mf.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(self._titles), len(terms), sum(sizes),
+                                  len(strings)))
+            sections = [("lengths", [self._lengths]), ("fingerprints", [self._fingerprints]), ("deleted", [deleted]),
+                        ("sizes", [sizes]), ("docs", [self._postings[term][0] for term in terms]),
+                        ("tfs", [self._postings[term][1] for term in terms]), ("strings", [strings])]
+            for name, parts in sections:
+                mf.write(bytes(layout[name] - mf.tell()))
+                for part in parts:
+                    mf.write(part)
+        os.replace(partial, path)
+
+    def load(path, storage):
+        """
+        Restores an index saved with save and attaches it to storage
+
+        Recipes in storage that the snapshot does not have, or has from
+        different ingredients or instructions, are indexed again, and
+        snapshot documents whose title is no longer stored are dropped.
+        """
+        with open(path, "rb") as mf:
+            data = mf.read()
+        if len(data) < _HEADER_SIZE or data[:4] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a search snapshot")
+        _, version, _, docs, terms, postings, strings = _HEADER.unpack_from(data)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported search snapshot version {version}")
+        if sys.byteorder != "little":
+            raise ValueError("Search snapshots can only be read on little-endian machines")
+        layout = _layout(docs, terms, postings)
+        if layout["strings"] + strings != len(data):
+            raise ValueError(f"{path} is truncated")
+
+        def section(name, typecode, count):
+            values = array(typecode)
+            values.frombytes(data[layout[name]:layout[name] + values.itemsize * count])
+            return values
+
+        names = json.loads(data[layout["strings"]:].decode("utf-8"))
+        if len(names["titles"]) != docs or len(names["terms"]) != terms:
+            raise ValueError(f"{path} is not a search snapshot")
+
+        search = RecipeSearch.__new__(RecipeSearch)
+        search._reset(storage)
+        search._titles = names["titles"]
+        search._lengths = section("lengths", "I", docs)
+        search._fingerprints = section("fingerprints", "Q", docs)
+        deleted = data[layout["deleted"]:layout["deleted"] + docs]
+        search._deleted = {doc for doc in range(docs) if deleted[doc]}
+
+        all_docs, all_tfs = section("docs", "I", postings), section("tfs", "H", postings)
+        start = 0
+        for term, size in zip(names["terms"], section("sizes", "I", terms)):
+            search._postings[term] = (all_docs[start:start + size], all_tfs[start:start + size])
+            start += size
+        search._vocabulary = sorted(search._postings)
+
+        for doc, title in enumerate(search._titles):
+            if doc not in search._deleted:
+                search._doc_ids[title] = doc
+                search._live_length += search._lengths[doc]
+
+        # catching up with the storage
+        for title in [t for t in search._doc_ids if t not in storage.recipes]:
+            search._delete(search._doc_ids[title])
+        for title, recipe in storage.recipes.items():
+            doc = search._doc_ids.get(title)
+            if doc is None or search._fingerprints[doc] != _fingerprint(recipe):
+                search._add(title, recipe)
+
+        storage.subscribe(search._add)
+        return search
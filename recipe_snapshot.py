@@ -0,0 +1,358 @@
+"""
+Memory-mapped binary snapshots of a RecipeStorage catalog
+
+write_snapshot stores a catalog in one file with fixed-width columns and
+SnapshotRecipes opens it through mmap. Opening only reads the header, so
+startup costs the same for ten recipes or a million, and a recipe is
+decoded from the mapped bytes the first time it is looked up.
+
+File layout, every section 8-byte aligned and little-endian:
+
+    header      magic, version and the section sizes below
+    rows        per recipe: title, instructions, image and category string
+                ids, then (start, count) of its tags and of its ingredients
+                in the list items, 8 uint32
+    numbers     calories, protein, carbs and fat columns, 8 bytes per recipe
+                read as int64 or float64 depending on the kinds column
+    kinds       per recipe and number column: 0 missing, 1 int, 2 float
+    slots       open addressing title hash table, row + 1 per slot (0 empty)
+    items       string ids of every tag and ingredient list, uint32
+    offsets     start of every string in the heap, plus the heap length
+    heap        UTF-8 strings, each stored once
+"""
+
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import MutableMapping
+
+
+SNAPSHOT_MAGIC = b"PPRS"
+SNAPSHOT_VERSION = 1
+
+# magic, version, flags, then the number of rows, strings, list items and hash slots
+_HEADER = struct.Struct("<4sHHQQQQ")
+_HEADER_SIZE = 64
+
+ROW_FIELDS = 8
+NUMBER_FIELDS = ("calories", "protein", "carbs", "fat")
+
+_MISSING, _INT, _FLOAT = 0, 1, 2
+
+
+def _aligned(size):
+    return (size + 7) & ~7
+
+
+def _layout(rows, strings, items, slots):
+    # byte offset of every section, and the file size last
+    sizes = [("rows", 4 * ROW_FIELDS * rows), ("numbers", 8 * len(NUMBER_FIELDS) * rows),
+             ("kinds", len(NUMBER_FIELDS) * rows), ("slots", 4 * slots), ("items", 4 * items),
+             ("offsets", 8 * (strings + 1))]
+    layout = {}
+    offset = _HEADER_SIZE
+    for name, size in sizes:
+        layout[name] = offset
+        offset += _aligned(size)
+    layout["heap"] = offset
+    return layout
+
+
+def _slot_count(rows):
+    # a power of two at least twice the rows, so probes stay short
+    slots = 8
+    while slots < 2 * rows:
+        slots *= 2
+    return slots
+
+
+def write_snapshot(recipes, path):
+    """
+    Writes a {title: recipe} catalog (RecipeStorage.recipes) to path
+
+    Recipes keep their order. The file is written next to path and moved in
+    place, so readers of an older snapshot at path are not disturbed.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Recipe snapshots can only be written on little-endian machines")
+
+    string_ids = {}
+    heap = []
+    offsets = array("Q", [0])
+
+    def string_id(text):
+        sid = string_ids.get(text)
+        if sid is None:
+            sid = string_ids[text] = len(heap)
+            data = text.encode("utf-8")
+            heap.append(data)
+            offsets.append(offsets[-1] + len(data))
+        return sid
+
+    rows = array("I")
+    items = array("I")
+    numbers = [array("q") for _ in NUMBER_FIELDS]
+    kinds = bytearray()
+    titles = []
+
+    for title, recipe in recipes.items():
+        titles.append(title.encode("utf-8"))
+        row = [string_id(title), string_id(recipe["instructions"]), string_id(recipe["image"]),
+               string_id(recipe["category"])]
+        for field in ("dietary_tags", "ingredients"):
+            values = recipe.get(field) or ()
+            row += (len(items), len(values))
+            items.extend(string_id(v) for v in values)
+        rows.extend(row)
+
+        for column, field in zip(numbers, NUMBER_FIELDS):
+            value = recipe.get(field)
+            if value is None:
+                kinds.append(_MISSING)
+                column.append(0)
+            elif isinstance(value, float):
+                kinds.append(_FLOAT)
+                column.append(struct.unpack("<q", struct.pack("<d", value))[0])
+            else:
+                kinds.append(_INT)
+                column.append(value)
+
+    # hash table of titles, probed linearly
+    slots = array("I", bytes(4 * _slot_count(len(titles))))
+    mask = len(slots) - 1
+    for row, title in enumerate(titles):
+        slot = zlib.crc32(title) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = row + 1
+
+    layout = _layout(len(titles), len(heap), len(items), len(slots))
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as mf:
+        mf.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(titles), len(heap), len(items), len(slots)))
+        # numbers are written column by column, so each column is one contiguous run
+        sections = [("rows", [rows]), ("numbers", numbers), ("kinds", [kinds]), ("slots", [slots]),
+                    ("items", [items]), ("offsets", [offsets]), ("heap", heap)]
+        for name, parts in sections:
+            mf.write(bytes(layout[name] - mf.tell()))
+            for part in parts:
+                mf.write(part)
+    os.replace(partial, path)
+
+
+class SnapshotRecipes(MutableMapping):
+    """
+    {title: recipe} view of a snapshot file, decoding recipes on first access
+
+    Recipes saved or deleted after opening are kept in memory on top of the
+    snapshot, and new titles iterate after the snapshot's, as in a dict.
+    Decoded recipes are cached, so later lookups return the same dict.
+
+    Attributes:
+        path(string): snapshot file
+    """
+
+    # Constuctor
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as mf:
+            self._map = mmap.mmap(mf.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._open()
+        except ValueError:
+            self._map.close()
+            raise
+
+        # recipes decoded or saved since opening, titles added after it and titles deleted
+        self._cache = {}
+        self._added = {}
+        self._deleted = set()
+
+    def _open(self):
+        if len(self._map) < _HEADER_SIZE or self._map[:4] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.path} is not a recipe snapshot")
+        _, version, _, rows, strings, items, slots = _HEADER.unpack_from(self._map)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported recipe snapshot version {version}")
+        if sys.byteorder != "little":
+            raise ValueError("Recipe snapshots can only be read on little-endian machines")
+
+        layout = _layout(rows, strings, items, slots)
+        if layout["heap"] > len(self._map):
+            raise ValueError(f"{self.path} is truncated")
+        view = memoryview(self._map)
+        self._offsets = view[layout["offsets"]:layout["offsets"] + 8 * (strings + 1)].cast("Q")
+        if layout["heap"] + self._offsets[-1] != len(self._map):
+            self._offsets.release()
+            view.release()
+            raise ValueError(f"{self.path} is truncated")
+
+        self._heap = layout["heap"]
+        self._rows = view[layout["rows"]:layout["numbers"]].cast("I")
+        numbers = view[layout["numbers"]:layout["numbers"] + 8 * len(NUMBER_FIELDS) * rows]
+        self._ints = numbers.cast("q")
+        self._floats = numbers.cast("d")
+        self._kinds = view[layout["kinds"]:layout["kinds"] + len(NUMBER_FIELDS) * rows]
+        self._slots = view[layout["slots"]:layout["slots"] + 4 * slots].cast("I")
+        self._items = view[layout["items"]:layout["items"] + 4 * items].cast("I")
+        self._views = [view, numbers, self._offsets, self._rows, self._ints, self._floats,
+                       self._kinds, self._slots, self._items]
+        self._length = rows
+
+    def close(self):
+        # views of the map have to go before it can be closed
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Decoding
+
+    def _string(self, sid):
+        offsets = self._offsets
+        return str(self._map[self._heap + offsets[sid]:self._heap + offsets[sid + 1]], "utf-8")
+
+    def _strings(self, start, count):
+        return [self._string(sid) for sid in self._items[start:start + count]]
+
+    def _number(self, row, column):
+        kind = self._kinds[len(NUMBER_FIELDS) * row + column]
+        if kind == _MISSING:
+            return None
+        position = column * self._length + row
+        return self._ints[position] if kind == _INT else self._floats[position]
+
+    def _title(self, row):
+        return self._string(self._rows[ROW_FIELDS * row])
+
+    def _decode(self, row):
+        base = ROW_FIELDS * row
+        _, instructions, image, category, tags, tag_count, ingredients, ingredient_count = \
+            self._rows[base:base + ROW_FIELDS]
+        recipe = {
+            "instructions": self._string(instructions),
+            "image": self._string(image),
+            "category": self._string(category)
+        }
+        for column, field in enumerate(NUMBER_FIELDS):
+            recipe[field] = self._number(row, column)
+        recipe["dietary_tags"] = self._strings(tags, tag_count)
+        recipe["ingredients"] = self._strings(ingredients, ingredient_count)
+        return recipe
+
+    def _find(self, title):
+        # snapshot row of title, or None
+        key = title.encode("utf-8")
+        slots, rows, offsets, heap = self._slots, self._rows, self._offsets, self._heap
+        mask = len(slots) - 1
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            row = slots[slot] - 1
+            sid = rows[ROW_FIELDS * row]
+            if self._map[heap + offsets[sid]:heap + offsets[sid + 1]] == key:
+                return row
+            slot = (slot + 1) & mask
+        return None
+
+    # Mapping
+
+    def __getitem__(self, title):
+        recipe = self._cache.get(title)
+        if recipe is not None:
+            return recipe
+        if not isinstance(title, str) or title in self._deleted:
+            raise KeyError(title)
+        row = self._find(title)
+        if row is None:
+            raise KeyError(title)
+        recipe = self._cache[title] = self._decode(row)
+        return recipe
+
+    def __contains__(self, title):
+        if title in self._cache:
+            return True
+        if not isinstance(title, str) or title in self._deleted:
+            return False
+        return self._find(title) is not None
+
+    def __setitem__(self, title, recipe):
+        # a deleted snapshot title saved again stays deleted from its row and comes back as added
+        if title not in self:
+            self._added[title] = None
+        self._cache[title] = recipe
+
+    def __delitem__(self, title):
+        if title not in self:
+            raise KeyError(title)
+        self._cache.pop(title, None)
+        if title in self._added:
+            del self._added[title]
+        else:
+            self._deleted.add(title)
+
+    def __iter__(self):
+        deleted = self._deleted
+        for row in range(self._length):
+            title = self._title(row)
+            if title not in deleted:
+                yield title
+        yield from list(self._added)
+
+    def __len__(self):
+        return self._length - len(self._deleted) + len(self._added)
+
+    def index_entries(self):
+        """
+        (title, recipe) pairs with only the fields RecipeStorage indexes
+
+        Reads the category, tags and number columns in bulk without decoding
+        instructions, images or ingredients, and decodes each distinct
+        category and tag once.
+        """
+        names = {}
+
+        def name(sid):
+            text = names.get(sid)
+            if text is None:
+                text = names[sid] = self._string(sid)
+            return text
+
+        rows, items = self._rows, self._items
+        width = len(NUMBER_FIELDS)
+        columns = [self._columns(column) for column in range(width)]
+        for row in range(self._length):
+            title = self._title(row)
+            if title in self._deleted:
+                continue
+            if title in self._cache:
+                yield title, self._cache[title]
+                continue
+
+            base = ROW_FIELDS * row
+            start = rows[base + 4]
+            entry = {"category": name(rows[base + 3]),
+                     "dietary_tags": [name(sid) for sid in items[start:start + rows[base + 5]]]}
+            for field, column in zip(NUMBER_FIELDS, columns):
+                entry[field] = column[row]
+            yield title, entry
+
+        for title in list(self._added):
+            yield title, self._cache[title]
+
+    def _columns(self, column):
+        # every value of one number column as a list
+        start = column * self._length
+        kinds = self._kinds[column::len(NUMBER_FIELDS)].tolist()
+        ints = self._ints[start:start + self._length].tolist()
+        floats = self._floats[start:start + self._length].tolist()
+        return [None if kind == _MISSING else (i if kind == _INT else f) for kind, i, f in zip(kinds, ints, floats)]
@@ -0,0 +1,458 @@
+"""
+HTTP/JSON service for recipes, profiles and posts
+
+RecipeService exposes RecipeStorage, UserProfile and create_post over a
+small asyncio HTTP/1.1 server with keep-alive. Large batches are validated
+in a process pool so the event loop keeps answering other connections, and
+requests beyond max_pending are turned away with 503 instead of queueing
+without bound.
+
+usage: python service.py [--host 127.0.0.1] [--port 8080] [--workers 2]
+
+Routes:
+    GET  /health
+    GET  /recipes?category=&tag=&min_calories=&max_calories=&limit=
+    GET  /recipes/<title>
+    POST /recipes
+    GET  /profiles/<username>
+    POST /profiles
+    POST /profiles:batch
+    GET  /posts?offset=&limit=
+    POST /posts
+    POST /posts:batch
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Phase5"))
+
+from main import RecipeStorage
+from UserProfile import UserProfile
+from post import INVALID_POST_DATA, Post, post_status
+from profile_storage import PROFILE_FIELDS, SQLiteProfileStorage
+
+
+# status for batch rows that are not a profile object with every field
+INVALID_PROFILE_DATA = "Invalid profile data"
+
+
+class HTTPError(Exception):
+    # raised by handlers to answer with an error status and {"status": message}
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def post_to_dict(post):
+    # same keys create_post reads, so a post can be sent back as it came in
+    return {
+        "image": post.image,
+        "description": post.description,
+        "likeButton": post.like_button,
+        "likeCount": post.like_count,
+        "imageCount": post.image_count
+    }
+
+
+# Batch validators, module level so the process pool can pickle them
+
+def _post_statuses(records):
+    # post_status for every record, INVALID_POST_DATA for malformed ones
+    statuses = []
+    for data in records:
+        try:
+            statuses.append(post_status(data, data.get("clicked", True)))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            statuses.append(INVALID_POST_DATA)
+    return statuses
+
+
+def _profile_reports(records):
+    # validate_batch reports for every record, INVALID_PROFILE_DATA for malformed ones
+    reports = [None] * len(records)
+    rows = []
+    for row, data in enumerate(records):
+        if isinstance(data, dict) and all(field in data for field in PROFILE_FIELDS):
+            rows.append(row)
+        else:
+            reports[row] = INVALID_PROFILE_DATA
+
+    if rows:
+        columns = {field: [records[row][field] for row in rows] for field in PROFILE_FIELDS}
+        for row, report in zip(rows, UserProfile.validate_batch(columns)):
+            reports[row] = report
+    return reports
+
+
+class RecipeService:
+    """
+    Asyncio HTTP/JSON front end for the PlatePlanner classes
+
+    Connections are kept alive until the client closes them, asks for
+    Connection: close, or stays idle for KEEPALIVE_TIMEOUT seconds. Requests
+    on one connection are answered in order, so pipelining works too.
+
+    Attributes:
+        recipes(RecipeStorage): recipe catalog
+        profiles(ProfileStorage): profile backend
+        posts(list): created Post objects, the index is the post id
+        workers(int): processes validating large batches, 0 validates everything inline
+        max_pending(int): requests in flight before new ones get 503
+        max_body(int): largest request body accepted, in bytes
+    """
+
+    # batches with at least this many records are validated in the process pool
+    OFFLOAD_BATCH = 16
+
+    # seconds an idle keep-alive connection is kept open
+    KEEPALIVE_TIMEOUT = 15
+
+    # largest request line plus headers
+    MAX_HEADER = 16 * 1024
+
+    # Constuctor
+    def __init__(self, recipes=None, profiles=None, workers=2, max_pending=256, max_body=1 << 20):
+        self.recipes = RecipeStorage() if recipes is None else recipes
+        self.profiles = SQLiteProfileStorage() if profiles is None else profiles
+        self.posts = []
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_body = max_body
+
+        self.pending = 0
+        self.rejected = 0
+        self._pool = None
+        self._pool_slots = None
+        self._server = None
+
+        # (method, first path segment) -> handler(path argument, query, body)
+        self._routes = {
+            ("GET", "health"): self._health,
+            ("GET", "recipes"): self._get_recipes,
+            ("POST", "recipes"): self._add_recipe,
+            ("GET", "profiles"): self._get_profile,
+            ("POST", "profiles"): self._add_profile,
+            ("POST", "profiles:batch"): self._add_profiles,
+            ("GET", "posts"): self._get_posts,
+            ("POST", "posts"): self._add_post,
+            ("POST", "posts:batch"): self._add_posts
+        }
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Starts listening, port 0 picks a free port (see self.port)"""
+        if self.workers:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+            # at most two batches per worker queued in the pool, later ones wait their turn
+            self._pool_slots = asyncio.Semaphore(2 * self.workers)
+
+        self._server = await asyncio.start_server(self._serve, host, port, limit=self.MAX_HEADER)
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def _offload(self, func, records):
+        # small batches are cheaper to validate than to ship to another process
+        if self._pool is None or len(records) < self.OFFLOAD_BATCH:
+            return func(records)
+
+        async with self._pool_slots:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, func, records)
+
+    # Connections
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                        {"status": "Request headers too large"}, False)
+                    break
+
+                keep_alive = await self._handle(head, reader, writer)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _handle(self, head, reader, writer):
+        # parsing the request line and headers, returns whether to keep the connection
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+            headers = dict((k.strip().lower(), v.strip()) for k, v in
+                           (line.split(":", 1) for line in lines[1:] if line))
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            await self._respond(writer, HTTPStatus.BAD_REQUEST, {"status": "Malformed request"}, False)
+            return False
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+        if "transfer-encoding" in headers:
+            await self._respond(writer, HTTPStatus.LENGTH_REQUIRED, {"status": "Content-Length required"}, False)
+            return False
+
+        # refusing oversized bodies without reading them, the connection can't be reused
+        if length > self.max_body or length < 0:
+            await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"status": "Request body too large"}, False)
+            return False
+        try:
+            body = await reader.readexactly(length) if length else b""
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return False
+
+        # shedding load before doing any work once too many requests are in flight
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            await self._respond(writer, HTTPStatus.SERVICE_UNAVAILABLE, {"status": "Server busy, please try again later"},
+                                keep_alive, {"Retry-After": "1"})
+            return keep_alive
+
+        self.pending += 1
+        try:
+            status, payload = await self._dispatch(method, target, body)
+        finally:
+            self.pending -= 1
+
+        await self._respond(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        name, _, argument = url.path.strip("/").partition("/")
+        handler = self._routes.get((method, name))
+        if handler is None:
+            known = any(route_name == name for _, route_name in self._routes)
+            if known:
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"status": "Method not allowed"}
+            return HTTPStatus.NOT_FOUND, {"status": "Not found"}
+
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"status": "Invalid JSON"}
+
+        try:
+            return await handler(unquote(argument), parse_qs(url.query), data)
+        except HTTPError as e:
+            return e.status, {"status": e.message}
+        except Exception:
+            # keeping the connection usable, the traceback goes to the event loop's handler
+            asyncio.get_running_loop().call_exception_handler(
+                {"message": f"{method} {url.path} failed", "exception": sys.exc_info()[1]})
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"status": "Unexpected error"}
+
+    async def _respond(self, writer, status, payload, keep_alive, extra_headers=None):
+        body = json.dumps(payload).encode()
+        headers = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        headers += [f"{k}: {v}" for k, v in (extra_headers or {}).items()]
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            # waiting for slow readers, so one client can't make us buffer without bound
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    # Handlers
+
+    async def _health(self, argument, query, data):
+        return HTTPStatus.OK, {"status": "ok", "pending": self.pending, "rejected": self.rejected}
+
+    async def _get_recipes(self, argument, query, data):
+        if argument:
+            recipe = self.recipes.recipes.get(argument)
+            if recipe is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, "Recipe not found")
+            return HTTPStatus.OK, dict(recipe, title=argument)
+
+        try:
+            titles = self.recipes.find_recipes(
+                category=_first(query, "category"),
+                tags=query.get("tag", ()),
+                min_calories=_number(query, "min_calories"),
+                max_calories=_number(query, "max_calories"),
+                min_protein=_number(query, "min_protein"),
+                max_protein=_number(query, "max_protein"),
+                limit=int(_first(query, "limit", 100))
+            )
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid query parameter")
+        return HTTPStatus.OK, [dict(self.recipes.recipes[t], title=t) for t in titles]
+
+    async def _add_recipe(self, argument, query, data):
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid recipe data")
+        try:
+            status = self.recipes.add_recipe(**data)
+        except TypeError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid recipe data")
+
+        if status != "Recipe saved successfully":
+            raise HTTPError(HTTPStatus.BAD_REQUEST, status)
+        return HTTPStatus.CREATED, {"status": status}
+
+    async def _get_profile(self, argument, query, data):
+        try:
+            return HTTPStatus.OK, self.profiles.load(argument)
+        except KeyError:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Profile not found")
+
+    async def _add_profile(self, argument, query, data):
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, INVALID_PROFILE_DATA)
+        try:
+            profile = UserProfile.from_dict(data)
+        except KeyError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, INVALID_PROFILE_DATA)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+
+        profile.store_to_json(self.profiles)
+        return HTTPStatus.CREATED, {"status": "Profile saved"}
+
+    async def _add_profiles(self, argument, query, data):
+        if not isinstance(data, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a list of profiles")
+
+        reports = await self._offload(_profile_reports, data)
+        valid = [{field: record[field] for field in PROFILE_FIELDS}
+                 for record, report in zip(data, reports) if report is None]
+        if valid:
+            self.profiles.store_many(valid)
+        return HTTPStatus.OK, {"stored": len(valid), "reports": reports}
+
+    async def _get_posts(self, argument, query, data):
+        try:
+            offset = int(_first(query, "offset", 0))
+            limit = int(_first(query, "limit", 50))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid query parameter")
+        # a negative offset would count from the end of the list and mislabel the ids
+        if offset < 0 or limit < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid query parameter")
+        page = self.posts[offset:offset + limit]
+        return HTTPStatus.OK, [dict(post_to_dict(p), id=offset + i) for i, p in enumerate(page)]
+
+    def _save_post(self, data):
+        self.posts.append(Post(data["image"], data["description"], data["likeButton"],
+                               data["likeCount"], data["imageCount"]))
+        return len(self.posts) - 1
+
+    async def _add_post(self, argument, query, data):
+        status = _post_statuses([data])[0]
+        if status:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, status)
+        return HTTPStatus.CREATED, {"status": "Posted!", "id": self._save_post(data)}
+
+    async def _add_posts(self, argument, query, data):
+        if not isinstance(data, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a list of posts")
+
+        results = []
+        for record, status in zip(data, await self._offload(_post_statuses, data)):
+            if status:
+                results.append({"status": status, "id": None})
+            else:
+                results.append({"status": "Posted!", "id": self._save_post(record)})
+        return HTTPStatus.OK, {"results": results}
+
+
+def _first(query, name, default=None):
+    values = query.get(name)
+    return values[0] if values else default
+
+
+def _number(query, name):
+    value = _first(query, name)
+    return None if value is None else float(value)
+
+
+class ServiceClient:
+    """
+    Minimal keep-alive JSON client for RecipeService, used by the tests and benchmark
+
+    Attributes:
+        host(string): server address
+        port(int): server port
+    """
+
+    # Constuctor
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, data=None):
+        """Sends one request on the shared connection, returns (status code, decoded json)"""
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+        body = b"" if data is None else json.dumps(data).encode()
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n\r\n"
+        self._writer.write(head.encode("latin-1") + body)
+
+        status_line, _, rest = (await self._reader.readuntil(b"\r\n\r\n")).decode("latin-1").partition("\r\n")
+        headers = dict(line.split(": ", 1) for line in rest.split("\r\n") if line)
+        payload = await self._reader.readexactly(int(headers["Content-Length"]))
+        if headers.get("Connection") == "close":
+            await self.close()
+        return int(status_line.split(" ")[1]), json.loads(payload)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=256)
+    args = parser.parse_args()
+
+    async def serve():
+        service = RecipeService(workers=args.workers, max_pending=args.max_pending)
+        server = await service.start(args.host, args.port)
+        print(f"serving on http://{args.host}:{service.port}")
+        try:
+            await server.serve_forever()
+        finally:
+            await service.close()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+"Similar recipes" over a RecipeStorage catalog
+
+SimilarRecipes reduces each recipe to its set of normalized ingredients
+("1/4 cup oats" and "Rolled oats" are both "oats"), gives every set a
+MinHash signature and buckets the signatures with locality-sensitive
+hashing. Recipes sharing a bucket in any band are candidates, and only
+those are ranked by exact Jaccard similarity, so a query looks at a few
+similar recipes instead of the whole catalog.
+"""
+
+import random
+import zlib
+from array import array
+
+from nutrition import food_name
+
+
+# Mersenne prime modulus of the MinHash permutations
+_PRIME = (1 << 61) - 1
+
+# MinHash values are cut to 32 bits and packed into one int per signature, each in
+# a 40 bit field: the bit above the value (guard) makes element-wise min a few int
+# operations, and whole bytes per field let bands be cut out as byte strings
+_VALUE_BITS = 32
+_FIELD_BITS = 40
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+
+
+def ingredient_set(ingredients):
+    """
+    Normalized ingredient names of a recipe, as a frozenset
+
+    Lines naming a food from nutrition.FOODS become that food, other lines
+    their lower case, singular words after the quantity and unit.
+    """
+    names = set(map(food_name, ingredients))
+    names.discard("")
+    return frozenset(names)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class SimilarRecipes:
+    """
+    MinHash / LSH index of recipe ingredient sets
+
+    Signatures have bands * rows MinHash values and two recipes become
+    candidates when all rows of any band agree. With the default 16 bands of
+    4 rows, pairs with a Jaccard similarity of 0.5 are found about 64% of the
+    time, 0.6 about 89% and 0.7 about 99%. The index subscribes to the
+    storage, and a re-saved title gets a new doc id with the old one marked
+    deleted.
+
+    Attributes:
+        storage(RecipeStorage): indexed catalog
+        bands(int): LSH bands
+        rows(int): MinHash values per band
+    """
+
+    # most candidates ranked per query, taken from the most selective buckets first
+    MAX_CANDIDATES = 2000
+
+    # Constuctor
+    def __init__(self, storage, bands=16, rows=4, seed=0):
+        self.storage = storage
+        self.bands = bands
+        self.rows = rows
+
+        rng = random.Random(seed)
+        self._permutations = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(bands * rows)]
+        self._values = sum(_VALUE_MASK << (i * _FIELD_BITS) for i in range(bands * rows))
+        self._guards = sum(1 << (i * _FIELD_BITS + _VALUE_BITS) for i in range(bands * rows))
+
+        # packed MinHash values of each ingredient name, computed once per name
+        self._token_hashes = {}
+        self._token_ids = {}
+
+        self._titles = []
+        self._doc_ids = {}
+        self._sets = []
+        self._deleted = set()
+
+        # per band: band key -> doc ids
+        self._buckets = [{} for _ in range(bands)]
+
+        for title, recipe in storage.recipes.items():
+            self._add(title, recipe)
+        storage.subscribe(self._add)
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def _hashes(self, name):
+        # only names of indexed recipes are kept, so queries do not grow the table
+        hashes = self._token_hashes.get(name)
+        if hashes is None:
+            x = zlib.crc32(name.encode("utf-8"))
+            hashes = 0
+            for i, (a, b) in enumerate(self._permutations):
+                hashes |= ((a * x + b) % _PRIME & _VALUE_MASK) << (i * _FIELD_BITS)
+            if name in self._token_ids:
+                self._token_hashes[name] = hashes
+        return hashes
+
+    def _band_keys(self, names):
+        # one key per band, cut from the element-wise minimum of the names' packed hashes
+        if not names:
+            return []
+        values, guards = self._values, self._guards
+        names = iter(names)
+        signature = self._hashes(next(names))
+        for name in names:
+            other = self._hashes(name)
+            # guard bits stay set in fields where signature >= other, and widen into a mask of those fields
+            smaller = ((signature | guards) - other) & guards
+            smaller -= smaller >> _VALUE_BITS
+            signature = (other & smaller) | (signature & (values ^ smaller))
+
+        width = self.rows * _FIELD_BITS // 8
+        packed = signature.to_bytes(self.bands * width, "little")
+        return [packed[band * width:(band + 1) * width] for band in range(self.bands)]
+
+    def _add(self, title, recipe):
+        names = ingredient_set(recipe.get("ingredients") or ())
+        for name in names:
+            self._token_ids.setdefault(name, len(self._token_ids))
+        keys = self._band_keys(names)
+
+        # a re-saved title replaces its old document
+        if title in self._doc_ids:
+            self._deleted.add(self._doc_ids.pop(title))
+
+        doc = len(self._titles)
+        self._titles.append(title)
+        self._doc_ids[title] = doc
+        self._sets.append(frozenset(self._token_ids[name] for name in names))
+        for buckets, key in zip(self._buckets, keys):
+            docs = buckets.get(key)
+            if docs is None:
+                docs = buckets[key] = array("I")
+            docs.append(doc)
+
+    def similar(self, title, k=10):
+        """[(title, jaccard)] of up to k other recipes sharing ingredients with title, most similar first"""
+        doc = self._doc_ids.get(title)
+        if doc is None:
+            return []
+        recipe = self.storage.recipes[title]
+        return self._rank(ingredient_set(recipe.get("ingredients") or ()), k, doc)
+
+    def similar_to(self, ingredients, k=10):
+        """[(title, jaccard)] of up to k recipes most similar to a list of ingredient lines"""
+        return self._rank(ingredient_set(ingredients), k, None)
+
+    def _rank(self, names, k, exclude):
+        keys = self._band_keys(names)
+        ids = frozenset(self._token_ids[name] for name in names if name in self._token_ids)
+
+        # smallest buckets first, they hold the closest matches
+        found = [buckets.get(key) for buckets, key in zip(self._buckets, keys)]
+        found = sorted((docs for docs in found if docs), key=len)
+
+        candidates = set()
+        for docs in found:
+            candidates.update(docs)
+            if len(candidates) >= self.MAX_CANDIDATES:
+                break
+        candidates.discard(exclude)
+
+        sets, titles, deleted = self._sets, self._titles, self._deleted
+        scored = []
+        for doc in candidates:
+            if doc in deleted:
+                continue
+            other = sets[doc]
+            shared = len(ids & other)
+            if shared:
+                scored.append((shared / (len(names) + len(other) - shared), titles[doc]))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(title, score) for score, title in scored[:k]]
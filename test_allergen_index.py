@@ -0,0 +1,92 @@
+import unittest
+
+from main import RecipeStorage
+from allergen_index import AllergenIndex, AllergenVocabulary, normalize
+
+
+# testcases for AllergenVocabulary
+class TestAllergenVocabulary(unittest.TestCase):
+
+    def setUp(self):
+        self.vocabulary = AllergenVocabulary()
+
+    # test case for plural and case normalization
+    def test_normalize(self):
+        self.assertEqual(normalize("  Peanuts "), "peanut")
+        self.assertEqual(normalize("Tree-Nuts"), "tree nut")
+        self.assertEqual(normalize("Anchovies"), "anchovy")
+
+    # test case for synonyms sharing the canonical bit
+    def test_synonyms(self):
+        self.assertEqual(self.vocabulary.bit("cheese"), self.vocabulary.bit("Milk"))
+        self.assertIsNone(self.vocabulary.bit("lettuce"))
+
+    # Helpers
+    def allergens_in(self, text):
+        mask = self.vocabulary.mask_of_text(text)
+        return {self.vocabulary.names[b] for b in range(len(self.vocabulary)) if mask >> b & 1}
+
+    # test case for word and phrase matches in ingredient text
+    def test_mask_of_text(self):
+        self.assertEqual(self.allergens_in("2 slices bread, 1 cup whole milk, Tree nuts"),
+                         {"wheat", "milk", "tree nut"})
+        self.assertEqual(self.allergens_in("4 anchovies, 1 cup almond milk"), {"fish", "tree nut"})
+
+    # test case for phrases holding an allergen word without being that allergen
+    def test_phrases(self):
+        self.assertEqual(self.allergens_in("2 tbsp peanut butter"), {"peanut"})
+        self.assertEqual(self.allergens_in("1 can coconut milk, 1 tsp cream of tartar"), set())
+        self.assertEqual(self.allergens_in("peanut butter, butter"), {"peanut", "milk"})
+
+
+# testcases for AllergenIndex
+class TestAllergenIndex(unittest.TestCase):
+
+    # initialising RecipeStorage object with a few recipes for testing
+    def setUp(self):
+        self.store = RecipeStorage()
+        self.store.add_recipe("Satay", "Grill", "satay.jpg", "Main Course",
+                              ingredients=["chicken", "2 tbsp peanut butter"])
+        self.store.add_recipe("Salad", "Toss", "salad.jpg", "Appetizer",
+                              ingredients=["lettuce", "tomatoes"])
+        self.store.add_recipe("Cheesecake", "Bake", "cake.jpg", "Dessert",
+                              ingredients=["cream cheese", "eggs", "flour"])
+        self.index = AllergenIndex(self.store)
+
+    # test case for safe recipes per allergy list
+    def test_safe_recipes(self):
+        self.assertEqual(self.index.safe_recipes(["peanut"]), ["Salad", "Cheesecake"])
+        self.assertEqual(self.index.safe_recipes(["Milk", "peanuts"]), ["Salad"])
+        self.assertEqual(self.index.safe_recipes([]), ["Satay", "Salad", "Cheesecake"])
+        self.assertEqual(self.index.safe_count(["egg"]), 2)
+
+    # test case for single recipe checks
+    def test_is_safe(self):
+        self.assertFalse(self.index.is_safe("Cheesecake", ["wheat"]))
+        self.assertTrue(self.index.is_safe("Salad", ["wheat"]))
+
+    # test case for recipes added and re-saved after the index was built
+    def test_incremental(self):
+        self.store.add_recipe("Pad Thai", "Fry", "padthai.jpg", "Main Course",
+                              ingredients=["rice noodles", "shrimp", "peanuts"])
+        self.store.add_recipe("Satay", "Grill", "satay.jpg", "Main Course", ingredients=["chicken"])
+        self.assertEqual(self.index.safe_recipes(["peanut"]), ["Satay", "Salad", "Cheesecake"])
+        self.assertEqual(self.index.safe_recipes(["shellfish"], limit=2), ["Satay", "Salad"])
+
+    # test case for plant milks and nut butters not excluding a milk allergy
+    def test_milk_phrases(self):
+        self.store.add_recipe("Curry", "Simmer", "curry.jpg", "Main Course",
+                              ingredients=["1 can coconut milk", "2 tbsp peanut butter", "anchovies"])
+        self.assertTrue(self.index.is_safe("Curry", ["milk"]))
+        self.assertFalse(self.index.is_safe("Curry", ["fish"]))
+        self.assertFalse(self.index.is_safe("Curry", ["peanuts"]))
+
+    # test case for allergies missing from the vocabulary
+    def test_unknown_allergy(self):
+        self.assertEqual(self.index.safe_recipes(["tomato"]), ["Satay", "Cheesecake"])
+        self.store.add_recipe("Bruschetta", "Toast", "b.jpg", "Appetizer", ingredients=["tomato"])
+        self.assertFalse(self.index.is_safe("Bruschetta", ["tomato"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
+from datetime import date
 
-from main import User, CalorieTracker, RecipeStorage
+from main import User, CalorieTracker, RecipeStorage, SortedIndex
 
 # testcases for Login function
 class TestLogin(unittest.TestCase):
@@ -88,6 +89,58 @@ class TestCalorieTracker(unittest.TestCase):
         result = self.tracker.add_calories("-45qw")
         self.assertEqual(result, "Only numeric characters are allowed")
 
+# testcases for Calorie tracker daily and weekly aggregates
+class TestCalorieAggregates(unittest.TestCase):
+
+    # initialising CalorieTracker object with a week of logs for testing
+    def setUp(self):
+        self.tracker = CalorieTracker()
+        self.tracker.log_meal(400, protein=20, carbs=40, fat=10, name="Oats", when="2024-10-13")
+        self.tracker.log_meal(600, protein=35, name="Tacos", when="2024-10-13")
+        self.tracker.log_meal(500, name="Oats", when="2024-10-15")
+        self.tracker.log_meal(300, name="Salad", when="2024-10-19")
+
+    # test case for a single day
+    def test_daily_totals(self):
+        totals = self.tracker.daily_totals("2024-10-13")
+        self.assertEqual(totals["calories"], 1000)
+        self.assertEqual(totals["protein"], 55)
+        self.assertEqual(totals["meals"], 2)
+
+    # test case for weekly totals and the average per logged day
+    def test_weekly_totals(self):
+        totals = self.tracker.weekly_totals("2024-10-13")
+        self.assertEqual(totals["calories"], 1800)
+        self.assertEqual(totals["active_days"], 3)
+        self.assertEqual(self.tracker.range_average("2024-10-13", "2024-10-19"), 600)
+
+    # test case for rolling totals ending on the latest logged day
+    def test_rolling_totals(self):
+        self.assertEqual(self.tracker.rolling_totals(5)["calories"], 800)
+        self.assertEqual(self.tracker.rolling_totals(1, end="2024-10-14")["calories"], 0)
+
+    # test case for back-dated and out-of-range days
+    def test_back_dated(self):
+        self.tracker.log_meal(250, when="2024-10-01")
+        self.tracker.log_meal(100, when="2024-10-15")
+        self.assertEqual(self.tracker.range_totals("2024-09-01", "2024-12-31")["calories"], 2150)
+        self.assertEqual(self.tracker.daily_totals("2024-10-15")["meals"], 2)
+        self.assertEqual(self.tracker.weekly_totals("2024-10-13")["active_days"], 3)
+        self.assertEqual(self.tracker.daily_totals("2025-01-01")["calories"], 0)
+
+    # test case for most logged meals in a range
+    def test_top_meals(self):
+        self.assertEqual(self.tracker.top_meals("2024-10-13", "2024-10-19"), [("Oats", 2), ("Salad", 1)])
+
+    # test case for invalid meal inputs
+    def test_invalid_meal(self):
+        self.assertEqual(self.tracker.log_meal("lots"), "Only numeric characters are allowed")
+        self.assertEqual(self.tracker.log_meal(100, when="someday"), "Invalid date")
+        self.assertEqual(self.tracker.log_meal(100, when="9999-12-31"), "Invalid date")
+        self.assertEqual(self.tracker.log_meal(100, when=date(1, 1, 1)), "Invalid date")
+        self.assertEqual(self.tracker.log_meal(100, when=739000), "Invalid date")
+        self.assertEqual(self.tracker.range_totals("0001-01-01", "9999-12-31")["calories"], 1800)
+
 # testcases for Recipe Storage function
 class TestRecipeStorage(unittest.TestCase):
 
@@ -155,6 +208,95 @@ class TestRecipeStorage(unittest.TestCase):
         self.assertEqual(result, "Recipe saved successfully")
 
 
+# testcases for Recipe Storage query function
+class TestRecipeQuery(unittest.TestCase):
+
+    # initialising RecipeStorage object with a small catalog for testing
+    def setUp(self):
+        self.store = RecipeStorage()
+        self.store.add_recipe("Vegan Brownies", "Mix and bake", "brownies.jpg", "Dessert",
+                              calories=350, protein=4, dietary_tags=["Vegan"])
+        self.store.add_recipe("Cheesecake", "Mix and chill", "cake.jpg", "Dessert",
+                              calories=450, protein=8, dietary_tags=["Vegetarian"])
+        self.store.add_recipe("Fruit Sorbet", "Blend and freeze", "sorbet.png", "Dessert",
+                              calories=120, protein=1, dietary_tags=["Vegan", "Gluten-Free"])
+        self.store.add_recipe("Chicken Tacos", "Fill and bake", "tacos.jpg", "Main Course",
+                              calories=380, protein=30)
+
+    # test case for category, tag and calorie filters combined
+    def test_combined_filters(self):
+        result = self.store.find_recipes(category="Dessert", tags=["Vegan"], max_calories=400)
+        self.assertEqual(result, ["Fruit Sorbet", "Vegan Brownies"])
+
+    # test case for a protein range query
+    def test_protein_range(self):
+        result = self.store.find_recipes(min_protein=5, max_protein=30)
+        self.assertEqual(result, ["Cheesecake", "Chicken Tacos"])
+
+    # test case for a limited query
+    def test_limit(self):
+        result = self.store.find_recipes(category="Dessert", min_calories=0, limit=2)
+        self.assertEqual(result, ["Fruit Sorbet", "Vegan Brownies"])
+
+    # test case for unknown category or tag
+    def test_no_matches(self):
+        self.assertEqual(self.store.find_recipes(tags=["Keto"]), [])
+        self.assertEqual(self.store.find_recipes(category="Appetizer"), [])
+
+    # test case for indexes updating when a title is saved again
+    def test_overwrite_updates_indexes(self):
+        self.store.add_recipe("Vegan Brownies", "Mix and bake", "brownies.jpg", "Appetizer", calories=900)
+        self.assertEqual(self.store.find_recipes(tags=["Vegan"]), ["Fruit Sorbet"])
+        self.assertEqual(self.store.find_recipes(min_calories=800), ["Vegan Brownies"])
+        self.assertEqual(self.store.find_recipes(max_protein=4), ["Fruit Sorbet"])
+
+    # test case for invalid nutrition values
+    def test_invalid_calories(self):
+        result = self.store.add_recipe("Soup", "Boil", "soup.jpg", "Appetizer", calories="lots")
+        self.assertEqual(result, "Invalid calorie amount")
+
+    # test case for invalid dietary tags
+    def test_invalid_tags(self):
+        result = self.store.add_recipe("Soup", "Boil", "soup.jpg", "Appetizer", dietary_tags="Vegan")
+        self.assertEqual(result, "Invalid dietary tags")
+
+
+# testcases for the sorted range index
+class TestSortedIndex(unittest.TestCase):
+
+    # test case for ranges spanning several buckets
+    def test_range_across_buckets(self):
+        index = SortedIndex()
+        index.BUCKET_SIZE = 4
+        for i in range(50):
+            index.add(i % 25, f"r{i}")
+        self.assertEqual(len(index), 50)
+        self.assertEqual(index.count(10, 12), 6)
+        self.assertEqual(sorted(index.irange(24)), ["r24", "r49"])
+
+    # test case for removing items
+    def test_remove(self):
+        index = SortedIndex()
+        index.add(5, "a")
+        self.assertTrue(index.remove(5, "a"))
+        self.assertFalse(index.remove(5, "a"))
+        self.assertEqual(list(index.irange()), [])
+
+    # test case for bulk loading matching one add per item
+    def test_update(self):
+        items = [(i % 25, f"r{i}") for i in range(50)]
+        bulk, single = SortedIndex(), SortedIndex()
+        bulk.BUCKET_SIZE = single.BUCKET_SIZE = 4
+        bulk.update(items)
+        for key, title in items:
+            single.add(key, title)
+        self.assertEqual(list(bulk.irange(3, 20)), list(single.irange(3, 20)))
+        self.assertEqual(bulk.count(10, 12), 6)
+
+        bulk.update([(11, "r100")])
+        self.assertEqual(bulk.count(10, 12), 7)
+
+
 if __name__ == "__main__":
     unittest.main()
 
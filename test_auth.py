@@ -0,0 +1,87 @@
+import unittest
+
+from auth import SessionTable, TokenBucketLimiter, UserDirectory
+
+
+# Helpers
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# testcases for UserDirectory login and logout
+class TestUserDirectory(unittest.TestCase):
+
+    # initialising UserDirectory with a cheap hash cost for testing
+    def setUp(self):
+        self.clock = FakeClock()
+        self.directory = UserDirectory(
+            iterations=1000,
+            sessions=SessionTable(ttl=60, clock=self.clock),
+            user_limiter=TokenBucketLimiter(capacity=3, refill_rate=1.0, clock=self.clock),
+            ip_limiter=TokenBucketLimiter(capacity=5, refill_rate=1.0, clock=self.clock)
+        )
+        self.directory.register("goodexample123", "gpass12!")
+
+    # testcase for valid username and password
+    def test_valid_login(self):
+        result = self.directory.login("goodexample123", "gpass12!")
+        self.assertEqual(result["status"], "Welcome Back")
+        self.assertEqual(self.directory.current_user(result["session"]), "goodexample123")
+
+    # testcase for wrong password, unknown user and invalid type
+    def test_invalid_login(self):
+        for username, password in [("goodexample123", "wrongpas"), ("nobody", "gpass12!"), (3, "gpass12!")]:
+            result = self.directory.login(username, password)
+            self.assertEqual(result, {"status": "Incorrect Username or Password", "session": None})
+
+    # testcase for registering a taken username
+    def test_duplicate_register(self):
+        self.assertEqual(self.directory.register("goodexample123", "other"), "Username already taken")
+
+    # testcase for passwords being stored hashed
+    def test_hashed(self):
+        salt, iterations, hashed = self.directory._credentials["goodexample123"]
+        self.assertNotIn(b"gpass12!", hashed)
+        self.assertEqual(iterations, 1000)
+
+    # testcase for a burst of attempts on one username
+    def test_user_rate_limit(self):
+        for _ in range(3):
+            self.directory.login("goodexample123", "wrongpas")
+        result = self.directory.login("goodexample123", "gpass12!")
+        self.assertEqual(result["status"], "Too many login attempts, please try again later")
+        self.clock.now += 1
+        self.assertEqual(self.directory.login("goodexample123", "gpass12!")["status"], "Welcome Back")
+
+    # testcase for a burst of attempts from one IP across usernames
+    def test_ip_rate_limit(self):
+        for i in range(5):
+            self.directory.login(f"user{i}", "guess", ip="10.0.0.1")
+        result = self.directory.login("goodexample123", "gpass12!", ip="10.0.0.1")
+        self.assertEqual(result["status"], "Too many login attempts, please try again later")
+        self.assertEqual(self.directory.login("goodexample123", "gpass12!", ip="10.0.0.2")["status"], "Welcome Back")
+
+    # testcase for logging out with a session token
+    def test_logout(self):
+        token = self.directory.login("goodexample123", "gpass12!")["session"]
+        self.assertEqual(self.directory.logout(token), "Logout successful")
+        self.assertEqual(self.directory.logout(token), "Invalid session please login")
+        self.assertEqual(self.directory.logout(None), "Unexpected error")
+
+    # testcase for session expiry and sweeping
+    def test_session_expiry(self):
+        token = self.directory.login("goodexample123", "gpass12!")["session"]
+        self.clock.now += 61
+        self.assertEqual(self.directory.logout(token), "Invalid session please login")
+        self.directory.login("goodexample123", "gpass12!")
+        self.clock.now += 61
+        self.assertEqual(self.directory.sweep()["sessions"], 1)
+        self.assertEqual(len(self.directory.sessions), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import duplicates
+from duplicates import DuplicateIndex, duplicate_recipes, find_duplicates, shingles, simhash
+from main import RecipeStorage
+from post import DUPLICATE_POST, create_post
+
+
+INSTRUCTIONS = ("Simmer the chicken in the curry sauce for twenty minutes, stir in the coconut milk, "
+                "season with salt and lime, scatter over the coriander and serve with steamed basmati rice "
+                "and warm naan bread on the side for a quick weeknight dinner that feeds four")
+
+
+# Helpers
+def post_data(**changes):
+    data = {"image": "pasta.jpg", "description": "Trying out this new recipe!",
+            "likeButton": True, "likeCount": 5, "imageCount": 1}
+    data.update(changes)
+    return data
+
+
+# testcases for SimHash fingerprints and the duplicate index
+class TestDuplicateIndex(unittest.TestCase):
+
+    # test case for shingles and SimHash ignoring case and punctuation
+    def test_simhash(self):
+        self.assertEqual(shingles("Mix it, then BAKE!"), ["mix it", "it then", "then bake"])
+        self.assertEqual(simhash("Mix it, then BAKE!"), simhash("mix it then bake"))
+        self.assertEqual(simhash("!!"), 0)
+        edited = INSTRUCTIONS.replace("twenty", "25")
+        self.assertLessEqual((simhash(INSTRUCTIONS) ^ simhash(edited)).bit_count(), 7)
+        self.assertGreater((simhash(INSTRUCTIONS) ^ simhash("Bake the cake until golden")).bit_count(), 7)
+
+    # test case for near-duplicates found and re-added keys replaced
+    def test_find(self):
+        index = DuplicateIndex()
+        index.add("curry", INSTRUCTIONS)
+        self.assertEqual(index.find(INSTRUCTIONS.upper()), "curry")
+        self.assertEqual(index.find(INSTRUCTIONS.replace("twenty", "25")), "curry")
+        self.assertIsNone(index.find("Bake the cake until golden"))
+
+        index.add("curry", "Bake the cake until golden")
+        self.assertIsNone(index.find(INSTRUCTIONS))
+        self.assertEqual(index.find("bake the cake until golden."), "curry")
+        self.assertEqual(len(index), 1)
+
+    # test case for images matched on content, whatever their file name, and only with similar text
+    def test_images(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ("a.jpg", "b.jpg", "c.jpg")]
+            for path, content in zip(paths, (b"same bytes", b"same bytes", b"other bytes")):
+                with open(path, "wb") as mf:
+                    mf.write(content)
+
+            index = DuplicateIndex()
+            index.add(1, INSTRUCTIONS, paths[0])
+            index.add(2, "", paths[0])
+            rewritten = INSTRUCTIONS.replace("twenty minutes", "half an hour").replace("four", "six people")
+            self.assertGreater((simhash(INSTRUCTIONS) ^ simhash(rewritten)).bit_count(), 7)
+            self.assertEqual(index.find(rewritten, paths[1]), 1)
+            self.assertIsNone(index.find(rewritten, paths[2]))
+            self.assertIsNone(index.find("Bake the cake until golden", paths[1]))
+            self.assertEqual(index.find("", paths[1]), 2)
+            self.assertIsNone(index.find("", os.path.join(directory, "missing.jpg")))
+
+
+# testcases for duplicate checks at ingest time and in bulk
+class TestIngestDuplicates(unittest.TestCase):
+
+    # test case for create_post rejecting a repeated description
+    def test_create_post(self):
+        index = DuplicateIndex()
+        self.assertEqual(create_post(post_data(), duplicates=index)["status"], "Posted!")
+        self.assertEqual(create_post(post_data(image="other.png"), duplicates=index)["status"], DUPLICATE_POST)
+        self.assertEqual(create_post(post_data(description="Second try, now with garlic bread"),
+                                     duplicates=index)["status"], "Posted!")
+        self.assertEqual(create_post(post_data())["status"], "Posted!")
+
+    # test case for add_recipe rejecting a recipe reposted under a new title
+    def test_add_recipe(self):
+        store = RecipeStorage(duplicates=DuplicateIndex())
+        self.assertEqual(store.add_recipe("Chicken Curry", INSTRUCTIONS, "curry.jpg", "Main Course"),
+                         "Recipe saved successfully")
+        self.assertEqual(store.add_recipe("Best Curry Ever", INSTRUCTIONS, "curry2.jpg", "Main Course"),
+                         "Recipe already exists")
+        self.assertEqual(store.add_recipe("Chicken Curry", INSTRUCTIONS + " Enjoy!", "curry.jpg", "Main Course"),
+                         "Recipe saved successfully")
+        self.assertEqual(list(store.recipes), ["Chicken Curry"])
+
+    # test case for recipes sharing a placeholder image but not their text
+    def test_shared_image(self):
+        with tempfile.TemporaryDirectory() as directory:
+            placeholder = os.path.join(directory, "placeholder.jpg")
+            with open(placeholder, "wb") as mf:
+                mf.write(b"placeholder bytes")
+
+            store = RecipeStorage(duplicates=DuplicateIndex())
+            with mock.patch("duplicates.content_hash", wraps=duplicates.content_hash) as content_hash:
+                self.assertEqual(store.add_recipe("Chicken Curry", INSTRUCTIONS, placeholder, "Main Course"),
+                                 "Recipe saved successfully")
+                self.assertEqual(store.add_recipe("Cake", "Bake the cake until golden", placeholder, "Dessert"),
+                                 "Recipe saved successfully")
+                self.assertEqual(store.add_recipe("Curry Again", INSTRUCTIONS.upper(), placeholder, "Main Course"),
+                                 "Recipe already exists")
+            # the image is hashed once per recipe
+            self.assertEqual(content_hash.call_count, 3)
+
+    # test case for bulk de-duplication giving the same pairs inline and in a process pool
+    def test_bulk(self):
+        store = RecipeStorage()
+        store.add_recipe("Chicken Curry", INSTRUCTIONS, "curry.jpg", "Main Course")
+        store.add_recipe("Cake", "Bake the cake until golden", "cake.jpg", "Dessert")
+        store.add_recipe("Curry Again", INSTRUCTIONS.replace("twenty", "25"), "again.jpg", "Main Course")
+        store.add_recipe("Cake Again", "BAKE the cake until golden!", "cake2.jpg", "Dessert")
+
+        expected = {"Curry Again": "Chicken Curry", "Cake Again": "Cake"}
+        self.assertEqual(duplicate_recipes(store), expected)
+        self.assertEqual(duplicate_recipes(store, workers=2, chunk_size=1), expected)
+        self.assertEqual(list(find_duplicates([(1, "a b c d", None), (2, "e f g h", None)])), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
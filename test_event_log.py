@@ -0,0 +1,161 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from event_log import EventLog
+
+
+# testcases for the append-only event log
+class TestEventLog(unittest.TestCase):
+
+    # initialising an EventLog with small segments, so a few events fill several
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log = EventLog(self.directory.name, segment_size=400)
+
+    def tearDown(self):
+        self.log.close()
+        self.directory.cleanup()
+
+    # Helpers
+    def reopen(self):
+        self.log.close()
+        self.log = EventLog(self.directory.name, segment_size=400)
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.directory.name) if name.endswith(".log"))
+
+    def stored_bytes(self):
+        total = 0
+        for name in self.segments():
+            try:
+                total += os.path.getsize(os.path.join(self.directory.name, name))
+            except FileNotFoundError:
+                # merged away by a compaction running meanwhile
+                pass
+        return total
+
+    # test case for monotonic ids and the newest events of a user first
+    def test_latest(self):
+        ids = [self.log.append("activity", "alice", {"step": i}) for i in range(12)]
+        self.log.append("post", "bob", {"text": "Hello"})
+        self.log.append("like", "alice", {"post": 7})
+        self.assertEqual(ids, list(range(1, 13)))
+        self.assertGreater(len(self.segments()), 1)
+
+        latest = self.log.latest("alice", n=3)
+        self.assertEqual([(e.id, e.kind) for e in latest], [(14, "like"), (12, "activity"), (11, "activity")])
+        self.assertEqual([e.data for e in self.log.latest("alice", n=2, kind="activity")],
+                         [{"step": 11}, {"step": 10}])
+        self.assertEqual([e.user for e in self.log.latest("bob")], ["bob"])
+        self.assertEqual(self.log.latest("carol"), [])
+        with self.assertRaises(ValueError):
+            self.log.append("comment", "alice")
+
+    # test case for keyed events superseding older ones and removed events staying hidden
+    def test_keys_and_remove(self):
+        first = self.log.append("meal_log", "alice", {"calories": 1800}, key="2024-05-01")
+        self.log.append("meal_log", "alice", {"calories": 2100}, key="2024-05-01")
+        post = self.log.append("post", "alice", {"text": "Pasta night"})
+        self.log.remove("alice", post)
+        self.assertEqual([e.data for e in self.log.latest("alice")], [{"calories": 2100}])
+        self.assertNotIn(first, [e.id for e in self.log.events()])
+
+        # ids keep counting after removals, also across a reopen
+        self.reopen()
+        self.assertEqual([e.data for e in self.log.latest("alice")], [{"calories": 2100}])
+        self.assertEqual(self.log.append("activity", "alice"), 5)
+
+    # test case for sealed segments, the unsealed tail and a torn last record after a crash
+    def test_reopen(self):
+        for i in range(20):
+            self.log.append("activity", f"user{i % 3}", {"step": i}, durable=i % 5 == 0)
+        before = list(self.log.events())
+        self.reopen()
+        self.assertEqual(list(self.log.events()), before)
+
+        last = os.path.join(self.directory.name, self.segments()[-1])
+        self.log.append("activity", "user0", {"step": 20})
+        self.log.close()
+        with open(last, "ab") as mf:
+            mf.write(b"\x01\x02\x03")
+        self.log = EventLog(self.directory.name, segment_size=400)
+        self.assertEqual(self.log.latest("user0", n=1)[0].data, {"step": 20})
+        self.assertEqual(self.log.append("activity", "user0"), 22)
+
+    # test case for compaction dropping hidden events and merging small segments
+    def test_compact(self):
+        ids = [self.log.append("activity", f"user{i % 2}", {"step": i}) for i in range(30)]
+        for event_id in ids[:10]:
+            self.log.remove(f"user{(event_id - 1) % 2}", event_id)
+        for i in range(10):
+            self.log.append("meal_log", "user0", {"version": i}, key="2024-05-01")
+        before = list(self.log.events())
+        segments = len(self.segments())
+
+        self.log.segment_size = 2000
+        self.assertGreaterEqual(self.log.compact(), 10)
+        self.assertLess(len(self.segments()), segments)
+        self.assertEqual(list(self.log.events()), before)
+        self.assertEqual(self.log.latest("user0", n=2)[1].data, {"step": 28})
+
+        self.reopen()
+        self.assertEqual(list(self.log.events()), before)
+        self.assertEqual(self.log.compact(), 0)
+
+    # test case for compaction after reopening leaving already compacted segments alone
+    def test_reopen_compact(self):
+        ids = [self.log.append("post", "alice", {"text": "x" * 40}) for _ in range(12)]
+        for event_id in ids[:6]:
+            self.log.remove("alice", event_id)
+        for i in range(6):
+            self.log.append("meal_log", "alice", {"version": i}, key="2024-05-01")
+        self.assertGreater(self.log.compact(), 0)
+        # a second pass only merges segments the first one shrank
+        self.log.compact()
+        before = list(self.log.events())
+
+        self.reopen()
+        with mock.patch("event_log._write_file") as write:
+            self.assertEqual(self.log.compact(), 0)
+        write.assert_not_called()
+        self.assertEqual(list(self.log.events()), before)
+
+    # test case for concurrent durable appends sharing fsyncs
+    def test_group_commit(self):
+        def writer(user):
+            for i in range(25):
+                self.log.append("like", user, {"post": i})
+
+        self.log.segment_size = 1 << 20
+        with mock.patch("event_log.os.fsync", side_effect=lambda fd: time.sleep(0.002)) as fsync:
+            threads = [threading.Thread(target=writer, args=(f"user{t}",)) for t in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(list(self.log.events())), 200)
+        self.assertLess(fsync.call_count, 200)
+        self.assertEqual([e.data["post"] for e in self.log.latest("user3", n=3)], [24, 23, 22])
+
+    # test case for compaction running in a background thread
+    def test_background_compaction(self):
+        ids = [self.log.append("post", "alice", {"text": "x" * 40}) for _ in range(12)]
+        for event_id in ids[:6]:
+            self.log.remove("alice", event_id)
+        self.log.append("post", "alice", {"text": "last"})
+        size = self.stored_bytes()
+        self.log.start_compaction(interval=0.01)
+
+        deadline = time.time() + 5
+        while self.stored_bytes() >= size and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertLess(self.stored_bytes(), size)
+        self.assertEqual(len(self.log.latest("alice", n=100)), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import base64
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+from image_ingest import PNG_SIGNATURE, Image, ImageInfo, ImagePipeline, sniff_image, validate_image_file
+
+# 16x16 baseline JPEG with 2x2 subsampled chroma (CPython's imghdr test image)
+PYTHON_JPG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQEAAQABAAD/2wBDAAMCAgICAgMCAgIDAwMDBAYEBAQEBAgGBgUGCQgKCgkICQkKDA8MCgsOCwkJDRENDg8Q"
+    "EBEQCgwSExIQEw8QEBD/2wBDAQMDAwQDBAgEBAgQCwkLEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQ"
+    "EBAQEBAQEBD/wAARCAAQABADASIAAhEBAxEB/8QAFgABAQEAAAAAAAAAAAAAAAAABwQF/8QAJBAAAQQBBAICAwAAAAAAAAAAAQID"
+    "BAYFBwgSExEiABQJMTL/xAAVAQEBAAAAAAAAAAAAAAAAAAAABv/EACMRAAECBQMFAAAAAAAAAAAAAAECEQMEBQYhABIxFRZhgeH/"
+    "2gAMAwEAAhEDEQA/ABSm0mobc8HmExLUlRzzEWPkJWW+ulrsaUVAseUgslSlH9LKuPryIKuWPZdskzXmm3fX5m2nF4GlVxx/HOpx"
+    "4ks51+MiU/Iaad7UcUo4tILoS4kqcWkezS0hO/HvuRp0rO6hWnWO1UisZVuFi4GFeyEpmGepa5S5SWVPuciFKRFLgSrwetnyPIB+"
+    "Vb4N9mKhQMzo5po9XLdDs9d6ZVix2VEhiL9kuNPxw2gEKcDQ/rs8AuA8VAe0vdl7VOYn+27flGAUgmITjbhSmCg3BYlyeWDkMolv"
+    "w4KOp1KM6iCNvngZHwetf//Z"
+)
+
+
+# Helpers
+def encode_png(width, height, rgb):
+    """Encodes 8-bit RGB rows as a PNG file's bytes"""
+    stride = width * 3
+    raw = b"".join(b"\x00" + bytes(rgb[y * stride:(y + 1) * stride]) for y in range(height))
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    return (PNG_SIGNATURE + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+def gradient(width, height):
+    return bytearray(value for y in range(height) for x in range(width) for value in (x % 256, y % 256, 128))
+
+
+def make_gif(width, height, palette, indexes):
+    # LZW with a clear code every 254 codes keeps every code 9 bits long
+    codes = []
+    for i, index in enumerate(indexes):
+        if i % 254 == 0:
+            codes.append(256)
+        codes.append(index)
+    codes.append(257)
+    value = sum(code << (9 * n) for n, code in enumerate(codes))
+    data = value.to_bytes(-(-9 * len(codes) // 8), "little")
+    blocks = b"".join(bytes([len(data[i:i + 255])]) + data[i:i + 255] for i in range(0, len(data), 255))
+    return (b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF7, 0, 0) + palette.ljust(768, b"\0")
+            + b"\x2c" + struct.pack("<HHHHB", 0, 0, width, height, 0) + b"\x08" + blocks + b"\x00;")
+
+
+# testcases for sniffing and validating image files
+class TestSniffImage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "wb") as mf:
+            mf.write(data)
+        return path
+
+    # test case for reading the format and size of each kind of image
+    def test_sniff(self):
+        self.assertEqual(sniff_image(self.write("a.png", encode_png(3, 2, gradient(3, 2)))), ImageInfo("png", 3, 2))
+        self.assertEqual(sniff_image(self.write("a.gif", make_gif(4, 5, b"", [0] * 20))), ImageInfo("gif", 4, 5))
+        self.assertEqual(sniff_image(self.write("a.jpg", PYTHON_JPG)), ImageInfo("jpeg", 16, 16))
+
+    # test case for files whose content does not match their name
+    def test_invalid(self):
+        self.assertEqual(validate_image_file(self.write("empty.jpg", b"")), "Must be an image")
+        self.assertEqual(validate_image_file(self.write("notes.jpg", b"not an image at all")), "Must be an image")
+        self.assertEqual(validate_image_file(self.write("photo.jpg", encode_png(2, 2, gradient(2, 2)))),
+                         "Must be an image")
+        self.assertEqual(validate_image_file(self.write("photo.txt", PYTHON_JPG)), "Must be an image")
+        self.assertEqual(validate_image_file(os.path.join(self.directory.name, "missing.jpg")), "No image chosen")
+        self.assertIsNone(validate_image_file(self.write("photo.JPEG", PYTHON_JPG)))
+
+    # test case for files cut off inside their header
+    def test_truncated(self):
+        png = encode_png(3, 2, gradient(3, 2))
+        self.assertEqual(validate_image_file(self.write("short.png", png[:22])), "Must be an image")
+        sof = PYTHON_JPG.index(b"\xff\xc0")
+        for end in (sof + 3, sof + 6, sof + 8):
+            self.assertEqual(validate_image_file(self.write("short.jpg", PYTHON_JPG[:end])), "Must be an image")
+
+    # test case for headers claiming huge dimensions
+    def test_too_large(self):
+        header = encode_png(1, 1, b"\0\0\0")[:16] + struct.pack(">II", 100_000, 100_000)
+        self.assertEqual(validate_image_file(self.write("huge.png", header + b"\0" * 64)), "Image is too large")
+
+
+# testcases for ImagePipeline uploads
+class TestImagePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pipeline = ImagePipeline(os.path.join(self.directory.name, "thumbnails"), size=32, workers=0)
+        self.images = [
+            self.write("dinner.png", encode_png(80, 40, gradient(80, 40))),
+            self.write("salad.gif", make_gif(20, 20, bytes(range(48)), [i % 16 for i in range(400)])),
+            self.write("soup.jpg", PYTHON_JPG)
+        ]
+
+    def tearDown(self):
+        self.pipeline.close()
+        self.directory.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "wb") as mf:
+            mf.write(data)
+        return path
+
+    # test case for every image getting a fixed size thumbnail
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_ingest(self):
+        result = self.pipeline.ingest(self.images)
+        self.assertEqual(result["status"], "Uploaded!")
+        self.assertEqual([image["format"] for image in result["images"]], ["png", "gif", "jpeg"])
+        for image in result["images"]:
+            self.assertFalse(image["duplicate"])
+            with Image.open(image["thumbnail"]) as thumbnail:
+                self.assertEqual(thumbnail.size, (32, 32))
+
+    # test case for repeat uploads, under the same or another name, being skipped
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_duplicates(self):
+        self.pipeline.ingest(self.images[:1])
+        copy = self.write("copy.png", open(self.images[0], "rb").read())
+        result = self.pipeline.ingest([copy, self.images[2], self.images[2]])
+        self.assertEqual([image["duplicate"] for image in result["images"]], [True, False, True])
+        self.assertEqual(result["images"][0]["hash"], result["images"][0]["thumbnail"][-68:-4])
+
+    # test case for uploads rejected before anything is written
+    def test_rejected(self):
+        bad = self.write("bad.jpg", b"GIF89a")
+        self.assertEqual(self.pipeline.ingest([]), {"status": "No image chosen", "images": []})
+        self.assertEqual(self.pipeline.ingest(self.images * 2)["status"], "Too many photos selected")
+        self.assertEqual(self.pipeline.ingest(self.images + [bad])["status"], "Must be an image")
+        self.assertEqual(os.listdir(self.pipeline.directory), [])
+
+    # test case for uploads being checked and hashed but not thumbnailed without Pillow
+    def test_without_pillow(self):
+        with mock.patch("image_ingest.Image", None):
+            result = self.pipeline.ingest([self.images[0], self.images[2], self.images[2]])
+        self.assertEqual(result["status"], "Uploaded!")
+        self.assertEqual([image["thumbnail"] for image in result["images"]], [None, None, None])
+        self.assertEqual([image["duplicate"] for image in result["images"]], [False, False, True])
+        self.assertEqual(os.listdir(self.pipeline.directory), [])
+
+    # test case for any decoder error becoming an unreadable image status
+    def test_decoder_error(self):
+        fake = mock.Mock()
+        fake.open.side_effect = ZeroDivisionError("division by zero")
+        with mock.patch("image_ingest.Image", fake):
+            result = self.pipeline.ingest(self.images[:1])
+        self.assertEqual(result["status"], "Image could not be read")
+        self.assertEqual(os.listdir(self.pipeline.directory), [])
+
+    # test case for a JPEG whose frame header claims a sampling factor of 0
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_zero_sampling(self):
+        data = bytearray(PYTHON_JPG)
+        # first component's sampling byte: SOF0 marker, length, precision, height, width, count, id
+        data[data.index(b"\xff\xc0") + 11] = 0
+        result = self.pipeline.ingest([self.write("crafted.jpg", bytes(data))])
+        self.assertEqual(result["status"], "Image could not be read")
+
+    # test case for thumbnails made in worker processes
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_workers(self):
+        with ImagePipeline(self.pipeline.directory, size=32, workers=2) as pipeline:
+            self.assertEqual(pipeline.ingest(self.images)["status"], "Uploaded!")
+        self.assertEqual(len(os.listdir(self.pipeline.directory)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from types import SimpleNamespace
+
+from main import RecipeStorage
+from meal_planner import MealPlanner
+
+
+# Helpers
+def make_profile(calories, allergies=()):
+    # MealPlanner only reads profile.data, as on UserProfile
+    return SimpleNamespace(data={"calories": calories, "allergies": list(allergies)})
+
+
+# testcases for MealPlanner
+class TestMealPlanner(unittest.TestCase):
+
+    # initialising a catalog with a spread of calories per category
+    def setUp(self):
+        self.store = RecipeStorage()
+        for i in range(20):
+            self.store.add_recipe(f"Starter {i}", "Prep", "s.jpg", "Appetizer",
+                                  calories=100 + 10 * i, protein=5, carbs=10, fat=4,
+                                  ingredients=["peanut sauce"] if i % 2 else ["lettuce"])
+            self.store.add_recipe(f"Main {i}", "Cook", "m.jpg", "Main Course",
+                                  calories=400 + 25 * i, protein=35, carbs=45, fat=15)
+            self.store.add_recipe(f"Dessert {i}", "Bake", "d.jpg", "Dessert",
+                                  calories=150 + 15 * i, protein=4, carbs=30, fat=8,
+                                  ingredients=["milk", "sugar"])
+        self.planner = MealPlanner(self.store)
+
+    # test case for a day plan within the calorie tolerance
+    def test_day_hits_target(self):
+        plans = self.planner.plan_day(make_profile(2000.0), count=3)
+        self.assertEqual(len(plans), 3)
+        for plan in plans:
+            self.assertLessEqual(abs(plan["calories"] - 2000.0), 100.0)
+            self.assertEqual(set(plan["meals"]), {"starter", "lunch", "dinner", "dessert"})
+        self.assertEqual(plans, sorted(plans, key=lambda p: p["score"]))
+
+    # test case for excluding recipes that mention an allergy
+    def test_allergies_excluded(self):
+        plans = self.planner.plan_day(make_profile(2000.0, ["Peanut"]))
+        for plan in plans:
+            for title in plan["meals"].values():
+                self.assertNotIn("peanut", " ".join(self.store.recipes[title]["ingredients"]))
+
+    # test case for allergies matched whatever their plural and only on whole words
+    def test_allergy_forms(self):
+        def planned(starter, **recipe):
+            store = RecipeStorage()
+            store.add_recipe(starter, "Prep", "s.jpg", "Appetizer", calories=300, **recipe)
+            store.add_recipe("Lunch", "Cook", "l.jpg", "Main Course", calories=600)
+            store.add_recipe("Dinner", "Cook", "m.jpg", "Main Course", calories=600)
+            store.add_recipe("Dessert", "Bake", "d.jpg", "Dessert", calories=500)
+            return MealPlanner(store, tolerance=0.1).plan_day(make_profile(2000.0, ["Peanuts"]))
+
+        self.assertEqual(planned("Satay Skewers", ingredients=["chicken", "peanut butter"]), [])
+        self.assertEqual(planned("Peanut Brittle"), [])
+        self.assertEqual(planned("Cheese Board", ingredients=["Cheddar cheese"])[0]["meals"]["starter"],
+                         "Cheese Board")
+        self.assertEqual(planned("Pea Soup", ingredients=["peas"])[0]["meals"]["starter"], "Pea Soup")
+
+    # test case for no possible plan
+    def test_no_plan(self):
+        self.assertEqual(self.planner.plan_day(make_profile(2000.0, ["milk"])), [])
+
+    # test case for a week without repeated recipes
+    def test_week_no_repeats(self):
+        weeks = self.planner.plan_week(make_profile(1800.0))
+        self.assertEqual(len(weeks[0]), 7)
+        titles = [t for day in weeks[0] for t in day["meals"].values()]
+        self.assertEqual(len(titles), len(set(titles)))
+
+    # test case for recipes added after the planner was built
+    def test_catalog_refresh(self):
+        self.store.add_recipe("Big Feast", "Cook", "f.jpg", "Main Course", calories=5000)
+        self.planner.plan_day(make_profile(2000.0))
+        self.assertIn("Big Feast", self.planner._arrays["Main Course"][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from main import RecipeStorage
+from nutrition import compute_catalog, fill_catalog, parse_ingredient, recipe_nutrition
+
+
+# testcases for the ingredient parser
+class TestParseIngredient(unittest.TestCase):
+
+    # test case for quantities, units and foods in the catalog's ingredient lines
+    def test_units(self):
+        self.assertEqual(parse_ingredient("1/4 cup oats")[:3], (0.25, "cup", "oats"))
+        self.assertEqual(parse_ingredient("2 scoops protein powder"), (2, "scoop", "protein powder", 60))
+        self.assertEqual(parse_ingredient("4 oz sliced turkey").grams, 4 * 28.35)
+        self.assertEqual(parse_ingredient("2 chicken breasts"), (2, None, "chicken breast", 348))
+        self.assertEqual(parse_ingredient("1 cup of milk").food, "milk")
+
+    # test case for mixed numbers, ranges and fraction characters
+    def test_quantities(self):
+        self.assertEqual(parse_ingredient("1 1/2 cups rice").quantity, 1.5)
+        self.assertEqual(parse_ingredient("1½ cups rice").quantity, 1.5)
+        self.assertEqual(parse_ingredient("2-3 cloves garlic")[:2], (2.5, "clove"))
+        self.assertEqual(parse_ingredient("10g oats")[1:], ("g", "oats", 10))
+
+    # test case for lines without a quantity or a known food
+    def test_missing_parts(self):
+        self.assertEqual(parse_ingredient("Sweet potato cubes"), (None, None, "sweet potato", 130))
+        self.assertEqual(parse_ingredient("Unicorn dust"), (None, None, None, None))
+
+    # test case for repeated lines being served from the cache
+    def test_cached(self):
+        parse_ingredient.cache_clear()
+        for _ in range(3):
+            parse_ingredient("1 banana")
+        info = parse_ingredient.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+
+
+# testcases for recipe and catalog nutrition
+class TestRecipeNutrition(unittest.TestCase):
+
+    # initialising RecipeStorage object with a hand-entered and a computed recipe
+    def setUp(self):
+        self.store = RecipeStorage()
+        self.store.add_recipe("Protein Pancakes", "Blend and cook", "pancakes.jpg", "Dessert",
+                              ingredients=["2 scoops protein powder", "2 eggs", "1 banana", "1/4 cup oats"])
+        self.store.add_recipe("Oat Bowl", "Stir", "oats.jpg", "Appetizer", calories=500,
+                              ingredients=["100 g oats"])
+        self.store.add_recipe("Mystery", "Unknown", "mystery.jpg", "Main Course", ingredients=["Unicorn dust"])
+
+    # test case for per-serving totals
+    def test_servings(self):
+        nutrition = recipe_nutrition(["100 g oats", "1 banana", "Unicorn dust"], servings=2)
+        self.assertEqual(nutrition["calories"], round((379 + 89 * 1.18) / 2, 1))
+        self.assertEqual(nutrition["protein"], round((13.2 + 1.1 * 1.18) / 2, 1))
+        self.assertEqual(nutrition["unmatched"], ["Unicorn dust"])
+
+    # test case for the same results inline and in a process pool
+    def test_compute_catalog(self):
+        inline = compute_catalog(self.store)
+        self.assertEqual(compute_catalog(self.store, workers=2, chunk_size=1), inline)
+        self.assertEqual(inline["Oat Bowl"]["calories"], 379)
+
+    # test case for filling only missing values, and re-indexing them
+    def test_fill_catalog(self):
+        self.assertEqual(fill_catalog(self.store), 2)
+        self.assertEqual(self.store.recipes["Oat Bowl"]["calories"], 500)
+        self.assertEqual(self.store.recipes["Oat Bowl"]["protein"], 13.2)
+        self.assertIsNone(self.store.recipes["Mystery"]["calories"])
+        self.assertEqual(self.store.find_recipes(min_protein=50), ["Protein Pancakes"])
+
+        self.assertEqual(fill_catalog(self.store, overwrite=True), 1)
+        self.assertEqual(self.store.recipes["Oat Bowl"]["calories"], 379)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import random
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+
+from allergen_index import AllergenIndex
+from main import RecipeStorage
+from ratings import MatrixFactorization, RatingStore
+
+
+# Helpers
+def make_profile(username, allergies=()):
+    # recommend_all only reads profile.data, as on UserProfile
+    return SimpleNamespace(data={"username": username, "allergies": list(allergies)})
+
+
+def taste_groups(store, users=40):
+    # even users love even recipes and odd users odd ones, each rating a random 8 of 12
+    rng = random.Random(0)
+    for user in range(users):
+        for recipe in rng.sample(range(12), 8):
+            store.rate(f"user{user}", f"Recipe {recipe}", 5 if recipe % 2 == user % 2 else 1)
+
+
+# testcases for RatingStore
+class TestRatingStore(unittest.TestCase):
+
+    def setUp(self):
+        self.ratings = RatingStore(prior_weight=2)
+
+    # test case for re-rating replacing the earlier rating and its aggregates
+    def test_rate(self):
+        self.ratings.rate("alice", "Pancakes", 4)
+        self.ratings.rate("bob", "Pancakes", 2)
+        self.ratings.rate("alice", "Pancakes", 5)
+        self.assertEqual(self.ratings.rating("alice", "Pancakes"), 5)
+        self.assertIsNone(self.ratings.rating("alice", "Salad"))
+        self.assertEqual(len(self.ratings), 2)
+        self.assertEqual(self.ratings.stats("Pancakes"), {"count": 2, "mean": 3.5, "bayesian": 3.5})
+        self.assertEqual(self.ratings.stats("Salad"), {"count": 0, "mean": None, "bayesian": 3.5})
+
+        for rating in (0, 6, 4.5, True, "5"):
+            with self.assertRaises(ValueError):
+                self.ratings.rate("alice", "Pancakes", rating)
+
+    # test case for pending ratings merged into the compressed rows
+    def test_compact(self):
+        self.ratings.rate("alice", "Salad", 3)
+        self.ratings.rate("alice", "Pancakes", 4)
+        self.ratings.compact()
+        self.ratings.rate("alice", "Salad", 1)
+        self.ratings.rate("bob", "Soup", 5)
+        self.assertEqual(self.ratings.rating("alice", "Salad"), 1)
+        # reads lay pending ratings over the rows instead of merging them
+        with mock.patch.object(self.ratings, "compact") as compact:
+            self.assertEqual(self.ratings.user_ratings("alice"), {"Salad": 1, "Pancakes": 4})
+            self.assertEqual(self.ratings.user_ratings("bob"), {"Soup": 5})
+            self.assertEqual(self.ratings.user_ratings("carol"), {})
+        compact.assert_not_called()
+        self.ratings.compact()
+        self.assertEqual(self.ratings.user_ratings("alice"), {"Salad": 1, "Pancakes": 4})
+
+    # test case for Bayesian averages pulling rarely rated recipes toward the mean
+    def test_top_rated(self):
+        self.ratings.rate("alice", "Soup", 5)
+        for user, rating in (("alice", 5), ("bob", 5), ("carol", 5), ("dave", 4)):
+            self.ratings.rate(user, "Stew", rating)
+        self.ratings.rate("bob", "Salad", 1)
+        # mean 25 / 6, so Soup is (2 * 25 / 6 + 5) / 3 and Stew (2 * 25 / 6 + 19) / 6
+        self.assertEqual([title for title, _ in self.ratings.top_rated(2)], ["Stew", "Soup"])
+        self.assertAlmostEqual(self.ratings.top_rated(1)[0][1], (50 / 6 + 19) / 6)
+
+
+# testcases for MatrixFactorization recommendations
+class TestMatrixFactorization(unittest.TestCase):
+
+    def setUp(self):
+        self.ratings = RatingStore()
+        taste_groups(self.ratings)
+        self.model = MatrixFactorization(self.ratings, factors=2).fit()
+
+    # test case for recommending the unrated recipes of the user's taste group
+    def test_recommend(self):
+        for user in range(40):
+            username = f"user{user}"
+            rated = self.ratings.user_ratings(username)
+            liked = [f"Recipe {r}" for r in range(user % 2, 12, 2) if f"Recipe {r}" not in rated]
+            recommended = [title for title, _ in self.model.recommend(username, n=len(liked))]
+            self.assertCountEqual(recommended, liked)
+            self.assertFalse(set(recommended) & set(rated))
+
+        self.assertGreater(self.model.predict("user1", "Recipe 1"), self.model.predict("user1", "Recipe 2") + 2)
+        self.assertEqual(len(self.model.recommend("stranger", n=5)), 5)
+
+    # test case for recipes unsafe for the user's allergies being skipped
+    def test_allergies(self):
+        best = self.model.recommend("user1", n=2)
+        store = RecipeStorage()
+        for recipe in range(12):
+            title = f"Recipe {recipe}"
+            ingredients = ["peanuts", "rice"] if title == best[0][0] else ["rice"]
+            store.add_recipe(title, "Cook", f"recipe{recipe}.jpg", "Main Course", ingredients=ingredients)
+        model = MatrixFactorization(self.ratings, allergens=AllergenIndex(store), factors=2).fit()
+        self.assertEqual(model.recommend("user1", n=1, allergies=["Peanut"]), best[1:])
+        self.assertEqual(model.recommend("user1", n=2, allergies=["milk"]), best)
+
+    # test case for the batch job giving the same results inline and in a process pool
+    def test_recommend_all(self):
+        profiles = [make_profile("user0"), make_profile("user1", ["milk"]), make_profile("stranger")]
+        inline = self.model.recommend_all(profiles, n=2)
+        self.assertEqual(inline["user0"], self.model.recommend("user0", n=2))
+        self.assertEqual(set(inline), {"user0", "user1", "stranger"})
+
+        pooled = MatrixFactorization(self.ratings, factors=2).fit(workers=2, chunk_size=7)
+        self.assertEqual(pooled.recommend_all(profiles, n=2, workers=2, chunk_size=1), inline)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+
+from main import RecipeStorage
+from recipe_search import RecipeSearch, tokenize
+
+
+# testcases for RecipeSearch
+class TestRecipeSearch(unittest.TestCase):
+
+    # initialising RecipeStorage object with a few recipes for testing
+    def setUp(self):
+        self.store = RecipeStorage()
+        self.store.add_recipe("Chicken Curry", "Simmer the chicken in the sauce", "curry.jpg", "Main Course",
+                              ingredients=["chicken thighs", "coconut milk", "curry paste"])
+        self.store.add_recipe("Chocolate Cake", "Bake for 30 minutes", "cake.jpg", "Dessert",
+                              ingredients=["flour", "cocoa", "eggs", "chocolate"])
+        self.store.add_recipe("Garden Salad", "Toss with chicken stock dressing", "salad.jpg", "Appetizer",
+                              ingredients=["lettuce", "tomatoes", "cucumber"])
+        self.search = RecipeSearch(self.store)
+
+    def titles(self, *args, **kwargs):
+        return [title for title, _ in self.search.search(*args, **kwargs)]
+
+    # test case for tokenizing with stopwords and punctuation removed
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Bake the Cake, for 30 min!"), ["bake", "cake", "30", "min"])
+
+    # test case for title matches outranking instruction matches
+    def test_ranking(self):
+        self.assertEqual(self.titles("chicken"), ["Chicken Curry", "Garden Salad"])
+        self.assertEqual(self.titles("chocolate cake"), ["Chocolate Cake"])
+        self.assertEqual(self.titles("chicken", limit=1), ["Chicken Curry"])
+        self.assertEqual(self.titles("unknown words"), [])
+
+    # test case for prefix completion and typeahead queries
+    def test_prefix(self):
+        self.assertEqual(self.search.complete("ch"), ["chicken", "chocolate"])
+        self.assertEqual(self.titles("coco", prefix=True), ["Chocolate Cake", "Chicken Curry"])
+        self.assertEqual(self.titles("coco", prefix=False), [])
+
+        # a partial last word that is a stopword or a single letter still completes
+        self.assertEqual(self.titles("t", prefix=True), ["Garden Salad", "Chicken Curry"])
+        self.assertEqual(self.titles("to", prefix=True), ["Garden Salad"])
+        self.assertEqual(self.titles("th", prefix=True), ["Chicken Curry"])
+        self.assertEqual(self.titles("chicken to", prefix=True), ["Garden Salad", "Chicken Curry"])
+        self.assertEqual(self.titles("chicken to ", prefix=True), ["Chicken Curry", "Garden Salad"])
+
+    # test case for recipes added and re-saved after the index was built
+    def test_incremental(self):
+        self.store.add_recipe("Lemon Tart", "Bake", "tart.jpg", "Dessert", ingredients=["lemons"])
+        self.store.add_recipe("Chicken Curry", "Simmer", "curry.jpg", "Main Course", ingredients=["tofu"])
+        self.assertEqual(self.titles("tart"), ["Lemon Tart"])
+        self.assertEqual(self.titles("coconut"), [])
+        self.assertEqual(self.titles("tofu"), ["Chicken Curry"])
+        self.assertEqual(len(self.search), 4)
+
+    # test case for results matching an exhaustive scoring on many postings
+    def test_matches_exhaustive(self):
+        store = RecipeStorage()
+        for i in range(2000):
+            store.add_recipe(f"Dish {i}", "stir " * (i % 7) + "serve", "dish.jpg", "Main Course",
+                             ingredients=["rice"] * (i % 3) + ["beans"])
+        search = RecipeSearch(store)
+        search.optimize()
+        for query in ("stir", "rice beans", "stir rice serve"):
+            found = search.search(query, limit=20)
+            everything = search.search(query, limit=2000)
+            self.assertEqual(found, everything[:20])
+
+    # test case for searches cut short by the scoring budget
+    def test_budget(self):
+        store = RecipeStorage()
+        for i in range(1000):
+            store.add_recipe(f"Soup {i}", "stir " * (i % 5) + "serve", "soup.jpg", "Main Course",
+                             ingredients=["water"] * (i % 4) + ["salt"])
+        search = RecipeSearch(store)
+        search.optimize()
+        exact = search.search("soup stir salt", limit=5)
+
+        search.SCORED_BUDGET = 300
+        found = search.search("soup stir salt", limit=5)
+        self.assertEqual(len(found), 5)
+        self.assertEqual(found[0], exact[0])
+
+    # test case for saving and restoring a snapshot
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "search.snapshot")
+            self.search.save(path)
+
+            store = RecipeStorage()
+            store.recipes = dict(self.store.recipes)
+            del store.recipes["Garden Salad"]
+            store.add_recipe("Pea Soup", "Blend", "soup.jpg", "Appetizer", ingredients=["peas"])
+
+            restored = RecipeSearch.load(path, store)
+            self.assertEqual([t for t, _ in restored.search("chicken")], ["Chicken Curry"])
+            self.assertEqual([t for t, _ in restored.search("soup")], ["Pea Soup"])
+            store.add_recipe("Pea Salad", "Toss", "salad.jpg", "Appetizer", ingredients=["peas"])
+            self.assertEqual(len(restored.search("peas")), 2)
+
+    # test case for recipes changed after the snapshot being re-indexed on load
+    def test_snapshot_changed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "search.snapshot")
+            self.search.save(path)
+            self.store.recipes["Chicken Curry"] = dict(self.store.recipes["Chicken Curry"],
+                                                       ingredients=["tofu", "curry paste"])
+
+            restored = RecipeSearch.load(path, self.store)
+            self.assertEqual([t for t, _ in restored.search("tofu")], ["Chicken Curry"])
+            self.assertEqual(restored.search("thighs"), [])
+
+            with open(path, "r+b") as mf:
+                mf.truncate(os.path.getsize(path) - 1)
+            self.assertRaises(ValueError, RecipeSearch.load, path, self.store)
+
+
+if __name__ == "__main__":
+    unittest.main()
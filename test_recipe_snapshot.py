@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from main import RecipeStorage
+from recipe_snapshot import SnapshotRecipes
+
+
+# testcases for memory-mapped recipe snapshots
+class TestRecipeSnapshot(unittest.TestCase):
+
+    # initialising RecipeStorage object with a small catalog and saving it to a snapshot
+    def setUp(self):
+        self.store = RecipeStorage()
+        self.store.add_recipe("Vegan Brownies", "Mix and bake", "brownies.jpg", "Dessert",
+                              calories=350, protein=4.5, dietary_tags=["Vegan"], ingredients=["cocoa", "flour"])
+        self.store.add_recipe("Crème Brûlée", "Bake, then torch the sugar", "creme.png", "Dessert",
+                              calories=450, dietary_tags=["Vegetarian"], ingredients=["cream", "eggs", "sugar"])
+        self.store.add_recipe("Fruit Sorbet", "Blend and freeze", "sorbet.png", "Dessert",
+                              calories=120, protein=1, fat=0.25, dietary_tags=["Vegan", "Gluten-Free"])
+        self.store.add_recipe("Chicken Tacos", "Fill and bake", "tacos.jpg", "Main Course",
+                              calories=380, protein=30, carbs=2 ** 40)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "catalog.snap")
+        self.store.save_snapshot(self.path)
+        self.loaded = RecipeStorage.open_snapshot(self.path)
+
+    def tearDown(self):
+        self.loaded.recipes.close()
+        self.directory.cleanup()
+
+    # test case for every field, type and the order of recipes coming back
+    def test_round_trip(self):
+        self.assertEqual(list(self.loaded.recipes), list(self.store.recipes))
+        self.assertEqual(dict(self.loaded.recipes.items()), self.store.recipes)
+        self.assertIsInstance(self.loaded.recipes["Vegan Brownies"]["calories"], int)
+        self.assertIsNone(self.loaded.recipes["Crème Brûlée"]["protein"])
+        self.assertNotIn("Pancakes", self.loaded.recipes)
+        with self.assertRaises(KeyError):
+            self.loaded.recipes["Pancakes"]
+
+    # test case for queries on the indexes built from the snapshot
+    def test_find_recipes(self):
+        self.assertEqual(self.loaded.find_recipes(category="Dessert", tags=["Vegan"], max_calories=400),
+                         ["Fruit Sorbet", "Vegan Brownies"])
+        self.assertEqual(self.loaded.find_recipes(min_protein=2), ["Vegan Brownies", "Chicken Tacos"])
+
+    # test case for saving recipes on top of an opened snapshot
+    def test_add_after_open(self):
+        self.assertEqual(self.loaded.add_recipe("Fruit Sorbet", "Blend", "sorbet.png", "Appetizer", calories=90),
+                         "Recipe saved successfully")
+        self.loaded.add_recipe("Pancakes", "Fry", "pancakes.jpg", "Dessert", calories=300)
+        self.assertCountEqual(self.loaded.find_recipes(category="Dessert"),
+                              ["Vegan Brownies", "Crème Brûlée", "Pancakes"])
+        self.assertEqual(self.loaded.find_recipes(max_calories=100), ["Fruit Sorbet"])
+        self.assertEqual(list(self.loaded.recipes)[-1], "Pancakes")
+        self.assertEqual(len(self.loaded.recipes), 5)
+
+        del self.loaded.recipes["Chicken Tacos"]
+        self.assertNotIn("Chicken Tacos", self.loaded.recipes)
+        self.assertEqual(len(self.loaded.recipes), 4)
+
+    # test case for files that are not snapshots of this version
+    def test_invalid_files(self):
+        with open(self.path, "rb") as mf:
+            data = mf.read()
+
+        for name, contents, message in [("other.snap", b"PPRS\x09\x00" + data[6:], "version 9"),
+                                        ("short.snap", data[:-3], "truncated"),
+                                        ("text.snap", b"title,calories\n" * 8, "not a recipe snapshot")]:
+            path = os.path.join(self.directory.name, name)
+            with open(path, "wb") as mf:
+                mf.write(contents)
+            with self.assertRaisesRegex(ValueError, message):
+                SnapshotRecipes(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+
+from service import RecipeService, ServiceClient
+
+
+# Helpers
+def post_data(**changes):
+    data = {"image": "food.jpg", "description": "Lunch", "likeButton": True, "likeCount": 1, "imageCount": 1}
+    data.update(changes)
+    return data
+
+
+def profile_data(username, **changes):
+    data = {"username": username, "description": "Hi", "weight": 70.0, "height": 175.0,
+            "allergies": ["nuts"], "calories": 2000.0, "activity": None}
+    data.update(changes)
+    return data
+
+
+# testcases for RecipeService routes
+class TestRecipeService(unittest.IsolatedAsyncioTestCase):
+
+    # starting a service without a process pool on a free port
+    async def asyncSetUp(self):
+        self.service = RecipeService(workers=0)
+        await self.service.start(port=0)
+        self.client = ServiceClient("127.0.0.1", self.service.port)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.service.close()
+
+    # test case for many requests on one keep-alive connection
+    async def test_keep_alive(self):
+        for _ in range(3):
+            self.assertEqual(await self.client.request("GET", "/health"),
+                             (200, {"status": "ok", "pending": 1, "rejected": 0}))
+        writer = self.client._writer
+        await self.client.request("GET", "/health")
+        self.assertIs(self.client._writer, writer)
+
+    # test case for adding and querying recipes
+    async def test_recipes(self):
+        recipe = {"title": "Pancakes", "instructions": "Mix and fry", "image": "pancakes.jpg",
+                  "category": "Dessert", "calories": 350}
+        self.assertEqual(await self.client.request("POST", "/recipes", recipe),
+                         (201, {"status": "Recipe saved successfully"}))
+        self.assertEqual(await self.client.request("POST", "/recipes", dict(recipe, image="pancakes.gif")),
+                         (400, {"status": "Invalid image format"}))
+
+        status, found = await self.client.request("GET", "/recipes?category=Dessert&max_calories=400")
+        self.assertEqual((status, [r["title"] for r in found]), (200, ["Pancakes"]))
+        status, found = await self.client.request("GET", "/recipes/Pancakes")
+        self.assertEqual((status, found["calories"]), (200, 350))
+        self.assertEqual((await self.client.request("GET", "/recipes/Waffles"))[0], 404)
+
+    # test case for storing, loading and rejecting profiles
+    async def test_profiles(self):
+        self.assertEqual((await self.client.request("POST", "/profiles", profile_data("goodexample123")))[0], 201)
+        self.assertEqual(await self.client.request("GET", "/profiles/goodexample123"),
+                         (200, profile_data("goodexample123")))
+        self.assertEqual(await self.client.request("POST", "/profiles", profile_data("ab")),
+                         (400, {"status": "Username length has to be greater than 3 and smaller than 20"}))
+        self.assertEqual((await self.client.request("GET", "/profiles/nobody"))[0], 404)
+
+    # test case for creating single and batched posts
+    async def test_posts(self):
+        self.assertEqual(await self.client.request("POST", "/posts", post_data()), (201, {"status": "Posted!", "id": 0}))
+        self.assertEqual(await self.client.request("POST", "/posts", post_data(description="")),
+                         (400, {"status": "No post description written"}))
+
+        status, batch = await self.client.request("POST", "/posts:batch", [post_data(), post_data(imageCount=9), 7])
+        self.assertEqual(status, 200)
+        self.assertEqual(batch["results"], [{"status": "Posted!", "id": 1},
+                                            {"status": "Too many photos selected", "id": None},
+                                            {"status": "Invalid post data", "id": None}])
+        status, posts = await self.client.request("GET", "/posts?offset=1")
+        self.assertEqual([p["id"] for p in posts], [1])
+        for query in ("offset=-5", "limit=-1", "offset=x"):
+            self.assertEqual(await self.client.request("GET", f"/posts?{query}"),
+                             (400, {"status": "Invalid query parameter"}))
+
+    # test case for unknown routes, bad bodies and oversized bodies
+    async def test_errors(self):
+        self.assertEqual((await self.client.request("GET", "/nothing"))[0], 404)
+        self.assertEqual((await self.client.request("DELETE", "/posts"))[0], 405)
+        self.assertEqual((await self.client.request("POST", "/posts:batch", {"not": "a list"}))[0], 400)
+
+        self.service.max_body = 10
+        self.assertEqual((await self.client.request("POST", "/posts", post_data()))[0], 413)
+        self.assertIsNone(self.client._writer)
+
+    # test case for shedding requests once too many are in flight
+    async def test_backpressure(self):
+        self.service.pending = self.service.max_pending
+        status, payload = await self.client.request("GET", "/health")
+        self.assertEqual(status, 503)
+        self.service.pending = 0
+        self.assertEqual((await self.client.request("GET", "/health"))[1]["rejected"], 1)
+
+
+# testcases for batches validated in the process pool
+class TestRecipeServicePool(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.service = RecipeService(workers=1)
+        await self.service.start(port=0)
+
+    async def asyncTearDown(self):
+        await self.service.close()
+
+    # test case for large batches giving the same results as inline validation
+    async def test_offloaded_batches(self):
+        posts = [post_data(likeCount=i) for i in range(40)]
+        profiles = [profile_data(f"user_{i:03d}", weight=float(i)) for i in range(40)]
+
+        clients = [ServiceClient("127.0.0.1", self.service.port) for _ in range(2)]
+        (_, post_batch), (_, profile_batch) = await asyncio.gather(
+            clients[0].request("POST", "/posts:batch", posts),
+            clients[1].request("POST", "/profiles:batch", profiles)
+        )
+        for client in clients:
+            await client.close()
+
+        self.assertEqual(sum(r["id"] is not None for r in post_batch["results"]), 39)
+        self.assertEqual(post_batch["results"][0]["status"], "Like count remains the same")
+        self.assertEqual(profile_batch["stored"], 37)
+        self.assertEqual(profile_batch["reports"][0], "Weight must be between 3 and 300 kg")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from main import RecipeStorage
+from similar_recipes import SimilarRecipes, ingredient_set, jaccard
+
+
+# testcases for SimilarRecipes
+class TestSimilarRecipes(unittest.TestCase):
+
+    # initialising RecipeStorage object with a few overlapping recipes for testing
+    def setUp(self):
+        self.store = RecipeStorage()
+        self.store.add_recipe("Pancakes", "Whisk and fry", "pancakes.jpg", "Dessert",
+                              ingredients=["2 eggs", "1 cup milk", "1 cup flour", "1 tbsp sugar", "Butter"])
+        self.store.add_recipe("Crepes", "Whisk thin and fry", "crepes.jpg", "Dessert",
+                              ingredients=["3 eggs", "2 cups milk", "1 cup flour", "Butter", "pinch of salt"])
+        self.store.add_recipe("Garden Salad", "Toss", "salad.jpg", "Appetizer",
+                              ingredients=["Lettuce", "2 tomatoes", "Olive oil"])
+        self.similar = SimilarRecipes(self.store)
+
+    # test case for normalizing quantities, units and plurals away
+    def test_ingredient_set(self):
+        self.assertEqual(ingredient_set(["1/4 cup rolled oats", "2 Eggs", "a dash of Vanilla Extracts"]),
+                         {"oats", "eggs", "a dash of vanilla extract"})
+        self.assertEqual(jaccard({"a", "b"}, {"b", "c"}), 1 / 3)
+
+    # test case for the most similar recipe first, excluding the recipe itself
+    def test_similar(self):
+        self.assertEqual(self.similar.similar("Pancakes"), [("Crepes", 4 / 6)])
+        self.assertEqual(self.similar.similar("Garden Salad", k=1), [])
+        self.assertEqual(self.similar.similar("Unknown"), [])
+        self.assertEqual(self.similar.similar_to(["eggs", "milk", "flour", "sugar", "butter"], k=1),
+                         [("Pancakes", 1.0)])
+
+    # test case for recipes saved after the index was built
+    def test_incremental(self):
+        self.store.add_recipe("Waffles", "Whisk and bake in the iron", "waffles.jpg", "Dessert",
+                              ingredients=["2 eggs", "1 cup milk", "1 cup flour", "1 tbsp sugar", "Butter"])
+        self.assertEqual(self.similar.similar("Pancakes", k=1), [("Waffles", 1.0)])
+
+        # re-saving with other ingredients drops the old version from results
+        self.store.add_recipe("Waffles", "Blend", "waffles.jpg", "Dessert", ingredients=["Lettuce", "2 tomatoes"])
+        self.assertEqual(self.similar.similar("Pancakes", k=1), [("Crepes", 4 / 6)])
+        self.assertEqual(len(self.similar), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()